@@ -18,12 +18,14 @@ from werkzeug.exceptions import RequestEntityTooLarge
 # Load environment variables early
 load_dotenv()
 
+from app.utils.reporting import RoutingSession  # noqa: E402
 from app.utils.time_utils import BUDAPEST_TZ, fmt_budapest, fmt_date  # noqa: E402
 from config import Config  # noqa: E402
 
 # Instantiate extensions
 # ✅ Keep attributes loaded after commit to avoid DetachedInstanceError in tests
-db = SQLAlchemy(session_options={"expire_on_commit": False})
+# RoutingSession: SELECTs of report views may go to a read-only engine.
+db = SQLAlchemy(session_options={"expire_on_commit": False, "class_": RoutingSession})
 mail = Mail()
 csrf = CSRFProtect()
 login_manager = LoginManager()
@@ -99,6 +101,10 @@ def create_app(test_config=None):
 
     # Init extensions
     db.init_app(flask_app)
+    from .utils.sqlite import configure_engines
+
+    with flask_app.app_context():
+        configure_engines(flask_app, db.engines.values())
 
     # 🔒 Force-load ALL models into metadata (core first, then features)
     # isort: off
@@ -122,6 +128,11 @@ def create_app(test_config=None):
     except Exception:
         # best-effort remap; don't crash app startup
         pass
+    import app.services.describer_sync  # noqa: F401  (session listeners)
+    import app.services.work_items  # noqa: F401  (session listeners)
+    import app.services.history  # noqa: F401  (session listeners)
+    import app.services.blob_store  # noqa: F401  (session listeners)
+
     # isort: on
 
     migrate.init_app(flask_app, db)
@@ -133,6 +144,11 @@ def create_app(test_config=None):
         render_as_batch=True,
     )
 
+    from .utils.upload_limits import UploadLimitMiddleware, UploadRequest
+
+    flask_app.request_class = UploadRequest
+    flask_app.wsgi_app = UploadLimitMiddleware(flask_app.wsgi_app, flask_app)
+
     mail.init_app(flask_app)
     csrf.init_app(flask_app)
     login_manager.init_app(flask_app)
@@ -249,7 +265,9 @@ def create_app(test_config=None):
 
     @flask_app.after_request
     def add_no_store_headers(response):
-        if flask_app.config.get("NO_STORE_HEADERS_ENABLED", True):
+        if flask_app.config.get("NO_STORE_HEADERS_ENABLED", True) and not getattr(
+            response, "keep_cache_control", False
+        ):
             ep = request.endpoint or ""
             if not (ep.startswith("static") or request.path.startswith("/static/")):
                 response.headers["Cache-Control"] = (
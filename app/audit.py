@@ -15,17 +15,19 @@ from app.utils.time_utils import now_utc
 TRUNCATE_AT = 500
 
 
-def log_action(action: str, details: str | None = None) -> None:
-    if not getattr(current_user, "is_authenticated", False):
+def log_action(action: str, details: str | None = None, *, user=None) -> None:
+    """Record *action* for *user* (default: the logged-in user)."""
+    user = current_user if user is None else user
+    if not getattr(user, "is_authenticated", False):
         return  # Skip logging if no user is logged in
 
     from app.models import AuditLog
 
     log_entry = AuditLog(
         timestamp=now_utc(),
-        user_id=current_user.id,
-        username=current_user.username,
-        role=current_user.role,
+        user_id=user.id,
+        username=user.username,
+        role=user.role,
         action=action,
         details=details,
     )
@@ -65,9 +67,13 @@ def _is_pk(column) -> bool:
 
 def _iter_column_attr_names(instance) -> Iterable[str]:
     mapper = inspect(instance).mapper
+    # Derived/materialized columns are maintained by listeners, not by users.
+    excluded = set(getattr(mapper.class_, "__audit_exclude__", ()))
     for col_attr in mapper.column_attrs:
         if any(_is_pk(col) for col in col_attr.columns):
             continue
+        if col_attr.key in excluded:
+            continue
         yield col_attr.key
 
 
@@ -104,3 +110,37 @@ def snapshot_for_insert(instance) -> List[Tuple[str, str, str]]:
             new_val = None
         snapshot.append((name, "∅", _stringify(new_val)))
     return snapshot
+
+
+def status_change(changes: Iterable[Tuple[str, str, str]]):
+    """Return ``(old, new)`` status from diff rows, or ``None`` if unchanged.
+
+    Works on :func:`diff_for_update`/:func:`snapshot_for_insert` output as well
+    as on ``(field, old, new)`` rows read back from the change logs.
+    """
+
+    for field, old_val, new_val in changes:
+        if field != "status":
+            continue
+        old_status = None if old_val in (None, "∅") else old_val
+        new_status = None if new_val in (None, "∅") else new_val
+        if old_status == new_status:
+            return None
+        return old_status, new_status
+    return None
+
+
+def change_payload(changes: Iterable[Tuple[str, str, str]]) -> str:
+    """Serialize diff rows as the JSON ``changes`` column of the change outbox."""
+
+    return json.dumps(
+        [
+            {
+                "field": field,
+                "old": None if old_val in (None, "∅") else old_val,
+                "new": None if new_val in (None, "∅") else new_val,
+            }
+            for field, old_val, new_val in changes
+        ],
+        ensure_ascii=False,
+    )
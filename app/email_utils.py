@@ -2,6 +2,7 @@ from flask import current_app
 from flask_mail import Message
 
 from . import mail
+from .services import email_outbox
 
 
 def send_email(subject, recipients, body):
@@ -9,14 +10,20 @@ def send_email(subject, recipients, body):
 
     If ``MAIL_DEFAULT_SENDER`` is not configured the function falls back to
     ``MAIL_USERNAME`` to avoid ``AssertionError`` from Flask-Mail.
+
+    This waits for the mail server; request handlers use :func:`queue_email`.
     """
-    sender = (
-        current_app.config.get("MAIL_DEFAULT_SENDER")
-        or current_app.config.get("MAIL_USERNAME")
-        or "no-reply@example.com"
-    )
+    sender = email_outbox.default_sender()
     msg = Message(subject, recipients=recipients, body=body, sender=sender)
     try:
         mail.send(msg)
     except Exception as e:  # pragma: no cover - log but don't fail
         current_app.logger.error("Failed to send email: %s", e)
+
+
+def queue_email(subject, recipients, body):
+    """Add the email to the outbox; it is sent after the caller commits.
+
+    See ``app.services.email_outbox`` for delivery, retries and rate limits.
+    """
+    return email_outbox.enqueue(subject, recipients, body)
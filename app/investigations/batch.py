@@ -0,0 +1,256 @@
+"""Generate one leíró letter for many investigations in a single run.
+
+The per-investigation routes build a context, resolve the experts and the
+describer one ``get_user_safe`` call at a time and queue one render.  A batch
+(``/investigations/batch_documents`` or ``scripts/batch_generate_documents.py``)
+instead
+
+- selects the investigations with one query (:func:`select_investigations`),
+- loads every user the contexts refer to with one ``IN`` query
+  (:func:`prefetch_users`); the resolvers then hit the session identity map,
+- queues one :class:`~app.models.DocumentJob` per investigation under a shared
+  ``batch_id``, which the document worker renders across its process pool.
+
+Each output is registered as an investigation attachment by the regular
+``investigation_doc`` finisher; :func:`write_zip` bundles a finished batch.
+"""
+
+from __future__ import annotations
+
+import uuid
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import current_app
+from sqlalchemy import or_
+
+from app import db
+from app.models import DocumentJob, User
+from app.paths import ensure_investigation_folder, file_safe_case_number
+from app.services import document_jobs, template_store
+from app.services.work_items import SUBJECT_INVESTIGATION
+from app.utils.time_utils import BUDAPEST_TZ
+
+from .models import Investigation
+
+DEFAULT_MAX_INVESTIGATIONS = 500
+
+
+def _szignalas_context(inv: Investigation, fields: dict) -> dict:
+    from .routes import _szignalas_context as build
+
+    return build(inv, fields)
+
+
+def _hatarido_context(inv: Investigation, fields: dict) -> dict:
+    from .routes import _hatarido_context as build
+
+    return build(inv, fields, date.fromisoformat(fields["desired_date"]))
+
+
+@dataclass(frozen=True)
+class Letter:
+    title: str
+    template: str
+    suffix: str
+    endpoint: str
+    fields: Dict[str, str]  # form field -> label
+    context: Callable[[Investigation, dict], dict]
+
+
+LETTERS: Dict[str, Letter] = {
+    "tajekoztatas_ugy_szignalasarol": Letter(
+        title="Tájékoztatás az ügy szignálásáról",
+        template="tajekoztatas_ugy_szignalasarol.docx",
+        suffix="tajekoztatas_ugy_szignalasarol",
+        endpoint="investigations.leiro_tajekoztatas_ugy_szignalasarol",
+        fields={
+            "cimzett_szerv": "Címzett szerv",
+            "titulus_szerv": "Titulus (szerv)",
+            "actor": "Actor",
+            "titulus": "Titulus",
+        },
+        context=_szignalas_context,
+    ),
+    "hatarido_hosszabbitas_kerelem": Letter(
+        title="Határidő hosszabbítás kérelem",
+        template="hatarido_hosszabbitas_kerelem.docx",
+        suffix="hatarido_hosszabbitas_kerelem",
+        endpoint="investigations.leiro_hatarido_hosszabbitas_kerelem",
+        fields={
+            "titulus_szerv": "Titulus (szerv)",
+            "cimzett_szerv": "Címzett szerv",
+            "actor": "Actor",
+            "reasons": "Indok",
+            "desired_date": "Kívánt határidő",
+            "titulus": "Titulus",
+        },
+        context=_hatarido_context,
+    ),
+}
+
+
+@dataclass
+class Selection:
+    """Filters of a batch; empty values do not filter."""
+
+    ids: List[int] = field(default_factory=list)
+    case_type: str = ""
+    status: str = ""
+    expert_id: Optional[int] = None
+    deadline_before: Optional[date] = None
+
+
+def validate_fields(letter: Letter, fields: dict) -> List[str]:
+    """Return the labels of missing or invalid letter fields."""
+    errors = [
+        label
+        for name, label in letter.fields.items()
+        if not (fields.get(name) or "").strip()
+    ]
+    if "desired_date" in letter.fields and fields.get("desired_date"):
+        try:
+            date.fromisoformat(fields["desired_date"])
+        except ValueError:
+            errors.append(letter.fields["desired_date"])
+    return errors
+
+
+def select_investigations(selection: Selection) -> List[Investigation]:
+    """Load the investigations matching *selection* with a single query."""
+    query = Investigation.query
+    if selection.ids:
+        query = query.filter(Investigation.id.in_(selection.ids))
+    if selection.case_type:
+        query = query.filter(Investigation.investigation_type == selection.case_type)
+    if selection.status:
+        query = query.filter(Investigation.status == selection.status)
+    if selection.expert_id:
+        query = query.filter(
+            or_(
+                Investigation.assigned_expert_id == selection.expert_id,
+                Investigation.expert1_id == selection.expert_id,
+                Investigation.expert2_id == selection.expert_id,
+            )
+        )
+    if selection.deadline_before:
+        # Deadlines are stored in UTC; the cut-off is local midnight.
+        cutoff = datetime.combine(selection.deadline_before, time.min, BUDAPEST_TZ)
+        query = query.filter(Investigation.deadline < cutoff.astimezone(timezone.utc))
+    limit = (
+        current_app.config.get("DOCUMENT_BATCH_MAX_INVESTIGATIONS")
+        or DEFAULT_MAX_INVESTIGATIONS
+    )
+    invs = query.order_by(Investigation.case_number).limit(limit + 1).all()
+    if len(invs) > limit:
+        raise ValueError(f"A kiválasztás több mint {limit} vizsgálatot tartalmaz.")
+    return invs
+
+
+def prefetch_users(invs: Sequence[Investigation]) -> List[User]:
+    """Load every user referenced by *invs* into the session in one query.
+
+    ``User.default_leiro`` is joined eagerly, so the effective-describer
+    fallback needs no further query either.  Keep the returned list while
+    building contexts: the identity map only holds weak references.
+    """
+    ids = {
+        ident
+        for inv in invs
+        for ident in (
+            inv.assigned_expert_id,
+            inv.expert1_id,
+            inv.expert2_id,
+            inv.describer_id,
+        )
+        if ident
+    }
+    if not ids:
+        return []
+    return User.query.filter(User.id.in_(ids)).all()
+
+
+def shared_template(letter: Letter) -> Optional[Path]:
+    """The letter's template in the current shared template set, if any."""
+    tset = template_store.current(template_store.INVESTIGATION_SET)
+    if tset is not None and (tset.path / letter.template).exists():
+        return tset.path / letter.template
+    return None
+
+
+def submit_batch(
+    letter_key: str,
+    invs: Sequence[Investigation],
+    fields: dict,
+    *,
+    user_id,
+    force: bool = False,
+) -> Tuple[str, List[Tuple[Investigation, str]]]:
+    """Queue *letter_key* for every investigation in *invs*.
+
+    The case folder's template is used where present, else the shared one.
+    Unchanged documents are not rendered again unless *force* is set.
+    Returns ``(batch_id, skipped)`` where *skipped* lists the investigations
+    without a template together with the reason.
+    """
+    letter = LETTERS[letter_key]
+    batch_id = uuid.uuid4().hex
+    users = prefetch_users(invs)  # noqa: F841 - keeps the users in the session
+    shared = shared_template(letter)
+    skipped = []
+    for inv in invs:
+        case_folder = ensure_investigation_folder(inv.case_number or str(inv.id))
+        template = Path(case_folder) / "DO-NOT-EDIT" / letter.template
+        if not template.exists():
+            template = shared
+        if template is None:
+            skipped.append((inv, "A sablon nem található."))
+            continue
+        safe_case = file_safe_case_number(inv.case_number or str(inv.id))
+        document_jobs.enqueue(
+            document_jobs.KIND_INVESTIGATION_DOC,
+            subject_type=SUBJECT_INVESTIGATION,
+            subject_id=inv.id,
+            user_id=user_id,
+            batch_id=batch_id,
+            force=force,
+            payload={
+                "renderer": "docx",
+                "template": str(template),
+                "output": str(Path(case_folder) / f"{safe_case}_{letter.suffix}.docx"),
+                "context": letter.context(inv, fields),
+                "category": "generated",
+                "next": {"endpoint": letter.endpoint, "values": {"id": inv.id}},
+            },
+        )
+    db.session.commit()
+    if document_jobs.eager():
+        document_jobs.run_worker(processes=0, once=True, batch_id=batch_id)
+    return batch_id, skipped
+
+
+def batch_jobs(batch_id: str) -> List[DocumentJob]:
+    return (
+        DocumentJob.query.filter_by(batch_id=batch_id)
+        .order_by(DocumentJob.created_at)
+        .all()
+    )
+
+
+def write_zip(batch_id: str, fileobj) -> int:
+    """Write the outputs of the finished jobs of *batch_id* into a ZIP.
+
+    Returns the number of files written.
+    """
+    written = 0
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for job in batch_jobs(batch_id):
+            output = Path(job.payload["output"])
+            if job.status != document_jobs.STATUS_DONE or not output.exists():
+                continue
+            zf.write(output, arcname=output.name)
+            written += 1
+    return written
@@ -3,13 +3,19 @@ from flask_login import current_user
 from sqlalchemy import event
 
 from app import db
-from app.audit import diff_for_update, snapshot_for_insert
+from app.audit import (
+    change_payload,
+    diff_for_update,
+    snapshot_for_insert,
+    status_change,
+)
 from app.utils.time_utils import now_utc
 
 
 class Investigation(db.Model):
     __bind_key__ = "examination"
     __tablename__ = "investigation"
+    __audit_exclude__ = ("effective_describer_id", "template_version")
 
     id = db.Column(db.Integer, primary_key=True, nullable=False)
     case_number = db.Column(db.String(16), unique=True, nullable=False)
@@ -50,6 +56,11 @@ class Investigation(db.Model):
     expert1_id = db.Column(db.Integer, index=True)
     expert2_id = db.Column(db.Integer, index=True)
     describer_id = db.Column(db.Integer, index=True)
+    # describer_id or the expert's default leíró (see app.services.describer_sync)
+    effective_describer_id = db.Column(db.Integer, index=True)
+    # DO-NOT-EDIT template set version linked into the investigation folder
+    # (see app.services.template_store).
+    template_version = db.Column(db.String(16))
 
     notes = db.relationship(
         "InvestigationNote",
@@ -103,6 +114,10 @@ class InvestigationAttachment(db.Model):
     category = db.Column(db.String(64), nullable=False)
     uploaded_by = db.Column(db.Integer, index=True, nullable=False)  # plain int
     uploaded_at = db.Column(db.DateTime(timezone=True), default=now_utc, nullable=False)
+    sha256 = db.Column(db.String(64), index=True)  # NULL for legacy uploads
+    size_bytes = db.Column(db.Integer)
+    # Generated documents: template + context hash (app.services.document_jobs)
+    render_fingerprint = db.Column(db.String(64))
 
     investigation = db.relationship("Investigation", back_populates="attachments")
 
@@ -132,6 +147,63 @@ class InvestigationChangeLog(db.Model):
     )
 
 
+class InvestigationStatusTransition(db.Model):
+    """One row per ``Investigation.status`` change (examination bind)."""
+
+    __bind_key__ = "examination"
+    __tablename__ = "status_transition"
+    __table_args__ = (
+        sa.Index("ix_inv_status_transition_subject_at", "subject_id", "at"),
+        sa.Index("ix_inv_status_transition_to_status_at", "to_status", "at"),
+        sa.Index("ix_inv_status_transition_at", "at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    subject_type = db.Column(db.String(16), nullable=False, default="investigation")
+    subject_id = db.Column(db.Integer, nullable=False)
+    from_status = db.Column(db.String(64))
+    to_status = db.Column(db.String(64))
+    at = db.Column(db.DateTime(timezone=True), nullable=False)
+    actor = db.Column(db.Integer)  # plain int, like InvestigationChangeLog
+
+
+class InvestigationHistorySnapshot(db.Model):
+    """Compressed full Investigation state as of a change-log row."""
+
+    __bind_key__ = "examination"
+    __tablename__ = "investigation_history_snapshot"
+    __table_args__ = (
+        sa.Index(
+            "ix_investigation_history_snapshot_subject_taken",
+            "subject_id",
+            "taken_at",
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    subject_id = db.Column(db.Integer, nullable=False)
+    changelog_id = db.Column(db.Integer, nullable=False)
+    change_count = db.Column(db.Integer, nullable=False)
+    taken_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    state = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON
+
+
+class InvestigationChangeOutbox(db.Model):
+    """Change-data-capture feed for investigations (examination bind)."""
+
+    __bind_key__ = "examination"
+    __tablename__ = "change_outbox"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    subject_type = db.Column(db.String(16), nullable=False, default="investigation")
+    subject_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(8), nullable=False)  # insert / update / delete
+    at = db.Column(db.DateTime(timezone=True), nullable=False)
+    actor = db.Column(db.Integer)  # plain int, like InvestigationChangeLog
+    changes = db.Column(db.Text, nullable=False)  # JSON list of field changes
+
+
 def _resolve_investigation_actor() -> int:
     try:
         if getattr(current_user, "is_authenticated", False):
@@ -143,6 +215,39 @@ def _resolve_investigation_actor() -> int:
     return 0
 
 
+def _record_investigation_status_transition(
+    connection, inv_id, changes, actor, timestamp
+):
+    transition = status_change(changes)
+    if transition is None:
+        return
+    connection.execute(
+        InvestigationStatusTransition.__table__.insert(),
+        {
+            "subject_type": "investigation",
+            "subject_id": inv_id,
+            "from_status": transition[0],
+            "to_status": transition[1],
+            "at": timestamp,
+            "actor": actor,
+        },
+    )
+
+
+def _record_investigation_outbox(connection, inv_id, op, changes, actor, timestamp):
+    connection.execute(
+        InvestigationChangeOutbox.__table__.insert(),
+        {
+            "subject_type": "investigation",
+            "subject_id": inv_id,
+            "op": op,
+            "at": timestamp,
+            "actor": actor,
+            "changes": change_payload(changes),
+        },
+    )
+
+
 @event.listens_for(Investigation, "before_update", propagate=True)
 def _investigation_log_before_update(mapper, connection, target):  # noqa: ARG001
     if isinstance(target, InvestigationChangeLog):
@@ -166,6 +271,12 @@ def _investigation_log_before_update(mapper, connection, target):  # noqa: ARG00
     ]
     if rows:
         connection.execute(InvestigationChangeLog.__table__.insert(), rows)
+    _record_investigation_status_transition(
+        connection, inv_id, changes, actor, timestamp
+    )
+    _record_investigation_outbox(
+        connection, inv_id, "update", changes, actor, timestamp
+    )
 
 
 @event.listens_for(Investigation, "after_insert", propagate=True)
@@ -175,6 +286,7 @@ def _investigation_log_after_insert(mapper, connection, target):  # noqa: ARG001
     actor = _resolve_investigation_actor()
     inv_id = getattr(target, "id", None)
     timestamp = now_utc()
+    snapshot = snapshot_for_insert(target)
     rows = [
         {
             "investigation_id": inv_id,
@@ -184,7 +296,25 @@ def _investigation_log_after_insert(mapper, connection, target):  # noqa: ARG001
             "edited_by": actor,
             "timestamp": timestamp,
         }
-        for field, old_val, new_val in snapshot_for_insert(target)
+        for field, old_val, new_val in snapshot
     ]
     if rows:
         connection.execute(InvestigationChangeLog.__table__.insert(), rows)
+    _record_investigation_status_transition(
+        connection, inv_id, snapshot, actor, timestamp
+    )
+    _record_investigation_outbox(
+        connection, inv_id, "insert", snapshot, actor, timestamp
+    )
+
+
+@event.listens_for(Investigation, "after_delete", propagate=True)
+def _investigation_log_after_delete(mapper, connection, target):  # noqa: ARG001
+    _record_investigation_outbox(
+        connection,
+        target.id,
+        "delete",
+        [],
+        _resolve_investigation_actor(),
+        now_utc(),
+    )
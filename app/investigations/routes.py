@@ -5,7 +5,9 @@ import shutil
 import tempfile
 import unicodedata
 import zipfile
+from contextlib import nullcontext
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 from types import SimpleNamespace
 from typing import Optional
@@ -18,6 +20,7 @@ from flask import (
     redirect,
     render_template,
     request,
+    send_file,
     url_for,
 )
 from flask_login import current_user, login_required
@@ -26,20 +29,31 @@ from werkzeug import exceptions
 from werkzeug.utils import secure_filename  # for safe filenames
 
 from app import db
+from app.audit import log_action
 from app.models import User
 from app.paths import ensure_investigation_folder, file_safe_case_number
+from app.routes import (
+    document_job_response,
+    flash_document_done,
+    force_render_requested,
+    start_chunked_upload,
+)
+from app.services import blob_store, document_jobs, docx_cache
+from app.services.archive import archive_reads, archive_view
 from app.services.case_logic import resolve_effective_describer_user
 from app.services.core_user_read import get_user_safe
+from app.services.work_items import SUBJECT_INVESTIGATION
 
 # IMPORTANT: import the module (so monkeypatch in tests affects calls)
 from app.utils import permissions as permissions_mod
 from app.utils.dates import safe_fmt
+from app.utils.idempotency import make_default_key
 from app.utils.rbac import require_roles as roles_required
 from app.utils.roles import canonical_role
 from app.utils.time_utils import fmt_budapest, fmt_date, now_utc
 from app.utils.uploads import send_safe
 
-from . import investigations_bp
+from . import batch, investigations_bp
 from .forms import FileUploadForm, InvestigationForm, InvestigationNoteForm
 from .models import (
     Investigation,
@@ -123,21 +137,8 @@ def _is_assigned_member(inv, u):
     }:
         return True
 
-    if explicit_describer_id:
-        return False
-
-    for expert_id in (
-        getattr(inv, "expert1_id", None),
-        getattr(inv, "expert2_id", None),
-    ):
-        if not expert_id:
-            continue
-        expert_user = db.session.get(User, expert_id)
-        effective = resolve_effective_describer_user(expert_user, explicit_describer_id)
-        if effective and effective.id == uid:
-            return True
-
-    return False
+    # Fallback to the expert's default leíró is materialized on the row.
+    return getattr(inv, "effective_describer_id", None) == uid
 
 
 def can_upload_investigation_now(inv, u):
@@ -580,21 +581,19 @@ def leiro_ertesites_form(id: int):
         )
         output_path = Path(case_folder) / output_filename
 
-        try:
-            # _render_docx_template saves atomically to output_path itself
-            _render_docx_template(template_path, output_path, context)
-        except Exception as exc:  # noqa: BLE001
-            current_app.logger.exception(
-                "DOCX generation failed for investigation %s: %s", inv.id, exc
+        job, created = _queue_investigation_document(
+            inv,
+            template_path,
+            output_path,
+            context,
+            endpoint="investigations.leiro_ertesites_form",
+            category="egyéb",
+        )
+        if not created or job.status in document_jobs.PENDING:
+            return document_job_response(
+                job, created, url_for("investigations.leiro_ertesites_form", id=inv.id)
             )
-            stray_tmp = output_path.with_suffix(".tmp")
-            if stray_tmp.exists():
-                try:
-                    stray_tmp.unlink()
-                except OSError:
-                    current_app.logger.warning(
-                        "Could not remove temporary értesítés file: %s", stray_tmp
-                    )
+        if job.status == document_jobs.STATUS_FAILED:
             flash("Hiba történt a dokumentum generálása közben.", "danger")
             return (
                 render_template(
@@ -607,39 +606,8 @@ def leiro_ertesites_form(id: int):
                 500,
             )
 
-        filename = output_filename
-        timestamp = now_utc()
-        attachment = (
-            InvestigationAttachment.query.filter_by(
-                investigation_id=inv.id, filename=filename
-            )
-            .order_by(InvestigationAttachment.uploaded_at.desc())
-            .first()
-        )
-        if attachment is None:
-            attachment = InvestigationAttachment(
-                investigation_id=inv.id,
-                filename=filename,
-                category="egyéb",
-                uploaded_by=current_user.id,
-                uploaded_at=timestamp,
-            )
-            db.session.add(attachment)
-        else:
-            attachment.category = "egyéb"
-            attachment.uploaded_by = current_user.id
-            attachment.uploaded_at = timestamp
-
-        db.session.commit()
-
-        flash("Értesítés dokumentum sikeresen generálva.", "success")
-        return redirect(
-            url_for(
-                "investigations.leiro_ertesites_form",
-                id=inv.id,
-                generated_id=attachment.id,
-            )
-        )
+        flash_document_done(job, "Értesítés dokumentum sikeresen generálva.")
+        return redirect(document_jobs.redirect_url(job))
 
     return render_template(
         "investigations/ertesites_doc_form.html",
@@ -775,14 +743,21 @@ def leiro_szakerto_szakkonzultans_bevonasa(id: int):
         "szak": szak,
     }
 
-    try:
-        _render_docx_template(template_path, output_path, context)
-    except Exception as exc:  # noqa: BLE001
-        current_app.logger.exception(
-            "DOCX generation failed for szakértő / szakkonzultáns bevonása %s: %s",
-            inv.id,
-            exc,
-        )
+    job, created = _queue_investigation_document(
+        inv,
+        template_path,
+        output_path,
+        context,
+        endpoint="investigations.leiro_szakerto_szakkonzultans_bevonasa",
+        category="generated",
+    )
+    if not created or job.status in document_jobs.PENDING:
+        return document_job_response(
+            job,
+            created,
+            url_for("investigations.leiro_szakerto_szakkonzultans_bevonasa", id=inv.id),
+        )
+    if job.status == document_jobs.STATUS_FAILED:
         flash("Hiba történt a dokumentum generálása közben.", "danger")
         return (
             render_template(
@@ -795,40 +770,8 @@ def leiro_szakerto_szakkonzultans_bevonasa(id: int):
             500,
         )
 
-    timestamp = now_utc()
-    filename = output_path.name
-    attachment = (
-        InvestigationAttachment.query.filter_by(
-            investigation_id=inv.id, filename=filename
-        )
-        .order_by(InvestigationAttachment.uploaded_at.desc())
-        .first()
-    )
-
-    if attachment is None:
-        attachment = InvestigationAttachment(
-            investigation_id=inv.id,
-            filename=filename,
-            category="generated",
-            uploaded_by=current_user.id,
-            uploaded_at=timestamp,
-        )
-        db.session.add(attachment)
-    else:
-        attachment.category = "generated"
-        attachment.uploaded_by = current_user.id
-        attachment.uploaded_at = timestamp
-
-    db.session.commit()
-
-    flash("Dokumentum sikeresen generálva.", "success")
-    return redirect(
-        url_for(
-            "investigations.leiro_szakerto_szakkonzultans_bevonasa",
-            id=inv.id,
-            generated_id=attachment.id,
-        )
-    )
+    flash_document_done(job, "Dokumentum sikeresen generálva.")
+    return redirect(document_jobs.redirect_url(job))
 
 
 @investigations_bp.route("/<int:id>/leiro/dokumentum_bekerese", methods=["GET", "POST"])
@@ -965,14 +908,19 @@ def leiro_dokumentum_bekerese(id: int):
     safe_case = file_safe_case_number(case_number)
     output_path = Path(case_folder) / f"{safe_case}_dokumentum_bekerese.docx"
 
-    try:
-        _render_docx_template(template_path, output_path, context)
-    except Exception as exc:  # noqa: BLE001
-        current_app.logger.exception(
-            "DOCX generation failed for dokumentum bekérése %s: %s",
-            inv.id,
-            exc,
+    job, created = _queue_investigation_document(
+        inv,
+        template_path,
+        output_path,
+        context,
+        endpoint="investigations.leiro_dokumentum_bekerese",
+        category="generated",
+    )
+    if not created or job.status in document_jobs.PENDING:
+        return document_job_response(
+            job, created, url_for("investigations.leiro_dokumentum_bekerese", id=inv.id)
         )
+    if job.status == document_jobs.STATUS_FAILED:
         flash("Hiba történt a dokumentum generálása közben.", "danger")
         return (
             render_template(
@@ -985,40 +933,8 @@ def leiro_dokumentum_bekerese(id: int):
             500,
         )
 
-    timestamp = now_utc()
-    filename = output_path.name
-    attachment = (
-        InvestigationAttachment.query.filter_by(
-            investigation_id=inv.id, filename=filename
-        )
-        .order_by(InvestigationAttachment.uploaded_at.desc())
-        .first()
-    )
-
-    if attachment is None:
-        attachment = InvestigationAttachment(
-            investigation_id=inv.id,
-            filename=filename,
-            category="generated",
-            uploaded_by=current_user.id,
-            uploaded_at=timestamp,
-        )
-        db.session.add(attachment)
-    else:
-        attachment.category = "generated"
-        attachment.uploaded_by = current_user.id
-        attachment.uploaded_at = timestamp
-
-    db.session.commit()
-
-    flash("Dokumentum sikeresen generálva.", "success")
-    return redirect(
-        url_for(
-            "investigations.leiro_dokumentum_bekerese",
-            id=inv.id,
-            generated_id=attachment.id,
-        )
-    )
+    flash_document_done(job, "Dokumentum sikeresen generálva.")
+    return redirect(document_jobs.redirect_url(job))
 
 
 @investigations_bp.route(
@@ -1143,14 +1059,21 @@ def leiro_szakkonzultansi_nyilatkozat(id: int):
     safe_case = file_safe_case_number(case_identifier)
     output_path = Path(case_folder) / f"{safe_case}_szakkonzultansi_nyilatkozat.docx"
 
-    try:
-        _render_docx_template(template_path, output_path, context)
-    except Exception as exc:  # noqa: BLE001
-        current_app.logger.exception(
-            "DOCX generation failed for szakkonzultánsi nyilatkozat %s: %s",
-            inv.id,
-            exc,
-        )
+    job, created = _queue_investigation_document(
+        inv,
+        template_path,
+        output_path,
+        context,
+        endpoint="investigations.leiro_szakkonzultansi_nyilatkozat",
+        category="generated",
+    )
+    if not created or job.status in document_jobs.PENDING:
+        return document_job_response(
+            job,
+            created,
+            url_for("investigations.leiro_szakkonzultansi_nyilatkozat", id=inv.id),
+        )
+    if job.status == document_jobs.STATUS_FAILED:
         flash("Hiba történt a dokumentum generálása közben.", "danger")
         return (
             render_template(
@@ -1163,40 +1086,8 @@ def leiro_szakkonzultansi_nyilatkozat(id: int):
             500,
         )
 
-    timestamp = now_utc()
-    filename = output_path.name
-    attachment = (
-        InvestigationAttachment.query.filter_by(
-            investigation_id=inv.id, filename=filename
-        )
-        .order_by(InvestigationAttachment.uploaded_at.desc())
-        .first()
-    )
-
-    if attachment is None:
-        attachment = InvestigationAttachment(
-            investigation_id=inv.id,
-            filename=filename,
-            category="generated",
-            uploaded_by=current_user.id,
-            uploaded_at=timestamp,
-        )
-        db.session.add(attachment)
-    else:
-        attachment.category = "generated"
-        attachment.uploaded_by = current_user.id
-        attachment.uploaded_at = timestamp
-
-    db.session.commit()
-
-    flash("Dokumentum sikeresen generálva.", "success")
-    return redirect(
-        url_for(
-            "investigations.leiro_szakkonzultansi_nyilatkozat",
-            id=inv.id,
-            generated_id=attachment.id,
-        )
-    )
+    flash_document_done(job, "Dokumentum sikeresen generálva.")
+    return redirect(document_jobs.redirect_url(job))
 
 
 @investigations_bp.route(
@@ -1319,14 +1210,21 @@ def leiro_tajekoztatas_arajanlat(id: int):
     safe_case = (inv.case_number or "").replace(":", "-").replace("/", "-")
     output_path = Path(case_folder) / f"{safe_case}_tajekoztatas_arajanlat.docx"
 
-    try:
-        _render_docx_template(template_path, output_path, context)
-    except Exception as exc:  # noqa: BLE001
-        current_app.logger.exception(
-            "DOCX generation failed for tájékoztatás árajánlat %s: %s",
-            inv.id,
-            exc,
-        )
+    job, created = _queue_investigation_document(
+        inv,
+        template_path,
+        output_path,
+        context,
+        endpoint="investigations.leiro_tajekoztatas_arajanlat",
+        category="generated",
+    )
+    if not created or job.status in document_jobs.PENDING:
+        return document_job_response(
+            job,
+            created,
+            url_for("investigations.leiro_tajekoztatas_arajanlat", id=inv.id),
+        )
+    if job.status == document_jobs.STATUS_FAILED:
         flash("Hiba történt a dokumentum generálása közben.", "danger")
         return (
             render_template(
@@ -1339,40 +1237,8 @@ def leiro_tajekoztatas_arajanlat(id: int):
             500,
         )
 
-    timestamp = now_utc()
-    filename = output_path.name
-    attachment = (
-        InvestigationAttachment.query.filter_by(
-            investigation_id=inv.id, filename=filename
-        )
-        .order_by(InvestigationAttachment.uploaded_at.desc())
-        .first()
-    )
-
-    if attachment is None:
-        attachment = InvestigationAttachment(
-            investigation_id=inv.id,
-            filename=filename,
-            category="generated",
-            uploaded_by=current_user.id,
-            uploaded_at=timestamp,
-        )
-        db.session.add(attachment)
-    else:
-        attachment.category = "generated"
-        attachment.uploaded_by = current_user.id
-        attachment.uploaded_at = timestamp
-
-    db.session.commit()
-
-    flash("Dokumentum sikeresen generálva.", "success")
-    return redirect(
-        url_for(
-            "investigations.leiro_tajekoztatas_arajanlat",
-            id=inv.id,
-            generated_id=attachment.id,
-        )
-    )
+    flash_document_done(job, "Dokumentum sikeresen generálva.")
+    return redirect(document_jobs.redirect_url(job))
 
 
 @investigations_bp.route(
@@ -1447,38 +1313,7 @@ def leiro_tajekoztatas_ugy_szignalasarol(id: int):
             400,
         )
 
-    cimzett_szerv = form_data["cimzett_szerv"].strip()
-    titulus_szerv = form_data["titulus_szerv"].strip()
-    actor_val = form_data["actor"].strip()
-    titulus_val = form_data["titulus"].strip()
-    kulso_ugyirat = _external_case_number(inv).strip() or "-"
-    kirendelo_val = _resolve_sender_institution(inv)
-    iktatoszam = (inv.case_number or "").strip()
-    vezeto = _resolve_describer_full_name(inv) or "-"
-    szak = _resolve_expert_full_name(inv)
-    creation_date = fmt_budapest(now_utc(), "%Y.%m.%d")
-
-    context = {
-        "cimzett_szerv": cimzett_szerv,
-        "cimzett-szerv": cimzett_szerv,
-        "cimzettszerv": cimzett_szerv,
-        "titulus_szerv": titulus_szerv,
-        "titulus-szerv": titulus_szerv,
-        "tituluszerv": titulus_szerv,
-        "titulusszerv": titulus_szerv,
-        "kulso ugyirat": kulso_ugyirat,
-        "kulso_ugyirat": kulso_ugyirat,
-        "kulsougyirat": kulso_ugyirat,
-        "iktatasi szam": iktatoszam or "-",
-        "iktatasi_szam": iktatoszam or "-",
-        "iktatasiszam": iktatoszam or "-",
-        "kirendelo": kirendelo_val,
-        "vezeto": vezeto,
-        "szak": szak,
-        "actor": actor_val,
-        "titulus": titulus_val,
-        "creation_date": creation_date,
-    }
+    context = _szignalas_context(inv, form_data)
 
     case_folder = ensure_investigation_folder(inv.case_number or str(inv.id))
     template_dir = Path(case_folder) / ERTESITES_TEMPLATE_DIRNAME
@@ -1499,14 +1334,21 @@ def leiro_tajekoztatas_ugy_szignalasarol(id: int):
         Path(case_folder) / f"{safe_case_number}_tajekoztatas_ugy_szignalasarol.docx"
     )
 
-    try:
-        _render_docx_template(template_path, output_path, context)
-    except Exception as exc:  # noqa: BLE001
-        current_app.logger.exception(
-            "DOCX generation failed for tájékoztatás ügy szignálásáról %s: %s",
-            inv.id,
-            exc,
+    job, created = _queue_investigation_document(
+        inv,
+        template_path,
+        output_path,
+        context,
+        endpoint="investigations.leiro_tajekoztatas_ugy_szignalasarol",
+        category="generated",
+    )
+    if not created or job.status in document_jobs.PENDING:
+        return document_job_response(
+            job,
+            created,
+            url_for("investigations.leiro_tajekoztatas_ugy_szignalasarol", id=inv.id),
         )
+    if job.status == document_jobs.STATUS_FAILED:
         flash("Hiba történt a dokumentum generálása közben.", "danger")
         return (
             render_template(
@@ -1520,40 +1362,8 @@ def leiro_tajekoztatas_ugy_szignalasarol(id: int):
             500,
         )
 
-    timestamp = now_utc()
-    filename = output_path.name
-    attachment = (
-        InvestigationAttachment.query.filter_by(
-            investigation_id=inv.id, filename=filename
-        )
-        .order_by(InvestigationAttachment.uploaded_at.desc())
-        .first()
-    )
-
-    if attachment is None:
-        attachment = InvestigationAttachment(
-            investigation_id=inv.id,
-            filename=filename,
-            category="generated",
-            uploaded_by=current_user.id,
-            uploaded_at=timestamp,
-        )
-        db.session.add(attachment)
-    else:
-        attachment.category = "generated"
-        attachment.uploaded_by = current_user.id
-        attachment.uploaded_at = timestamp
-
-    db.session.commit()
-
-    flash("Dokumentum sikeresen generálva.", "success")
-    return redirect(
-        url_for(
-            "investigations.leiro_tajekoztatas_ugy_szignalasarol",
-            id=inv.id,
-            generated_id=attachment.id,
-        )
-    )
+    flash_document_done(job, "Dokumentum sikeresen generálva.")
+    return redirect(document_jobs.redirect_url(job))
 
 
 @investigations_bp.route(
@@ -1663,29 +1473,23 @@ def leiro_hatarido_hosszabbitas_kerelem(id: int):
 
     output_path = Path(case_folder) / f"{safe_case}_hatarido_hosszabbitas_kerelem.docx"
 
-    context = {
-        "titulus_szerv": form_data["titulus_szerv"].strip(),
-        "cimzett_szerv": form_data["cimzett_szerv"].strip(),
-        "actor": form_data["actor"].strip(),
-        "reasons": form_data["reasons"].strip(),
-        "desired_date": desired_dt.strftime("%Y.%m.%d"),
-        "titulus": form_data["titulus"].strip(),
-        "iktatasi_szam": inv.case_number or "",
-        "vezeto": _resolve_describer_full_name(inv) or "",
-        "kulso_ugyirat": _external_case_number(inv).strip(),
-        "kirendelo": (inv.institution_name or ""),
-        "creation_date": fmt_budapest(now_utc(), "%Y.%m.%d"),
-        "szak": _resolve_expert_full_name(inv) or "",
-    }
+    context = _hatarido_context(inv, form_data, desired_dt)
 
-    try:
-        _render_docx_template(template_path, output_path, context)
-    except Exception as exc:  # noqa: BLE001
-        current_app.logger.exception(
-            "DOCX generation failed for határidő hosszabbítás kérelem %s: %s",
-            inv.id,
-            exc,
+    job, created = _queue_investigation_document(
+        inv,
+        template_path,
+        output_path,
+        context,
+        endpoint="investigations.leiro_hatarido_hosszabbitas_kerelem",
+        category="generated",
+    )
+    if not created or job.status in document_jobs.PENDING:
+        return document_job_response(
+            job,
+            created,
+            url_for("investigations.leiro_hatarido_hosszabbitas_kerelem", id=inv.id),
         )
+    if job.status == document_jobs.STATUS_FAILED:
         flash("Hiba történt a dokumentum generálása közben.", "danger")
         return (
             render_template(
@@ -1699,95 +1503,183 @@ def leiro_hatarido_hosszabbitas_kerelem(id: int):
             500,
         )
 
+    flash_document_done(job, "Dokumentum sikeresen generálva.")
+    return redirect(document_jobs.redirect_url(job))
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+def _szignalas_context(inv: Investigation, fields: dict) -> dict:
+    """Context of the "tájékoztatás az ügy szignálásáról" letter."""
+    cimzett_szerv = fields["cimzett_szerv"].strip()
+    titulus_szerv = fields["titulus_szerv"].strip()
+    kulso_ugyirat = _external_case_number(inv).strip() or "-"
+    iktatoszam = (inv.case_number or "").strip()
+    return {
+        "cimzett_szerv": cimzett_szerv,
+        "cimzett-szerv": cimzett_szerv,
+        "cimzettszerv": cimzett_szerv,
+        "titulus_szerv": titulus_szerv,
+        "titulus-szerv": titulus_szerv,
+        "tituluszerv": titulus_szerv,
+        "titulusszerv": titulus_szerv,
+        "kulso ugyirat": kulso_ugyirat,
+        "kulso_ugyirat": kulso_ugyirat,
+        "kulsougyirat": kulso_ugyirat,
+        "iktatasi szam": iktatoszam or "-",
+        "iktatasi_szam": iktatoszam or "-",
+        "iktatasiszam": iktatoszam or "-",
+        "kirendelo": _resolve_sender_institution(inv),
+        "vezeto": _resolve_describer_full_name(inv) or "-",
+        "szak": _resolve_expert_full_name(inv),
+        "actor": fields["actor"].strip(),
+        "titulus": fields["titulus"].strip(),
+        "creation_date": fmt_budapest(now_utc(), "%Y.%m.%d"),
+    }
+
+
+def _hatarido_context(inv: Investigation, fields: dict, desired_dt) -> dict:
+    """Context of the "határidő-hosszabbítási kérelem" letter."""
+    return {
+        "titulus_szerv": fields["titulus_szerv"].strip(),
+        "cimzett_szerv": fields["cimzett_szerv"].strip(),
+        "actor": fields["actor"].strip(),
+        "reasons": fields["reasons"].strip(),
+        "desired_date": desired_dt.strftime("%Y.%m.%d"),
+        "titulus": fields["titulus"].strip(),
+        "iktatasi_szam": inv.case_number or "",
+        "vezeto": _resolve_describer_full_name(inv) or "",
+        "kulso_ugyirat": _external_case_number(inv).strip(),
+        "kirendelo": (inv.institution_name or ""),
+        "creation_date": fmt_budapest(now_utc(), "%Y.%m.%d"),
+        "szak": _resolve_expert_full_name(inv) or "",
+    }
+
+
+def _queue_investigation_document(
+    inv, template_path: Path, output_path: Path, context: dict, *, endpoint, category
+):
+    """Submit a leíró document render; see :mod:`app.services.document_jobs`.
+
+    Once rendered, the output is registered as an attachment of *inv* and the
+    user is sent back to *endpoint* with ``generated_id``.  An unchanged
+    document is not rendered again unless the form asks to ``force`` it.
+    """
+    return document_jobs.submit(
+        document_jobs.KIND_INVESTIGATION_DOC,
+        subject_type=SUBJECT_INVESTIGATION,
+        subject_id=inv.id,
+        key=make_default_key(request),
+        force=force_render_requested(),
+        payload={
+            "renderer": "docx",
+            "template": str(template_path),
+            "output": str(output_path),
+            "context": context,
+            "category": category,
+            "next": {"endpoint": endpoint, "values": {"id": inv.id}},
+        },
+    )
+
+
+@document_jobs.finisher(document_jobs.KIND_INVESTIGATION_DOC)
+def _register_generated_attachment(job):
+    filename = Path(job.payload["output"]).name
+    category = job.payload["category"]
     timestamp = now_utc()
-    filename = output_path.name
     attachment = (
         InvestigationAttachment.query.filter_by(
-            investigation_id=inv.id, filename=filename
+            investigation_id=job.subject_id, filename=filename
         )
         .order_by(InvestigationAttachment.uploaded_at.desc())
         .first()
     )
-
     if attachment is None:
         attachment = InvestigationAttachment(
-            investigation_id=inv.id,
+            investigation_id=job.subject_id,
             filename=filename,
-            category="generated",
-            uploaded_by=current_user.id,
+            category=category,
+            uploaded_by=job.user_id,
             uploaded_at=timestamp,
         )
         db.session.add(attachment)
     else:
-        attachment.category = "generated"
-        attachment.uploaded_by = current_user.id
+        attachment.category = category
+        attachment.uploaded_by = job.user_id
         attachment.uploaded_at = timestamp
+    attachment.render_fingerprint = job.payload.get("fingerprint")
+    db.session.flush()
+    return {"generated_id": attachment.id}
 
-    db.session.commit()
 
-    flash("Dokumentum sikeresen generálva.", "success")
-    return redirect(
-        url_for(
-            "investigations.leiro_hatarido_hosszabbitas_kerelem",
-            id=inv.id,
-            generated_id=attachment.id,
+@document_jobs.reuser(document_jobs.KIND_INVESTIGATION_DOC)
+def _reuse_generated_attachment(job):
+    output = Path(job.payload["output"])
+    if not output.is_file():
+        return None
+    attachment = (
+        InvestigationAttachment.query.filter_by(
+            investigation_id=job.subject_id, filename=output.name
         )
+        .order_by(InvestigationAttachment.uploaded_at.desc())
+        .first()
     )
-
-
-# ---------------------------------------------------------------------------
-# Helpers
-# ---------------------------------------------------------------------------
+    if attachment is None or (
+        attachment.render_fingerprint != job.payload["fingerprint"]
+    ):
+        return None
+    return {"generated_id": attachment.id}
 
 
 def _render_docx_template(
     template_path: Path, output_path: Path, context: dict
 ) -> None:
-    """Render a DOCX template after sanitizing malformed Jinja placeholders."""
+    """Render a DOCX template after sanitizing malformed Jinja placeholders.
+
+    The sanitized template comes from :mod:`app.services.docx_cache`, so the
+    sanitize/validate pass only runs once per template content.
+    """
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    sanitized_path = _sanitize_docx_placeholders(template_path)
+    sanitized = docx_cache.sanitized(template_path)
     safe_context = {k: ("" if v is None else v) for k, v in context.items()}
 
     try:
-        try:
-            from docxtpl import DocxTemplate
-        except ModuleNotFoundError:
-            DocxTemplate = None
-        else:
-            tpl = DocxTemplate(str(sanitized_path))
-            tpl.render(safe_context)
-            _save_docx_atomic(tpl.save, output_path)
-            return
+        from docxtpl import DocxTemplate
+    except ModuleNotFoundError:
+        DocxTemplate = None
+    else:
+        tpl = DocxTemplate(io.BytesIO(sanitized))
+        tpl.render(safe_context)
+        _save_docx_atomic(tpl.save, output_path)
+        return
 
-        from docx import Document
+    from docx import Document
 
-        doc = Document(str(sanitized_path))
-        replacements = {
-            f"{{{{{key}}}}}": (str(value) if value is not None else "")
-            for key, value in safe_context.items()
-        }
+    doc = Document(io.BytesIO(sanitized))
+    replacements = {
+        f"{{{{{key}}}}}": (str(value) if value is not None else "")
+        for key, value in safe_context.items()
+    }
 
-        for paragraph in doc.paragraphs:
-            for needle, replacement in replacements.items():
-                if needle in paragraph.text:
-                    paragraph.text = paragraph.text.replace(needle, replacement)
-
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    text = cell.text
-                    for needle, replacement in replacements.items():
-                        if needle in text:
-                            text = text.replace(needle, replacement)
-                    if cell.text != text:
-                        cell.text = text
-
-        _save_docx_atomic(doc.save, output_path)
-    finally:
-        try:
-            sanitized_path.unlink()
-        except FileNotFoundError:
-            pass
+    for paragraph in doc.paragraphs:
+        for needle, replacement in replacements.items():
+            if needle in paragraph.text:
+                paragraph.text = paragraph.text.replace(needle, replacement)
+
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                text = cell.text
+                for needle, replacement in replacements.items():
+                    if needle in text:
+                        text = text.replace(needle, replacement)
+                if cell.text != text:
+                    cell.text = text
+
+    _save_docx_atomic(doc.save, output_path)
 
 
 def _save_docx_atomic(save_func, output_path: Path) -> None:
@@ -1805,125 +1697,141 @@ def _save_docx_atomic(save_func, output_path: Path) -> None:
                 pass
 
 
-# Join any sequence of XML between adjacent text nodes so placeholders can be contiguous.
-# This covers </w:t> ... <w:t>, but also arbitrary tag runs between them.
-_JOIN_TEXT_NODES = re.compile(rb"</w:t>(?:\s|<[^>]+>)*<w:t[^>]*>")
-_PLACEHOLDER_PATTERN = re.compile(r"(\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\})", flags=re.DOTALL)
-_VAR_NAME_PATTERN = re.compile(r"\{\{\s*(.*?)\s*\}\}", flags=re.DOTALL)
+# A ``{{ name }}`` variable whose delimiters and name may be split across
+# runs, text nodes or paragraphs by Word, or a ``{% %}`` / ``{# #}`` block that
+# is kept as is.  Word's markup between the two braces of a delimiter is
+# skipped; every token is bounded so an unclosed ``{{``, ``{%`` or ``{#`` cannot
+# make the scan quadratic on large parts.
+_TAGS_BETWEEN = rb"(?:\s*<[^>]*>\s*)*"
+_PLACEHOLDER_PATTERN = re.compile(
+    rb"\{" + _TAGS_BETWEEN + rb"\{(?P<name>.{0,4096}?)\}" + _TAGS_BETWEEN + rb"\}"
+    rb"|\{%.{0,4096}?%\}|\{#.{0,4096}?#\}",
+    flags=re.DOTALL,
+)
+_XML_TAG = re.compile(rb"<[^>]*>")
+_NON_WORD = re.compile(r"[^\w]")
+_PLACEHOLDER_PARTS = ("word/document.xml", "word/header", "word/footer")
+
+
+def _fold_char(ch: str) -> str:
+    nfkd = unicodedata.normalize("NFKD", ch)
+    return "".join(c for c in nfkd if not unicodedata.combining(c))
+
+
+# Accent folding for Latin-1 / Latin Extended-A/B (every Hungarian letter);
+# anything else goes through NFKD at lookup time.
+_FOLD_TABLE = {cp: _fold_char(chr(cp)) for cp in range(0x80, 0x250)}
+
+
+@lru_cache(maxsize=4096)
+def _placeholder_token(raw: bytes) -> bytes:
+    """``{{name}}`` for the raw bytes between the delimiters of a variable."""
+    name = _XML_TAG.sub(b"", raw).decode("utf-8", errors="ignore")
+    folded = name.translate(_FOLD_TABLE)
+    if not folded.isascii():
+        folded = "".join(_fold_char(ch) for ch in folded)
+    return b"{{" + _NON_WORD.sub("", folded).encode("utf-8") + b"}}"
 
 
 def _sanitize_docx_placeholders(docx_path: Path) -> Path:
-    """Return sanitized copy of DOCX with normalized Jinja placeholders."""
-    changed_any = False
-    out_buf = io.BytesIO()
+    """Return sanitized copy of DOCX with normalized Jinja placeholders.
 
-    with (
-        zipfile.ZipFile(str(docx_path), "r") as zin,
-        zipfile.ZipFile(out_buf, "w", compression=zipfile.ZIP_DEFLATED) as zout,
-    ):
-        names = zin.namelist()
-        target_parts = [
-            n
-            for n in names
-            if n.startswith("word/")
-            and n.endswith(".xml")
-            and (
-                n == "word/document.xml"
-                or n.startswith("word/header")
-                or n.startswith("word/footer")
-            )
-        ]
-        for name in names:
-            data = zin.read(name)
-            if name in target_parts:
-                try:
-                    new_data, changed = _normalize_xml_placeholders(data)
-                except Exception:
-                    new_data, changed = data, False
-                else:
-                    data = new_data
-                changed_any = changed_any or changed
-            zout.writestr(name, data)
-
-    tmp = tempfile.NamedTemporaryFile(prefix="sanitized", suffix=".docx", delete=False)
-    with tmp:
-        tmp.write(out_buf.getvalue())
-    tmp_path = Path(tmp.name)
-    # Validate sanitized DOCX; if invalid, fall back to a safe temp copy of the original.
-    try:
-        from docx import Document  # python-docx
+    Only document, header and footer parts are rewritten; a part whose
+    placeholders spanned markup is checked to still be well-formed XML and
+    is kept as the original otherwise.  Every
+    entry keeps its compression, so stored media is not deflated, and a
+    template without changes is copied byte for byte.
+    """
+    from lxml import etree
 
-        Document(str(tmp_path))  # raises on malformed XML
-        current_app.logger.info(
-            "DOCX sanitizer: wrote %s (changed=%s)",
-            tmp_path,
-            "yes" if changed_any else "no",
-        )
-        return tmp_path
+    fd, name = tempfile.mkstemp(prefix="sanitized", suffix=".docx")
+    os.close(fd)
+    tmp_path = Path(name)
+    try:
+        with zipfile.ZipFile(str(docx_path), "r") as zin:
+            parts = {}
+            for info in zin.infolist():
+                if not info.filename.startswith(_PLACEHOLDER_PARTS):
+                    continue
+                data = zin.read(info)
+                try:
+                    new_data, changed, dropped_markup = _rewrite_placeholders(data)
+                    if dropped_markup:
+                        etree.fromstring(new_data)
+                except Exception as exc:  # noqa: BLE001
+                    current_app.logger.warning(
+                        "DOCX sanitizer: kept %s unchanged (%s)", info.filename, exc
+                    )
+                    continue
+                if changed:
+                    parts[info.filename] = new_data
+            if not parts:
+                shutil.copyfile(docx_path, tmp_path)
+            else:
+                with zipfile.ZipFile(tmp_path, "w") as zout:
+                    for info in zin.infolist():
+                        data = parts.get(info.filename)
+                        if data is None:
+                            data = zin.read(info)
+                        zout.writestr(info, data, compress_type=info.compress_type)
     except Exception as exc:  # noqa: BLE001
         current_app.logger.warning(
-            "DOCX sanitizer produced invalid file (%s). Falling back to original.", exc
+            "DOCX sanitizer failed (%s). Falling back to original.", exc
         )
         try:
+            shutil.copyfile(docx_path, tmp_path)
+        except BaseException:
             tmp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
-        fb_path = Path(
-            tempfile.mkstemp(prefix="sanitized_fallback_", suffix=".docx")[1]
-        )
-        fb_path.write_bytes(Path(docx_path).read_bytes())
-        current_app.logger.info(
-            "DOCX sanitizer: fallback copy at %s (changed=no)", fb_path
-        )
-        return fb_path
+            raise
+        parts = {}
+    current_app.logger.info(
+        "DOCX sanitizer: wrote %s (changed=%s)",
+        tmp_path,
+        ", ".join(sorted(parts)) if parts else "no",
+    )
+    return tmp_path
 
 
 def _normalize_xml_placeholders(xml_bytes: bytes) -> tuple[bytes, bool]:
     """
-    Conservative placeholder normalization for a single XML part.
-    - Do NOT join across block boundaries (no global run merges).
-    - Only normalize tokens that are already contiguous like '{{name}}'.
+    Normalize the Jinja variables of a single XML part in one pass.
+
+    - Works on the raw bytes; the part is never decoded as a whole.
+    - Repairs variables split by Word: the markup inside ``{{ ... }}`` and
+      between the two braces of a delimiter is dropped, e.g.
+      ``{</w:t></w:r><w:r><w:t>{ti</w:t>...<w:t>tulus}}`` -> ``{{titulus}}``.
+    - Names are folded to ASCII and stripped of non-word characters
+      (``{{jkv.vezető}}`` -> ``{{jkvvezeto}}``).
     - Leave {% %} / {# #} intact.
-    - Never touch the <w:sectPr> region.
     """
+    result, changed, _ = _rewrite_placeholders(xml_bytes)
+    return result, changed
 
-    # Fast path: skip if no Jinja var delimiters at all.
-    if b"{{" not in xml_bytes or b"}}" not in xml_bytes:
-        return xml_bytes, False
 
-    changed = False
-    text = xml_bytes.decode("utf-8", errors="ignore")
+def _rewrite_placeholders(xml_bytes: bytes) -> tuple[bytes, bool, bool]:
+    """``_normalize_xml_placeholders`` that also reports dropped markup."""
+    # Fast path: nothing that could open a placeholder.
+    if b"{" not in xml_bytes:
+        return xml_bytes, False, False
 
-    def _ascii_fold(value: str) -> str:
-        nfkd = unicodedata.normalize("NFKD", value)
-        return "".join(ch for ch in nfkd if not unicodedata.combining(ch))
+    changed = dropped_markup = False
 
-    def repl(match: re.Match[str]) -> str:
-        nonlocal changed
+    def repl(match: re.Match[bytes]) -> bytes:
+        nonlocal changed, dropped_markup
         token = match.group(0)
-        vm = _VAR_NAME_PATTERN.fullmatch(token)
-        if not vm:
+        raw = match.group("name")
+        if raw is None:
             return token  # keep blocks/comments unchanged
-        inner = vm.group(1)
-        # Remove any XML tags that leaked inside braces and normalize whitespace
-        inner = re.sub(r"<[^>]+>", "", inner, flags=re.DOTALL)
-        inner = re.sub(r"\s+", " ", inner).strip()
-        folded = _ascii_fold(inner)
-        normalized = re.sub(r"[^\w]", "", folded)
-        sanitized = "{{" + normalized + "}}"
+        sanitized = _placeholder_token(raw)
         if sanitized != token:
             changed = True
+            dropped_markup = dropped_markup or b"<" in token
         return sanitized
 
-    # Protect section properties: process only before <w:sectPr>, keep sectPr/tail intact
-    parts = re.split(r"(<w:sectPr\\b.*?</w:sectPr>)", text, flags=re.DOTALL)
-    if len(parts) >= 3:
-        head = _PLACEHOLDER_PATTERN.sub(repl, parts[0])
-        tail = "".join(parts[1:])
-        result = head + tail
-    else:
-        result = _PLACEHOLDER_PATTERN.sub(repl, text)
-    return result.encode("utf-8"), changed
+    result = _PLACEHOLDER_PATTERN.sub(repl, xml_bytes)
+    if not changed:
+        return xml_bytes, False, False
+    return result, True, dropped_markup
 
 
 def _can_modify(inv, user) -> bool:
@@ -2044,7 +1952,9 @@ def list_investigations():
         order_col.desc() if sort_order == "desc" else order_col.asc()
     )
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Searches also cover the archived years (app.services.archive).
+    with archive_reads() if search else nullcontext():
+        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     investigations = pagination.items
 
     for inv in investigations:
@@ -2068,10 +1978,144 @@ def list_investigations():
         search_query=search,
         query_params=request.args.to_dict(),
         has_edit_investigation=has_edit_investigation,
+        can_batch_documents=canonical_role(current_user.role) in ("admin", "leíró"),
         caps=capabilities_for(current_user),
     )
 
 
+def _batch_selection_from_form(form) -> batch.Selection:
+    def _int(name):
+        try:
+            return int(form.get(name) or 0) or None
+        except ValueError:
+            return None
+
+    ids = [int(v) for v in re.findall(r"\d+", form.get("ids") or "")]
+    deadline_raw = (form.get("deadline_before") or "").strip()
+    try:
+        deadline = datetime.fromisoformat(deadline_raw).date() if deadline_raw else None
+    except ValueError:
+        deadline = None
+    return batch.Selection(
+        ids=ids,
+        case_type=(form.get("case_type") or "").strip(),
+        status=(form.get("status") or "").strip(),
+        expert_id=_int("expert_id"),
+        deadline_before=deadline,
+    )
+
+
+def _batch_or_404(batch_id: str):
+    jobs = batch.batch_jobs(batch_id)
+    if not jobs or (
+        canonical_role(current_user.role) != "admin"
+        and any(job.user_id != current_user.id for job in jobs)
+    ):
+        abort(404)
+    return jobs
+
+
+@investigations_bp.route("/batch_documents", methods=["GET", "POST"])
+@login_required
+@roles_required("admin", "leíró")
+def batch_documents():
+    """Generate one letter for every investigation matching the filters."""
+    form_data = request.form if request.method == "POST" else request.args
+    letter_key = form_data.get("letter") or next(iter(batch.LETTERS))
+
+    def _form(status=200):
+        return (
+            render_template(
+                "investigations/batch_documents.html",
+                letters=batch.LETTERS,
+                letter_key=letter_key,
+                form_data=form_data,
+                expert_choices=_expert_select_choices(),
+            ),
+            status,
+        )
+
+    if request.method == "GET":
+        return _form()
+
+    letter = batch.LETTERS.get(letter_key)
+    if letter is None:
+        flash("Ismeretlen dokumentumtípus.", "danger")
+        return _form(400)
+    errors = batch.validate_fields(letter, form_data)
+    if errors:
+        flash("Hiányzó vagy hibás mezők: " + ", ".join(errors), "danger")
+        return _form(400)
+    try:
+        invs = batch.select_investigations(_batch_selection_from_form(form_data))
+    except ValueError as exc:
+        flash(str(exc), "danger")
+        return _form(400)
+    if not invs:
+        flash("Nincs a szűrésnek megfelelő vizsgálat.", "warning")
+        return _form(400)
+
+    fields = {name: form_data.get(name, "") for name in letter.fields}
+    batch_id, skipped = batch.submit_batch(
+        letter_key,
+        invs,
+        fields,
+        user_id=current_user.id,
+        force=force_render_requested(),
+    )
+    for inv, reason in skipped:
+        flash(f"{inv.case_number}: {reason}", "warning")
+    if len(skipped) == len(invs):
+        return _form(400)
+    log_action(
+        "Batch document generation",
+        f"{letter_key} for {len(invs) - len(skipped)} investigation(s), "
+        f"batch {batch_id}",
+    )
+    return redirect(url_for("investigations.batch_documents_status", batch_id=batch_id))
+
+
+@investigations_bp.route("/batch_documents/<batch_id>", methods=["GET"])
+@login_required
+def batch_documents_status(batch_id):
+    jobs = _batch_or_404(batch_id)
+    counts = document_jobs.batch_counts(batch_id)
+    if request.args.get("format") == "json" or (
+        request.accept_mimetypes.best == "application/json"
+    ):
+        return jsonify({"id": batch_id, "counts": counts})
+    invs = {
+        inv.id: inv
+        for inv in Investigation.query.filter(
+            Investigation.id.in_([job.subject_id for job in jobs])
+        )
+    }
+    return render_template(
+        "investigations/batch_documents_status.html",
+        batch_id=batch_id,
+        jobs=jobs,
+        investigations=invs,
+        counts=counts,
+        pending=sum(counts[status] for status in document_jobs.PENDING),
+    )
+
+
+@investigations_bp.route("/batch_documents/<batch_id>/download", methods=["GET"])
+@login_required
+def batch_documents_zip(batch_id):
+    _batch_or_404(batch_id)
+    buf = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    if not batch.write_zip(batch_id, buf):
+        abort(404)
+    buf.seek(0)
+    return send_file(
+        buf,
+        mimetype="application/zip",
+        as_attachment=True,
+        download_name=f"dokumentumok_{batch_id[:8]}.zip",
+    )
+
+
 @investigations_bp.route("/new", methods=["GET", "POST"])
 @login_required
 @roles_required("admin", "iroda")
@@ -2148,7 +2192,8 @@ def new_investigation():
 
         # Create per-investigation folder (separate from Cases)
         ensure_investigation_folder(inv.case_number)
-        init_investigation_upload_dirs(inv.case_number)
+        init_investigation_upload_dirs(inv)
+        db.session.commit()
 
         flash("Vizsgálat létrehozva.", "success")
         return redirect(url_for("investigations.documents", id=inv.id))
@@ -2211,6 +2256,7 @@ def documents(id):
 @investigations_bp.route("/<int:id>/view")
 @login_required
 @roles_required("admin", "iroda", "szak", "penz", "pénzügy", "szig")
+@archive_view
 def view_investigation(id):
     inv = db.session.get(Investigation, id)
     if inv is None:
@@ -2280,6 +2326,7 @@ def view_investigation(id):
     "penz",
     "pénzügy",  # allow legacy finance label
 )
+@archive_view
 def detail_investigation(id):
     inv = db.session.get(Investigation, id)
     if inv is None:
@@ -2523,12 +2570,12 @@ def upload_investigation_file(id):
         inv_dir = Path(ensure_investigation_folder(inv.case_number))
         inv_dir.mkdir(parents=True, exist_ok=True)
         filename = secure_filename(upfile.filename or "upload.bin")
-        dest = inv_dir / filename
         try:
             upfile.stream.seek(0)
         except Exception:
             pass
-        upfile.save(dest.as_posix())
+        blob = blob_store.store_stream(upfile.stream)
+        filename = blob_store.link_into(blob, inv_dir, filename).name
     except exceptions.BadRequest:
         if is_xhr:
             return jsonify({"error": "forbidden"}), 400
@@ -2547,6 +2594,8 @@ def upload_investigation_file(id):
         category=category,
         uploaded_by=current_user.id,
         uploaded_at=now_utc(),
+        sha256=blob.sha256,
+        size_bytes=blob.size,
     )
     db.session.add(attachment)
     db.session.commit()
@@ -2564,6 +2613,31 @@ def upload_investigation_file(id):
     return redirect(url_for("investigations.documents", id=id, uploaded=1))
 
 
+@investigations_bp.route("/<int:id>/uploads/chunked", methods=["POST"])
+@login_required
+@roles_required(
+    "admin",
+    "iroda",
+    "szak",
+    "szakértő",  # legacy expert label
+    "leir",
+    "leíró",  # legacy scribe label
+    "szig",
+    "szignáló",
+    "toxi",
+    "penz",
+    "pénzügy",  # legacy finance label
+)
+def start_investigation_chunked_upload(id):
+    """Open a resumable upload; chunks go to the shared ``/uploads/chunked`` API."""
+    inv = db.session.get(Investigation, id)
+    if inv is None:
+        abort(404)
+    if not can_upload_investigation_now(inv, current_user):
+        abort(403)
+    return start_chunked_upload(SUBJECT_INVESTIGATION, inv.id)
+
+
 @investigations_bp.route("/<int:inv_id>/download/<int:file_id>")
 @login_required
 @roles_required(
@@ -2578,6 +2652,7 @@ def upload_investigation_file(id):
     "penz",
     "pénzügy",  # allow legacy finance label
 )
+@archive_view
 def download_investigation_file(inv_id, file_id):
     inv = db.session.get(Investigation, inv_id) or abort(404)
     att = db.session.get(InvestigationAttachment, file_id) or abort(404)
@@ -2587,7 +2662,7 @@ def download_investigation_file(inv_id, file_id):
     root = Path(ensure_investigation_folder(inv.case_number))
     filename = att.filename
     try:
-        return send_safe(root, filename, as_attachment=True)
+        return send_safe(root, filename, as_attachment=True, etag=att.sha256)
     except exceptions.BadRequest:
         current_app.logger.warning(
             "Path traversal attempt for investigation %s: %s", inv_id, filename
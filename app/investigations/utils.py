@@ -1,12 +1,10 @@
 # app/investigations/utils.py
-import shutil
-from pathlib import Path
-
 from flask import current_app
 from sqlalchemy import func
 
 from app.paths import ensure_investigation_folder as ensure_invest_path
 from app.paths import investigation_root as invest_root_path
+from app.services import template_store
 from app.utils.time_utils import now_utc, to_budapest
 from app.utils.user_display import user_display_name as _core_user_display
 
@@ -30,14 +28,14 @@ def init_investigation_upload_dirs(case_or_inv) -> str:
 
     Accepts a case number string or an Investigation instance. Ensures the
     investigation folder exists, creates a ``DO-NOT-EDIT`` subdirectory and
-    copies template files from the configured template directory. Existing
-    files are left untouched so repeated calls are safe.
+    links the shared, pre-sanitized template set into it (see
+    ``app.services.template_store``). Existing files are left untouched so
+    repeated calls are safe. For an Investigation the template version is
+    recorded on it; the caller commits.
     """
 
-    if isinstance(case_or_inv, Investigation):
-        case_number = case_or_inv.case_number
-    else:
-        case_number = str(case_or_inv)
+    inv = case_or_inv if isinstance(case_or_inv, Investigation) else None
+    case_number = inv.case_number if inv is not None else str(case_or_inv)
 
     inv_root = ensure_invest_path(case_number)
     target = inv_root / "DO-NOT-EDIT"
@@ -48,44 +46,22 @@ def init_investigation_upload_dirs(case_or_inv) -> str:
         if not keep.exists():
             keep.touch()
 
-    cfg_override = current_app.config.get("INVESTIGATION_TEMPLATE_DIR")
-    if cfg_override:
-        src_root = Path(cfg_override)
+    src_root = template_store.source_root(template_store.INVESTIGATION_SET)
+    if current_app.config.get("INVESTIGATION_TEMPLATE_DIR"):
         current_app.logger.info("Using INVESTIGATION_TEMPLATE_DIR: %s", src_root)
     else:
-        src_root = Path(current_app.instance_path) / "docs" / "vizsgalat"
         current_app.logger.info(
             "Using default investigation template dir: %s", src_root
         )
 
-    if not src_root.exists():
+    tset = template_store.current(template_store.INVESTIGATION_SET)
+    if tset is None:
         current_app.logger.warning("Investigation template dir missing: %s", src_root)
         return str(target)
 
-    for item in src_root.iterdir():
-        dest = target / item.name
-        if item.is_dir():
-            shutil.copytree(item, dest, dirs_exist_ok=True)
-        else:
-            if not dest.exists():
-                shutil.copy2(item, dest)
-
-    # Best-effort one-time sanitizer for bundled templates. Render-time sanitation remains authoritative.
-    try:
-        from app.investigations.routes import _sanitize_docx_placeholders
-
-        for docx_file in target.rglob("*.docx"):
-            try:
-                tmp = _sanitize_docx_placeholders(docx_file)
-            except Exception:
-                continue
-            try:
-                tmp.unlink()
-            except FileNotFoundError:
-                pass
-    except Exception:
-        pass
-
+    template_store.materialize(tset, target)
+    if inv is not None:
+        inv.template_version = tset.version
     return str(target)
 
 
@@ -7,7 +7,12 @@ from sqlalchemy.orm import synonym
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from app import db
-from app.audit import diff_for_update, snapshot_for_insert
+from app.audit import (
+    change_payload,
+    diff_for_update,
+    snapshot_for_insert,
+    status_change,
+)
 from app.utils.time_utils import fmt_budapest, now_utc
 from app.utils.user_display import user_display_name
 
@@ -34,6 +39,7 @@ class User(db.Model, UserMixin):
 
 class Case(db.Model):
     __tablename__ = "case"  # be explicit
+    __audit_exclude__ = ("effective_describer_id", "template_version")
 
     id = db.Column(db.Integer, primary_key=True, nullable=False)
     case_number = db.Column(db.String(32), unique=True, nullable=False)
@@ -71,6 +77,12 @@ class Case(db.Model):
     expert_1 = db.Column(db.String(128))
     expert_2 = db.Column(db.String(128))
     describer = db.Column(db.String(128))
+    # Materialized describer (explicit or expert's default leíró); maintained by
+    # app.services.describer_sync, never edited directly.
+    effective_describer_id = db.Column(db.Integer, index=True)
+    # DO-NOT-EDIT template set version linked into the case folder
+    # (see app.services.template_store).
+    template_version = db.Column(db.String(16))
     tox_expert = db.Column(db.String(128))
     tox_completed = db.Column(db.Boolean, default=False)
     assigned_office = db.Column(db.String(64))
@@ -219,6 +231,70 @@ class ChangeLog(db.Model):
         return f"<ChangeLog {self.field_name}: {self.old_value} → {self.new_value}>"
 
 
+class StatusTransition(db.Model):
+    """One row per ``Case.status`` change, for SLA/turnaround queries.
+
+    Written next to the ChangeLog rows by the Case listeners below; see
+    ``app.services.status_history`` for the dwell-time aggregates.
+    """
+
+    __tablename__ = "status_transition"
+    __table_args__ = (
+        db.Index("ix_status_transition_subject_at", "subject_id", "at"),
+        db.Index("ix_status_transition_to_status_at", "to_status", "at"),
+        db.Index("ix_status_transition_at", "at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    subject_type = db.Column(db.String(16), nullable=False, default="case")
+    subject_id = db.Column(db.Integer, nullable=False)
+    from_status = db.Column(db.String(64))
+    to_status = db.Column(db.String(64))
+    at = db.Column(db.DateTime(timezone=True), nullable=False)
+    actor = db.Column(db.String(64))
+
+
+class CaseHistorySnapshot(db.Model):
+    """Compressed full Case state as of ChangeLog row ``changelog_id``.
+
+    Checkpoints let ``app.services.history`` replay only the ChangeLog rows
+    written after the nearest snapshot.
+    """
+
+    __tablename__ = "case_history_snapshot"
+    __table_args__ = (
+        db.Index("ix_case_history_snapshot_subject_taken", "subject_id", "taken_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    subject_id = db.Column(db.Integer, nullable=False)
+    changelog_id = db.Column(db.Integer, nullable=False)
+    change_count = db.Column(db.Integer, nullable=False)
+    taken_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    state = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON
+
+
+class ChangeOutbox(db.Model):
+    """Append-only change-data-capture feed for cases.
+
+    One row per Case insert/update/delete, written in the same transaction as
+    the ChangeLog rows.  ``id`` is the feed sequence number consumers resume
+    from (see ``app.services.change_feed``); AUTOINCREMENT keeps it from being
+    reused.
+    """
+
+    __tablename__ = "change_outbox"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    subject_type = db.Column(db.String(16), nullable=False, default="case")
+    subject_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(8), nullable=False)  # insert / update / delete
+    at = db.Column(db.DateTime(timezone=True), nullable=False)
+    actor = db.Column(db.String(64))
+    changes = db.Column(db.Text, nullable=False)  # JSON list of field changes
+
+
 def _resolve_case_actor() -> str:
     """Return identifier for whoever triggered the change."""
 
@@ -230,6 +306,37 @@ def _resolve_case_actor() -> str:
     return "system"
 
 
+def _record_case_status_transition(connection, case_id, changes, actor, timestamp):
+    transition = status_change(changes)
+    if transition is None:
+        return
+    connection.execute(
+        StatusTransition.__table__.insert(),
+        {
+            "subject_type": "case",
+            "subject_id": case_id,
+            "from_status": transition[0],
+            "to_status": transition[1],
+            "at": timestamp,
+            "actor": actor,
+        },
+    )
+
+
+def _record_case_outbox(connection, case_id, op, changes, actor, timestamp):
+    connection.execute(
+        ChangeOutbox.__table__.insert(),
+        {
+            "subject_type": "case",
+            "subject_id": case_id,
+            "op": op,
+            "at": timestamp,
+            "actor": actor,
+            "changes": change_payload(changes),
+        },
+    )
+
+
 @event.listens_for(Case, "before_update", propagate=True)
 def _case_log_before_update(mapper, connection, target):  # noqa: ARG001
     if isinstance(target, ChangeLog):
@@ -253,6 +360,8 @@ def _case_log_before_update(mapper, connection, target):  # noqa: ARG001
     ]
     if rows:
         connection.execute(ChangeLog.__table__.insert(), rows)
+    _record_case_status_transition(connection, case_id, changes, actor, timestamp)
+    _record_case_outbox(connection, case_id, "update", changes, actor, timestamp)
 
 
 @event.listens_for(Case, "after_insert", propagate=True)
@@ -262,6 +371,7 @@ def _case_log_after_insert(mapper, connection, target):  # noqa: ARG001
     actor = _resolve_case_actor()
     case_id = getattr(target, "id", None)
     timestamp = now_utc()
+    snapshot = snapshot_for_insert(target)
     rows = [
         {
             "case_id": case_id,
@@ -271,10 +381,19 @@ def _case_log_after_insert(mapper, connection, target):  # noqa: ARG001
             "edited_by": actor,
             "timestamp": timestamp,
         }
-        for field, old_val, new_val in snapshot_for_insert(target)
+        for field, old_val, new_val in snapshot
     ]
     if rows:
         connection.execute(ChangeLog.__table__.insert(), rows)
+    _record_case_status_transition(connection, case_id, snapshot, actor, timestamp)
+    _record_case_outbox(connection, case_id, "insert", snapshot, actor, timestamp)
+
+
+@event.listens_for(Case, "after_delete", propagate=True)
+def _case_log_after_delete(mapper, connection, target):  # noqa: ARG001
+    _record_case_outbox(
+        connection, target.id, "delete", [], _resolve_case_actor(), now_utc()
+    )
 
 
 class UploadedFile(db.Model):
@@ -285,6 +404,10 @@ class UploadedFile(db.Model):
     upload_time = db.Column(db.DateTime(timezone=True), default=now_utc, nullable=False)
     uploader = db.Column(db.String(64), nullable=False)
     category = db.Column(db.String(50), nullable=False)
+    sha256 = db.Column(db.String(64), index=True)  # NULL for legacy uploads
+    size_bytes = db.Column(db.Integer)
+    # Generated documents: template + context hash (app.services.document_jobs)
+    render_fingerprint = db.Column(db.String(64))
 
     case = db.relationship("Case", back_populates="uploaded_file_records")
 
@@ -294,6 +417,164 @@ class UploadedFile(db.Model):
         )
 
 
+class UploadBlob(db.Model):
+    """A content-addressed upload blob (see ``app.services.blob_store``).
+
+    ``refcount`` counts the UploadedFile/InvestigationAttachment rows that
+    carry this hash, across both binds.
+    """
+
+    __tablename__ = "upload_blob"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), default=now_utc, nullable=False)
+
+
+class ChunkedUpload(db.Model):
+    """An in-progress resumable upload (see ``app.services.chunked_uploads``)."""
+
+    __tablename__ = "chunked_upload"
+    __table_args__ = (db.Index("ix_chunked_upload_updated_at", "updated_at"),)
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    subject_type = db.Column(db.String(16), nullable=False)
+    subject_id = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(256), nullable=False)
+    category = db.Column(db.String(64), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    received_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    status = db.Column(db.String(16), nullable=False, default="open")
+    created_at = db.Column(db.DateTime(timezone=True), default=now_utc, nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), default=now_utc, nullable=False)
+
+
+class DocumentJob(db.Model):
+    """A queued document render (see ``app.services.document_jobs``)."""
+
+    __tablename__ = "document_job"
+    __table_args__ = (
+        db.Index("ix_document_job_status_created", "status", "created_at"),
+        db.Index("ix_document_job_idempotency_key", "idempotency_key"),
+        db.Index("ix_document_job_batch_id", "batch_id"),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)
+    subject_type = db.Column(db.String(16), nullable=False)
+    subject_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    idempotency_key = db.Column(db.String(64), nullable=True)
+    batch_id = db.Column(db.String(32), nullable=True)
+    status = db.Column(db.String(16), nullable=False, default="queued")
+    payload = db.Column(db.JSON, nullable=False)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=now_utc, nullable=False)
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+
+class EmailOutbox(db.Model):
+    """An email waiting to be sent (see ``app.services.email_outbox``).
+
+    Written in the same transaction as the change it reports, one row per
+    recipient; the sender worker delivers due rows and retries failures until
+    they are ``dead``.
+    """
+
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        db.Index("ix_email_outbox_status_next", "status", "next_attempt_at"),
+        db.Index("ix_email_outbox_recipient_sent", "recipient", "sent_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    recipient = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255), nullable=True)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    worker = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=now_utc, nullable=False)
+    next_attempt_at = db.Column(
+        db.DateTime(timezone=True), default=now_utc, nullable=False
+    )
+    claimed_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    sent_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+
+class DeadlineDigest(db.Model):
+    """A deadline digest queued for a user on a (Budapest) day.
+
+    Written with the digest's outbox row; the unique key keeps a second run
+    on the same day from mailing the user again.
+    """
+
+    __tablename__ = "deadline_digest"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "digest_date", name="uq_deadline_digest_day"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    digest_date = db.Column(db.Date, nullable=False)
+    upcoming = db.Column(db.Integer, nullable=False, default=0)
+    overdue = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), default=now_utc, nullable=False)
+
+
+class ScheduledJob(db.Model):
+    """Schedule and lease of a registered job (see ``app.services.scheduler``).
+
+    A scheduler process runs the job only while it holds the lease
+    (``lease_owner`` until ``lease_expires_at``), so several schedulers on
+    one database never run it twice.
+    """
+
+    __tablename__ = "scheduled_job"
+
+    name = db.Column(db.String(64), primary_key=True)
+    schedule = db.Column(db.String(64), nullable=False)
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    lock_group = db.Column(db.String(64), nullable=True)
+    next_run_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    lease_owner = db.Column(db.String(64), nullable=True)
+    lease_expires_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    last_started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    last_finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    last_status = db.Column(db.String(16), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+
+class ScheduledJobRun(db.Model):
+    """One run of a scheduled job: outcome, duration and result."""
+
+    __tablename__ = "scheduled_job_run"
+    __table_args__ = (
+        db.Index("ix_scheduled_job_run_job_started", "job_name", "started_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    job_name = db.Column(db.String(64), nullable=False)
+    worker = db.Column(db.String(64), nullable=False)
+    trigger = db.Column(db.String(16), nullable=False, default="schedule")
+    status = db.Column(db.String(16), nullable=False)
+    started_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+
+
 class TaskMessage(db.Model):
     """Persistent notification for assigned tasks."""
 
@@ -330,3 +611,26 @@ class IdempotencyToken(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     case_id = db.Column(db.Integer, db.ForeignKey("case.id"))
     created_at = db.Column(db.DateTime(timezone=True), default=now_utc, nullable=False)
+
+
+class WorkItem(db.Model):
+    """Denormalized per-user inbox row backing the "Ügyeim" pages.
+
+    One row per (subject, user, role); maintained by
+    ``app.services.work_items`` from case/investigation/upload changes.
+    ``user_id`` is NULL for role-wide pools (toxicology).
+    """
+
+    __tablename__ = "work_item"
+    __table_args__ = (
+        db.Index("ix_work_item_user_status_deadline", "user_id", "status", "deadline"),
+        db.Index("ix_work_item_subject", "subject_type", "subject_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    user_id = db.Column(db.Integer)
+    subject_type = db.Column(db.String(16), nullable=False)
+    subject_id = db.Column(db.Integer, nullable=False)
+    role = db.Column(db.String(32), nullable=False)
+    status = db.Column(db.String(64))
+    deadline = db.Column(db.DateTime(timezone=True))
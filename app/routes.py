@@ -1,5 +1,4 @@
 # app/routes.py
-import os
 from pathlib import Path
 
 from flask import (
@@ -14,22 +13,33 @@ from flask import (
     url_for,
 )
 from flask_login import current_user, login_required
-from sqlalchemy import and_, false, func, or_
 from werkzeug import exceptions
 
 from app import db
+from app.audit import log_action
 from app.investigations.models import Investigation
-from app.models import Case, ChangeLog, UploadedFile, User
+from app.models import Case, ChangeLog, DocumentJob, UploadedFile, User
 from app.paths import file_safe_case_number
-from app.services.case_logic import resolve_effective_describer
+from app.services import chunked_uploads, document_jobs, replication, scheduler
+from app.services.work_items import (
+    ROLE_DESCRIBER,
+    ROLE_EXPERT,
+    ROLE_TOXI,
+    SUBJECT_CASE,
+    SUBJECT_INVESTIGATION,
+    TOXI_DONE,
+    TOXI_PENDING,
+    inbox_page,
+)
 from app.utils.case_helpers import build_case_context, ensure_unlocked_or_redirect
 from app.utils.case_status import is_final_status
 from app.utils.dates import attach_case_dates, safe_fmt
 from app.utils.idempotency import claim_idempotency, make_default_key
+from app.utils.permissions import capabilities_for
 from app.utils.rbac import require_roles as roles_required
 from app.utils.roles import canonical_role
 from app.utils.time_utils import fmt_budapest, fmt_date, now_utc
-from app.utils.uploads import is_valid_category, resolve_safe, save_upload
+from app.utils.uploads import is_valid_category, resolve_safe, store_upload
 from app.utils.user_display import user_display_name
 
 main_bp = Blueprint("main", __name__)
@@ -52,7 +62,7 @@ def handle_file_upload(case, file, category="egyéb"):
     root = Path(current_app.config["UPLOAD_CASES_ROOT"])
     subdir = file_safe_case_number(case.case_number)
     try:
-        dest = save_upload(file, root, "cases", subdir)
+        stored = store_upload(file, root, "cases", subdir)
     except exceptions.BadRequest:
         raise
     except Exception as e:  # noqa: BLE001
@@ -61,13 +71,15 @@ def handle_file_upload(case, file, category="egyéb"):
         return None
     rec = UploadedFile(
         case_id=case.id,
-        filename=dest.name,
+        filename=stored.path.name,
         uploader=user_display_name(current_user),
         upload_time=now_utc(),
         category=category,
+        sha256=stored.sha256,
+        size_bytes=stored.size,
     )
     db.session.add(rec)
-    return dest.name
+    return stored.path.name
 
 
 def is_expert_for_case(user, case):
@@ -78,20 +90,11 @@ def is_expert_for_case(user, case):
 def is_describer_for_case(user, case):
     """Return True if *user* is the describer for *case*.
 
-    When ``case.describer`` is empty we fall back to the effective describer
-    derived from the expert's configured default leíró.
+    Uses the materialized ``effective_describer_id`` (explicit describer, or
+    the expert's configured default leíró; see ``app.services.describer_sync``).
     """
 
-    user_ident = (user.screen_name or user.username or "").strip()
-    explicit = (case.describer or "").strip()
-    if explicit:
-        return user_ident == explicit
-
-    try:
-        effective = (resolve_effective_describer(case) or "").strip()
-    except Exception:  # noqa: BLE001
-        effective = ""
-    return bool(user_ident) and user_ident == effective
+    return user.id is not None and case.effective_describer_id == user.id
 
 
 @main_bp.app_errorhandler(413)
@@ -101,8 +104,12 @@ def _too_large(e):  # noqa: ARG001
 
 
 def _max_upload_bytes():
-    """Return max upload size in bytes, defaulting to 16MB if not configured or set to a non-number/None."""
-    val = current_app.config.get("MAX_CONTENT_LENGTH", None)
+    """Return max upload size in bytes, defaulting to 16MB if not configured or set to a non-number/None.
+
+    Per-route ``UPLOAD_ROUTE_LIMITS`` apply; oversized bodies are normally
+    already refused by ``app.utils.upload_limits`` while streaming.
+    """
+    val = request.max_content_length
     try:
         if val is None:
             return 16 * 1024 * 1024
@@ -122,25 +129,21 @@ def enforce_upload_size_limit():
 @login_required
 @roles_required("szakértő")
 def ugyeim():
-    ident = current_user.screen_name or current_user.username
-    cases = (
-        Case.query.filter(or_(Case.expert_1 == ident, Case.expert_2 == ident))
-        .filter(Case.status != "boncolva-leírónál")
-        .order_by(Case.id.desc())
-        .all()
+    pagination, cases = inbox_page(
+        current_user.id,
+        ROLE_EXPERT,
+        SUBJECT_CASE,
+        exclude_statuses=("boncolva-leírónál",),
+        page=request.args.get("page", 1, type=int),
     )
     for case in cases:
         attach_case_dates(case)
 
-    investigations = (
-        Investigation.query.filter(
-            or_(
-                Investigation.expert1_id == current_user.id,
-                Investigation.expert2_id == current_user.id,
-            )
-        )
-        .order_by(Investigation.id.desc())
-        .all()
+    inv_pagination, investigations = inbox_page(
+        current_user.id,
+        ROLE_EXPERT,
+        SUBJECT_INVESTIGATION,
+        page=request.args.get("inv_page", 1, type=int),
     )
     for inv in investigations:
         inv.deadline_str = fmt_date(getattr(inv, "deadline", None))
@@ -149,42 +152,12 @@ def ugyeim():
         "ugyeim.html",
         cases=cases,
         investigations=investigations,
+        pagination=pagination,
+        inv_pagination=inv_pagination,
         page_title="Elvégzendő",
     )
 
 
-@main_bp.before_app_request
-def _enforce_global_upload_cap():
-    # Only check multipart POSTs
-    if request.method != "POST":
-        return
-    ct = request.content_type or ""
-    if "multipart/form-data" not in ct:
-        return
-
-    limit = _max_upload_bytes()
-
-    # Prefer Content-Length if provided by client
-    cl = request.content_length
-    if cl is not None and cl > limit:
-        abort(413)
-
-    # Fallback: inspect uploaded files (Werkzeug FileStorage)
-    try:
-        for fs in request.files.values():
-            size = getattr(fs, "content_length", None)
-            if size is None:
-                pos = fs.stream.tell()
-                fs.stream.seek(0, os.SEEK_END)
-                size = fs.stream.tell()
-                fs.stream.seek(pos, os.SEEK_SET)
-            if size is not None and size > limit:
-                abort(413)
-    except Exception:
-        # Do not block if we cannot determine size
-        pass
-
-
 @main_bp.route("/cases/<int:case_id>/mark_tox_viewed")
 @login_required
 @roles_required("szakértő")
@@ -542,86 +515,31 @@ def upload_elvegzes_files(case_id):
 @login_required
 @roles_required("leíró")
 def leiro_ugyeim():
-    ident_screen = (current_user.screen_name or "").strip().lower()
-    ident_username = (current_user.username or "").strip().lower()
-    identifiers = tuple({ident for ident in (ident_screen, ident_username) if ident})
-
-    normalized_describer = func.lower(func.trim(Case.describer))
-    normalized_expert_1 = func.lower(func.trim(Case.expert_1))
-    normalized_expert_2 = func.lower(func.trim(Case.expert_2))
-
-    normalized_user_screen = func.lower(func.trim(User.screen_name))
-    normalized_user_username = func.lower(func.trim(User.username))
-
-    empty_describer = or_(Case.describer.is_(None), func.trim(Case.describer) == "")
-
-    expert_links = or_(
-        or_(
-            normalized_user_screen == normalized_expert_1,
-            normalized_user_username == normalized_expert_1,
-        ),
-        or_(
-            normalized_user_screen == normalized_expert_2,
-            normalized_user_username == normalized_expert_2,
-        ),
-    )
-
-    # CASES (MAIN bind only) — safe EXISTS against User+Case
-    default_leiro_exists = (
-        db.session.query(User.id)
-        .filter(User.default_leiro_id == current_user.id)
-        .filter(expert_links)
-        .exists()
-    )
-
-    filters = [and_(empty_describer, default_leiro_exists)]
-    if identifiers:
-        filters.append(normalized_describer.in_(identifiers))
-
-    combined_filter = or_(*filters) if len(filters) > 1 else filters[0]
-    base_q = Case.query.filter(combined_filter)
     pending_statuses = {"szignálva", "boncolva-leírónál"}
-    pending = (
-        base_q.filter(Case.status.in_(pending_statuses))
-        .order_by(Case.case_number.desc())
-        .all()
+    pagination, pending = inbox_page(
+        current_user.id,
+        ROLE_DESCRIBER,
+        SUBJECT_CASE,
+        statuses=pending_statuses,
+        page=request.args.get("page", 1, type=int),
     )
-    completed = (
-        base_q.filter(Case.status == "leiktatva")
-        .order_by(Case.case_number.desc())
-        .all()
+    done_pagination, completed = inbox_page(
+        current_user.id,
+        ROLE_DESCRIBER,
+        SUBJECT_CASE,
+        statuses={"leiktatva"},
+        page=request.args.get("done_page", 1, type=int),
     )
     for case in pending + completed:
         attach_case_dates(case)
 
-    cases_for_table = pending + completed
-
-    # INVESTIGATIONS (EXAMINATION bind) — avoid cross-bind subqueries.
-    # Step 1: Resolve expert user IDs on MAIN
-    expert_ids = [
-        row.id
-        for row in db.session.query(User.id)
-        .filter(User.default_leiro_id == current_user.id)
-        .all()
-    ]
-
-    # Step 2: Build safe ownership predicate on EXAMINATION using IN()
-    expert_match = or_(
-        Investigation.expert1_id.in_(expert_ids) if expert_ids else false(),
-        Investigation.expert2_id.in_(expert_ids) if expert_ids else false(),
-    )
-
-    inv_ownership = or_(
-        Investigation.describer_id == current_user.id,
-        and_(Investigation.describer_id.is_(None), expert_match),
-    )
-
     inv_pending_statuses = {"beérkezett", "szignálva"}
-    pending_investigations = (
-        Investigation.query.filter(inv_ownership)
-        .filter(Investigation.status.in_(inv_pending_statuses))
-        .order_by(Investigation.id.desc())
-        .all()
+    inv_pagination, pending_investigations = inbox_page(
+        current_user.id,
+        ROLE_DESCRIBER,
+        SUBJECT_INVESTIGATION,
+        statuses=inv_pending_statuses,
+        page=request.args.get("inv_page", 1, type=int),
     )
     for inv in pending_investigations:
         inv.deadline_str = fmt_date(getattr(inv, "deadline", None))
@@ -631,9 +549,11 @@ def leiro_ugyeim():
         "leiro_ugyeim.html",
         pending_cases=pending,
         completed_cases=completed,
-        cases=cases_for_table,
         pending_investigations=pending_investigations,
         completed_investigations=completed_investigations,
+        pagination=pagination,
+        done_pagination=done_pagination,
+        inv_pagination=inv_pagination,
     )
 
 
@@ -641,17 +561,21 @@ def leiro_ugyeim():
 @login_required
 @roles_required("toxi")
 def toxi_ugyeim():
-    """Dashboard for toxicology specialists."""
-    vegzes_exists = (
-        db.session.query(UploadedFile.id)
-        .filter(UploadedFile.case_id == Case.id, UploadedFile.category == "végzés")
-        .exists()
+    """Dashboard for toxicology specialists (shared pool of cases with végzés)."""
+    pagination, assigned_cases = inbox_page(
+        None,
+        ROLE_TOXI,
+        SUBJECT_CASE,
+        statuses=(TOXI_PENDING,),
+        page=request.args.get("page", 1, type=int),
+    )
+    done_pagination, done_cases = inbox_page(
+        None,
+        ROLE_TOXI,
+        SUBJECT_CASE,
+        statuses=(TOXI_DONE,),
+        page=request.args.get("done_page", 1, type=int),
     )
-
-    pending_filter = or_(Case.tox_completed.is_(False), Case.tox_completed.is_(None))
-
-    assigned_cases = Case.query.filter(pending_filter, vegzes_exists).all()
-    done_cases = Case.query.filter(Case.tox_completed.is_(True), vegzes_exists).all()
     for case in assigned_cases + done_cases:
         attach_case_dates(case)
 
@@ -659,6 +583,8 @@ def toxi_ugyeim():
         "toxi_ugyeim.html",
         assigned_cases=assigned_cases,
         done_cases=done_cases,
+        pagination=pagination,
+        done_pagination=done_pagination,
     )
 
 
@@ -824,13 +750,6 @@ def generate_certificate(case_id):
     if not is_expert_for_case(current_user, case):
         abort(403)
 
-    key = make_default_key(request)
-    if not claim_idempotency(
-        key, route=request.endpoint, user_id=current_user.id, case_id=case.id
-    ):
-        flash("Művelet már feldolgozva.")
-        return redirect(url_for("main.elvegzem", case_id=case.id))
-
     root = Path(current_app.config["UPLOAD_CASES_ROOT"])
 
     f = request.form
@@ -863,18 +782,37 @@ def generate_certificate(case_id):
         file_safe_case_number(case.case_number),
         f"halottvizsgalati_bizonyitvany-{file_safe_case_number(case.case_number)}.txt",
     )
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    with open(dest, "w", encoding="utf-8", newline="\n") as fh:
-        fh.write("\n".join(lines))
-
-    case.certificate_generated = True
-    case.certificate_generated_at = now_utc()
-    db.session.commit()
+    job, created = document_jobs.submit(
+        document_jobs.KIND_CERTIFICATE,
+        subject_type=SUBJECT_CASE,
+        subject_id=case.id,
+        case_id=case.id,
+        key=make_default_key(request),
+        payload={
+            "renderer": "text",
+            "output": str(dest),
+            "lines": lines,
+            "next": {"endpoint": "main.elvegzem", "values": {"case_id": case.id}},
+        },
+    )
+    if not created or job.status != document_jobs.STATUS_DONE:
+        return document_job_response(
+            job, created, url_for("main.elvegzem", case_id=case.id)
+        )
 
     flash("Bizonyítvány generálva.", "success")
     return redirect(url_for("main.elvegzem", case_id=case.id))
 
 
+@document_jobs.finisher(document_jobs.KIND_CERTIFICATE)
+def _certificate_generated(job):
+    case = db.session.get(Case, job.subject_id)
+    if case is not None:
+        case.certificate_generated = True
+        case.certificate_generated_at = now_utc()
+    return {}
+
+
 @main_bp.route("/cases/<int:case_id>/complete_expert", methods=["POST"])
 @login_required
 @roles_required("szakértő", "admin")
@@ -889,3 +827,199 @@ def complete_expert(case_id):
 
     flash("Szakértői vizsgálat elvégezve.")
     return redirect(url_for("main.ugyeim"))
+
+
+# ---------------------------------------------------------------------------
+# Queued document generation (see app.services.document_jobs)
+# ---------------------------------------------------------------------------
+
+
+def _wants_json() -> bool:
+    return (
+        request.headers.get("X-Requested-With") == "XMLHttpRequest"
+        or request.accept_mimetypes.best == "application/json"
+    )
+
+
+def document_job_response(job, created, fallback):
+    """Answer a document route whose job is still pending or was resubmitted.
+
+    JSON clients get 202 with the job state and its polling URL; browsers are
+    sent to the status page, which polls and then follows the job's redirect.
+    """
+    if not created:
+        flash("Művelet már feldolgozva.")
+        if job is None or job.status == document_jobs.STATUS_FAILED:
+            return redirect(fallback)
+        if job.status == document_jobs.STATUS_DONE:
+            return redirect(document_jobs.redirect_url(job) or fallback)
+    if job.status == document_jobs.STATUS_FAILED:
+        flash("Hiba történt a dokumentum generálása közben.", "danger")
+        return redirect(fallback)
+    status_url = url_for("main.document_job_status", job_id=job.id)
+    if _wants_json():
+        return jsonify(document_jobs.state(job)), 202, {"Location": status_url}
+    if created:
+        flash("A dokumentum generálása folyamatban.", "info")
+    return redirect(status_url)
+
+
+def flash_document_done(job, message):
+    """Flash *message* for a finished job, or note that nothing changed."""
+    if (job.result or {}).get("reused"):
+        flash("A dokumentum nem változott, a korábban generált fájl érvényes.", "info")
+    else:
+        flash(message, "success")
+
+
+def force_render_requested() -> bool:
+    """Whether the form asks to render even if the document is unchanged."""
+    return request.form.get("force") in ("1", "on", "true")
+
+
+@main_bp.route("/jobs/stats", methods=["GET"])
+@login_required
+@roles_required("admin")
+def document_job_stats():
+    """Rendered vs. reused documents per kind (fingerprint hit rate)."""
+    return jsonify(document_jobs.reuse_stats())
+
+
+@main_bp.route("/jobs/scheduler", methods=["GET"])
+@login_required
+@roles_required("admin")
+def scheduler_metrics():
+    """Scheduled jobs: schedule, lease and run counts/durations."""
+    return jsonify(scheduler.metrics())
+
+
+@main_bp.route("/jobs/replication", methods=["GET"])
+@login_required
+@roles_required("admin")
+def replication_status():
+    """WAL shipping: standby generation, pending segments and lag."""
+    return jsonify(replication.metrics())
+
+
+@main_bp.route("/jobs/<job_id>", methods=["GET"])
+@login_required
+def document_job_status(job_id):
+    job = db.session.get(DocumentJob, job_id)
+    if job is None or (
+        job.user_id != current_user.id and canonical_role(current_user.role) != "admin"
+    ):
+        abort(404)
+    if _wants_json() or request.args.get("format") == "json":
+        return jsonify(document_jobs.state(job))
+    return render_template("document_job.html", job=job, state=document_jobs.state(job))
+
+
+# ---------------------------------------------------------------------------
+# Resumable chunked uploads (see app.services.chunked_uploads)
+# ---------------------------------------------------------------------------
+
+
+def _chunked_state(upload):
+    return {
+        "id": upload.id,
+        "filename": upload.filename,
+        "size": upload.total_size,
+        "chunk_size": upload.chunk_size,
+        "offset": upload.received_bytes,
+        "status": upload.status,
+    }
+
+
+def _chunked_error(exc: exceptions.HTTPException):
+    payload = {"error": exc.description}
+    if isinstance(exc, chunked_uploads.OffsetMismatch):
+        payload["offset"] = exc.expected
+    return jsonify(payload), exc.code
+
+
+def start_chunked_upload(subject_type, subject_id):
+    """Open a chunked upload from the JSON body; permissions checked by caller."""
+    data = request.get_json(silent=True) or {}
+    category = (data.get("category") or "").strip()
+    if not category or not is_valid_category(category):
+        return jsonify({"error": "invalid category"}), 400
+    try:
+        upload = chunked_uploads.start(
+            user_id=current_user.id,
+            subject_type=subject_type,
+            subject_id=subject_id,
+            filename=data.get("filename"),
+            category=category,
+            size=data.get("size"),
+            sha256=data.get("sha256"),
+        )
+    except exceptions.HTTPException as exc:
+        return _chunked_error(exc)
+    db.session.commit()
+    return jsonify(_chunked_state(upload)), 201
+
+
+@main_bp.route("/uploads/chunked/<upload_id>", methods=["GET"])
+@login_required
+def chunked_upload_status(upload_id):
+    upload = chunked_uploads.get_owned(upload_id, current_user.id)
+    return jsonify(_chunked_state(upload))
+
+
+@main_bp.route("/uploads/chunked/<upload_id>", methods=["PUT"])
+@login_required
+def chunked_upload_put(upload_id):
+    upload = chunked_uploads.get_owned(upload_id, current_user.id)
+    try:
+        offset = int(request.args.get("offset", ""))
+    except ValueError:
+        return jsonify({"error": "offset required"}), 400
+    try:
+        chunked_uploads.append(upload, offset, request.stream, request.content_length)
+    except exceptions.HTTPException as exc:
+        return _chunked_error(exc)
+    db.session.commit()
+    return jsonify(_chunked_state(upload))
+
+
+@main_bp.route("/uploads/chunked/<upload_id>", methods=["DELETE"])
+@login_required
+def chunked_upload_delete(upload_id):
+    upload = chunked_uploads.get_owned(upload_id, current_user.id)
+    chunked_uploads.discard(upload)
+    db.session.commit()
+    return "", 204
+
+
+@main_bp.route("/uploads/chunked/<upload_id>/finalize", methods=["POST"])
+@login_required
+def chunked_upload_finalize(upload_id):
+    from app.investigations.routes import can_upload_investigation_now
+
+    upload = chunked_uploads.get_owned(upload_id, current_user.id)
+    # Re-run the upload route's checks: status or assignment may have changed
+    # since the upload was started.
+    if upload.subject_type == SUBJECT_CASE:
+        subject = db.session.get(Case, upload.subject_id) or abort(404)
+        if not capabilities_for(current_user).get("can_upload_case"):
+            return jsonify({"error": "Nincs jogosultság"}), 403
+        if is_final_status(subject.status):
+            return jsonify({"error": "Az ügy lezárva"}), 409
+        uploader = user_display_name(current_user)
+    else:
+        subject = db.session.get(Investigation, upload.subject_id) or abort(404)
+        if not can_upload_investigation_now(subject, current_user):
+            return jsonify({"error": "Nincs jogosultság"}), 403
+        uploader = current_user.id
+    try:
+        blob = chunked_uploads.finalize(upload)
+    except exceptions.HTTPException as exc:
+        db.session.commit()  # keep the reset offset after a checksum mismatch
+        return _chunked_error(exc)
+    record = chunked_uploads.attach(upload, blob, subject, uploader)
+    db.session.commit()
+    if upload.subject_type == SUBJECT_CASE:
+        log_action("File uploaded", f"{record.filename} for case {subject.case_number}")
+    state = _chunked_state(upload)
+    state.update(filename=record.filename, sha256=blob.sha256)
+    return jsonify(state)
@@ -0,0 +1,437 @@
+"""Per-year archive databases for closed cases and investigations."""
+
+from __future__ import annotations
+
+import logging
+from calendar import monthrange
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial, wraps
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import sqlalchemy as sa
+from flask import current_app, make_response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+from werkzeug.exceptions import NotFound
+
+from app import db
+from app.investigations.models import (
+    Investigation,
+    InvestigationAttachment,
+    InvestigationChangeLog,
+    InvestigationHistorySnapshot,
+    InvestigationNote,
+    InvestigationStatusTransition,
+)
+from app.models import (
+    Case,
+    CaseHistorySnapshot,
+    ChangeLog,
+    IdempotencyToken,
+    StatusTransition,
+    TaskMessage,
+    UploadedFile,
+    WorkItem,
+)
+from app.services.scheduler import job
+from app.utils.case_status import CASE_STATUS_FINAL
+from app.utils.reporting import reporting
+from app.utils.sqlite import is_file_engine
+from app.utils.time_utils import now_utc, to_budapest
+
+log = logging.getLogger(__name__)
+
+DEFAULTS = {"ARCHIVE_AFTER_MONTHS": 24, "ARCHIVE_BATCH_SIZE": 200}
+MAX_ATTACHED = 10  # SQLite's default SQLITE_MAX_ATTACHED
+_SCHEMA = "archive"
+
+
+class ArchiveError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Spec:
+    """What is archived from one bind."""
+
+    subject: sa.Table
+    subject_type: str  # WorkItem.subject_type
+    closed: sa.ColumnElement
+    last_activity: sa.ColumnElement
+    related: Tuple[Tuple[sa.Table, str], ...]  # (table, owner column)
+    purged: Tuple[Tuple[sa.Table, str], ...] = ()
+
+    @property
+    def tables(self) -> Tuple[Tuple[sa.Table, str], ...]:
+        return ((self.subject, "id"),) + self.related
+
+
+def specs() -> Dict[str, Spec]:
+    case = Case.__table__
+    investigation = Investigation.__table__
+    changes = InvestigationChangeLog.__table__
+    last_change = (
+        sa.select(sa.func.max(changes.c.timestamp))
+        .where(changes.c.investigation_id == investigation.c.id)
+        .scalar_subquery()
+    )
+    return {
+        "main": Spec(
+            subject=case,
+            subject_type="case",
+            closed=case.c.status == CASE_STATUS_FINAL,
+            last_activity=case.c.updated_at,
+            related=(
+                (ChangeLog.__table__, "case_id"),
+                (UploadedFile.__table__, "case_id"),
+                (TaskMessage.__table__, "case_id"),
+                (StatusTransition.__table__, "subject_id"),
+                (CaseHistorySnapshot.__table__, "subject_id"),
+            ),
+            purged=((IdempotencyToken.__table__, "case_id"),),
+        ),
+        "examination": Spec(
+            subject=investigation,
+            subject_type="investigation",
+            # No workflow closes an investigation yet, so none is archived
+            # until one sets CASE_STATUS_FINAL.
+            closed=investigation.c.status == CASE_STATUS_FINAL,
+            last_activity=sa.func.coalesce(
+                last_change, investigation.c.registration_time
+            ),
+            related=(
+                (changes, "investigation_id"),
+                (InvestigationAttachment.__table__, "investigation_id"),
+                (InvestigationNote.__table__, "investigation_id"),
+                (InvestigationStatusTransition.__table__, "subject_id"),
+                (InvestigationHistorySnapshot.__table__, "subject_id"),
+            ),
+        ),
+    }
+
+
+def _setting(name: str) -> int:
+    value = current_app.config.get(name)
+    return DEFAULTS[name] if value is None else value
+
+
+def archive_dir() -> Path:
+    configured = current_app.config.get("ARCHIVE_DIR")
+    if configured:
+        return Path(configured)
+    return Path(current_app.instance_path) / "archive"
+
+
+def archive_files(bind: str) -> List[Path]:
+    """The bind's archive files, oldest year first."""
+    root = archive_dir()
+    if not root.is_dir():
+        return []
+    return sorted(root.glob(f"{bind}-[0-9][0-9][0-9][0-9].db"))
+
+
+def engines() -> Dict[str, Engine]:
+    return {
+        bind or "main": engine
+        for bind, engine in db.engines.items()
+        if is_file_engine(engine)
+    }
+
+
+def _archive_tables(spec: Spec, schema: Optional[str] = None) -> List[sa.Table]:
+    """Plain copies of the archived tables: columns, primary key, owner index."""
+    metadata = sa.MetaData(schema=schema)
+    tables = []
+    for table, owner in spec.tables:
+        copy = sa.Table(
+            table.name,
+            metadata,
+            *(sa.Column(c.name, c.type, primary_key=c.primary_key) for c in table.c),
+        )
+        if owner != "id":
+            sa.Index(f"ix_{table.name}_{owner}", copy.c[owner])
+        tables.append(copy)
+    return tables
+
+
+def months_before(moment: datetime, months: int) -> datetime:
+    total = moment.year * 12 + moment.month - 1 - months
+    year, month = divmod(total, 12)
+    day = min(moment.day, monthrange(year, month + 1)[1])
+    return moment.replace(year=year, month=month + 1, day=day)
+
+
+# --- archiving ---------------------------------------------------------------
+
+
+def _newest_owners(conn, spec: Spec) -> Set[int]:
+    owners = set()
+    for table, owner in spec.tables:
+        top = conn.execute(
+            sa.select(table.c[owner]).order_by(table.c.id.desc()).limit(1)
+        ).scalar()
+        if top is not None:
+            owners.add(top)
+    return owners
+
+
+def candidates(conn, spec: Spec, cutoff: datetime, year: int) -> Dict[int, List[int]]:
+    """Ids of the subjects due for archiving, by registration year."""
+    subject = spec.subject
+    registered = sa.func.strftime(
+        "%Y", sa.func.coalesce(subject.c.registration_time, spec.last_activity)
+    )
+    rows = conn.execute(
+        sa.select(subject.c.id, registered)
+        .where(spec.closed, spec.last_activity < cutoff)
+        .order_by(subject.c.id)
+    ).all()
+    keep = _newest_owners(conn, spec)
+    by_year: Dict[int, List[int]] = {}
+    for subject_id, registered_year in rows:
+        if subject_id in keep or not registered_year or int(registered_year) >= year:
+            continue
+        by_year.setdefault(int(registered_year), []).append(subject_id)
+    return by_year
+
+
+def _prepare(path: Path, spec: Spec) -> None:
+    """Create the archive file's tables; add columns the models gained since."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    engine = sa.create_engine(f"sqlite:///{path.as_posix()}", poolclass=NullPool)
+    try:
+        tables = _archive_tables(spec)
+        with engine.begin() as conn:
+            tables[0].metadata.create_all(conn)
+            for table in tables:
+                info = conn.exec_driver_sql(f'PRAGMA table_info("{table.name}")')
+                have = {row[1] for row in info}
+                for column in table.c:
+                    if column.name not in have:
+                        conn.exec_driver_sql(
+                            f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" '
+                            f"{column.type.compile(engine.dialect)}"
+                        )
+    finally:
+        engine.dispose()
+
+
+def _move(conn, path: Path, spec: Spec, ids: List[int]) -> None:
+    """Copy the subjects *ids* into the archive file *path*, then delete them."""
+    conn.exec_driver_sql(f"ATTACH DATABASE ? AS {_SCHEMA}", (str(path),))
+    conn.commit()
+    try:
+        with conn.begin():
+            targets = _archive_tables(spec, _SCHEMA)
+            for (table, owner), target in zip(spec.tables, targets, strict=True):
+                conn.execute(
+                    sa.insert(target)
+                    .prefix_with("OR REPLACE")
+                    .from_select(
+                        [c.name for c in table.c],
+                        sa.select(*table.c).where(table.c[owner].in_(ids)),
+                    )
+                )
+        with conn.begin():
+            for table, owner in spec.related[::-1] + spec.purged + spec.tables[:1]:
+                conn.execute(sa.delete(table).where(table.c[owner].in_(ids)))
+    finally:
+        conn.exec_driver_sql(f"DETACH DATABASE {_SCHEMA}")
+        conn.commit()
+
+
+def archive_bind(
+    name: str,
+    engine: Engine,
+    cutoff: datetime,
+    year: int,
+    *,
+    batch: int,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """Archive the bind's due subjects; returns the number moved per year."""
+    spec = specs()[name]
+    moved: Dict[str, int] = {}
+    with engine.connect() as conn:
+        due = candidates(conn, spec, cutoff, year)
+        conn.rollback()
+        for registered_year, ids in sorted(due.items()):
+            moved[str(registered_year)] = len(ids)
+            if dry_run:
+                continue
+            path = archive_dir() / f"{name}-{registered_year}.db"
+            _prepare(path, spec)
+            for start in range(0, len(ids), batch):
+                _move(conn, path, spec, ids[start : start + batch])
+            db.session.execute(
+                sa.delete(WorkItem).where(
+                    WorkItem.subject_type == spec.subject_type,
+                    WorkItem.subject_id.in_(ids),
+                )
+            )
+            db.session.commit()
+    return moved
+
+
+def run(
+    now: Optional[datetime] = None,
+    *,
+    months: Optional[int] = None,
+    dry_run: bool = False,
+) -> dict:
+    """Archive what is due in every bind (see :func:`specs`)."""
+    now = now or now_utc()
+    months = _setting("ARCHIVE_AFTER_MONTHS") if months is None else months
+    if months <= 0:
+        raise ArchiveError("ARCHIVE_AFTER_MONTHS must be positive")
+    cutoff = months_before(now, months)
+    year = to_budapest(now).year
+    batch = _setting("ARCHIVE_BATCH_SIZE")
+    db.session.remove()
+    report = {"cutoff": cutoff.isoformat(), "dry_run": dry_run, "binds": {}}
+    for name, engine in engines().items():
+        moved = archive_bind(name, engine, cutoff, year, batch=batch, dry_run=dry_run)
+        report["binds"][name] = moved
+        if moved and not dry_run:
+            log.info("archive: %s moved %s", name, moved)
+    return report
+
+
+def status() -> dict:
+    """Hot subject counts and each archive file's size and row counts."""
+    report = {}
+    for name, engine in engines().items():
+        spec = specs()[name]
+        with engine.connect() as conn:
+            hot = conn.execute(
+                sa.select(sa.func.count()).select_from(spec.subject)
+            ).scalar()
+        files = {}
+        for path in archive_files(name):
+            engine = sa.create_engine(
+                f"sqlite:///file:{path.as_posix()}?mode=ro&uri=true",
+                poolclass=NullPool,
+            )
+            with engine.connect() as reader:
+                files[path.name] = {
+                    "bytes": path.stat().st_size,
+                    "rows": {
+                        table.name: reader.execute(
+                            sa.select(sa.func.count()).select_from(table)
+                        ).scalar()
+                        for table in _archive_tables(spec)
+                    },
+                }
+            engine.dispose()
+        report[name] = {"hot": hot, "archives": files}
+    return report
+
+
+@job("archive", schedule="30 4 * * 0", timeout=6 * 3600, group="maintenance")
+def _archive_job() -> dict:
+    """Move long-closed cases and investigations to the per-year archives."""
+    return run()
+
+
+# --- unified reads -----------------------------------------------------------
+
+
+def _quote(name: str) -> str:
+    return f'"{name}"'
+
+
+def _attach(dbapi_connection, _record, *, files: List[Path], spec: Spec) -> None:
+    """Attach *files* read-only and shadow the archived tables with views."""
+    tables = _archive_tables(spec)
+    selects = {
+        t.name: [f'SELECT {", ".join(map(_quote, t.c.keys()))} FROM main."{t.name}"']
+        for t in tables
+    }
+    for number, path in enumerate(files):
+        schema = f"archive_{number}"
+        dbapi_connection.execute(
+            f"ATTACH DATABASE ? AS {schema}", (f"file:{path.as_posix()}?mode=ro",)
+        )
+        for table in tables:
+            have = {
+                row[1]
+                for row in dbapi_connection.execute(
+                    f'PRAGMA {schema}.table_info("{table.name}")'
+                )
+            }
+            if not have:
+                continue
+            columns = ", ".join(
+                _quote(c) if c in have else f"NULL AS {_quote(c)}"
+                for c in table.c.keys()
+            )
+            selects[table.name].append(f'SELECT {columns} FROM {schema}."{table.name}"')
+    for name, parts in selects.items():
+        dbapi_connection.execute(
+            f'CREATE TEMP VIEW "{name}" AS {" UNION ALL ".join(parts)}'
+        )
+
+
+def _reader(name: str, primary: Engine, files: List[Path]) -> Engine:
+    """A cached engine reading the bind's hot and archived rows together."""
+    readers = current_app.extensions.setdefault("archive_readers", {})
+    cached = readers.get(name)
+    if cached and cached[0] == files:
+        return cached[1]
+    if cached:  # a new year's file appeared
+        cached[1].dispose()
+    attached = files
+    if len(files) > MAX_ATTACHED:
+        log.warning(
+            "archive: %s has %d archive files, reading the newest %d",
+            name,
+            len(files),
+            MAX_ATTACHED,
+        )
+        attached = files[-MAX_ATTACHED:]
+    path = Path(primary.url.database).resolve().as_posix()
+    engine = sa.create_engine(f"sqlite:///file:{path}?uri=true")
+    event.listen(
+        engine, "connect", partial(_attach, files=attached, spec=specs()[name])
+    )
+    readers[name] = (files, engine)
+    return engine
+
+
+def archive_routes() -> Dict[Engine, Engine]:
+    """Routes to the unified readers of the binds that have archives."""
+    routes = {}
+    for name, engine in engines().items():
+        files = archive_files(name)
+        if files:
+            routes[engine] = _reader(name, engine, files)
+    return routes
+
+
+@contextmanager
+def archive_reads() -> Iterator[bool]:
+    """Let the block's SELECTs see archived rows; yields whether any exist."""
+    routes = archive_routes()
+    with reporting(routes):
+        yield bool(routes)
+
+
+def archive_view(view):
+    """Decorator for detail views: retry a 404 with the archives attached."""
+
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        try:
+            return view(*args, **kwargs)
+        except NotFound:
+            routes = archive_routes()
+            if not routes:
+                raise
+        with reporting(routes):
+            return make_response(view(*args, **kwargs))
+
+    return wrapped
@@ -0,0 +1,452 @@
+"""Online backups of both databases and the upload trees."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy.engine import Engine
+
+from app import db
+from app.services.scheduler import job
+from app.utils.time_utils import now_utc
+
+MANIFEST = "manifest.json"
+NAME_FORMAT = "%Y%m%dT%H%M%SZ"
+DEFAULTS = {
+    "BACKUP_KEEP": 7,
+    "BACKUP_PAGES_PER_STEP": 1024,
+    "BACKUP_STEP_SLEEP_MS": 5,
+    "BACKUP_MAX_RESTARTS": 20,
+}
+CHUNK_SIZE = 1024 * 1024
+_SKIP_SUFFIXES = (".part", ".tmp")  # in-flight uploads / cache writes
+
+
+class BackupError(RuntimeError):
+    pass
+
+
+def _setting(name: str) -> int:
+    value = current_app.config.get(name)
+    return DEFAULTS[name] if value is None else value
+
+
+def backup_root() -> Path:
+    configured = current_app.config.get("BACKUP_ROOT")
+    root = (
+        Path(configured) if configured else Path(current_app.instance_path) / "backups"
+    )
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def upload_trees() -> Dict[str, Path]:
+    from app.paths import case_root, investigation_root
+    from app.services.archive import archive_dir
+    from app.services.blob_store import blob_root
+
+    trees = {
+        "cases": case_root(),
+        "investigations": investigation_root(),
+        "blobs": blob_root(),
+    }
+    if archive_dir().is_dir():  # per-year archive databases
+        trees["archive"] = archive_dir()
+    return trees
+
+
+def list_backups() -> List[str]:
+    """Names of the complete backups, oldest first."""
+    return sorted(
+        p.name
+        for p in backup_root().iterdir()
+        if not p.name.startswith(".") and (p / MANIFEST).is_file()
+    )
+
+
+def load_manifest(name: str) -> dict:
+    return json.loads((backup_root() / name / MANIFEST).read_text(encoding="utf-8"))
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# --- databases ---------------------------------------------------------------
+
+
+def _engines() -> Dict[str, Engine]:
+    from app.services.db_maintenance import engines
+
+    return engines()
+
+
+def _source(engine: Engine) -> Tuple[sqlite3.Connection, Optional[object]]:
+    """A driver connection to read *engine*'s database (and what to close)."""
+    path = engine.url.database
+    if path and path != ":memory:" and not path.startswith("file:"):
+        conn = sqlite3.connect(
+            f"file:{Path(path).as_posix()}?mode=ro",
+            uri=True,
+            isolation_level=None,
+            timeout=30,
+        )
+        return conn, conn
+    raw = engine.raw_connection()
+    return raw.driver_connection, raw
+
+
+def _copy_db(source: sqlite3.Connection, dest: Path) -> dict:
+    """Page-stepped backup of *source* into *dest*; returns its manifest entry."""
+    pages = _setting("BACKUP_PAGES_PER_STEP")
+    pause = _setting("BACKUP_STEP_SLEEP_MS") / 1000.0
+    max_restarts = _setting("BACKUP_MAX_RESTARTS")
+    state = {"remaining": None, "restarts": 0}
+
+    class _Restarting(Exception):
+        pass
+
+    def progress(status, remaining, total):
+        # A write by another connection restarts the copy from page 1.
+        if state["remaining"] is not None and remaining >= state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise _Restarting
+        state["remaining"] = remaining
+        if pause and remaining:
+            time.sleep(pause)
+
+    target = sqlite3.connect(str(dest))
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress)
+            one_step = False
+        except _Restarting:
+            source.backup(target)
+            one_step = True
+        # A self-contained file, whatever mode the source uses.
+        target.execute("PRAGMA journal_mode=DELETE")
+        check = target.execute("PRAGMA quick_check").fetchone()[0]
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        target.close()
+    if check != "ok":
+        raise BackupError(f"snapshot {dest.name} failed quick_check: {check}")
+    return {
+        "file": dest.name,
+        "size": dest.stat().st_size,
+        "sha256": _sha256(dest),
+        "page_count": page_count,
+        "restarts": state["restarts"],
+        "one_step": one_step,
+    }
+
+
+def _snapshot_databases(dest: Path) -> Tuple[Dict[str, dict], bool]:
+    db.session.remove()
+    sources = {name: _source(engine) for name, engine in _engines().items()}
+    try:
+        wal = all(
+            conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            for conn, _ in sources.values()
+        )
+        if wal:
+            # Pin both snapshots before copying either.
+            for conn, _ in sources.values():
+                conn.execute("BEGIN")
+                conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        databases = {
+            name: _copy_db(conn, dest / f"{name}.db")
+            for name, (conn, _) in sources.items()
+        }
+    finally:
+        for conn, closer in sources.values():
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+            closer.close()
+    return databases, wal
+
+
+# --- upload trees ------------------------------------------------------------
+
+
+def _copy_hashed(src: Path, dest: Path) -> str:
+    digest = hashlib.sha256()
+    with src.open("rb") as fin, dest.open("wb") as fout:
+        for chunk in iter(lambda: fin.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            fout.write(chunk)
+    shutil.copystat(src, dest)
+    return digest.hexdigest()
+
+
+def _try_link(src: Path, dest: Path) -> bool:
+    try:
+        os.link(src, dest)
+    except OSError:
+        return False
+    return True
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """Hard-link *dest* to *src*, or copy it where links are refused."""
+    if not _try_link(src, dest):
+        shutil.copy2(src, dest)
+
+
+def _backup_tree(
+    root: Path,
+    dest: Path,
+    previous: Optional[Tuple[Path, dict]],
+    copies: Dict[Tuple[int, int], Tuple[Path, str]],
+    stats: dict,
+) -> Dict[str, list]:
+    """Copy *root* into *dest*; returns ``{relpath: [size, mtime_ns, sha256]}``.
+
+    *copies* maps the (device, inode) of files already backed up to their
+    copy, across trees, so hard-linked files stay linked in the backup.
+    """
+    files: Dict[str, list] = {}
+    prev_dir, prev_files = previous or (None, {})
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(_SKIP_SUFFIXES):
+                continue
+            src = Path(dirpath) / filename
+            rel = src.relative_to(root).as_posix()
+            try:
+                st = src.stat()
+            except OSError:  # deleted while walking
+                continue
+            target = dest / rel
+            target.parent.mkdir(parents=True, exist_ok=True)
+            old = prev_files.get(rel)
+            key = (st.st_dev, st.st_ino)
+            try:
+                if key in copies:  # another name of an already copied file
+                    first, sha256 = copies[key]
+                    _link_or_copy(first, target)
+                    stats["linked"] += 1
+                elif (
+                    old
+                    and old[:2] == [st.st_size, st.st_mtime_ns]
+                    and _try_link(prev_dir / rel, target)
+                ):
+                    sha256 = old[2]
+                    stats["linked"] += 1
+                else:
+                    sha256 = _copy_hashed(src, target)
+                    stats["copied"] += 1
+                    stats["copied_bytes"] += st.st_size
+            except FileNotFoundError:  # deleted while copying
+                target.unlink(missing_ok=True)
+                continue
+            copies.setdefault(key, (target, sha256))
+            files[rel] = [st.st_size, st.st_mtime_ns, sha256]
+    return files
+
+
+# --- backup / verify / restore -----------------------------------------------
+
+
+def create_backup(now: Optional[datetime] = None) -> dict:
+    """Take a backup; returns its manifest (with ``name`` and ``stats``)."""
+    now = now or now_utc()
+    name = now.astimezone(timezone.utc).strftime(NAME_FORMAT)
+    root = backup_root()
+    if (root / name).exists():
+        raise BackupError(f"backup {name} already exists")
+    work = root / f".{name}.partial"
+    shutil.rmtree(work, ignore_errors=True)
+    work.mkdir()
+    started = time.perf_counter()
+    previous = list_backups()
+    prev_manifest = load_manifest(previous[-1]) if previous else None
+    try:
+        databases, consistent = _snapshot_databases(work)
+        stats = {"copied": 0, "linked": 0, "copied_bytes": 0}
+        copies: Dict[Tuple[int, int], Tuple[Path, str]] = {}
+        uploads = {}
+        for tree, tree_root in upload_trees().items():
+            prev = None
+            if prev_manifest and tree in prev_manifest["uploads"]:
+                prev = (
+                    root / previous[-1] / "uploads" / tree,
+                    prev_manifest["uploads"][tree],
+                )
+            uploads[tree] = _backup_tree(
+                tree_root, work / "uploads" / tree, prev, copies, stats
+            )
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        manifest = {
+            "name": name,
+            "created_at": now.isoformat(),
+            "consistent": consistent,
+            "based_on": previous[-1] if previous else None,
+            "databases": databases,
+            "uploads": uploads,
+            "stats": stats,
+        }
+        (work / MANIFEST).write_text(json.dumps(manifest), encoding="utf-8")
+        work.rename(root / name)
+    except BaseException:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+    current_app.logger.info(
+        "Backup %s: %d file(s) copied (%d bytes), %d linked in %.1f s",
+        name,
+        stats["copied"],
+        stats["copied_bytes"],
+        stats["linked"],
+        stats["seconds"],
+    )
+    return manifest
+
+
+def prune(keep: Optional[int] = None) -> List[str]:
+    """Delete all but the newest *keep* backups; returns the deleted names.
+
+    Hard links keep the files the remaining backups still share.
+    """
+    keep = _setting("BACKUP_KEEP") if keep is None else keep
+    names = list_backups()
+    doomed = names[: max(len(names) - keep, 0)]
+    for name in doomed:
+        shutil.rmtree(backup_root() / name)
+    return doomed
+
+
+def verify(name: str, *, deep: bool = False) -> List[str]:
+    """Problems found in backup *name* (empty when it is intact).
+
+    Checks the database checksums and ``quick_check`` and that every upload
+    copy exists with its size; *deep* also re-hashes the upload copies.
+    """
+    base = backup_root() / name
+    manifest = load_manifest(name)
+    problems = []
+    for bind, info in manifest["databases"].items():
+        path = base / info["file"]
+        if not path.is_file() or _sha256(path) != info["sha256"]:
+            problems.append(f"{bind}: snapshot missing or checksum mismatch")
+            continue
+        conn = sqlite3.connect(f"file:{path.as_posix()}?mode=ro", uri=True)
+        try:
+            check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            conn.close()
+        if check != "ok":
+            problems.append(f"{bind}: quick_check {check}")
+    for tree, files in manifest["uploads"].items():
+        for rel, (size, _mtime, sha256) in files.items():
+            path = base / "uploads" / tree / rel
+            try:
+                if path.stat().st_size != size or (deep and _sha256(path) != sha256):
+                    problems.append(f"{tree}/{rel}: checksum mismatch")
+            except OSError:
+                problems.append(f"{tree}/{rel}: missing")
+    return problems
+
+
+def _restore_tree(
+    src: Path,
+    files: Dict[str, list],
+    root: Path,
+    tag: str,
+    copies: Dict[Tuple[int, int], Path],
+) -> int:
+    """Replace *root* by the backup copy; the old tree is kept beside it."""
+    staging = root.with_name(f"{root.name}.restoring")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    for rel in files:
+        source = src / rel
+        target = staging / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        st = source.stat()
+        key = (st.st_dev, st.st_ino)
+        if key in copies:  # keep blob/folder hard links
+            _link_or_copy(copies[key], target)
+        else:
+            shutil.copy2(source, target)
+            copies[key] = target
+    if root.exists():
+        root.rename(root.with_name(f"{root.name}.pre-restore-{tag}"))
+    staging.rename(root)
+    return len(files)
+
+
+def restore(name: str) -> dict:
+    """Write backup *name* back over the live databases and upload trees.
+
+    The backup is verified (deep) first and nothing is touched if it is
+    damaged.  Meant for a stopped application: databases are overwritten in
+    place through the backup API, the replaced upload trees are kept as
+    ``<tree>.pre-restore-<name>``.
+    """
+    problems = verify(name, deep=True)
+    if problems:
+        raise BackupError(f"backup {name} is damaged: {'; '.join(problems[:5])}")
+    base = backup_root() / name
+    manifest = load_manifest(name)
+    engines = _engines()
+    missing = set(manifest["databases"]) - set(engines)
+    if missing:
+        raise BackupError(f"no bind for snapshot(s): {', '.join(sorted(missing))}")
+    db.session.remove()
+    restored = {"databases": [], "files": 0}
+    tag = now_utc().astimezone(timezone.utc).strftime(NAME_FORMAT)
+    for bind, info in manifest["databases"].items():
+        path = (base / info["file"]).as_posix()
+        snapshot = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        raw = engines[bind].raw_connection()
+        try:
+            snapshot.backup(raw.driver_connection)
+            check = raw.driver_connection.execute("PRAGMA quick_check").fetchone()
+            check = check[0]
+        finally:
+            raw.close()
+            snapshot.close()
+        if check != "ok":
+            raise BackupError(f"{bind}: restored database failed quick_check: {check}")
+        restored["databases"].append(bind)
+    trees = upload_trees()
+    copies: Dict[Tuple[int, int], Path] = {}
+    for tree, files in manifest["uploads"].items():
+        if tree in trees:
+            restored["files"] += _restore_tree(
+                base / "uploads" / tree, files, trees[tree], tag, copies
+            )
+    current_app.logger.info(
+        "Restored backup %s: %s, %d file(s)",
+        name,
+        ", ".join(restored["databases"]),
+        restored["files"],
+    )
+    return restored
+
+
+@job("backup", schedule="0 2 * * *", timeout=6 * 3600, group="maintenance")
+def _backup_job() -> dict:
+    """Nightly online backup of both databases and the upload trees."""
+    manifest = create_backup()
+    return {
+        "name": manifest["name"],
+        "consistent": manifest["consistent"],
+        "pruned": prune(),
+        **manifest["stats"],
+    }
@@ -0,0 +1,470 @@
+"""Content-addressed storage for uploaded files."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional
+
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.investigations.models import InvestigationAttachment
+from app.models import UploadBlob, UploadedFile
+from app.utils.time_utils import now_utc
+
+CHUNK_SIZE = 1024 * 1024
+
+_DELTAS_KEY = "blob_refcount_deltas"
+
+
+@dataclass(frozen=True)
+class StoredBlob:
+    sha256: str
+    size: int
+    path: Path
+
+
+def blob_root() -> Path:
+    """Return the blob directory (``BLOB_STORE_ROOT``, else next to uploads).
+
+    Living beside the upload roots keeps blobs on the same filesystem, so the
+    folder entries can be hard links.
+    """
+    configured = current_app.config.get("BLOB_STORE_ROOT")
+    if configured:
+        root = Path(configured)
+    else:
+        root = Path(current_app.config["UPLOAD_CASES_ROOT"]).parent / "blobs"
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def blob_path(sha256: str, root: Optional[Path] = None) -> Path:
+    root = root or blob_root()
+    return root / sha256[:2] / sha256[2:4] / sha256
+
+
+def _iter_chunks(stream: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def hash_file(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in _iter_chunks(fh, chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _register(sha256: str, size: int) -> None:
+    db.session.execute(
+        sa.insert(UploadBlob.__table__)
+        .prefix_with("OR IGNORE")
+        .values(sha256=sha256, size_bytes=size, refcount=0, created_at=now_utc()),
+        bind_arguments={"mapper": sa.inspect(UploadBlob)},
+    )
+
+
+def _publish(tmp: Path, sha256: str, size: int) -> StoredBlob:
+    dest = blob_path(sha256)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists():
+        tmp.unlink()  # dedupe: same content already stored
+    else:
+        os.replace(tmp, dest)
+    _register(sha256, size)
+    return StoredBlob(sha256, size, dest)
+
+
+def _tmp_dir() -> Path:
+    path = blob_root() / "tmp"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class BlobSpool:
+    """Temporary file under the blob root that hashes whatever is written.
+
+    Installed as the multipart ``stream_factory`` target (see
+    ``app.utils.upload_limits``): the parser writes the file part here once
+    and :func:`store_stream` publishes it with a rename.  Unpublished spools
+    are deleted on close.
+    """
+
+    def __init__(self) -> None:
+        fd, name = tempfile.mkstemp(dir=_tmp_dir(), suffix=".part")
+        self.path = Path(name)
+        self._file = os.fdopen(fd, "w+b")
+        self._digest = hashlib.sha256()
+        self.size = 0
+        # False once anything but a sequential append happened; the running
+        # digest is then useless and store_stream falls back to copying.
+        self._sequential = True
+        self._published = False
+
+    def write(self, data) -> int:
+        if self._file.tell() != self.size:
+            self._sequential = False
+        written = self._file.write(data)
+        if self._sequential:
+            self._digest.update(data)
+            self.size += written
+        return written
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self._file.readline(size)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def publish(self) -> Optional[StoredBlob]:
+        """Move the spooled data into the store, or ``None`` if not possible."""
+        if not self._sequential or self._file.closed:
+            return None
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        blob = _publish(self.path, self._digest.hexdigest(), self.size)
+        self._published = True
+        return blob
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        if not self._published:
+            self.path.unlink(missing_ok=True)
+
+    def __del__(self) -> None:
+        # Parts abandoned mid-parse (e.g. a 413) never reach request.files.
+        try:
+            self.close()
+        except Exception:  # noqa: BLE001
+            pass
+
+
+def store_stream(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> StoredBlob:
+    """Stream *stream* into the blob store, hashing on the way.
+
+    A :class:`BlobSpool` is published whole by rename, without re-reading.
+    """
+    if isinstance(stream, BlobSpool):
+        blob = stream.publish()
+        if blob is not None:
+            return blob
+        stream.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(dir=_tmp_dir(), suffix=".part")
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in _iter_chunks(stream, chunk_size):
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        return _publish(tmp, digest.hexdigest(), size)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def store_file(
+    path: Path, sha256: Optional[str] = None, size: Optional[int] = None
+) -> StoredBlob:
+    """Move a complete file (e.g. an assembled chunked upload) into the store.
+
+    *path* must live under the blob root so the move is a rename.
+    """
+    sha256 = sha256 or hash_file(path)
+    size = path.stat().st_size if size is None else size
+    return _publish(path, sha256, size)
+
+
+def _same_content(path: Path, blob: StoredBlob) -> bool:
+    try:
+        if os.path.samefile(path, blob.path):
+            return True
+        if path.stat().st_size != blob.size:
+            return False
+    except OSError:
+        return False
+    return hash_file(path) == blob.sha256
+
+
+def _free_name(directory: Path, filename: str, blob: StoredBlob) -> Path:
+    """Return *filename* in *directory*, or ``stem_N.ext`` if taken by other data."""
+    candidate = directory / filename
+    stem, dot, ext = filename.rpartition(".")
+    if not dot:
+        stem, ext = filename, ""
+    n = 2
+    while candidate.exists() and not _same_content(candidate, blob):
+        candidate = directory / (f"{stem}_{n}{dot}{ext}")
+        n += 1
+    return candidate
+
+
+def _link(src: Path, dest: Path) -> None:
+    tmp = dest.with_name(f".{dest.name}.link")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+def link_into(blob: StoredBlob, directory: Path, filename: str) -> Path:
+    """Expose *blob* as ``directory/filename`` and return the path used."""
+    directory.mkdir(parents=True, exist_ok=True)
+    dest = _free_name(directory, filename, blob)
+    try:
+        if os.path.samefile(dest, blob.path):
+            return dest
+    except OSError:
+        pass
+    _link(blob.path, dest)
+    return dest
+
+
+def adopt_file(path: Path) -> StoredBlob:
+    """Move an existing folder file under the blob store (used by backfills).
+
+    If the content is already stored, *path* is relinked to the existing blob
+    so the duplicate copy is freed.
+    """
+    sha256 = hash_file(path)
+    size = path.stat().st_size
+    dest = blob_path(sha256)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if not dest.exists():
+        try:
+            os.link(path, dest)
+        except OSError:
+            shutil.copyfile(path, dest)
+    elif not os.path.samefile(path, dest):
+        _link(dest, path)
+    _register(sha256, size)
+    return StoredBlob(sha256, size, dest)
+
+
+def verify(sha256: str) -> bool:
+    """Re-hash a blob and compare it with its address."""
+    path = blob_path(sha256)
+    return path.exists() and hash_file(path) == sha256
+
+
+def recount() -> int:
+    """Recompute every ``upload_blob.refcount`` from the attachment tables.
+
+    Archived attachment rows (``app.services.archive``) count as well.
+    """
+    from app.services.archive import archive_reads
+
+    session = db.session
+    counts: Dict[str, int] = {}
+    with archive_reads():
+        for model in (UploadedFile, InvestigationAttachment):
+            rows = session.execute(
+                select(model.sha256, func.count())
+                .where(model.sha256.isnot(None))
+                .group_by(model.sha256),
+                bind_arguments={"mapper": sa.inspect(model)},
+            )
+            for sha256, count in rows:
+                counts[sha256] = counts.get(sha256, 0) + count
+    table = UploadBlob.__table__
+    bind_args = {"mapper": sa.inspect(UploadBlob)}
+    session.execute(sa.update(table).values(refcount=0), bind_arguments=bind_args)
+    if counts:
+        session.execute(
+            sa.update(table)
+            .where(table.c.sha256 == sa.bindparam("b_sha256"))
+            .values(refcount=sa.bindparam("b_refcount")),
+            [{"b_sha256": k, "b_refcount": v} for k, v in counts.items()],
+            bind_arguments=bind_args,
+        )
+    return len(counts)
+
+
+def _attachment_rows(model, parent, parent_fk):
+    return db.session.execute(
+        select(model.id, model.filename, parent.case_number)
+        .join(parent, parent.id == parent_fk)
+        .where(model.sha256.is_(None))
+        .order_by(model.id),
+        bind_arguments={"mapper": sa.inspect(model)},
+    ).all()
+
+
+def backfill() -> Dict[str, int]:
+    """Adopt files recorded before the blob store existed; the caller commits.
+
+    Hashes each legacy ``UploadedFile``/``InvestigationAttachment`` file, moves
+    it under the store (deduplicating identical copies) and records its hash
+    and size, then rebuilds the reference counts.
+    """
+    from app.investigations.models import Investigation
+    from app.models import Case
+    from app.paths import case_root, file_safe_case_number, investigation_root
+
+    sources = (
+        (UploadedFile, Case, UploadedFile.case_id, case_root()),
+        (
+            InvestigationAttachment,
+            Investigation,
+            InvestigationAttachment.investigation_id,
+            investigation_root(),
+        ),
+    )
+    stats = {"adopted": 0, "missing": 0}
+    for model, parent, parent_fk, root in sources:
+        updates = []
+        for row in _attachment_rows(model, parent, parent_fk):
+            path = root / file_safe_case_number(row.case_number) / row.filename
+            if not path.is_file():
+                stats["missing"] += 1
+                continue
+            blob = adopt_file(path)
+            updates.append(
+                {"b_id": row.id, "b_sha256": blob.sha256, "b_size": blob.size}
+            )
+        if updates:
+            table = model.__table__
+            db.session.execute(
+                sa.update(table)
+                .where(table.c.id == sa.bindparam("b_id"))
+                .values(
+                    sha256=sa.bindparam("b_sha256"),
+                    size_bytes=sa.bindparam("b_size"),
+                ),
+                updates,
+                bind_arguments={"mapper": sa.inspect(model)},
+            )
+            stats["adopted"] += len(updates)
+    recount()
+    return stats
+
+
+def collect_garbage(grace: timedelta = timedelta(hours=1)) -> int:
+    """Delete unreferenced blobs older than *grace*; the caller commits.
+
+    The grace period covers blobs stored by requests that have not committed
+    their attachment row yet.  Folder links keep their data regardless.
+    Temporary files left behind by crashed uploads are removed as well.
+    """
+    session = db.session
+    table = UploadBlob.__table__
+    bind_args = {"mapper": sa.inspect(UploadBlob)}
+    cutoff = now_utc() - grace
+    victims = [
+        sha256
+        for (sha256,) in session.execute(
+            select(table.c.sha256).where(
+                table.c.refcount <= 0, table.c.created_at < cutoff
+            ),
+            bind_arguments=bind_args,
+        )
+    ]
+    root = blob_root()
+    for sha256 in victims:
+        blob_path(sha256, root).unlink(missing_ok=True)
+    cutoff_ts = cutoff.timestamp()
+    for tmp in _tmp_dir().glob("*.part"):
+        try:
+            if tmp.stat().st_mtime < cutoff_ts:
+                tmp.unlink()
+        except OSError:
+            pass
+    if victims:
+        session.execute(
+            sa.delete(table).where(table.c.sha256.in_(victims)),
+            bind_arguments=bind_args,
+        )
+    return len(victims)
+
+
+def _queue_delta(target, delta: int) -> None:
+    sha256 = getattr(target, "sha256", None)
+    session = object_session(target)
+    if not sha256 or session is None:
+        return
+    deltas = session.info.setdefault(_DELTAS_KEY, {})
+    deltas[sha256] = deltas.get(sha256, 0) + delta
+
+
+def _attachment_inserted(mapper, connection, target):  # noqa: ARG001
+    _queue_delta(target, 1)
+
+
+def _attachment_deleted(mapper, connection, target):  # noqa: ARG001
+    _queue_delta(target, -1)
+
+
+for _model in (UploadedFile, InvestigationAttachment):
+    event.listen(_model, "after_insert", _attachment_inserted)
+    event.listen(_model, "after_delete", _attachment_deleted)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _apply_refcount_deltas(session, flush_context):  # noqa: ARG001
+    deltas = session.info.pop(_DELTAS_KEY, None)
+    if not deltas:
+        return
+    table = UploadBlob.__table__
+    payload = [{"b_sha256": k, "b_delta": v} for k, v in deltas.items() if v]
+    if not payload:
+        return
+    session.execute(
+        sa.update(table)
+        .where(table.c.sha256 == sa.bindparam("b_sha256"))
+        .values(refcount=table.c.refcount + sa.bindparam("b_delta")),
+        payload,
+        bind_arguments={"mapper": sa.inspect(UploadBlob)},
+    )
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_on_rollback(session, previous_transaction):  # noqa: ARG001
+    # A failed flush never reaches after_flush_postexec.
+    session.info.pop(_DELTAS_KEY, None)
@@ -4,8 +4,6 @@ from __future__ import annotations
 
 from typing import Optional
 
-from sqlalchemy import or_
-
 from app import db
 from app.models import Case, User
 
@@ -17,15 +15,6 @@ def _normalized(value: Optional[str]) -> Optional[str]:
     return trimmed or None
 
 
-def _resolve_user_by_identifier(identifier: Optional[str]) -> Optional[User]:
-    ident = _normalized(identifier)
-    if not ident:
-        return None
-    return User.query.filter(
-        or_(User.screen_name == ident, User.username == ident)
-    ).first()
-
-
 def _user_display_label(user: Optional[User]) -> Optional[str]:
     if not user:
         return None
@@ -49,14 +38,9 @@ def resolve_effective_describer(case: Case) -> Optional[str]:
     if explicit:
         return explicit
 
-    for expert_identifier in (case.expert_1, case.expert_2):
-        expert_user = _resolve_user_by_identifier(expert_identifier)
-        if not expert_user:
-            continue
-        fallback_user = _resolve_default_leiro(expert_user)
-        label = _user_display_label(fallback_user)
-        if label:
-            return label
+    # Fallback (expert's default leíró) is materialized by describer_sync.
+    if case.effective_describer_id:
+        return _user_display_label(db.session.get(User, case.effective_describer_id))
 
     return None
 
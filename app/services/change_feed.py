@@ -0,0 +1,101 @@
+"""Change-data-capture feed over the ``change_outbox`` tables."""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import Callable, List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy import func, select
+
+from app import db
+from app.investigations.models import InvestigationChangeOutbox
+from app.models import ChangeOutbox
+
+STREAMS = {"case": ChangeOutbox, "investigation": InvestigationChangeOutbox}
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+MAX_WAIT = 30.0
+# The HTTP feed runs in a sync request worker; keep its long-poll short.
+HTTP_MAX_WAIT = 5.0
+POLL_INTERVAL = 0.25
+
+
+def _model(stream: str):
+    try:
+        return STREAMS[stream]
+    except KeyError:
+        raise ValueError(f"unknown stream: {stream!r}") from None
+
+
+def _engine(model):
+    return db.session.get_bind(mapper=sa.inspect(model))
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_LIMIT
+    return min(limit, MAX_LIMIT)
+
+
+def serialize(stream: str, row) -> dict:
+    at = row.at
+    return {
+        "seq": row.id,
+        "stream": stream,
+        "subject": {"type": row.subject_type, "id": row.subject_id},
+        "op": row.op,
+        "at": at.isoformat() if at is not None else None,
+        "actor": row.actor,
+        "changes": json.loads(row.changes) if row.changes else [],
+    }
+
+
+def fetch(stream: str, after: int = 0, limit: Optional[int] = None) -> List[dict]:
+    """Return up to *limit* events with ``seq > after``, oldest first.
+
+    Reads on a fresh connection so polling loops see newly committed events
+    regardless of the state of the request session.
+    """
+    model = _model(stream)
+    table = model.__table__
+    stmt = (
+        select(table)
+        .where(table.c.id > after)
+        .order_by(table.c.id)
+        .limit(clamp_limit(limit))
+    )
+    with _engine(model).connect() as conn:
+        return [serialize(stream, row) for row in conn.execute(stmt)]
+
+
+def head(stream: str) -> int:
+    """Return the latest sequence number of *stream* (0 when empty)."""
+    model = _model(stream)
+    with _engine(model).connect() as conn:
+        return conn.execute(select(func.max(model.__table__.c.id))).scalar() or 0
+
+
+def wait_for(
+    stream: str,
+    after: int = 0,
+    limit: Optional[int] = None,
+    timeout: float = 0.0,
+    *,
+    poll_interval: float = POLL_INTERVAL,
+    sleep: Callable[[float], None] = time.sleep,
+) -> List[dict]:
+    """Long-poll variant of :func:`fetch`.
+
+    Returns as soon as at least one event is available, or an empty list once
+    *timeout* seconds (capped at ``MAX_WAIT``) have passed.
+    """
+    deadline = time.monotonic() + max(0.0, min(timeout, MAX_WAIT))
+    while True:
+        events = fetch(stream, after, limit)
+        remaining = deadline - time.monotonic()
+        if events or remaining <= 0:
+            return events
+        sleep(min(poll_interval, remaining))
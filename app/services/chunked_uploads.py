@@ -0,0 +1,257 @@
+"""Resumable chunked uploads for case and investigation documents."""
+
+from __future__ import annotations
+
+import os
+import re
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy import select
+from werkzeug import exceptions
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.investigations.models import InvestigationAttachment
+from app.models import ChunkedUpload, UploadedFile
+from app.paths import ensure_investigation_folder, file_safe_case_number
+from app.services import blob_store
+from app.services.work_items import SUBJECT_CASE, SUBJECT_INVESTIGATION
+from app.utils.time_utils import now_utc
+from app.utils.upload_limits import route_limit
+from app.utils.uploads import allowed_file, resolve_safe
+
+DOMAINS = {SUBJECT_CASE: "cases", SUBJECT_INVESTIGATION: "investigations"}
+
+STATUS_OPEN = "open"
+STATUS_DONE = "done"
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024
+COPY_BLOCK = 64 * 1024
+CHUNK_ENDPOINT = "main.chunked_upload_put"
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class OffsetMismatch(exceptions.Conflict):
+    """A chunk was sent for an offset other than the next expected one."""
+
+    def __init__(self, expected: int):
+        super().__init__(f"expected offset {expected}")
+        self.expected = expected
+
+
+def chunk_size() -> int:
+    """Configured chunk size, kept below the chunk PUT route's body limit."""
+    size = int(current_app.config.get("CHUNKED_UPLOAD_CHUNK_SIZE") or 0)
+    size = size or DEFAULT_CHUNK_SIZE
+    limit = route_limit(current_app.config, CHUNK_ENDPOINT)
+    if limit:
+        size = min(size, int(limit))
+    return size
+
+
+def max_size() -> int:
+    return int(current_app.config.get("CHUNKED_UPLOAD_MAX_SIZE") or DEFAULT_MAX_SIZE)
+
+
+def _partial_dir() -> Path:
+    path = blob_store.blob_root() / "partial"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def partial_path(upload: ChunkedUpload) -> Path:
+    return _partial_dir() / f"{upload.id}.part"
+
+
+def start(
+    *,
+    user_id: int,
+    subject_type: str,
+    subject_id: int,
+    filename: str,
+    category: str,
+    size,
+    sha256: str,
+) -> ChunkedUpload:
+    """Open an upload session; the caller has checked permissions and commits."""
+    domain = DOMAINS.get(subject_type)
+    if domain is None:
+        raise ValueError(f"unknown subject_type: {subject_type!r}")
+    filename = secure_filename(filename or "")
+    if not filename or not allowed_file(filename, domain):
+        raise exceptions.BadRequest("forbidden file type")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise exceptions.BadRequest("invalid size") from None
+    if size <= 0:
+        raise exceptions.BadRequest("invalid size")
+    if size > max_size():
+        raise exceptions.RequestEntityTooLarge()
+    sha256 = (sha256 or "").strip().lower()
+    if not _SHA256_RE.match(sha256):
+        raise exceptions.BadRequest("invalid sha256")
+
+    now = now_utc()
+    upload = ChunkedUpload(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        subject_type=subject_type,
+        subject_id=subject_id,
+        filename=filename,
+        category=category,
+        total_size=size,
+        chunk_size=chunk_size(),
+        sha256=sha256,
+        received_bytes=0,
+        status=STATUS_OPEN,
+        created_at=now,
+        updated_at=now,
+    )
+    partial_path(upload).touch()
+    db.session.add(upload)
+    return upload
+
+
+def append(upload: ChunkedUpload, offset: int, stream: BinaryIO, length) -> int:
+    """Write one chunk at *offset*; returns the new confirmed offset.
+
+    Every chunk but the last must be exactly ``chunk_size`` bytes.  A short
+    body (client disconnect) is discarded so the confirmed offset stays valid.
+    """
+    if upload.status != STATUS_OPEN:
+        raise exceptions.Conflict("upload already finalized")
+    if offset != upload.received_bytes:
+        raise OffsetMismatch(upload.received_bytes)
+    expected = min(upload.chunk_size, upload.total_size - offset)
+    if length != expected:
+        raise exceptions.BadRequest(f"chunk must be {expected} bytes")
+
+    written = 0
+    with open(partial_path(upload), "r+b") as fh:
+        fh.seek(offset)
+        fh.truncate()
+        while written < length:
+            block = stream.read(min(COPY_BLOCK, length - written))
+            if not block:
+                break
+            fh.write(block)
+            written += len(block)
+        if written != length:
+            fh.truncate(offset)
+            raise exceptions.BadRequest("incomplete chunk")
+        fh.flush()
+        os.fsync(fh.fileno())
+
+    upload.received_bytes = offset + written
+    upload.updated_at = now_utc()
+    return upload.received_bytes
+
+
+def finalize(upload: ChunkedUpload) -> blob_store.StoredBlob:
+    """Verify the assembled file and move it into the blob store.
+
+    On a checksum mismatch the received data is dropped and the session
+    restarts from offset 0.
+    """
+    if upload.status != STATUS_OPEN:
+        raise exceptions.Conflict("upload already finalized")
+    if upload.received_bytes != upload.total_size:
+        raise OffsetMismatch(upload.received_bytes)
+    path = partial_path(upload)
+    if blob_store.hash_file(path) != upload.sha256:
+        with open(path, "r+b") as fh:
+            fh.truncate(0)
+        upload.received_bytes = 0
+        upload.updated_at = now_utc()
+        raise exceptions.UnprocessableEntity("checksum mismatch")
+    blob = blob_store.store_file(path, upload.sha256, upload.total_size)
+    upload.status = STATUS_DONE
+    upload.updated_at = now_utc()
+    return blob
+
+
+def attach(upload: ChunkedUpload, blob: blob_store.StoredBlob, subject, uploader):
+    """Link a finalized blob into *subject*'s folder and record it.
+
+    Returns the new ``UploadedFile``/``InvestigationAttachment``.
+    """
+    if upload.subject_type == SUBJECT_CASE:
+        root = Path(current_app.config["UPLOAD_CASES_ROOT"])
+        folder = resolve_safe(root, file_safe_case_number(subject.case_number))
+        dest = blob_store.link_into(blob, folder, upload.filename)
+        record = UploadedFile(
+            case_id=subject.id,
+            filename=dest.name,
+            uploader=uploader,
+            upload_time=now_utc(),
+            category=upload.category,
+            sha256=blob.sha256,
+            size_bytes=blob.size,
+        )
+        subject.uploaded_files = ",".join(
+            filter(None, (subject.uploaded_files or "").split(",") + [dest.name])
+        )
+    else:
+        folder = Path(ensure_investigation_folder(subject.case_number))
+        dest = blob_store.link_into(blob, folder, upload.filename)
+        record = InvestigationAttachment(
+            investigation_id=subject.id,
+            filename=dest.name,
+            category=upload.category,
+            uploaded_by=uploader,
+            uploaded_at=now_utc(),
+            sha256=blob.sha256,
+            size_bytes=blob.size,
+        )
+    db.session.add(record)
+    return record
+
+
+def discard(upload: ChunkedUpload) -> None:
+    partial_path(upload).unlink(missing_ok=True)
+    db.session.delete(upload)
+
+
+def collect_stale(max_age: timedelta = timedelta(hours=24)) -> int:
+    """Drop uploads idle for *max_age* and orphaned partial files; caller commits."""
+    cutoff = now_utc() - max_age
+    stale = (
+        db.session.execute(
+            select(ChunkedUpload).where(ChunkedUpload.updated_at < cutoff)
+        )
+        .scalars()
+        .all()
+    )
+    for upload in stale:
+        discard(upload)
+
+    known = {
+        upload_id
+        for (upload_id,) in db.session.execute(
+            select(ChunkedUpload.id),
+            bind_arguments={"mapper": sa.inspect(ChunkedUpload)},
+        )
+    }
+    orphans = 0
+    cutoff_ts = cutoff.timestamp()
+    for path in _partial_dir().glob("*.part"):
+        if path.stem not in known and path.stat().st_mtime < cutoff_ts:
+            path.unlink(missing_ok=True)
+            orphans += 1
+    return len(stale) + orphans
+
+
+def get_owned(upload_id: str, user_id: Optional[int]) -> ChunkedUpload:
+    """Load an upload session owned by *user_id*, else 404."""
+    upload = db.session.get(ChunkedUpload, upload_id)
+    if upload is None or upload.user_id != user_id:
+        raise exceptions.NotFound()
+    return upload
@@ -0,0 +1,438 @@
+"""Compressed cold storage for the upload folders of long-closed subjects."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db, paths
+from app.investigations.models import Investigation
+from app.models import Case, UploadBlob
+from app.services import archive, blob_store, template_store
+from app.services.scheduler import job
+from app.utils.time_utils import now_utc
+
+log = logging.getLogger(__name__)
+
+DEFAULTS = {"COLD_STORAGE_AFTER_MONTHS": 12, "COLD_STORAGE_CACHE_MAX_MB": 512}
+SUFFIX = ".zip"
+INDEX_MEMBER = ".cold-index.json"
+KEEP = ".keep"
+SAMPLE_BYTES = 64 * 1024
+# Deflate a file only if its first SAMPLE_BYTES shrink below this ratio:
+# scans, Office files and most PDFs are compressed already.
+DEFLATE_BELOW = 0.9
+_SUBJECTS = {
+    "main": (Case, template_store.CASE_SET),
+    "examination": (Investigation, template_store.INVESTIGATION_SET),
+}
+
+
+class ColdStorageError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class ColdFile:
+    archive: Path
+    member: str
+    size: int
+    sha256: str
+    mtime: float
+    kind: str
+    source: Optional[str] = None
+
+
+def _setting(name: str) -> int:
+    value = current_app.config.get(name)
+    return DEFAULTS[name] if value is None else value
+
+
+def cache_dir() -> Path:
+    configured = current_app.config.get("COLD_STORAGE_CACHE_DIR")
+    if configured:
+        return Path(configured)
+    return Path(current_app.instance_path) / "cold_cache"
+
+
+def _cache_limit() -> int:
+    return _setting("COLD_STORAGE_CACHE_MAX_MB") * 1024 * 1024
+
+
+def upload_root(bind: str) -> Path:
+    return paths.case_root() if bind == "main" else paths.investigation_root()
+
+
+def zip_path(folder: Path) -> Path:
+    return folder.with_name(folder.name + SUFFIX)
+
+
+def _fsync(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# --- reading -----------------------------------------------------------------
+
+
+@lru_cache(maxsize=256)
+def _index(path: str, _mtime_ns: int, _size: int) -> Dict[str, dict]:
+    with zipfile.ZipFile(path) as zf:
+        return json.loads(zf.read(INDEX_MEMBER))["files"]
+
+
+def read_index(archive_path: Path) -> Dict[str, dict]:
+    """The index of *archive_path*, cached until the zip is replaced."""
+    st = archive_path.stat()
+    return _index(str(archive_path), st.st_mtime_ns, st.st_size)
+
+
+def find(root: Path, path: Path) -> Optional[ColdFile]:
+    """The packed entry for the missing *path* under *root*, if any.
+
+    Looks for ``<dir>.zip`` beside each directory from *path*'s parent up to
+    *root*.
+    """
+    root = root.resolve()
+    folder = path.parent
+    while folder == root or root in folder.parents:
+        packed = zip_path(folder)
+        if packed.is_file():
+            member = path.relative_to(folder).as_posix()
+            entry = read_index(packed).get(member)
+            if entry is None:
+                return None
+            return ColdFile(
+                archive=packed,
+                member=member,
+                size=entry["size"],
+                sha256=entry["sha256"],
+                mtime=entry["mtime"],
+                kind=entry["kind"],
+                source=entry.get("source"),
+            )
+        folder = folder.parent
+    return None
+
+
+def open_member(cold: ColdFile) -> IO[bytes]:
+    """A binary stream of *cold*'s member; closing it releases the zip."""
+    zf = zipfile.ZipFile(cold.archive)
+    try:
+        return zf.open(cold.member)
+    finally:
+        zf.close()  # the member keeps the file open until it is closed
+
+
+def _evict(root: Path, limit: int, keep: Path) -> None:
+    """Drop the least recently served copies until the cache fits *limit*."""
+    entries = []
+    for path in root.glob("*/*"):
+        if path.suffix == ".part":
+            continue
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _mtime, size, _path in entries)
+    for _mtime, size, path in sorted(entries):
+        if total <= limit:
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def _extracted(cold: ColdFile) -> Optional[Path]:
+    limit = _cache_limit()
+    if cold.size > limit // 4:  # one file must not flush the whole cache
+        return None
+    root = cache_dir()
+    path = root / cold.sha256[:2] / cold.sha256
+    try:
+        os.utime(path)  # a hit moves it to the young end of the LRU
+        return path
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out, open_member(cold) as src:
+            shutil.copyfileobj(src, out, blob_store.CHUNK_SIZE)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    _evict(root, limit, keep=path)
+    return path
+
+
+def local_copy(cold: ColdFile) -> Optional[Path]:
+    """A file with *cold*'s bytes, or ``None`` if it should be streamed.
+
+    Blob and template entries are their source file; zip members are
+    extracted into the cache unless larger than a quarter of it.
+    """
+    if cold.kind == "zip":
+        return _extracted(cold)
+    if cold.kind == "blob":
+        path = blob_store.blob_path(cold.sha256)
+    else:
+        path = template_store.store_root() / cold.source
+    try:
+        if path.stat().st_size == cold.size:
+            return path
+    except FileNotFoundError:
+        pass
+    log.warning("cold storage: source of %s:%s is gone", cold.archive, cold.member)
+    raise FileNotFoundError(str(path))
+
+
+# --- packing -----------------------------------------------------------------
+
+
+def _files(folder: Path) -> List[Path]:
+    return sorted(p for p in folder.rglob("*") if p.is_file() and not p.is_symlink())
+
+
+def _template_inodes(template_dir: Optional[Path]) -> Dict[Tuple[int, int], str]:
+    if template_dir is None or not template_dir.is_dir():
+        return {}
+    store = template_store.store_root()
+    inodes = {}
+    for path in _files(template_dir):
+        st = path.stat()
+        inodes[(st.st_dev, st.st_ino)] = path.relative_to(store).as_posix()
+    return inodes
+
+
+def _is_blob(sha256: str, st: os.stat_result) -> bool:
+    """Whether *st* is the referenced blob *sha256* (so the link can go)."""
+    try:
+        blob = blob_store.blob_path(sha256).stat()
+    except FileNotFoundError:
+        return False
+    if (blob.st_dev, blob.st_ino) != (st.st_dev, st.st_ino):
+        return False
+    row = db.session.get(UploadBlob, sha256)
+    return row is not None and row.refcount > 0
+
+
+def _compression(path: Path) -> int:
+    with path.open("rb") as fh:
+        sample = fh.read(SAMPLE_BYTES)
+    if sample and len(zlib.compress(sample, 1)) < len(sample) * DEFLATE_BELOW:
+        return zipfile.ZIP_DEFLATED
+    return zipfile.ZIP_STORED
+
+
+def _copy_member(old: zipfile.ZipFile, out: zipfile.ZipFile, rel: str) -> None:
+    info = old.getinfo(rel)
+    copy = zipfile.ZipInfo(rel, date_time=info.date_time)
+    copy.compress_type = info.compress_type
+    copy.file_size = info.file_size
+    with old.open(info) as src, out.open(copy, "w") as dst:
+        shutil.copyfileobj(src, dst, blob_store.CHUNK_SIZE)
+
+
+def _remove_packed(folder: Path, packed: Dict[Path, os.stat_result]) -> None:
+    """Remove the packed files still as packed, then empty directories."""
+    for path, before in packed.items():
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        if (st.st_ino, st.st_size, st.st_mtime_ns) == (
+            before.st_ino,
+            before.st_size,
+            before.st_mtime_ns,
+        ):
+            path.unlink()
+    for directory in sorted(folder.rglob("*"), reverse=True) + [folder]:
+        if directory.is_dir() and not any(directory.iterdir()):
+            directory.rmdir()
+
+
+def pack(folder: Path, template_dir: Optional[Path] = None) -> dict:
+    """Pack *folder* into ``<folder>.zip`` (merging an existing one).
+
+    Returns the packed file count, their bytes, the bytes freed by removing
+    them (files with no other link), the growth of the zip and the
+    difference of the last two (``reclaimed``).
+    """
+    target = zip_path(folder)
+    previous = read_index(target) if target.exists() else {}
+    old_size = target.stat().st_size if target.exists() else 0
+    templates = _template_inodes(template_dir)
+    stats = {"files": 0, "bytes": 0, "freed": 0}
+    index: Dict[str, dict] = {}
+    packed: Dict[Path, os.stat_result] = {}
+    tmp = target.with_name(target.name + ".part")
+    with zipfile.ZipFile(tmp, "w") as out:
+        for path in _files(folder):
+            rel = path.relative_to(folder).as_posix()
+            st = path.stat()
+            entry = {
+                "size": st.st_size,
+                "mtime": st.st_mtime,
+                "sha256": blob_store.hash_file(path),
+                "kind": "zip",
+            }
+            inode = (st.st_dev, st.st_ino)
+            if st.st_nlink > 1 and inode in templates:
+                entry.update(kind="template", source=templates[inode])
+            elif st.st_nlink > 1 and _is_blob(entry["sha256"], st):
+                entry["kind"] = "blob"
+            else:
+                out.write(path, rel, compress_type=_compression(path))
+                if st.st_nlink == 1:
+                    stats["freed"] += st.st_size
+            index[rel] = entry
+            packed[path] = st
+            stats["files"] += 1
+            stats["bytes"] += st.st_size
+        if previous:
+            with zipfile.ZipFile(target) as old:
+                for rel, entry in previous.items():
+                    if rel in index:
+                        continue  # the folder's newer copy wins
+                    if entry["kind"] == "zip":
+                        _copy_member(old, out, rel)
+                    index[rel] = entry
+        out.writestr(
+            INDEX_MEMBER,
+            json.dumps({"version": 1, "files": index}, sort_keys=True),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+    _fsync(tmp)
+    with zipfile.ZipFile(tmp) as check:
+        bad = check.testzip()
+    if bad is not None:
+        tmp.unlink()
+        raise ColdStorageError(f"{target}: member {bad} failed its CRC check")
+    os.replace(tmp, target)
+    _fsync(target.parent)
+    _remove_packed(folder, packed)
+    stats["zip_bytes"] = target.stat().st_size - old_size
+    stats["reclaimed"] = stats["freed"] - stats["zip_bytes"]
+    return stats
+
+
+def _worth_packing(folder: Path) -> bool:
+    """Whether *folder* has files beyond the ``.keep`` markers of a repack."""
+    if not folder.is_dir():
+        return False
+    files = _files(folder)
+    if not zip_path(folder).exists():
+        return bool(files)
+    return any(p.name != KEEP for p in files)
+
+
+def due(cutoff: datetime) -> Iterator[Tuple[Path, Optional[Path]]]:
+    """Folders of subjects closed with no activity since *cutoff*.
+
+    Yields each folder with its template version directory, if any.  Closed
+    means :data:`~app.utils.case_status.CASE_STATUS_FINAL` (see
+    :func:`archive.specs`); nothing sets it on investigations yet, so their
+    folders are not packed.
+    """
+    store = template_store.store_root()
+    specs = archive.specs()
+    with archive.archive_reads():
+        for name, (model, template_set) in _SUBJECTS.items():
+            spec = specs[name]
+            rows = db.session.execute(
+                sa.select(spec.subject.c.case_number, spec.subject.c.template_version)
+                .where(spec.closed, spec.last_activity < cutoff)
+                .order_by(spec.subject.c.id),
+                bind_arguments={"mapper": sa.inspect(model)},
+            ).all()
+            root = upload_root(name)
+            for case_number, version in rows:
+                template_dir = store / template_set / version if version else None
+                yield root / paths.file_safe_case_number(case_number), template_dir
+
+
+def run(
+    now: Optional[datetime] = None,
+    *,
+    months: Optional[int] = None,
+    dry_run: bool = False,
+) -> dict:
+    """Pack every due folder (see :func:`due`); returns totals."""
+    now = now or now_utc()
+    months = _setting("COLD_STORAGE_AFTER_MONTHS") if months is None else months
+    if months <= 0:
+        raise ColdStorageError("COLD_STORAGE_AFTER_MONTHS must be positive")
+    cutoff = archive.months_before(now, months)
+    totals = {"files": 0, "bytes": 0, "freed": 0, "zip_bytes": 0, "reclaimed": 0}
+    report = {"cutoff": cutoff.isoformat(), "dry_run": dry_run, "folders": 0}
+    started = time.monotonic()
+    for folder, template_dir in list(due(cutoff)):
+        if not _worth_packing(folder):
+            continue
+        report["folders"] += 1
+        if dry_run:
+            files = _files(folder)
+            totals["files"] += len(files)
+            totals["bytes"] += sum(p.stat().st_size for p in files)
+            continue
+        try:
+            stats = pack(folder, template_dir)
+        except (OSError, zipfile.BadZipFile, ColdStorageError):
+            log.exception("cold storage: packing %s failed", folder)
+            report.setdefault("failed", []).append(folder.name)
+            continue
+        for key in totals:
+            totals[key] += stats[key]
+    report.update(totals, seconds=round(time.monotonic() - started, 1))
+    if report["folders"] and not dry_run:
+        log.info(
+            "cold storage: packed %d folder(s), reclaimed %d bytes",
+            report["folders"],
+            report["reclaimed"],
+        )
+    return report
+
+
+def status() -> dict:
+    """Packed folders and bytes per upload root, and the cache's usage."""
+    report = {}
+    for name in _SUBJECTS:
+        zips = list(upload_root(name).glob(f"*{SUFFIX}"))
+        report[name] = {
+            "folders": len(zips),
+            "bytes": sum(p.stat().st_size for p in zips),
+        }
+    cached = [p for p in cache_dir().glob("*/*") if p.suffix != ".part"]
+    report["cache"] = {
+        "files": len(cached),
+        "bytes": sum(p.stat().st_size for p in cached),
+        "limit": _cache_limit(),
+    }
+    return report
+
+
+@job("cold_storage", schedule="30 5 * * 0", timeout=6 * 3600, group="maintenance")
+def _cold_storage_job() -> dict:
+    """Pack the upload folders of long-closed cases and investigations."""
+    return run()
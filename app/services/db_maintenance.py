@@ -0,0 +1,280 @@
+"""Routine SQLite maintenance of both binds."""
+
+from __future__ import annotations
+
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from flask import current_app
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.services import replication
+from app.services.scheduler import job
+from app.utils.sqlite import is_file_engine
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+AUTO_VACUUM_INCREMENTAL = 2
+DEFAULT_TEMP_MAX_AGE = timedelta(hours=6)
+_SANITIZED_GLOB = "sanitized*.docx"  # _sanitize_docx_placeholders' mkstemp
+
+
+def engines() -> Dict[str, Engine]:
+    """SQLite engines of the main and the examination bind."""
+    return {
+        bind or "main": engine
+        for bind, engine in db.engines.items()
+        if engine.dialect.name == "sqlite"
+    }
+
+
+def _pragma(conn, name: str):
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def _has_table(conn, name: str) -> bool:
+    return (
+        conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).scalar()
+        is not None
+    )
+
+
+def _index_stats(conn) -> List[dict]:
+    indexes = conn.exec_driver_sql(
+        "SELECT name, tbl_name FROM sqlite_master "
+        "WHERE type = 'index' ORDER BY tbl_name, name"
+    ).all()
+    pages: Dict[str, int] = {}
+    try:
+        pages = dict(
+            conn.exec_driver_sql(
+                "SELECT name, count(*) FROM dbstat GROUP BY name"
+            ).all()
+        )
+    except OperationalError:  # SQLite built without dbstat
+        pass
+    stat1: Dict[str, str] = {}
+    if _has_table(conn, "sqlite_stat1"):
+        stat1 = dict(
+            conn.exec_driver_sql(
+                "SELECT idx, stat FROM sqlite_stat1 WHERE idx IS NOT NULL"
+            ).all()
+        )
+    return [
+        {
+            "index": name,
+            "table": table,
+            "pages": pages.get(name),
+            "stat": stat1.get(name),
+        }
+        for name, table in indexes
+    ]
+
+
+def stats(engine: Engine, *, indexes: bool = True) -> dict:
+    """Page counts, free list, modes and (with *indexes*) index statistics."""
+    with engine.connect() as conn:
+        page_size = _pragma(conn, "page_size")
+        result = {
+            "page_size": page_size,
+            "page_count": _pragma(conn, "page_count"),
+            "freelist_count": _pragma(conn, "freelist_count"),
+            "auto_vacuum": AUTO_VACUUM_MODES.get(_pragma(conn, "auto_vacuum")),
+            "journal_mode": _pragma(conn, "journal_mode"),
+            "analyzed": _has_table(conn, "sqlite_stat1"),
+        }
+        result["free_bytes"] = result["freelist_count"] * page_size
+        if indexes:
+            result["indexes"] = _index_stats(conn)
+    return result
+
+
+def _may_checkpoint(engine: Engine, bind: Optional[str]) -> bool:
+    """With WAL shipping configured only the shipper checkpoints, unless it
+    stopped reporting or the WAL outgrew its cap (see
+    :func:`replication.overdue_checkpoint`)."""
+    if not current_app.config.get("REPLICATION_STANDBY_DIR"):
+        return True
+    if bind is None or not is_file_engine(engine):
+        return False
+    reason = replication.overdue_checkpoint(
+        replication.standby_root(), bind, Path(engine.url.database)
+    )
+    if reason:
+        current_app.logger.warning(
+            "Checkpointing %s without the WAL shipper: %s", bind, reason
+        )
+    return reason is not None
+
+
+def maintain(
+    engine: Engine,
+    *,
+    convert: bool = False,
+    vacuum_pages: Optional[int] = None,
+    bind: Optional[str] = None,
+) -> List[str]:
+    """Checkpoint, analyze and vacuum *engine*'s database; returns the steps done.
+
+    *vacuum_pages* caps the pages released per run (default: all free pages).
+    """
+    done = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if str(_pragma(conn, "journal_mode")).lower() == "wal" and _may_checkpoint(
+            engine, bind
+        ):
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+            done.append("wal_checkpoint")
+
+        if not _has_table(conn, "sqlite_stat1"):
+            conn.exec_driver_sql("ANALYZE")
+            done.append("analyze")
+        conn.exec_driver_sql("PRAGMA analysis_limit=1000")
+        conn.exec_driver_sql("PRAGMA optimize")
+        done.append("optimize")
+
+        if _pragma(conn, "auto_vacuum") != AUTO_VACUUM_INCREMENTAL:
+            if not convert:
+                return done
+            # Takes effect only with the full VACUUM that rebuilds the file.
+            conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+            done.append("vacuum")
+        elif _pragma(conn, "freelist_count"):
+            pages = "" if vacuum_pages is None else f"({int(vacuum_pages)})"
+            # Frees one page per step; only executescript() steps to the end.
+            conn.connection.driver_connection.executescript(
+                f"PRAGMA incremental_vacuum{pages};"
+            )
+            done.append("incremental_vacuum")
+    return done
+
+
+def _temp_locations() -> List[tuple]:
+    """(directory, glob) of temp files only a crashed process leaves behind."""
+    from app.services import blob_store, docx_cache
+
+    return [
+        (Path(tempfile.gettempdir()), _SANITIZED_GLOB),
+        (docx_cache.cache_root(), "**/*.tmp"),
+        (blob_store.blob_root() / "tmp", "*.part"),
+    ]
+
+
+def purge_temp_files(max_age: timedelta = DEFAULT_TEMP_MAX_AGE) -> Dict[str, int]:
+    """Delete leaked temp files older than *max_age*; returns ``{"files", "bytes"}``.
+
+    The age threshold keeps files of renders and uploads still in progress.
+    """
+    cutoff = time.time() - max_age.total_seconds()
+    removed = {"files": 0, "bytes": 0}
+    for directory, pattern in _temp_locations():
+        if not directory.is_dir():
+            continue
+        for path in directory.glob(pattern):
+            try:
+                st = path.stat()
+                if not path.is_file() or st.st_mtime >= cutoff:
+                    continue
+                path.unlink()
+            except OSError:
+                continue
+            removed["files"] += 1
+            removed["bytes"] += st.st_size
+    return removed
+
+
+def run(
+    *,
+    convert: Optional[bool] = None,
+    vacuum_pages: Optional[int] = None,
+    temp_max_age: Optional[timedelta] = None,
+    indexes: bool = False,
+) -> dict:
+    """Maintain every bind and purge temp files; returns before/after stats.
+
+    Unset arguments come from ``DB_MAINTENANCE_*`` config.  A bind that is
+    busy (``database is locked``) is reported with its error and skipped.
+    """
+    config = current_app.config
+    if convert is None:
+        convert = bool(config.get("DB_MAINTENANCE_CONVERT"))
+    if vacuum_pages is None:
+        vacuum_pages = config.get("DB_MAINTENANCE_VACUUM_PAGES") or None
+    if temp_max_age is None:
+        hours = config.get("DB_MAINTENANCE_TEMP_MAX_AGE_HOURS")
+        temp_max_age = timedelta(hours=hours) if hours else DEFAULT_TEMP_MAX_AGE
+    db.session.remove()  # no open transaction may hold the files
+    report = {}
+    for name, engine in engines().items():
+        entry = {"before": stats(engine, indexes=indexes)}
+        started = time.perf_counter()
+        try:
+            entry["steps"] = maintain(
+                engine, convert=convert, vacuum_pages=vacuum_pages, bind=name
+            )
+        except OperationalError as exc:
+            current_app.logger.warning("SQLite maintenance of %s failed: %s", name, exc)
+            entry["error"] = str(exc.orig)
+        entry["seconds"] = round(time.perf_counter() - started, 3)
+        entry["after"] = stats(engine, indexes=indexes)
+        report[name] = entry
+    report["temp_files"] = purge_temp_files(temp_max_age)
+    return report
+
+
+@job("db_maintenance", schedule="15 3 * * *", timeout=3600, group="maintenance")
+def _maintenance_job() -> dict:
+    """ANALYZE/optimize, WAL checkpoint and incremental vacuum of both binds."""
+    report = run()
+    for name, entry in report.items():
+        if name == "temp_files":
+            continue
+        before, after = entry["before"], entry["after"]
+        current_app.logger.info(
+            "SQLite %s: %d -> %d pages, %d -> %d free (%s)",
+            name,
+            before["page_count"],
+            after["page_count"],
+            before["freelist_count"],
+            after["freelist_count"],
+            ", ".join(entry.get("steps", [])) or entry.get("error"),
+        )
+    return report
+
+
+def guard_wal() -> Dict[str, dict]:
+    """Checkpoint the WAL of binds whose shipper is overdue (see
+    :func:`_may_checkpoint`); returns each bind's WAL size and action."""
+    if not current_app.config.get("REPLICATION_STANDBY_DIR"):
+        return {}
+    report = {}
+    db.session.remove()
+    for name, engine in engines().items():
+        if not is_file_engine(engine):
+            continue
+        entry = {"wal_bytes": replication.wal_bytes(engine.url.database)}
+        if _may_checkpoint(engine, name):
+            try:
+                with engine.connect().execution_options(
+                    isolation_level="AUTOCOMMIT"
+                ) as conn:
+                    conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+            except OperationalError as exc:
+                entry["error"] = str(exc.orig)
+            else:
+                entry["checkpointed"] = True
+        report[name] = entry
+    return report
+
+
+@job("wal_guard", schedule="@every 5m", timeout=600)
+def _wal_guard_job() -> Dict[str, dict]:
+    """Checkpoint WALs the replication shipper has left to grow."""
+    return guard_wal()
@@ -0,0 +1,210 @@
+"""Daily deadline digests for experts and leírók."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import groupby
+from typing import Dict, List, Optional
+
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.investigations.models import Investigation
+from app.models import Case, DeadlineDigest, User, WorkItem
+from app.services import email_outbox
+from app.services.scheduler import job
+from app.services.work_items import (
+    ROLE_ASSIGNED,
+    ROLE_DESCRIBER,
+    ROLE_EXPERT,
+    SUBJECT_CASE,
+    SUBJECT_INVESTIGATION,
+)
+from app.utils.case_status import CASE_STATUS_FINAL
+from app.utils.reporting import reporting
+from app.utils.time_utils import BUDAPEST_TZ, fmt_budapest, now_utc, to_budapest
+
+DEFAULT_DAYS = 14
+DIGEST_ROLES = (ROLE_EXPERT, ROLE_DESCRIBER, ROLE_ASSIGNED)
+_CHUNK = 500
+
+
+@dataclass
+class Item:
+    subject_type: str
+    subject_id: int
+    case_number: Optional[str]
+    status: Optional[str]
+    deadline: datetime
+
+
+@dataclass
+class Digest:
+    user_id: int
+    recipient: str
+    name: str
+    overdue: List[Item] = field(default_factory=list)
+    upcoming: List[Item] = field(default_factory=list)
+
+
+def _utc_naive(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _horizon(day: date, days: int) -> datetime:
+    """End of the Budapest day *days* after *day*, in UTC."""
+    end = datetime.combine(day + timedelta(days=days + 1), time.min, BUDAPEST_TZ)
+    return end.astimezone(timezone.utc)
+
+
+def collect(now: Optional[datetime] = None) -> List[Digest]:
+    """Digests of every user not yet digested on *now*'s Budapest day."""
+    now = now or now_utc()
+    today = to_budapest(now).date()
+    days = current_app.config.get("DEADLINE_DIGEST_DAYS") or DEFAULT_DAYS
+    already = sa.select(DeadlineDigest.user_id).where(
+        DeadlineDigest.digest_date == today
+    )
+    stmt = (
+        sa.select(
+            WorkItem.user_id,
+            User.username,
+            User.screen_name,
+            WorkItem.subject_type,
+            WorkItem.subject_id,
+            WorkItem.status,
+            WorkItem.deadline,
+            Case.case_number,
+        )
+        .join(User, User.id == WorkItem.user_id)
+        .outerjoin(
+            Case,
+            sa.and_(
+                WorkItem.subject_type == SUBJECT_CASE, Case.id == WorkItem.subject_id
+            ),
+        )
+        .where(
+            WorkItem.role.in_(DIGEST_ROLES),
+            WorkItem.deadline.isnot(None),
+            WorkItem.deadline < _horizon(today, days),
+            sa.or_(WorkItem.status.is_(None), WorkItem.status != CASE_STATUS_FINAL),
+            WorkItem.user_id.notin_(already),
+        )
+        .order_by(WorkItem.user_id, WorkItem.deadline, WorkItem.subject_id)
+    )
+    now_naive = _utc_naive(now)
+    digests = []
+    investigation_items: Dict[int, List[Item]] = {}
+    rows = db.session.execute(stmt)
+    for user_id, user_rows in groupby(rows, key=lambda row: row.user_id):
+        digest = None
+        seen = set()
+        for row in user_rows:
+            if digest is None:
+                digest = Digest(user_id, row.username, row.screen_name or row.username)
+            key = (row.subject_type, row.subject_id)
+            if key in seen:  # e.g. expert and kirendelt on the same subject
+                continue
+            seen.add(key)
+            deadline = row.deadline
+            if deadline.tzinfo is not None:
+                deadline = _utc_naive(deadline)
+            item = Item(
+                row.subject_type, row.subject_id, row.case_number, row.status, deadline
+            )
+            if row.subject_type == SUBJECT_INVESTIGATION:
+                investigation_items.setdefault(row.subject_id, []).append(item)
+            (digest.overdue if deadline < now_naive else digest.upcoming).append(item)
+        digests.append(digest)
+
+    ids = list(investigation_items)
+    for start in range(0, len(ids), _CHUNK):
+        chunk = ids[start : start + _CHUNK]
+        for inv_id, case_number in db.session.execute(
+            sa.select(Investigation.id, Investigation.case_number).where(
+                Investigation.id.in_(chunk)
+            )
+        ):
+            for item in investigation_items[inv_id]:
+                item.case_number = case_number
+    return digests
+
+
+def _line(item: Item) -> str:
+    kind = "vizsgálat" if item.subject_type == SUBJECT_INVESTIGATION else "ügy"
+    return (
+        f"  - {item.case_number or item.subject_id} ({kind}), határidő: "
+        f"{fmt_budapest(item.deadline, '%Y.%m.%d')}, állapot: {item.status or '–'}"
+    )
+
+
+def render(digest: Digest, day: date, days: int) -> tuple[str, str]:
+    """``(subject, body)`` of *digest*."""
+    subject = (
+        f"Határidők {day:%Y.%m.%d}: {len(digest.overdue)} lejárt, "
+        f"{len(digest.upcoming)} közelgő"
+    )
+    lines = [f"Kedves {digest.name}!", ""]
+    if digest.overdue:
+        lines.append(f"Lejárt határidejű ügyek ({len(digest.overdue)}):")
+        lines.extend(_line(item) for item in digest.overdue)
+        lines.append("")
+    if digest.upcoming:
+        lines.append(f"{days} napon belül lejáró ügyek ({len(digest.upcoming)}):")
+        lines.extend(_line(item) for item in digest.upcoming)
+        lines.append("")
+    return subject, "\n".join(lines)
+
+
+def queue_digests(now: Optional[datetime] = None) -> int:
+    """Add today's digests to the outbox; returns how many were queued.
+
+    A concurrent run that queued first wins: this one rolls back and
+    queues nothing.
+    """
+    now = now or now_utc()
+    today = to_budapest(now).date()
+    days = current_app.config.get("DEADLINE_DIGEST_DAYS") or DEFAULT_DAYS
+    with reporting():  # a report read: fine from the replica
+        digests = collect(now)
+    if not digests:
+        return 0
+    messages = []
+    records = []
+    for digest in digests:
+        subject, body = render(digest, today, days)
+        messages.append((digest.recipient, subject, body))
+        records.append(
+            {
+                "user_id": digest.user_id,
+                "digest_date": today,
+                "upcoming": len(digest.upcoming),
+                "overdue": len(digest.overdue),
+                "created_at": now,
+            }
+        )
+    try:
+        db.session.execute(sa.insert(DeadlineDigest), records)
+        email_outbox.enqueue_many(messages)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        current_app.logger.info("Deadline digests for %s were already queued", today)
+        return 0
+    return len(records)
+
+
+def run(now: Optional[datetime] = None, *, send: bool = True) -> dict:
+    """Queue today's digests and, with *send*, drain the outbox."""
+    queued = queue_digests(now)
+    sent = email_outbox.run_worker(once=True) if send else 0
+    return {"queued": queued, "sent": sent}
+
+
+@job("deadline_digest", schedule="0 7 * * *")
+def _digest_job() -> int:
+    """Queue today's deadline digests (the email_outbox job sends them)."""
+    return queue_digests()
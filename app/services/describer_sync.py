@@ -0,0 +1,322 @@
+"""Keep ``effective_describer_id`` on cases and investigations up to date."""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import bindparam, event, func, or_
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import db
+from app.investigations.models import Investigation
+from app.models import Case, User
+
+CASE_INPUT_FIELDS = ("expert_1", "expert_2", "describer")
+INVESTIGATION_INPUT_FIELDS = ("expert1_id", "expert2_id", "describer_id")
+USER_INPUT_FIELDS = ("username", "screen_name", "default_leiro_id")
+
+_PENDING_USERS_KEY = "describer_sync_users"
+
+
+def normalize_identifier(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+def _sqlite_lower(value: str) -> str:
+    # SQLite's lower() only folds ASCII; mirror it for SQL-side prefilters.
+    return "".join(ch.lower() if ch.isascii() else ch for ch in value.strip())
+
+
+def build_user_index(users: Iterable[User]) -> Dict[str, User]:
+    """Map normalized screen names and usernames to users (lowest id wins)."""
+    index: Dict[str, User] = {}
+    for user in sorted(users, key=lambda u: u.id or 0):
+        for ident in (user.screen_name, user.username):
+            key = normalize_identifier(ident)
+            if key:
+                index.setdefault(key, user)
+    return index
+
+
+def case_effective_describer_id(
+    case: Case, user_index: Dict[str, User]
+) -> Optional[int]:
+    explicit = normalize_identifier(case.describer)
+    if explicit:
+        user = user_index.get(explicit)
+        return user.id if user else None
+    for ident in (case.expert_1, case.expert_2):
+        expert = user_index.get(normalize_identifier(ident))
+        if expert is not None and expert.default_leiro_id:
+            return expert.default_leiro_id
+    return None
+
+
+def case_describer_ids(case: Case, user_index: Dict[str, User]) -> set[int]:
+    """Leírók whose inbox lists *case*: the explicit one, else every expert's
+    default leíró (the effective describer is the first of these)."""
+    if normalize_identifier(case.describer):
+        describer_id = case_effective_describer_id(case, user_index)
+        return {describer_id} if describer_id else set()
+    experts = (
+        user_index.get(normalize_identifier(i)) for i in (case.expert_1, case.expert_2)
+    )
+    return {e.default_leiro_id for e in experts if e is not None and e.default_leiro_id}
+
+
+def investigation_effective_describer_id(
+    inv: Investigation, users_by_id: Dict[int, User]
+) -> Optional[int]:
+    if inv.describer_id:
+        return inv.describer_id
+    for expert_id in (inv.expert1_id, inv.expert2_id):
+        expert = users_by_id.get(expert_id) if expert_id else None
+        if expert is not None and expert.default_leiro_id:
+            return expert.default_leiro_id
+    return None
+
+
+def investigation_describer_ids(
+    inv: Investigation, users_by_id: Dict[int, User]
+) -> set[int]:
+    """Leírók whose inbox lists *inv*; see :func:`case_describer_ids`."""
+    if inv.describer_id:
+        return {inv.describer_id}
+    experts = (users_by_id.get(i) for i in (inv.expert1_id, inv.expert2_id) if i)
+    return {e.default_leiro_id for e in experts if e is not None and e.default_leiro_id}
+
+
+def _inputs_changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+def _user_identifiers(user: User) -> set[str]:
+    """Current and previous identifiers of *user* (raw, stripped)."""
+    state = inspect(user)
+    idents: set[str] = set()
+    for name in ("username", "screen_name"):
+        history = state.attrs[name].history
+        for value in (
+            list(history.added) + list(history.deleted) + list(history.unchanged)
+        ):
+            if value and value.strip():
+                idents.add(value.strip())
+    return idents
+
+
+@event.listens_for(Session, "before_flush")
+def _sync_before_flush(session, flush_context, instances):  # noqa: ARG001
+    pending = [obj for obj in session.new if isinstance(obj, (Case, Investigation))]
+    pending += [
+        obj
+        for obj in session.dirty
+        if (isinstance(obj, Case) and _inputs_changed(obj, CASE_INPUT_FIELDS))
+        or (
+            isinstance(obj, Investigation)
+            and _inputs_changed(obj, INVESTIGATION_INPUT_FIELDS)
+        )
+    ]
+
+    users = session.info.setdefault(_PENDING_USERS_KEY, {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, User) and (
+            obj in session.new or _inputs_changed(obj, USER_INPUT_FIELDS)
+        ):
+            _, idents = users.setdefault(id(obj), (obj, set()))
+            idents.update(_user_identifiers(obj))
+
+    if not pending:
+        return
+
+    with session.no_autoflush:
+        user_index = None
+        for obj in pending:
+            if isinstance(obj, Case):
+                if user_index is None:
+                    user_index = build_user_index(session.query(User).all())
+                obj.effective_describer_id = case_effective_describer_id(
+                    obj, user_index
+                )
+            else:
+                users_by_id = {
+                    uid: session.get(User, uid)
+                    for uid in (obj.expert1_id, obj.expert2_id)
+                    if uid
+                }
+                obj.effective_describer_id = investigation_effective_describer_id(
+                    obj, {k: v for k, v in users_by_id.items() if v is not None}
+                )
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _sync_after_flush(session, flush_context):  # noqa: ARG001
+    pending = session.info.pop(_PENDING_USERS_KEY, None)
+    if not pending:
+        return
+    user_ids = {user.id for user, _ in pending.values() if user.id is not None}
+    raw_idents = set().union(*(idents for _, idents in pending.values()))
+    with session.no_autoflush:
+        _resync_cases(session, user_ids, raw_idents)
+        _resync_investigations(session, user_ids)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_on_rollback(session, previous_transaction):  # noqa: ARG001
+    # A failed flush never reaches after_flush_postexec.
+    session.info.pop(_PENDING_USERS_KEY, None)
+
+
+def _resync_cases(session, user_ids: set[int], raw_idents: set[str]) -> int:
+    idents = {normalize_identifier(v) for v in raw_idents}
+    idents |= {_sqlite_lower(v) for v in raw_idents}
+    idents.discard("")
+    conditions = []
+    if user_ids:
+        conditions.append(Case.effective_describer_id.in_(user_ids))
+    if idents:
+        for column in (Case.expert_1, Case.expert_2, Case.describer):
+            conditions.append(func.lower(func.trim(column)).in_(idents))
+    if not conditions:
+        return 0
+    cases = session.query(Case).filter(or_(*conditions)).all()
+    if not cases:
+        return 0
+    # Expert names feed the work-item inbox too, so resync all matched cases.
+    _mark_work_items(session, "case", [case.id for case in cases])
+    user_index = build_user_index(session.query(User).all())
+    return _apply_case_values(
+        session, cases, lambda case: case_effective_describer_id(case, user_index)
+    )
+
+
+def _resync_investigations(session, user_ids: set[int]) -> int:
+    if not user_ids:
+        return 0
+    invs = (
+        session.query(Investigation)
+        .filter(
+            or_(
+                Investigation.effective_describer_id.in_(user_ids),
+                Investigation.expert1_id.in_(user_ids),
+                Investigation.expert2_id.in_(user_ids),
+            )
+        )
+        .all()
+    )
+    if not invs:
+        return 0
+    _mark_work_items(session, "investigation", [inv.id for inv in invs])
+    users_by_id = _users_by_id(session, invs)
+    return _apply_investigation_values(
+        session,
+        invs,
+        lambda inv: investigation_effective_describer_id(inv, users_by_id),
+    )
+
+
+def _mark_work_items(session, subject_type: str, ids) -> None:
+    from app.services.work_items import mark_subjects
+
+    mark_subjects(session, subject_type, ids)
+
+
+def _users_by_id(session, invs: Iterable[Investigation]) -> Dict[int, User]:
+    ids = {uid for inv in invs for uid in (inv.expert1_id, inv.expert2_id) if uid}
+    if not ids:
+        return {}
+    return {u.id: u for u in session.query(User).filter(User.id.in_(ids)).all()}
+
+
+def _apply_case_values(session, cases, resolver) -> int:
+    table = Case.__table__
+    changes = []
+    for case in cases:
+        new_val = resolver(case)
+        if new_val != case.effective_describer_id:
+            changes.append({"b_id": case.id, "b_value": new_val})
+            set_committed_value(case, "effective_describer_id", new_val)
+    if changes:
+        # Keep updated_at untouched: this is derived data, not a user edit.
+        session.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                effective_describer_id=bindparam("b_value"),
+                updated_at=table.c.updated_at,
+            ),
+            changes,
+        )
+    return len(changes)
+
+
+def _apply_investigation_values(session, invs, resolver) -> int:
+    table = Investigation.__table__
+    changes = []
+    for inv in invs:
+        new_val = resolver(inv)
+        if new_val != inv.effective_describer_id:
+            changes.append({"b_id": inv.id, "b_value": new_val})
+            set_committed_value(inv, "effective_describer_id", new_val)
+    if changes:
+        session.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(effective_describer_id=bindparam("b_value")),
+            changes,
+            bind_arguments={"mapper": inspect(Investigation)},
+        )
+    return len(changes)
+
+
+def recompute_all(session=None, batch_size: int = 500) -> dict:
+    """Recompute ``effective_describer_id`` for every case and investigation.
+
+    Returns ``{"cases": <updated>, "investigations": <updated>}``; the caller
+    is responsible for committing.
+    """
+    session = session or db.session
+    counts = {"cases": 0, "investigations": 0}
+    with session.no_autoflush:
+        users = session.query(User).all()
+        user_index = build_user_index(users)
+        users_by_id = {u.id: u for u in users}
+
+        last_id = 0
+        while True:
+            batch = (
+                session.query(Case)
+                .populate_existing()
+                .filter(Case.id > last_id)
+                .order_by(Case.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            counts["cases"] += _apply_case_values(
+                session, batch, lambda c: case_effective_describer_id(c, user_index)
+            )
+            last_id = batch[-1].id
+
+        last_id = 0
+        while True:
+            batch = (
+                session.query(Investigation)
+                .populate_existing()
+                .filter(Investigation.id > last_id)
+                .order_by(Investigation.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            counts["investigations"] += _apply_investigation_values(
+                session,
+                batch,
+                lambda i: investigation_effective_describer_id(i, users_by_id),
+            )
+            last_id = batch[-1].id
+    return counts
@@ -0,0 +1,614 @@
+"""Queued document generation, rendered by ``run_tasks.py documents``."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import sqlalchemy as sa
+from flask import Flask, current_app, request, url_for
+from flask_login import current_user
+
+from app import db
+from app.models import DocumentJob
+from app.services.scheduler import job
+from app.utils.idempotency import claim_idempotency
+from app.utils.time_utils import now_utc
+
+KIND_TOX_DOC = "tox_doc"
+KIND_CERTIFICATE = "certificate"
+KIND_INVESTIGATION_DOC = "investigation_doc"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+PENDING = (STATUS_QUEUED, STATUS_RUNNING)
+
+DEFAULT_TIMEOUT = 600
+DEFAULT_MAX_ATTEMPTS = 3
+
+_finishers: Dict[str, Callable[[DocumentJob], Optional[dict]]] = {}
+_reusers: Dict[str, Callable[[DocumentJob], Optional[dict]]] = {}
+
+
+# ---------------------------------------------------------------------------
+# Renderers (no database access; may run in a pool process)
+# ---------------------------------------------------------------------------
+
+
+def render_docx(payload: dict) -> None:
+    """Render through the sanitizing investigation renderer."""
+    from app.investigations.routes import _render_docx_template
+
+    _render_docx_template(
+        Path(payload["template"]), Path(payload["output"]), payload["context"]
+    )
+
+
+def render_plain_docx(payload: dict) -> None:
+    """Render with docxtpl as-is; python-docx replacements as a fallback.
+
+    Saved through a temp file: an existing output may be hardlinked to its
+    upload blob, which an in-place write would change as well.
+    """
+    from app.investigations.routes import _save_docx_atomic
+
+    template, output = payload["template"], Path(payload["output"])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        from docxtpl import DocxTemplate
+    except ModuleNotFoundError:
+        from docx import Document
+
+        doc = Document(template)
+        for p in doc.paragraphs:
+            for needle, value in payload.get("replacements", {}).items():
+                if needle in p.text:
+                    p.text = p.text.replace(needle, str(value))
+        _save_docx_atomic(doc.save, output)
+        return
+    tpl = DocxTemplate(template)
+    tpl.render(payload["context"])
+    _save_docx_atomic(tpl.save, output)
+
+
+def render_text(payload: dict) -> None:
+    output = Path(payload["output"])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8", newline="\n") as fh:
+        fh.write("\n".join(payload["lines"]))
+    os.replace(tmp, output)
+
+
+RENDERERS = {
+    "docx": render_docx,
+    "plain_docx": render_plain_docx,
+    "text": render_text,
+}
+
+
+def render(payload: dict) -> None:
+    RENDERERS[payload["renderer"]](payload)
+
+
+def finisher(kind: str):
+    """Register the database step run after a job of *kind* rendered."""
+
+    def decorator(fn):
+        _finishers[kind] = fn
+        return fn
+
+    return decorator
+
+
+def reuser(kind: str):
+    """Register the lookup of an up-to-date earlier output of *kind*.
+
+    It receives the new job (``payload["fingerprint"]`` set) and returns the
+    result to reuse when the previous output has the same fingerprint and
+    still exists, ``None`` to render.
+    """
+
+    def decorator(fn):
+        _reusers[kind] = fn
+        return fn
+
+    return decorator
+
+
+def fingerprint(payload: dict) -> str:
+    """Hash of everything a template render depends on.
+
+    The context is normalized (key order, ``None`` rendered as ``""``), so
+    equivalent contexts match.  Dates put into the context (``today``,
+    ``creation_date``) are part of it: a letter dated yesterday is not
+    reused today.
+    """
+    from app.services import docx_cache
+
+    context = payload.get("context") or {}
+    material = {
+        "renderer": payload["renderer"],
+        "template": docx_cache.digest(Path(payload["template"])),
+        "context": {k: ("" if v is None else v) for k, v in context.items()},
+        "replacements": payload.get("replacements"),
+    }
+    if payload["renderer"] == "docx":
+        material["sanitizer"] = docx_cache.SANITIZER_VERSION
+    blob = json.dumps(material, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Enqueue / status
+# ---------------------------------------------------------------------------
+
+
+def eager() -> bool:
+    return bool(current_app.config.get("DOCUMENT_JOBS_EAGER"))
+
+
+def submit(
+    kind: str,
+    *,
+    subject_type: str,
+    subject_id: int,
+    payload: dict,
+    key: Optional[str] = None,
+    case_id: Optional[int] = None,
+    force: bool = False,
+) -> Tuple[Optional[DocumentJob], bool]:
+    """Queue a render for the current user; returns ``(job, created)``.
+
+    When *key* was already claimed, ``created`` is ``False`` and ``job`` is
+    the job queued under that key (``None`` if there is none, e.g. the key
+    predates the queue).  A failed job does not block resubmitting.  The
+    new job may already be done when its output is unchanged (see
+    :func:`enqueue`).
+    """
+    user_id = getattr(current_user, "id", None)
+    if key is not None and not claim_idempotency(
+        key, route=request.endpoint, user_id=user_id, case_id=case_id
+    ):
+        existing = (
+            DocumentJob.query.filter_by(idempotency_key=key)
+            .order_by(DocumentJob.created_at.desc())
+            .first()
+        )
+        if existing is None or existing.status != STATUS_FAILED:
+            return existing, False
+
+    job = enqueue(
+        kind,
+        subject_type=subject_type,
+        subject_id=subject_id,
+        payload=payload,
+        user_id=user_id,
+        key=key,
+        force=force,
+    )
+    db.session.commit()
+    if eager() and job.status == STATUS_QUEUED:
+        run_inline(job)
+    return job, True
+
+
+def enqueue(
+    kind: str,
+    *,
+    subject_type: str,
+    subject_id: int,
+    payload: dict,
+    user_id: Optional[int],
+    key: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    force: bool = False,
+) -> DocumentJob:
+    """Add a queued job to the session (the caller commits).
+
+    Template renders get a fingerprint; if the kind's reuser finds the
+    previous output up to date, the job is added as done instead, unless
+    *force* is set.
+    """
+    template = payload.get("template")
+    if template and Path(template).is_file():
+        payload = {**payload, "fingerprint": fingerprint(payload)}
+    job = DocumentJob(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        subject_type=subject_type,
+        subject_id=subject_id,
+        user_id=user_id,
+        idempotency_key=key,
+        batch_id=batch_id,
+        status=STATUS_QUEUED,
+        payload=payload,
+        attempts=0,
+        created_at=now_utc(),
+    )
+    reuse = _reusers.get(kind)
+    if not force and reuse is not None and "fingerprint" in payload:
+        result = reuse(job)
+        if result is not None:
+            job.status = STATUS_DONE
+            job.result = {**result, "reused": True}
+            job.finished_at = job.created_at
+    db.session.add(job)
+    return job
+
+
+def redirect_url(job: DocumentJob) -> Optional[str]:
+    """Where the user continues once *job* is done (``payload["next"]``)."""
+    target = job.payload.get("next")
+    if not target:
+        return None
+    values = dict(target.get("values") or {})
+    if job.status == STATUS_DONE:
+        values.update(job.result or {})
+    return url_for(target["endpoint"], **values)
+
+
+def batch_counts(batch_id: str) -> Dict[str, int]:
+    """Number of jobs per status in *batch_id*."""
+    rows = db.session.execute(
+        sa.select(DocumentJob.status, sa.func.count())
+        .where(DocumentJob.batch_id == batch_id)
+        .group_by(DocumentJob.status)
+    ).all()
+    counts = {status: 0 for status in (*PENDING, STATUS_DONE, STATUS_FAILED)}
+    counts.update({status: n for status, n in rows})
+    return counts
+
+
+def reuse_stats() -> Dict[str, dict]:
+    """Rendered vs. reused fingerprinted jobs per kind, with the hit rate."""
+    reused = sa.func.json_extract(DocumentJob.result, "$.reused")
+    rows = db.session.execute(
+        sa.select(DocumentJob.kind, sa.func.count(), sa.func.count(reused))
+        .where(
+            DocumentJob.status == STATUS_DONE,
+            sa.func.json_extract(DocumentJob.payload, "$.fingerprint").isnot(None),
+        )
+        .group_by(DocumentJob.kind)
+    ).all()
+    stats = {}
+    for kind, total, hits in rows:
+        stats[kind] = {
+            "rendered": total - hits,
+            "reused": hits,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+    return stats
+
+
+def state(job: DocumentJob) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "error": job.error,
+        "result": job.result,
+        "redirect": redirect_url(job) if job.status == STATUS_DONE else None,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+
+def _worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _finish(job: DocumentJob, worker: str, **values) -> bool:
+    """Move *job* out of ``running`` if *worker* still owns it.
+
+    A render that outlived ``DOCUMENT_JOB_TIMEOUT`` may have been re-queued
+    and claimed by another worker; its result is then rolled back (with the
+    finisher's rows) instead of finishing the job twice.
+    """
+    res = db.session.execute(
+        sa.update(DocumentJob)
+        .where(
+            DocumentJob.id == job.id,
+            DocumentJob.status == STATUS_RUNNING,
+            DocumentJob.worker == worker,
+        )
+        .values(finished_at=now_utc(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount != 1:
+        db.session.rollback()
+        current_app.logger.warning(
+            "Document job %s is no longer running on %s; result dropped",
+            job.id,
+            worker,
+        )
+        return False
+    db.session.commit()
+    db.session.refresh(job)
+    return True
+
+
+def _complete(job: DocumentJob, worker: str) -> None:
+    try:
+        result = _finishers[job.kind](job)
+        _finish(job, worker, status=STATUS_DONE, result=result or {}, error=None)
+    except Exception as exc:  # noqa: BLE001
+        db.session.rollback()
+        _fail(job, exc, worker)
+
+
+def _fail(job: DocumentJob, exc: BaseException, worker: str) -> None:
+    current_app.logger.error(
+        "Document job %s (%s) failed: %s", job.id, job.kind, exc, exc_info=exc
+    )
+    _finish(
+        job,
+        worker,
+        status=STATUS_FAILED,
+        error=str(exc)[:500] or exc.__class__.__name__,
+    )
+
+
+def run_inline(job: DocumentJob) -> DocumentJob:
+    """Render and finish *job* in this process."""
+    job.status = STATUS_RUNNING
+    job.worker = _worker_name()
+    job.attempts = (job.attempts or 0) + 1
+    job.started_at = now_utc()
+    db.session.commit()
+    _execute(job, job.worker)
+    return job
+
+
+def _execute(job: DocumentJob, worker: str) -> None:
+    try:
+        render(job.payload)
+    except Exception as exc:  # noqa: BLE001
+        _fail(job, exc, worker)
+    else:
+        _complete(job, worker)
+
+
+def requeue_stale(worker: Optional[str] = None) -> int:
+    """Return jobs of crashed workers to the queue (or fail them).
+
+    Jobs claimed by *worker* (the caller) are left alone: it is still
+    rendering them.
+    """
+    timeout = current_app.config.get("DOCUMENT_JOB_TIMEOUT") or DEFAULT_TIMEOUT
+    max_attempts = (
+        current_app.config.get("DOCUMENT_JOB_MAX_ATTEMPTS") or DEFAULT_MAX_ATTEMPTS
+    )
+    cutoff = now_utc() - timedelta(seconds=timeout)
+    query = DocumentJob.query.filter(
+        DocumentJob.status == STATUS_RUNNING, DocumentJob.started_at < cutoff
+    )
+    if worker is not None:
+        query = query.filter(
+            sa.or_(DocumentJob.worker.is_(None), DocumentJob.worker != worker)
+        )
+    stale = query.all()
+    for stale_job in stale:
+        if stale_job.attempts >= max_attempts:
+            stale_job.status = STATUS_FAILED
+            stale_job.error = "worker timed out"
+            stale_job.finished_at = now_utc()
+        else:
+            stale_job.status = STATUS_QUEUED
+            stale_job.worker = None
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+
+def claim(limit: int, worker: str, batch_id: Optional[str] = None) -> List[DocumentJob]:
+    """Atomically move up to *limit* queued jobs to ``running`` for *worker*."""
+    if limit <= 0:
+        return []
+    query = sa.select(DocumentJob.id).where(DocumentJob.status == STATUS_QUEUED)
+    if batch_id is not None:
+        query = query.where(DocumentJob.batch_id == batch_id)
+    ids = (
+        db.session.execute(query.order_by(DocumentJob.created_at).limit(limit))
+        .scalars()
+        .all()
+    )
+    claimed = []
+    for job_id in ids:
+        res = db.session.execute(
+            sa.update(DocumentJob)
+            .where(DocumentJob.id == job_id, DocumentJob.status == STATUS_QUEUED)
+            .values(
+                status=STATUS_RUNNING,
+                worker=worker,
+                started_at=now_utc(),
+                attempts=DocumentJob.attempts + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount == 1:
+            claimed.append(job_id)
+    db.session.commit()
+    if not claimed:
+        return []
+    return (
+        DocumentJob.query.filter(DocumentJob.id.in_(claimed))
+        .order_by(DocumentJob.created_at)
+        .populate_existing()
+        .all()
+    )
+
+
+def _init_render_process(config: dict) -> None:
+    # Renderers only need config and a logger, not the database.
+    app = Flask("document_jobs")
+    app.config.update(config)
+    app.app_context().push()
+
+
+def _render_config() -> dict:
+    from app.services import docx_cache
+
+    return {
+        "DOCX_CACHE_ROOT": str(docx_cache.cache_root()),
+        "DOCX_CACHE_MAX_BYTES": current_app.config.get("DOCX_CACHE_MAX_BYTES"),
+    }
+
+
+def _new_pool(processes: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_init_render_process,
+        initargs=(_render_config(),),
+    )
+
+
+def _kill_pool(pool: ProcessPoolExecutor) -> None:
+    # shutdown() cannot interrupt a hung render; end the processes first.
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    for process in list((pool._processes or {}).values()):
+        process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _time_out(job_id: int, worker: str, timeout: int, max_attempts: int) -> None:
+    """Fail or re-queue a render of *worker* that exceeded *timeout*."""
+    job = db.session.get(DocumentJob, job_id)
+    current_app.logger.error(
+        "Document job %s (%s) timed out after %s s", job.id, job.kind, timeout
+    )
+    if job.attempts >= max_attempts:
+        _finish(
+            job,
+            worker,
+            status=STATUS_FAILED,
+            error=f"render timed out after {timeout} s",
+        )
+    else:
+        _release(job_id, worker)
+
+
+def _release(job_id: int, worker: str, attempt_used: bool = True) -> None:
+    values = {"status": STATUS_QUEUED, "worker": None}
+    if not attempt_used:
+        values["attempts"] = DocumentJob.attempts - 1
+    db.session.execute(
+        sa.update(DocumentJob)
+        .where(
+            DocumentJob.id == job_id,
+            DocumentJob.status == STATUS_RUNNING,
+            DocumentJob.worker == worker,
+        )
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def run_worker(
+    *,
+    processes: Optional[int] = None,
+    once: bool = False,
+    poll_interval: float = 1.0,
+    batch_id: Optional[str] = None,
+) -> int:
+    """Process queued jobs; returns how many finished.
+
+    ``processes=0`` renders in this process (no pool).  With *once* the
+    worker exits when the queue is empty instead of polling; *batch_id*
+    limits it to the jobs of one batch.  A pooled render running longer
+    than ``DOCUMENT_JOB_TIMEOUT`` is failed or re-queued and the pool is
+    replaced.
+    """
+    if processes is None:
+        processes = current_app.config.get("DOCUMENT_JOB_PROCESSES") or (
+            os.cpu_count() or 1
+        )
+    worker = _worker_name()
+    finished = 0
+    if processes == 0:
+        while True:
+            requeue_stale(worker)
+            jobs = claim(1, worker, batch_id)
+            if not jobs:
+                if once:
+                    return finished
+                time.sleep(poll_interval)
+                continue
+            _execute(jobs[0], worker)
+            finished += 1
+
+    timeout = current_app.config.get("DOCUMENT_JOB_TIMEOUT") or DEFAULT_TIMEOUT
+    max_attempts = (
+        current_app.config.get("DOCUMENT_JOB_MAX_ATTEMPTS") or DEFAULT_MAX_ATTEMPTS
+    )
+    pool = _new_pool(processes)
+    in_flight = {}  # future -> (job id, monotonic deadline)
+
+    def collect(done) -> int:
+        for future in done:
+            job = db.session.get(DocumentJob, in_flight.pop(future)[0])
+            exc = future.exception()
+            if exc is not None:
+                _fail(job, exc, worker)
+            else:
+                _complete(job, worker)
+        return len(done)
+
+    try:
+        while True:
+            requeue_stale(worker)
+            for job in claim(processes - len(in_flight), worker, batch_id):
+                future = pool.submit(render, job.payload)
+                in_flight[future] = (job.id, time.monotonic() + timeout)
+            if not in_flight:
+                if once:
+                    return finished
+                time.sleep(poll_interval)
+                continue
+            done, _ = wait(
+                in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED
+            )
+            finished += collect(done)
+            now = time.monotonic()
+            overdue = [f for f, (_, deadline) in in_flight.items() if deadline < now]
+            if not overdue:
+                continue
+            for future in overdue:
+                _time_out(in_flight.pop(future)[0], worker, timeout, max_attempts)
+            finished += collect([f for f in in_flight if f.done()])
+            _kill_pool(pool)
+            # Renders that shared the pool with the hung one start over.
+            for job_id, _ in in_flight.values():
+                _release(job_id, worker, attempt_used=False)
+            in_flight.clear()
+            pool = _new_pool(processes)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+@job("document_jobs", schedule="@every 1m", timeout=3600)
+def _sweep_job() -> int:
+    """Render queued documents nobody else picked up.
+
+    Renders in the job process, so a timeout leaves no orphaned pool; the
+    ``run_tasks.py documents`` worker remains the high-throughput path.
+    """
+    return run_worker(processes=0, once=True)
@@ -0,0 +1,161 @@
+"""Cache of sanitized DOCX templates for rendering."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Tuple
+
+from flask import current_app
+
+SANITIZER_VERSION = "3"  # bump whenever the sanitizer output changes
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Content hashes remembered by path + mtime + size (each entry is tiny).
+MAX_DIGESTS = 4096
+
+_lock = threading.Lock()
+_by_stat: Dict[Tuple[str, int, int], str] = {}
+_data: "OrderedDict[str, bytes]" = OrderedDict()
+_digests: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+
+def cache_root() -> Path:
+    configured = current_app.config.get("DOCX_CACHE_ROOT")
+    root = (
+        Path(configured)
+        if configured
+        else Path(current_app.instance_path) / "cache" / "docx"
+    )
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def _max_bytes() -> int:
+    value = current_app.config.get("DOCX_CACHE_MAX_BYTES")
+    return DEFAULT_MAX_BYTES if value is None else int(value)
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_key(path: Path) -> Tuple[str, int, int]:
+    st = path.stat()
+    return (str(path.resolve()), st.st_mtime_ns, st.st_size)
+
+
+def digest(template_path: Path) -> str:
+    """SHA-256 of *template_path*; only re-hashed after the file changed."""
+    template_path = Path(template_path)
+    key = _stat_key(template_path)
+    with _lock:
+        sha256 = _by_stat.get(key) or _digests.get(key)
+        if key in _digests:
+            _digests.move_to_end(key)
+    if sha256 is None:
+        sha256 = _hash_file(template_path)
+        with _lock:
+            _digests[key] = sha256
+            while len(_digests) > MAX_DIGESTS:
+                _digests.popitem(last=False)
+    return sha256
+
+
+def _remember(key, sha256: str, data: bytes) -> None:
+    limit = _max_bytes()
+    with _lock:
+        _by_stat[key] = sha256
+        _data[sha256] = data
+        _data.move_to_end(sha256)
+        total = sum(len(v) for v in _data.values())
+        while total > limit and len(_data) > 1:
+            evicted, value = _data.popitem(last=False)
+            total -= len(value)
+            _stats["evictions"] += 1
+            for stale in [k for k, v in _by_stat.items() if v == evicted]:
+                del _by_stat[stale]
+
+
+def _sanitize(template_path: Path) -> bytes:
+    from app.investigations.routes import _sanitize_docx_placeholders
+
+    tmp = _sanitize_docx_placeholders(template_path)
+    try:
+        return tmp.read_bytes()
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def sanitized(template_path: Path) -> bytes:
+    """Return the sanitized bytes of *template_path*, from cache if possible."""
+    template_path = Path(template_path)
+    key = _stat_key(template_path)
+    with _lock:
+        sha256 = _by_stat.get(key)
+        data = _data.get(sha256) if sha256 else None
+        if data is not None:
+            _data.move_to_end(sha256)
+            _stats["memory_hits"] += 1
+            return data
+
+    sha256 = digest(template_path)
+    with _lock:
+        data = _data.get(sha256)
+        if data is not None:
+            _stats["memory_hits"] += 1
+    if data is None:
+        cached = cache_root() / f"{sha256}-{SANITIZER_VERSION}.docx"
+        try:
+            data = cached.read_bytes()
+        except FileNotFoundError:
+            data = _sanitize(template_path)
+            _write_atomic(cached, data)
+            with _lock:
+                _stats["misses"] += 1
+        else:
+            with _lock:
+                _stats["disk_hits"] += 1
+    _remember(key, sha256, data)
+    return data
+
+
+def stats() -> Dict[str, int]:
+    """Counters since start (or :func:`clear`) plus the in-memory footprint."""
+    with _lock:
+        result = dict(_stats)
+        result["entries"] = len(_data)
+        result["bytes"] = sum(len(v) for v in _data.values())
+    return result
+
+
+def clear(disk: bool = False) -> None:
+    """Drop the in-memory cache and counters; with *disk*, the files too."""
+    with _lock:
+        _by_stat.clear()
+        _data.clear()
+        _digests.clear()
+        for name in _stats:
+            _stats[name] = 0
+    if disk:
+        for path in cache_root().glob(f"*-{SANITIZER_VERSION}.docx"):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,340 @@
+"""Transactional email outbox, delivered by ``run_tasks.py emails``."""
+
+from __future__ import annotations
+
+import os
+import smtplib
+import socket
+import time
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy as sa
+from flask import current_app
+from flask_mail import Message
+
+from app import db
+from app.models import EmailOutbox
+from app.services.scheduler import job
+from app.utils.time_utils import now_utc
+
+STATUS_QUEUED = "queued"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_DEAD = "dead"
+
+DEFAULTS = {
+    "EMAIL_BATCH_SIZE": 50,
+    "EMAIL_MAX_ATTEMPTS": 5,
+    "EMAIL_RETRY_BASE_SECONDS": 60,
+    "EMAIL_RETRY_MAX_SECONDS": 6 * 3600,
+    "EMAIL_RATE_LIMIT": 30,
+    "EMAIL_RATE_WINDOW_SECONDS": 3600,
+    "EMAIL_SEND_TIMEOUT": 300,
+}
+
+# The server answered; the connection is still usable for the next message.
+_REPLY_ERRORS = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+
+
+def _setting(name: str) -> int:
+    value = current_app.config.get(name)
+    return DEFAULTS[name] if value is None else int(value)
+
+
+def default_sender() -> str:
+    return (
+        current_app.config.get("MAIL_DEFAULT_SENDER")
+        or current_app.config.get("MAIL_USERNAME")
+        or "no-reply@example.com"
+    )
+
+
+def enqueue(subject: str, recipients: Iterable[str], body: str) -> List[EmailOutbox]:
+    """Add one outbox row per recipient to the session (the caller commits)."""
+    now = now_utc()
+    rows = [
+        EmailOutbox(
+            recipient=recipient,
+            sender=default_sender(),
+            subject=subject,
+            body=body,
+            status=STATUS_QUEUED,
+            attempts=0,
+            created_at=now,
+            next_attempt_at=now,
+        )
+        for recipient in dict.fromkeys(r for r in recipients if r)
+    ]
+    db.session.add_all(rows)
+    return rows
+
+
+def enqueue_many(messages: Iterable[Tuple[str, str, str]]) -> int:
+    """Bulk :func:`enqueue` of ``(recipient, subject, body)`` messages.
+
+    One multi-row insert in the caller's transaction; for jobs queueing
+    thousands of emails at once.
+    """
+    now = now_utc()
+    sender = default_sender()
+    rows = [
+        {
+            "recipient": recipient,
+            "sender": sender,
+            "subject": subject,
+            "body": body,
+            "status": STATUS_QUEUED,
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now,
+        }
+        for recipient, subject, body in messages
+        if recipient
+    ]
+    if rows:
+        db.session.execute(sa.insert(EmailOutbox), rows)
+    return len(rows)
+
+
+# ---------------------------------------------------------------------------
+# Sending
+# ---------------------------------------------------------------------------
+
+
+def requeue_stale() -> int:
+    """Return rows of a crashed sender to the queue."""
+    cutoff = now_utc() - timedelta(seconds=_setting("EMAIL_SEND_TIMEOUT"))
+    res = db.session.execute(
+        sa.update(EmailOutbox)
+        .where(EmailOutbox.status == STATUS_SENDING, EmailOutbox.claimed_at < cutoff)
+        .values(status=STATUS_QUEUED, worker=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return res.rowcount
+
+
+def claim(limit: int, worker: str) -> List[EmailOutbox]:
+    """Atomically move up to *limit* due rows to ``sending`` for *worker*."""
+    now = now_utc()
+    ids = (
+        db.session.execute(
+            sa.select(EmailOutbox.id)
+            .where(
+                EmailOutbox.status == STATUS_QUEUED,
+                EmailOutbox.next_attempt_at <= now,
+            )
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+            .limit(limit)
+        )
+        .scalars()
+        .all()
+    )
+    if not ids:
+        return []
+    db.session.execute(
+        sa.update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids), EmailOutbox.status == STATUS_QUEUED)
+        .values(status=STATUS_SENDING, worker=worker, claimed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return (
+        EmailOutbox.query.filter(
+            EmailOutbox.id.in_(ids),
+            EmailOutbox.status == STATUS_SENDING,
+            EmailOutbox.worker == worker,
+        )
+        .order_by(EmailOutbox.id)
+        .populate_existing()
+        .all()
+    )
+
+
+def _sent_in_window(recipients: Iterable[str]) -> Dict[str, int]:
+    since = now_utc() - timedelta(seconds=_setting("EMAIL_RATE_WINDOW_SECONDS"))
+    rows = db.session.execute(
+        sa.select(EmailOutbox.recipient, sa.func.count())
+        .where(
+            EmailOutbox.recipient.in_(set(recipients)),
+            EmailOutbox.status == STATUS_SENT,
+            EmailOutbox.sent_at >= since,
+        )
+        .group_by(EmailOutbox.recipient)
+    ).all()
+    return dict(rows)
+
+
+def _permanent(exc: BaseException) -> bool:
+    """5xx replies will not change on retry."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    code = getattr(exc, "smtp_code", None)
+    return isinstance(code, int) and code >= 500
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base = _setting("EMAIL_RETRY_BASE_SECONDS")
+    seconds = min(base * 2 ** max(attempts - 1, 0), _setting("EMAIL_RETRY_MAX_SECONDS"))
+    return timedelta(seconds=seconds)
+
+
+def _failed(row: EmailOutbox, exc: BaseException) -> None:
+    row.attempts = (row.attempts or 0) + 1
+    row.last_error = str(exc)[:500] or exc.__class__.__name__
+    row.worker = None
+    if _permanent(exc) or row.attempts >= _setting("EMAIL_MAX_ATTEMPTS"):
+        row.status = STATUS_DEAD
+        current_app.logger.error(
+            "Email %s to %s is dead after %d attempt(s): %s",
+            row.id,
+            row.recipient,
+            row.attempts,
+            row.last_error,
+        )
+    else:
+        row.status = STATUS_QUEUED
+        row.next_attempt_at = now_utc() + _retry_delay(row.attempts)
+        current_app.logger.warning(
+            "Email %s to %s failed (attempt %d): %s",
+            row.id,
+            row.recipient,
+            row.attempts,
+            row.last_error,
+        )
+
+
+def _postpone(row: EmailOutbox) -> None:
+    window = _setting("EMAIL_RATE_WINDOW_SECONDS")
+    limit = max(_setting("EMAIL_RATE_LIMIT"), 1)
+    row.status = STATUS_QUEUED
+    row.worker = None
+    row.next_attempt_at = now_utc() + timedelta(seconds=window / limit)
+
+
+class _Connection:
+    """Flask-Mail connection opened on first use and reopened after a drop.
+
+    If connecting fails, the rest of the batch fails with the same error
+    instead of trying the server again for every message.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._connect_error: Optional[BaseException] = None
+
+    def send(self, message: Message) -> None:
+        if self._connect_error is not None:
+            raise self._connect_error
+        if self._conn is None:
+            try:
+                self._conn = current_app.extensions["mail"].connect().__enter__()
+            except Exception as exc:  # noqa: BLE001
+                self._connect_error = exc
+                raise
+        try:
+            self._conn.send(message)
+        except _REPLY_ERRORS:
+            raise
+        except OSError:
+            # Dropped or broken connection: the next message reconnects.
+            self.close()
+            raise
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.__exit__(None, None, None)
+            except Exception:  # noqa: BLE001
+                pass
+
+
+def drain(worker: Optional[str] = None) -> Dict[str, int]:
+    """Send one batch of due emails over one connection; returns counts."""
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    rows = claim(_setting("EMAIL_BATCH_SIZE"), worker)
+    counts = {"sent": 0, "retry": 0, "dead": 0, "postponed": 0}
+    if not rows:
+        return counts
+    limit = _setting("EMAIL_RATE_LIMIT")
+    sent = _sent_in_window(row.recipient for row in rows)
+    conn = _Connection()
+    try:
+        for row in rows:
+            if limit and sent.get(row.recipient, 0) >= limit:
+                _postpone(row)
+                counts["postponed"] += 1
+                continue
+            message = Message(
+                row.subject,
+                recipients=[row.recipient],
+                body=row.body,
+                sender=row.sender or default_sender(),
+            )
+            try:
+                conn.send(message)
+            except Exception as exc:  # noqa: BLE001
+                _failed(row, exc)
+                counts["dead" if row.status == STATUS_DEAD else "retry"] += 1
+            else:
+                row.status = STATUS_SENT
+                row.sent_at = now_utc()
+                row.attempts = (row.attempts or 0) + 1
+                row.last_error = None
+                row.worker = None
+                sent[row.recipient] = sent.get(row.recipient, 0) + 1
+                counts["sent"] += 1
+            # One commit per message: a crash never re-sends delivered mail.
+            db.session.commit()
+    finally:
+        conn.close()
+    return counts
+
+
+def run_worker(*, once: bool = False, poll_interval: float = 5.0) -> int:
+    """Send queued emails; returns how many were sent.
+
+    With *once* the sender exits when nothing is due instead of polling.
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    total = 0
+    while True:
+        requeue_stale()
+        counts = drain(worker)
+        total += counts["sent"]
+        if not any(counts.values()) or counts["postponed"] == sum(counts.values()):
+            if once:
+                return total
+            time.sleep(poll_interval)
+
+
+def requeue_dead(ids: Optional[Iterable[int]] = None) -> int:
+    """Give dead emails (all, or *ids*) a fresh set of attempts."""
+    query = sa.update(EmailOutbox).where(EmailOutbox.status == STATUS_DEAD)
+    if ids is not None:
+        query = query.where(EmailOutbox.id.in_(list(ids)))
+    res = db.session.execute(
+        query.values(
+            status=STATUS_QUEUED, attempts=0, next_attempt_at=now_utc()
+        ).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return res.rowcount
+
+
+def stats() -> Dict[str, int]:
+    """Number of outbox rows per status."""
+    rows = db.session.execute(
+        sa.select(EmailOutbox.status, sa.func.count()).group_by(EmailOutbox.status)
+    ).all()
+    counts = {s: 0 for s in (STATUS_QUEUED, STATUS_SENDING, STATUS_SENT, STATUS_DEAD)}
+    counts.update(dict(rows))
+    return counts
+
+
+@job("email_outbox", schedule="@every 1m", timeout=900)
+def _send_job() -> int:
+    """Send the due emails of the outbox."""
+    return run_worker(once=True)
@@ -0,0 +1,245 @@
+"""Time-travel reconstruction of case/investigation state."""
+
+from __future__ import annotations
+
+import json
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+import sqlalchemy as sa
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app import db
+from app.investigations.models import (
+    Investigation,
+    InvestigationChangeLog,
+    InvestigationHistorySnapshot,
+)
+from app.models import Case, CaseHistorySnapshot, ChangeLog
+
+DEFAULT_SNAPSHOT_EVERY = 50
+EMPTY = "∅"
+
+_PENDING_KEY = "history_checkpoint_pending"
+
+
+@dataclass(frozen=True)
+class _Subject:
+    model: type
+    log: type
+    log_subject: sa.Column
+    snapshot: type
+
+
+SUBJECTS = {
+    "case": _Subject(Case, ChangeLog, ChangeLog.case_id, CaseHistorySnapshot),
+    "investigation": _Subject(
+        Investigation,
+        InvestigationChangeLog,
+        InvestigationChangeLog.investigation_id,
+        InvestigationHistorySnapshot,
+    ),
+}
+
+
+@dataclass
+class Reconstruction:
+    subject_type: str
+    subject_id: int
+    as_of: datetime
+    state: Dict[str, Optional[str]] = field(default_factory=dict)
+    checkpoint_id: Optional[int] = None
+    replayed: int = 0
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.state)
+
+
+def _subject(subject_type: str) -> _Subject:
+    try:
+        return SUBJECTS[subject_type]
+    except KeyError:
+        raise ValueError(f"unknown subject_type: {subject_type!r}") from None
+
+
+def snapshot_every() -> int:
+    if has_app_context():
+        value = current_app.config.get("HISTORY_SNAPSHOT_EVERY")
+        if value:
+            return max(int(value), 1)
+    return DEFAULT_SNAPSHOT_EVERY
+
+
+def compress_state(state: Dict[str, Optional[str]]) -> bytes:
+    payload = json.dumps(state, ensure_ascii=False, sort_keys=True)
+    return zlib.compress(payload.encode("utf-8"), 6)
+
+
+def decompress_state(blob: bytes) -> Dict[str, Optional[str]]:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def _apply(state: Dict[str, Optional[str]], field_name: str, new_value) -> None:
+    state[field_name] = None if new_value in (None, EMPTY) else new_value
+
+
+def _bind(model):
+    return {"mapper": sa.inspect(model)}
+
+
+def _latest_snapshot(session, subj: _Subject, subject_id: int, at=None):
+    snap = subj.snapshot
+    stmt = select(snap).where(snap.subject_id == subject_id)
+    if at is not None:
+        stmt = stmt.where(snap.taken_at <= at)
+    stmt = stmt.order_by(snap.changelog_id.desc()).limit(1)
+    return session.execute(stmt, bind_arguments=_bind(snap)).scalars().first()
+
+
+def _log_rows(session, subj: _Subject, subject_id: int, after_snapshot, at=None):
+    log = subj.log
+    stmt = select(log.id, log.field_name, log.new_value, log.timestamp).where(
+        subj.log_subject == subject_id
+    )
+    if after_snapshot is not None:
+        # Range on (subject, timestamp) index, then exact cut on id.
+        stmt = stmt.where(
+            log.timestamp >= after_snapshot.taken_at,
+            log.id > after_snapshot.changelog_id,
+        )
+    if at is not None:
+        stmt = stmt.where(log.timestamp <= at)
+    return session.execute(stmt.order_by(log.id), bind_arguments=_bind(log)).all()
+
+
+def reconstruct(subject_type: str, subject_id: int, at: datetime) -> Reconstruction:
+    """Return the field values of a subject as of *at*.
+
+    ``state`` is empty when the subject did not exist yet (or has no history).
+    """
+    subj = _subject(subject_type)
+    session = db.session
+    result = Reconstruction(subject_type, subject_id, at)
+    snapshot = _latest_snapshot(session, subj, subject_id, at)
+    if snapshot is not None:
+        result.state = decompress_state(snapshot.state)
+        result.checkpoint_id = snapshot.id
+    rows = _log_rows(session, subj, subject_id, snapshot, at)
+    for row in rows:
+        _apply(result.state, row.field_name, row.new_value)
+    result.replayed = len(rows)
+    return result
+
+
+def build_checkpoints(
+    subject_type: str, subject_id: int, every: Optional[int] = None, session=None
+) -> int:
+    """Write snapshots for *subject_id* every *every* rows after the last one.
+
+    Returns the number of snapshots written; the caller commits.
+    """
+    subj = _subject(subject_type)
+    session = session or db.session
+    every = every or snapshot_every()
+    snapshot = _latest_snapshot(session, subj, subject_id)
+    state = decompress_state(snapshot.state) if snapshot is not None else {}
+    count = snapshot.change_count if snapshot is not None else 0
+
+    payload = []
+    pending = 0
+    for row in _log_rows(session, subj, subject_id, snapshot):
+        _apply(state, row.field_name, row.new_value)
+        count += 1
+        pending += 1
+        if pending >= every:
+            payload.append(
+                {
+                    "subject_id": subject_id,
+                    "changelog_id": row.id,
+                    "change_count": count,
+                    "taken_at": row.timestamp,
+                    "state": compress_state(state),
+                }
+            )
+            pending = 0
+    if payload:
+        session.execute(
+            sa.insert(subj.snapshot.__table__),
+            payload,
+            bind_arguments=_bind(subj.snapshot),
+        )
+    return len(payload)
+
+
+def _rows_since_snapshot(session, subj: _Subject, subject_id: int) -> int:
+    snapshot = _latest_snapshot(session, subj, subject_id)
+    log = subj.log
+    stmt = select(func.count()).select_from(log).where(subj.log_subject == subject_id)
+    if snapshot is not None:
+        stmt = stmt.where(
+            log.timestamp >= snapshot.taken_at, log.id > snapshot.changelog_id
+        )
+    return session.execute(stmt, bind_arguments=_bind(log)).scalar_one()
+
+
+def checkpoint_if_due(
+    session, subject_type: str, subject_ids: Iterable[int], every: Optional[int] = None
+) -> int:
+    """Checkpoint the given subjects that accumulated *every* rows or more."""
+    subj = _subject(subject_type)
+    every = every or snapshot_every()
+    written = 0
+    for subject_id in subject_ids:
+        if _rows_since_snapshot(session, subj, subject_id) >= every:
+            written += build_checkpoints(subject_type, subject_id, every, session)
+    return written
+
+
+def build_all_checkpoints(subject_type: str, every: Optional[int] = None) -> dict:
+    """Checkpoint every subject with history; used by the CLI backfill."""
+    subj = _subject(subject_type)
+    session = db.session
+    subject_ids = [
+        sid
+        for (sid,) in session.execute(
+            select(subj.log_subject).distinct().order_by(subj.log_subject),
+            bind_arguments=_bind(subj.log),
+        )
+    ]
+    written = 0
+    for subject_id in subject_ids:
+        written += build_checkpoints(subject_type, subject_id, every, session)
+    return {"subjects": len(subject_ids), "snapshots": written}
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_subjects(session, flush_context, instances):  # noqa: ARG001
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, (Case, Investigation)):
+            pending.append(obj)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _checkpoint_after_flush(session, flush_context):  # noqa: ARG001
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    case_ids = {o.id for o in pending if isinstance(o, Case) and o.id}
+    inv_ids = {o.id for o in pending if isinstance(o, Investigation) and o.id}
+    with session.no_autoflush:
+        if case_ids:
+            checkpoint_if_due(session, "case", sorted(case_ids))
+        if inv_ids:
+            checkpoint_if_due(session, "investigation", sorted(inv_ids))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_on_rollback(session, previous_transaction):  # noqa: ARG001
+    # A failed flush never reaches after_flush_postexec.
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,399 @@
+"""Reconciliation of the upload trees with the attachment records."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app import db
+from app.investigations.models import Investigation, InvestigationAttachment
+from app.models import Case, UploadedFile
+from app.paths import file_safe_case_number
+from app.services import archive, blob_store, cold_storage
+from app.utils.time_utils import now_utc
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+MANIFEST_VERSION = 1
+TEMPLATES_DIR = "DO-NOT-EDIT"
+_RECORDS = {
+    "main": (UploadedFile, UploadedFile.case_id, Case),
+    "examination": (
+        InvestigationAttachment,
+        InvestigationAttachment.investigation_id,
+        Investigation,
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Record:
+    id: int
+    filename: str
+    sha256: Optional[str]
+    size: Optional[int]
+
+
+@dataclass
+class Finding:
+    kind: str
+    bind: str
+    folder: str
+    file: Optional[str] = None
+    record_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+def manifest_path() -> Path:
+    configured = current_app.config.get("RECONCILE_MANIFEST")
+    if configured:
+        return Path(configured)
+    return Path(current_app.instance_path) / "reconcile_manifest.json"
+
+
+def quarantine_dir() -> Path:
+    configured = current_app.config.get("RECONCILE_QUARANTINE")
+    if configured:
+        return Path(configured)
+    return Path(current_app.instance_path) / "reconcile_quarantine"
+
+
+def load_manifest() -> Dict[str, dict]:
+    try:
+        data = json.loads(manifest_path().read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data["dirs"]
+
+
+def _save_manifest(dirs: Dict[str, dict]) -> None:
+    path = manifest_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    tmp.write_text(
+        json.dumps({"version": MANIFEST_VERSION, "dirs": dirs}, sort_keys=True),
+        encoding="utf-8",
+    )
+    os.replace(tmp, path)
+
+
+# --- the two sides -------------------------------------------------------------
+
+
+Records = Dict[str, Dict[str, Dict[str, Record]]]
+
+
+def records() -> Tuple[Records, Dict[str, Set[str]]]:
+    """Records by bind, folder and filename, and each bind's subject folders.
+
+    Two bulk queries per bind, archived rows included; of several rows with
+    one filename the newest wins, as in the download views.
+    """
+    by_folder: Records = {}
+    subjects: Dict[str, Set[str]] = {}
+    with archive.archive_reads():
+        for bind, (model, owner, parent) in _RECORDS.items():
+            numbers = db.session.execute(sa.select(parent.case_number)).scalars()
+            subjects[bind] = {file_safe_case_number(n) for n in numbers}
+            rows = db.session.execute(
+                sa.select(
+                    model.id,
+                    model.filename,
+                    model.sha256,
+                    model.size_bytes,
+                    parent.case_number,
+                )
+                .join(parent, owner == parent.id)
+                .order_by(model.id)
+            )
+            folders = by_folder[bind] = {}
+            for row_id, filename, sha256, size, case_number in rows:
+                folder = folders.setdefault(file_safe_case_number(case_number), {})
+                folder[filename] = Record(row_id, filename, sha256, size)
+    return by_folder, subjects
+
+
+def _scan(
+    folder: Path,
+    key: str,
+    manifest: Dict[str, dict],
+    hash_names: Set[str],
+    full: bool,
+) -> Tuple[Dict[str, dict], Dict[str, int]]:
+    """List *folder*'s tree, reusing unchanged directories from *manifest*.
+
+    Returns the folder's manifest entries (keyed ``<key>/<rel dir>``) and
+    counters.  Top-level files named in *hash_names* are hashed.
+    """
+    dirs: Dict[str, dict] = {}
+    stats = {"listed": 0, "reused": 0, "hashed": 0}
+    pending = [(folder, key)]
+    while pending:
+        path, dir_key = pending.pop()
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            continue
+        previous = manifest.get(dir_key)
+        if previous and previous["mtime_ns"] == mtime_ns and not full:
+            entry = {
+                "mtime_ns": mtime_ns,
+                "files": dict(previous["files"]),
+                "dirs": list(previous["dirs"]),
+            }
+            stats["reused"] += 1
+        else:
+            old_files = previous["files"] if previous else {}
+            entry = {"mtime_ns": mtime_ns, "files": {}, "dirs": []}
+            with os.scandir(path) as listing:
+                for item in listing:
+                    if item.is_dir(follow_symlinks=False):
+                        entry["dirs"].append(item.name)
+                    elif item.is_file(follow_symlinks=False):
+                        st = item.stat()
+                        old = old_files.get(item.name)
+                        sha256 = None
+                        if old and old[:2] == [st.st_size, st.st_mtime_ns]:
+                            sha256 = old[2]
+                        entry["files"][item.name] = [
+                            st.st_size,
+                            st.st_mtime_ns,
+                            sha256,
+                        ]
+            entry["dirs"].sort()
+            stats["listed"] += 1
+        if dir_key == key:
+            for name in hash_names:
+                meta = entry["files"].get(name)
+                if meta and meta[2] is None:
+                    meta[2] = blob_store.hash_file(path / name)
+                    stats["hashed"] += 1
+        dirs[dir_key] = entry
+        pending.extend((path / sub, f"{dir_key}/{sub}") for sub in entry["dirs"])
+    return dirs, stats
+
+
+def _untracked(dirs: Dict[str, dict], key: str, expected) -> List[str]:
+    names = []
+    for dir_key, entry in dirs.items():
+        rel = dir_key[len(key) + 1 :]
+        if rel.split("/")[0] == TEMPLATES_DIR:
+            continue
+        for name in entry["files"]:
+            path = f"{rel}/{name}" if rel else name
+            if name != cold_storage.KEEP and path not in expected:
+                names.append(path)
+    return sorted(names)
+
+
+def _cold_source_present(entry: dict) -> bool:
+    if entry["kind"] == "blob":
+        return blob_store.blob_path(entry["sha256"]).is_file()
+    return True
+
+
+def _check(
+    bind: str,
+    name: str,
+    expected: Dict[str, Record],
+    listing: Optional[dict],
+    index: Dict[str, dict],
+) -> List[Finding]:
+    """Compare one folder's records with its top-level files and cold zip."""
+    findings = []
+    files = listing["files"] if listing else {}
+    for filename, record in sorted(expected.items()):
+        meta = files.get(filename)
+        if meta is not None:
+            size, sha256 = meta[0], meta[2]
+        elif filename in index and _cold_source_present(index[filename]):
+            size, sha256 = index[filename]["size"], index[filename]["sha256"]
+        else:
+            findings.append(Finding("missing", bind, name, filename, record.id))
+            continue
+        if record.size is not None and size != record.size:
+            detail = f"size {size}, recorded {record.size}"
+        elif record.sha256 and sha256 and sha256 != record.sha256:
+            detail = f"sha256 {sha256}, recorded {record.sha256}"
+        else:
+            continue
+        findings.append(Finding("changed", bind, name, filename, record.id, detail))
+    return findings
+
+
+# --- repairs ---------------------------------------------------------------------
+
+
+def _quarantine(path: Path, bind: str, stamp: str) -> Path:
+    rel = path.relative_to(cold_storage.upload_root(bind))
+    target = quarantine_dir() / stamp / bind / rel
+    target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(path), str(target))
+    return target
+
+
+def _repair(finding: Finding, record: Optional[Record], stamp: str) -> Optional[dict]:
+    folder = cold_storage.upload_root(finding.bind) / finding.folder
+    if finding.kind == "orphan":
+        path = folder.with_name(finding.file) if finding.file else folder
+        return {
+            "action": "quarantined",
+            "path": str(path),
+            "to": str(_quarantine(path, finding.bind, stamp)),
+        }
+    if record is None or not record.sha256:
+        return None
+    path = folder / record.filename
+    # Folder files are hard links to their blob: a file overwritten in place
+    # took the blob with it, and relinking would bring the damage back.
+    if not blob_store.verify(record.sha256):
+        return {
+            "action": "unrepairable",
+            "path": str(path),
+            "detail": f"blob {record.sha256} missing or damaged",
+        }
+    repair = {"action": "relinked", "path": str(path)}
+    if finding.kind == "changed" and path.exists():  # else: only its cold copy
+        repair["kept"] = str(_quarantine(path, finding.bind, stamp))
+    blob = blob_store.blob_path(record.sha256)
+    stored = blob_store.StoredBlob(record.sha256, blob.stat().st_size, blob)
+    blob_store.link_into(stored, folder, record.filename)
+    return repair
+
+
+# --- the run ---------------------------------------------------------------------
+
+
+def _list_root(
+    bind: str, root: Path, subjects: Set[str], findings: List[Finding]
+) -> Tuple[List[str], Dict[str, Dict[str, dict]]]:
+    """The folders under *root* and the indexes of its cold zips.
+
+    Orphaned folders and zips and unreadable zips go to *findings*.
+    """
+    with os.scandir(root) as listing:
+        entries = sorted(listing, key=lambda e: e.name)
+    folders, zips = [], {}
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            name = entry.name
+            folders.append(name)
+        elif entry.is_file() and entry.name.endswith(cold_storage.SUFFIX):
+            name = entry.name[: -len(cold_storage.SUFFIX)]
+            try:
+                zips[name] = cold_storage.read_index(Path(entry.path))
+            except (OSError, ValueError, KeyError) as exc:
+                zips[name] = {}
+                findings.append(
+                    Finding("unreadable", bind, name, entry.name, detail=str(exc))
+                )
+        else:
+            continue
+        if name not in subjects:
+            file = None if entry.is_dir(follow_symlinks=False) else entry.name
+            findings.append(Finding("orphan", bind, name, file))
+    return folders, zips
+
+
+def run(
+    *,
+    hash_files: bool = False,
+    full: bool = False,
+    repair: bool = False,
+    workers: Optional[int] = None,
+) -> dict:
+    """Reconcile both upload roots with the records; returns the report."""
+    started = time.monotonic()
+    workers = workers or current_app.config.get("RECONCILE_WORKERS") or DEFAULT_WORKERS
+    manifest = {} if full else load_manifest()
+    expected_by_bind, subjects = records()
+    findings: List[Finding] = []
+    new_manifest: Dict[str, dict] = {}
+    totals = {"folders": 0, "listed": 0, "reused": 0, "hashed": 0, "files": 0}
+    indexes: Dict[Tuple[str, str], Dict[str, dict]] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = []
+        for bind, expected in expected_by_bind.items():
+            root = cold_storage.upload_root(bind)
+            folders, zips = _list_root(bind, root, subjects[bind], findings)
+            indexes.update(((bind, name), index) for name, index in zips.items())
+            for name in folders:
+                wanted = expected.get(name, {})
+                hash_names = (
+                    {f for f, r in wanted.items() if r.sha256} if hash_files else set()
+                )
+                key = f"{bind}/{name}"
+                scan = pool.submit(_scan, root / name, key, manifest, hash_names, full)
+                jobs.append((bind, name, key, scan))
+        scanned = {}
+        for bind, name, key, future in jobs:
+            dirs, stats = future.result()
+            new_manifest.update(dirs)
+            scanned[bind, name] = (key, dirs)
+            totals["folders"] += 1
+            for counter in ("listed", "reused", "hashed"):
+                totals[counter] += stats[counter]
+            totals["files"] += sum(len(d["files"]) for d in dirs.values())
+
+    for bind, expected in expected_by_bind.items():
+        for name in sorted(set(expected) | {n for b, n in scanned if b == bind}):
+            key, dirs = scanned.get((bind, name), (None, {}))
+            wanted = expected.get(name, {})
+            index = indexes.get((bind, name), {})
+            findings.extend(_check(bind, name, wanted, dirs.get(key), index))
+            if key is not None and name in subjects[bind]:
+                findings.extend(
+                    Finding("untracked", bind, name, path)
+                    for path in _untracked(dirs, key, wanted)
+                )
+
+    repairs = []
+    if repair:
+        stamp = now_utc().strftime("%Y%m%dT%H%M%S")
+        for finding in findings:
+            if finding.kind not in ("missing", "changed", "orphan"):
+                continue
+            record = (
+                expected_by_bind[finding.bind].get(finding.folder, {}).get(finding.file)
+            )
+            done = _repair(finding, record, stamp)
+            if done is not None:
+                repairs.append(done)
+    # Repairs touch the directories, so their new mtimes force a relisting
+    _save_manifest(new_manifest)
+
+    counts: Dict[str, int] = {}
+    for finding in findings:
+        counts[finding.kind] = counts.get(finding.kind, 0) + 1
+    report = {
+        "generated_at": now_utc().isoformat(),
+        "hashed": hash_files,
+        "full": full,
+        "workers": workers,
+        "records": sum(
+            len(files)
+            for folders in expected_by_bind.values()
+            for files in folders.values()
+        ),
+        **totals,
+        "counts": counts,
+        "findings": [asdict(f) for f in findings],
+        "repairs": repairs,
+        "seconds": round(time.monotonic() - started, 2),
+    }
+    if repairs:
+        log.info("reconcile: %d repair(s)", len(repairs))
+    return report
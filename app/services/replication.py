@@ -0,0 +1,705 @@
+"""WAL shipping of both binds to a warm, read-only standby (``run_tasks.py replicate``)."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import time
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from app import db
+
+log = logging.getLogger(__name__)
+
+WAL_HEADER_SIZE = 32
+INDEX_HEADER_SIZE = 48
+_INDEX_HEADER = struct.Struct("=IIIBBHIIII")  # ... mxFrame, nPage, aFrameCksum
+FRAME_HEADER_SIZE = 24
+SEGMENT_MAGIC = b"FCWALSEG"
+_SEGMENT_HEADER = struct.Struct(">8sII")  # magic, page size, frame count
+_FRAME = struct.Struct(">II")  # page number, database size if commit frame
+SHIP_STATE = "ship.json"
+REPLAY_STATE = "replay.json"
+PROMOTED = "promoted.json"
+MAX_SEGMENT_FRAMES = 4096
+HEARTBEAT_SECONDS = 10.0
+DEFAULTS = {
+    "REPLICATION_POLL_SECONDS": 1.0,
+    "REPLICATION_CHECKPOINT_FRAMES": 1000,
+    "REPLICATION_SHIPPER_STALE_SECONDS": 300.0,
+    "REPLICATION_MAX_WAL_MB": 1024,
+}
+
+Frame = Tuple[int, int, bytes]
+
+
+class ReplicationError(RuntimeError):
+    pass
+
+
+def _setting(name: str):
+    value = current_app.config.get(name)
+    return DEFAULTS[name] if value is None else value
+
+
+# --- WAL format --------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class WalIndex:
+    """The wal-index (``-shm``) header: what readers of the WAL see."""
+
+    frames: int  # mxFrame: frames of committed transactions
+    page_size: int
+    salts: Tuple[int, int]
+    checksum: Tuple[int, int]  # stored in frame *frames*
+
+
+def _checksum(data: bytes, s0: int, s1: int, big_endian: bool) -> Tuple[int, int]:
+    words = array("I", data)
+    if big_endian != (sys.byteorder == "big"):
+        words.byteswap()
+    for i in range(0, len(words), 2):
+        s0 = (s0 + words[i] + s1) & 0xFFFFFFFF
+        s1 = (s1 + words[i + 1] + s0) & 0xFFFFFFFF
+    return s0, s1
+
+
+def read_wal_index(db_path: Path, attempts: int = 100) -> Optional[WalIndex]:
+    """The wal-index header of *db_path*, or None if there is none yet.
+
+    Read like SQLite's readers do: the header is stored twice and only used
+    when both copies agree and the checksum (native byte order) is right.
+    """
+    shm = Path(f"{db_path}-shm")
+    for _ in range(attempts):
+        try:
+            with open(shm, "rb") as fh:
+                raw = fh.read(2 * INDEX_HEADER_SIZE)
+        except FileNotFoundError:
+            return None
+        if len(raw) < 2 * INDEX_HEADER_SIZE:
+            return None
+        first = raw[:INDEX_HEADER_SIZE]
+        if first == raw[INDEX_HEADER_SIZE:]:
+            _v, _u, _change, is_init, _big, size, frames, _pages, c1, c2 = (
+                _INDEX_HEADER.unpack(first[:32])
+            )
+            if not is_init:
+                return None
+            native = sys.byteorder == "big"
+            if _checksum(first[:40], 0, 0, native) == struct.unpack("=II", first[40:]):
+                return WalIndex(
+                    frames,
+                    65536 if size == 1 else size,
+                    struct.unpack(">II", first[32:40]),  # copied from the WAL
+                    (c1, c2),
+                )
+        time.sleep(0.001)  # a writer is updating it
+    raise ReplicationError(f"{shm.name}: wal-index header keeps changing")
+
+
+def read_frames(
+    wal_path: Path, index: WalIndex, start: int, *, limit: Optional[int] = None
+) -> Tuple[List[Frame], int, Optional[Tuple[int, int]]]:
+    """Committed frames of the WAL from frame index *start* on.
+
+    Reads up to ``index.frames``; with *limit* stops at the first commit
+    frame after that many.  Returns ``(frames, end, checksum)``: *end* is
+    the index after the last frame returned (always a commit frame) and
+    *checksum* the checksum stored in it.  Frames of another WAL (it was
+    started over since *index* was read) end the read early.
+    """
+    frame_size = FRAME_HEADER_SIZE + index.page_size
+    frames: List[Frame] = []
+    end, checksum = start, None
+    with open(wal_path, "rb") as fh:
+        fh.seek(WAL_HEADER_SIZE + start * frame_size)
+        for position in range(start, index.frames):
+            raw = fh.read(frame_size)
+            if len(raw) < frame_size:
+                break
+            pgno, commit, salt1, salt2, c1, c2 = struct.unpack(">6I", raw[:24])
+            if (salt1, salt2) != index.salts:
+                break
+            frames.append((pgno, commit, raw[FRAME_HEADER_SIZE:]))
+            if commit:
+                end, checksum = position + 1, (c1, c2)
+                if limit is not None and len(frames) >= limit:
+                    break
+    return frames[: end - start], end, checksum
+
+
+def _frame_checksum(wal_path: Path, index: WalIndex, position: int):
+    """The checksum stored in frame *position*, if it belongs to this WAL."""
+    with open(wal_path, "rb") as fh:
+        fh.seek(WAL_HEADER_SIZE + position * (FRAME_HEADER_SIZE + index.page_size))
+        raw = fh.read(FRAME_HEADER_SIZE)
+    if len(raw) < FRAME_HEADER_SIZE:
+        return None
+    _pgno, _commit, salt1, salt2, c1, c2 = struct.unpack(">6I", raw)
+    return (c1, c2) if (salt1, salt2) == index.salts else None
+
+
+# --- standby files -----------------------------------------------------------
+
+
+def _load(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def _fsync_replace(tmp: Path, dest: Path) -> None:
+    with open(tmp, "rb+") as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp, dest)
+
+
+def _save(path: Path, data: dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
+    _fsync_replace(tmp, path)
+
+
+def _segment_name(generation: int, seq: int) -> str:
+    return f"{generation:06d}-{seq:010d}.seg"
+
+
+def _segments(directory: Path, generation: int) -> List[Tuple[int, Path]]:
+    found = []
+    for path in (directory / "segments").glob(f"{generation:06d}-*.seg"):
+        found.append((int(path.stem.split("-")[1]), path))
+    return sorted(found)
+
+
+def write_segment(path: Path, page_size: int, frames: List[Frame]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(_SEGMENT_HEADER.pack(SEGMENT_MAGIC, page_size, len(frames)))
+        for pgno, commit, page in frames:
+            fh.write(_FRAME.pack(pgno, commit))
+            fh.write(page)
+    _fsync_replace(tmp, path)
+
+
+def read_segment(path: Path) -> Tuple[int, List[Frame]]:
+    with open(path, "rb") as fh:
+        magic, page_size, count = _SEGMENT_HEADER.unpack(fh.read(_SEGMENT_HEADER.size))
+        if magic != SEGMENT_MAGIC:
+            raise ReplicationError(f"{path.name} is not a WAL segment")
+        frames = []
+        for _ in range(count):
+            pgno, commit = _FRAME.unpack(fh.read(_FRAME.size))
+            page = fh.read(page_size)
+            if len(page) < page_size:
+                raise ReplicationError(f"{path.name} is truncated")
+            frames.append((pgno, commit, page))
+    return page_size, frames
+
+
+def _check_not_promoted(directory: Path) -> None:
+    if (directory / PROMOTED).exists():
+        raise ReplicationError(f"standby {directory.name} has been promoted")
+
+
+# --- primary side ------------------------------------------------------------
+
+
+class Shipper:
+    """Ships the committed WAL frames of one database to ``<root>/<name>/``."""
+
+    def __init__(
+        self, name: str, db_path, root, *, checkpoint_frames: int = 1000
+    ) -> None:
+        self.name = name
+        self.db_path = Path(db_path)
+        self.wal_path = Path(f"{self.db_path}-wal")
+        self.dir = Path(root) / name
+        self.checkpoint_frames = checkpoint_frames
+        self.state = _load(self.dir / SHIP_STATE)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._verified = False  # position proven against this WAL
+        self._saved_at = 0.0
+        self._checkpointed: Optional[tuple] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), isolation_level=None, timeout=30)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _save_state(self, state: dict, *, changed: bool) -> None:
+        state["updated_at"] = time.time()
+        self.state = state
+        if changed or state["updated_at"] - self._saved_at >= HEARTBEAT_SECONDS:
+            _save(self.dir / SHIP_STATE, state)
+            self._saved_at = state["updated_at"]
+
+    def _continues(self, index: Optional[WalIndex]) -> bool:
+        if self._verified:
+            return True
+        # First look at the WAL since this shipper started: it continues the
+        # shipped position only if the WAL still holds the last shipped frame.
+        state = self.state
+        if index is None or tuple(state["salts"] or ()) != index.salts:
+            return False
+        if state["frames"] == 0:
+            return True
+        stored = _frame_checksum(self.wal_path, index, state["frames"] - 1)
+        return stored == tuple(state["checksum"] or ())
+
+    def sync(self) -> int:
+        """Ship the transactions committed since the last call; returns frames."""
+        _check_not_promoted(self.dir)
+        if self._conn is None:
+            # Opens (or recovers) the wal-index and keeps the WAL from being
+            # checkpointed away when the app closes its last connection.
+            self._conn = self._connect()
+            self._conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        index = read_wal_index(self.db_path)
+        if self.state is None or not self._continues(index):
+            return self.resync()
+        self._verified = True
+        if index is None:
+            self._save_state(dict(self.state), changed=False)
+            return 0
+        shipped = 0
+        while True:
+            count = self._ship(index)
+            shipped += count
+            if count < MAX_SEGMENT_FRAMES:
+                return shipped
+
+    def _ship(self, index: WalIndex) -> int:
+        """Write the next segment (about MAX_SEGMENT_FRAMES frames at most)."""
+        state = dict(self.state)
+        restarted = tuple(state["salts"] or ()) != index.salts
+        # After our checkpoint the next writer starts the WAL over.
+        start = 0 if restarted else state["frames"]
+        frames, end, checksum = read_frames(
+            self.wal_path, index, start, limit=MAX_SEGMENT_FRAMES
+        )
+        if frames:
+            state["seq"] += 1
+            name = _segment_name(state["generation"], state["seq"])
+            write_segment(self.dir / "segments" / name, index.page_size, frames)
+            state["checksum"] = list(checksum)
+        elif restarted:
+            state["checksum"] = None
+        state.update(salts=list(index.salts), frames=end)
+        self._save_state(state, changed=bool(frames) or restarted)
+        return len(frames)
+
+    def needs_checkpoint(self) -> bool:
+        if self.state is None or self.state["frames"] < self.checkpoint_frames:
+            return False
+        position = (tuple(self.state["salts"]), self.state["frames"])
+        return self._checkpointed != position
+
+    def checkpoint(self) -> bool:
+        """Ship the tail with writers held off, then checkpoint the WAL.
+
+        Returns True when every frame was copied into the database, i.e. the
+        next writer starts the WAL over.
+        """
+        if self._conn is None:
+            self._conn = self._connect()
+        writer = self._connect()
+        writer.execute("PRAGMA busy_timeout=5000")
+        try:
+            try:
+                writer.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:  # busy writers: next round
+                return False
+            self.sync()
+            _busy, wal_frames, backfilled = self._conn.execute(
+                "PRAGMA wal_checkpoint(PASSIVE)"
+            ).fetchone()
+        finally:
+            if writer.in_transaction:
+                writer.execute("ROLLBACK")
+            writer.close()
+        done = wal_frames == backfilled
+        if done:
+            self._checkpointed = (tuple(self.state["salts"]), self.state["frames"])
+        return done
+
+    def resync(self) -> int:
+        """Start a new generation from an online snapshot of the database."""
+        self.dir.joinpath("segments").mkdir(parents=True, exist_ok=True)
+        writer = self._connect()
+        reader = sqlite3.connect(
+            f"file:{self.db_path.as_posix()}?mode=ro",
+            uri=True,
+            isolation_level=None,
+            timeout=30,
+        )
+        generation = (self.state or {}).get("generation", 0) + 1
+        base = self.dir / f"base-{generation}.db"
+        try:
+            mode = writer.execute("PRAGMA journal_mode").fetchone()[0]
+            if mode.lower() != "wal":
+                raise ReplicationError(f"{self.db_path.name} is not in WAL mode")
+            # Pin the snapshot and its WAL position while no one writes ...
+            writer.execute("BEGIN IMMEDIATE")
+            reader.execute("BEGIN")
+            reader.execute("SELECT count(*) FROM sqlite_master").fetchone()
+            index = read_wal_index(self.db_path)
+            end = index.frames if index else 0
+            checksum = _frame_checksum(self.wal_path, index, end - 1) if end else None
+            writer.execute("ROLLBACK")
+            # ... then copy it without blocking them.
+            tmp = base.with_name(base.name + ".tmp")
+            target = sqlite3.connect(str(tmp))
+            try:
+                reader.backup(target, pages=1024)
+            finally:
+                target.close()
+            _fsync_replace(tmp, base)
+        finally:
+            if writer.in_transaction:
+                writer.execute("ROLLBACK")
+            writer.close()
+            reader.close()
+        state = {
+            "generation": generation,
+            "seq": 0,
+            "salts": list(index.salts) if index else None,
+            "frames": end,
+            "checksum": list(checksum) if checksum else None,
+        }
+        self._save_state(state, changed=True)
+        self._verified = True
+        for path in self.dir.glob("base-*.db"):
+            if path != base:
+                path.unlink()
+        for path in (self.dir / "segments").glob("*.seg"):
+            if not path.name.startswith(f"{generation:06d}-"):
+                path.unlink()
+        log.info("replication: %s resynced as generation %s", self.name, generation)
+        return 0
+
+
+# --- standby side ------------------------------------------------------------
+
+
+def _stamp(fh, counter: int, page_count: int) -> None:
+    """Mark the copy as a rollback-journal database changed by *counter*."""
+    fh.seek(18)
+    fh.write(b"\x01\x01")  # file format versions: legacy (not WAL)
+    fh.seek(24)
+    fh.write(struct.pack(">II", counter, page_count))  # change counter, size
+    fh.seek(92)
+    fh.write(struct.pack(">I", counter))  # version-valid-for
+
+
+class Replayer:
+    """Applies shipped segments to the warm copy ``<root>/<name>/<name>.db``."""
+
+    def __init__(self, name: str, root) -> None:
+        self.name = name
+        self.dir = Path(root) / name
+        self.db_path = self.dir / f"{name}.db"
+
+    def _restore_base(self, generation: int) -> dict:
+        tmp = self.db_path.with_name(self.db_path.name + ".tmp")
+        shutil.copyfile(self.dir / f"base-{generation}.db", tmp)
+        with open(tmp, "r+b") as fh:
+            header = fh.read(100)
+            page_size = struct.unpack(">H", header[16:18])[0]
+            page_size = 65536 if page_size == 1 else page_size
+            counter = struct.unpack(">I", header[24:28])[0] + 1
+            _stamp(fh, counter, os.fstat(fh.fileno()).st_size // page_size)
+        _fsync_replace(tmp, self.db_path)
+        return {"generation": generation, "seq": 0, "counter": counter}
+
+    def _apply(self, segment: Path, counter: int) -> None:
+        page_size, frames = read_segment(segment)
+        lock = sqlite3.connect(str(self.db_path), isolation_level=None, timeout=60)
+        try:
+            with open(self.db_path, "r+b") as fh:
+                # Readers wait while the pages are replaced.
+                lock.execute("BEGIN EXCLUSIVE")
+                for pgno, _commit, page in frames:
+                    fh.seek((pgno - 1) * page_size)
+                    fh.write(page)
+                size = frames[-1][1]
+                fh.truncate(size * page_size)
+                _stamp(fh, counter, size)
+                fh.flush()
+                os.fsync(fh.fileno())
+                lock.execute("COMMIT")
+        finally:
+            lock.close()
+
+    def apply(self) -> int:
+        """Replay the segments that have arrived; returns how many."""
+        _check_not_promoted(self.dir)
+        ship = _load(self.dir / SHIP_STATE)
+        if ship is None:
+            return 0
+        state = _load(self.dir / REPLAY_STATE)
+        if state is None or state["generation"] != ship["generation"]:
+            state = self._restore_base(ship["generation"])
+            state["applied_at"] = time.time()
+            _save(self.dir / REPLAY_STATE, state)
+        applied = 0
+        for seq, path in _segments(self.dir, state["generation"]):
+            if seq <= state["seq"]:
+                path.unlink()
+                continue
+            if seq != state["seq"] + 1:
+                raise ReplicationError(
+                    f"{self.name}: segment {state['seq'] + 1} is missing"
+                )
+            state["counter"] += 1
+            self._apply(path, state["counter"])
+            state.update(seq=seq, applied_at=time.time())
+            _save(self.dir / REPLAY_STATE, state)
+            path.unlink()
+            applied += 1
+        return applied
+
+
+def promote(root, names, *, targets: Optional[Dict[str, Path]] = None) -> dict:
+    """Make the standby copies primaries.
+
+    Replays what has arrived, checks each copy and switches it to WAL mode.
+    With *targets* (``{name: database path}``) the copy is also installed
+    there; the files it replaces are kept as ``<file>.failed-<stamp>``.
+    Shipping and replay into the standby directory stop afterwards.
+    """
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    report = {}
+    for name in names:
+        replayer = Replayer(name, root)
+        applied = replayer.apply()
+        conn = sqlite3.connect(str(replayer.db_path), isolation_level=None)
+        try:
+            check = conn.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise ReplicationError(f"standby {name} failed quick_check: {check}")
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+        state = _load(replayer.dir / REPLAY_STATE) or {}
+        info = {
+            "generation": state.get("generation"),
+            "segment": state.get("seq"),
+            "applied": applied,
+            "path": str(replayer.db_path),
+        }
+        if targets:
+            dest = Path(targets[name])
+            for suffix in ("", "-wal", "-shm"):
+                old = Path(f"{dest}{suffix}")
+                if old.exists():
+                    old.rename(f"{old}.failed-{stamp}")
+            shutil.copyfile(replayer.db_path, dest)
+            info["installed"] = str(dest)
+        _save(replayer.dir / PROMOTED, dict(info, promoted_at=stamp))
+        report[name] = info
+    return report
+
+
+def status(root, primaries: Dict[str, Path], now: Optional[float] = None) -> dict:
+    """Replication lag per database.
+
+    ``lag_seconds`` is the age of the oldest shipped segment not yet
+    replayed, ``unshipped_frames`` what the primary's WAL holds beyond the
+    shipped position and ``shipper_age`` the time since the shipper last
+    reported in.  ``wal_bytes`` is the size of the primary's WAL file.
+    """
+    now = time.time() if now is None else now
+    result = {}
+    for name, db_path in primaries.items():
+        directory = Path(root) / name
+        ship = _load(directory / SHIP_STATE)
+        replay = _load(directory / REPLAY_STATE) or {}
+        info: dict = {
+            "promoted": (directory / PROMOTED).exists(),
+            "wal_bytes": wal_bytes(db_path),
+        }
+        if ship is None:
+            result[name] = dict(info, shipping=False)
+            continue
+        applied = (
+            replay.get("seq", 0)
+            if replay.get("generation") == ship["generation"]
+            else -1
+        )
+        pending = [
+            path
+            for seq, path in _segments(directory, ship["generation"])
+            if seq > applied
+        ]
+        oldest = min((p.stat().st_mtime for p in pending), default=None)
+        info.update(
+            shipping=True,
+            generation=ship["generation"],
+            shipped_segment=ship["seq"],
+            applied_segment=max(applied, 0),
+            pending_segments=len(pending),
+            lag_seconds=round(max(0.0, now - oldest), 3) if oldest else 0.0,
+            shipper_age=round(now - ship.get("updated_at", now), 3),
+            applied_at=replay.get("applied_at"),
+            unshipped_frames=_unshipped(Path(db_path), ship),
+        )
+        result[name] = info
+    return result
+
+
+def replica_lag(root, name: str, db_path, now: Optional[float] = None):
+    """Seconds the warm copy of *name* may be behind; None if not readable.
+
+    Zero when everything the primary committed has been replayed, else the
+    age of the oldest segment waiting for replay or, with frames not yet
+    shipped, of the shipper's last report.
+    """
+    directory = Path(root) / name
+    ship = _load(directory / SHIP_STATE)
+    replay = _load(directory / REPLAY_STATE)
+    if (
+        ship is None
+        or replay is None
+        or replay["generation"] != ship["generation"]
+        or (directory / PROMOTED).exists()
+        or not (directory / f"{name}.db").exists()
+    ):
+        return None
+    now = time.time() if now is None else now
+    pending = [
+        path
+        for seq, path in _segments(directory, ship["generation"])
+        if seq > replay["seq"]
+    ]
+    if pending:
+        return max(0.0, now - min(path.stat().st_mtime for path in pending))
+    if _unshipped(Path(db_path), ship):
+        return max(0.0, now - ship.get("updated_at", 0.0))
+    return 0.0
+
+
+def wal_bytes(db_path) -> int:
+    try:
+        return os.path.getsize(f"{db_path}-wal")
+    except OSError:
+        return 0
+
+
+def overdue_checkpoint(
+    root, name: str, db_path, now: Optional[float] = None
+) -> Optional[str]:
+    """Why the app should checkpoint *name*'s WAL itself; None if it should not.
+
+    The app leaves checkpoints to the shipper, so a stopped or lagging
+    shipper would let the WAL grow without limit.  Past
+    ``REPLICATION_SHIPPER_STALE_SECONDS`` without a report from the shipper,
+    or past ``REPLICATION_MAX_WAL_MB``, the WAL is checkpointed anyway and
+    the shipper starts a new generation when it catches up.
+    """
+    now = time.time() if now is None else now
+    size = wal_bytes(db_path)
+    if not size:
+        return None
+    limit = _setting("REPLICATION_MAX_WAL_MB")
+    if limit and size > limit * 1024 * 1024:
+        return f"WAL is {size} bytes, over {limit} MB"
+    ship = _load(Path(root) / name / SHIP_STATE)
+    if ship is None:
+        return "no shipper has reported"
+    age = now - ship.get("updated_at", 0.0)
+    stale = _setting("REPLICATION_SHIPPER_STALE_SECONDS")
+    if age > stale:
+        return f"shipper last reported {age:.0f} s ago"
+    return None
+
+
+def _unshipped(db_path: Path, ship: dict) -> int:
+    index = read_wal_index(db_path)
+    if index is None:
+        return 0
+    if tuple(ship["salts"] or ()) == index.salts:
+        return max(0, index.frames - ship["frames"])
+    return index.frames
+
+
+# --- app wiring --------------------------------------------------------------
+
+
+def standby_root() -> Path:
+    configured = current_app.config.get("REPLICATION_STANDBY_DIR")
+    if not configured:
+        raise ReplicationError("REPLICATION_STANDBY_DIR is not set")
+    return Path(configured)
+
+
+def primaries() -> Dict[str, Path]:
+    """Database file of each bind that can be replicated."""
+    from app.services.db_maintenance import engines
+    from app.utils.sqlite import is_file_engine
+
+    return {
+        name: Path(engine.url.database)
+        for name, engine in engines().items()
+        if is_file_engine(engine)
+    }
+
+
+def run(
+    *,
+    once: bool = False,
+    poll_interval: Optional[float] = None,
+    ship: bool = True,
+    replay: bool = True,
+) -> Dict[str, int]:
+    """Ship and/or replay until stopped (one round with *once*)."""
+    root = standby_root()
+    if poll_interval is None:
+        poll_interval = _setting("REPLICATION_POLL_SECONDS")
+    checkpoint_frames = _setting("REPLICATION_CHECKPOINT_FRAMES")
+    names = primaries()
+    db.session.remove()
+    shippers = [
+        Shipper(name, path, root, checkpoint_frames=checkpoint_frames)
+        for name, path in names.items()
+        if ship
+    ]
+    replayers = [Replayer(name, root) for name in names if replay]
+    totals = {"frames": 0, "checkpoints": 0, "segments": 0}
+    try:
+        while True:
+            for shipper in shippers:
+                totals["frames"] += shipper.sync()
+                if shipper.needs_checkpoint() and shipper.checkpoint():
+                    totals["checkpoints"] += 1
+            for replayer in replayers:
+                totals["segments"] += replayer.apply()
+            if once:
+                return totals
+            time.sleep(poll_interval)
+    finally:
+        for shipper in shippers:
+            shipper.close()
+
+
+def metrics() -> dict:
+    """:func:`status` for the configured standby (``{}`` when not configured)."""
+    if not current_app.config.get("REPLICATION_STANDBY_DIR"):
+        return {}
+    return status(standby_root(), primaries())
@@ -0,0 +1,562 @@
+"""Persistent job scheduler (``python run_scheduler.py``)."""
+
+from __future__ import annotations
+
+import importlib
+import multiprocessing
+import os
+import socket
+import time
+from calendar import monthrange
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import ScheduledJob, ScheduledJobRun
+from app.utils.time_utils import BUDAPEST_TZ, now_utc
+
+STATUS_RUNNING = "running"
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+
+TRIGGER_SCHEDULE = "schedule"
+TRIGGER_MANUAL = "manual"
+
+DEFAULT_TIMEOUT = 600
+DEFAULT_PROCESSES = 2
+DEFAULT_HISTORY_DAYS = 30
+LEASE_GRACE_SECONDS = 60
+
+# Modules whose import registers jobs.
+JOB_MODULES = (
+    "app.services.scheduler",
+    "app.services.deadline_digest",
+    "app.services.email_outbox",
+    "app.services.document_jobs",
+    "app.services.db_maintenance",
+    "app.services.backups",
+    "app.services.archive",
+    "app.services.cold_storage",
+)
+
+
+@dataclass(frozen=True)
+class JobSpec:
+    name: str
+    fn: Callable[[], object]
+    schedule: str
+    timeout: int = DEFAULT_TIMEOUT
+    lock_group: Optional[str] = None
+    description: str = ""
+
+
+JOBS: Dict[str, JobSpec] = {}
+
+
+def job(
+    name: str,
+    *,
+    schedule: str,
+    timeout: int = DEFAULT_TIMEOUT,
+    group: Optional[str] = None,
+):
+    """Register the decorated callable as scheduled job *name*.
+
+    The callable runs inside an app context and takes no arguments; its
+    (JSON-serialisable) return value is stored with the run.
+    """
+    next_fire(schedule, now_utc())  # reject bad expressions at import time
+
+    def decorator(fn):
+        doc = (fn.__doc__ or "").strip().splitlines()
+        JOBS[name] = JobSpec(name, fn, schedule, timeout, group, doc[0] if doc else "")
+        return fn
+
+    return decorator
+
+
+def load_jobs() -> Dict[str, JobSpec]:
+    for module in JOB_MODULES:
+        importlib.import_module(module)
+    return JOBS
+
+
+# --- schedules ---------------------------------------------------------------
+
+_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _field(text: str, low: int, high: int) -> Optional[frozenset]:
+    """Values of one cron field; ``None`` for an unrestricted ``*``."""
+    if text == "*":
+        return None
+    values = set()
+    for part in text.split(","):
+        spec, _, step = part.partition("/")
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start, end = (int(v) for v in spec.split("-", 1))
+        else:
+            start = end = int(spec)
+            if step:
+                end = high
+        if not (low <= start <= end <= high):
+            raise ValueError(f"cron field out of range: {text!r}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return frozenset(values)
+
+
+def _every(expr: str) -> Optional[timedelta]:
+    if not expr.startswith("@every "):
+        return None
+    value = expr[len("@every ") :].strip()
+    seconds = int(value[:-1]) * _UNITS[value[-1]] if value[-1] in _UNITS else 0
+    if seconds <= 0:
+        raise ValueError(f"bad interval: {expr!r}")
+    return timedelta(seconds=seconds)
+
+
+def next_fire(expr: str, after: datetime) -> datetime:
+    """First time strictly after *after* (aware) matching schedule *expr*."""
+    expr = _ALIASES.get(expr.strip(), expr.strip())
+    interval = _every(expr)
+    if interval is not None:
+        return after + interval
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"cron expression needs 5 fields: {expr!r}")
+    minutes, hours, days, months, weekdays = (
+        _field(text, *bounds) for text, bounds in zip(fields, _RANGES, strict=True)
+    )
+    if weekdays is not None:  # cron: 0 and 7 are Sunday; Python: Monday is 0
+        weekdays = frozenset((d - 1) % 7 for d in weekdays)
+
+    def day_matches(t: datetime) -> bool:
+        dom = days is None or t.day in days
+        dow = weekdays is None or t.weekday() in weekdays
+        if days is not None and weekdays is not None:
+            return dom or dow
+        return dom and dow
+
+    # Wall-clock search in Budapest time, minute resolution.
+    t = after.astimezone(BUDAPEST_TZ).replace(tzinfo=None, second=0, microsecond=0)
+    t += timedelta(minutes=1)
+    limit = t + timedelta(days=366 * 5)
+    while t < limit:
+        if months is not None and t.month not in months:
+            last = monthrange(t.year, t.month)[1]
+            t = t.replace(day=last, hour=0, minute=0) + timedelta(days=1)
+        elif not day_matches(t):
+            t = t.replace(hour=0, minute=0) + timedelta(days=1)
+        elif hours is not None and t.hour not in hours:
+            t = t.replace(minute=0) + timedelta(hours=1)
+        elif minutes is not None and t.minute not in minutes:
+            t += timedelta(minutes=1)
+        else:
+            return t.replace(tzinfo=BUDAPEST_TZ).astimezone(timezone.utc)
+    raise ValueError(f"cron expression never fires: {expr!r}")
+
+
+# --- job table and leases ----------------------------------------------------
+
+
+def _schedule_of(spec: JobSpec) -> str:
+    overrides = current_app.config.get("SCHEDULER_SCHEDULES") or {}
+    return overrides.get(spec.name, spec.schedule)
+
+
+def sync_jobs(now: Optional[datetime] = None) -> int:
+    """Create/update the ``scheduled_job`` rows of the registered jobs.
+
+    Returns how many rows were created or changed.
+    """
+    now = now or now_utc()
+    disabled = set(current_app.config.get("SCHEDULER_DISABLED_JOBS") or ())
+    rows = {row.name: row for row in ScheduledJob.query.all()}
+    changed = 0
+    for spec in load_jobs().values():
+        schedule = _schedule_of(spec)
+        enabled = spec.name not in disabled
+        row = rows.get(spec.name)
+        if row is None:
+            row = ScheduledJob(name=spec.name, next_run_at=next_fire(schedule, now))
+            db.session.add(row)
+        elif (row.schedule, row.enabled, row.lock_group) == (
+            schedule,
+            enabled,
+            spec.lock_group,
+        ):
+            continue
+        elif row.schedule != schedule:
+            row.next_run_at = next_fire(schedule, now)
+        row.schedule = schedule
+        row.enabled = enabled
+        row.lock_group = spec.lock_group
+        changed += 1
+    try:
+        db.session.commit()
+    except IntegrityError:  # another scheduler synced concurrently
+        db.session.rollback()
+    return changed
+
+
+def acquire(
+    name: str, worker: str, *, now: Optional[datetime] = None, due: bool = True
+) -> bool:
+    """Take the lease of job *name* for *worker*; ``True`` if this run may start.
+
+    With *due* the job must be enabled and due; the next run is then moved
+    to the job's next fire time.  The lease is refused while another worker
+    holds it or holds a lease in the job's lock group.
+    """
+    now = now or now_utc()
+    spec = JOBS[name]
+    other = aliased(ScheduledJob)
+    group_busy = (
+        sa.select(other.name)
+        .where(
+            other.lock_group == ScheduledJob.lock_group,
+            other.name != ScheduledJob.name,
+            other.lease_owner.isnot(None),
+            other.lease_expires_at > now,
+        )
+        .exists()
+    )
+    values = {
+        "lease_owner": worker,
+        "lease_expires_at": now + timedelta(seconds=spec.timeout + LEASE_GRACE_SECONDS),
+        "last_started_at": now,
+        "last_status": STATUS_RUNNING,
+    }
+    conditions = [
+        ScheduledJob.name == name,
+        sa.or_(
+            ScheduledJob.lease_owner.is_(None), ScheduledJob.lease_expires_at <= now
+        ),
+        sa.or_(ScheduledJob.lock_group.is_(None), ~group_busy),
+    ]
+    if due:
+        row = db.session.get(ScheduledJob, name)
+        if row is None:
+            return False
+        conditions += [
+            ScheduledJob.enabled.is_(True),
+            ScheduledJob.next_run_at <= now,
+        ]
+        values["next_run_at"] = next_fire(row.schedule, now)
+    res = db.session.execute(
+        sa.update(ScheduledJob)
+        .where(*conditions)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return res.rowcount == 1
+
+
+def release(name: str, worker: str, status: str, error: Optional[str] = None) -> bool:
+    """Give the lease back and record the outcome; ``False`` if it was lost."""
+    res = db.session.execute(
+        sa.update(ScheduledJob)
+        .where(ScheduledJob.name == name, ScheduledJob.lease_owner == worker)
+        .values(
+            lease_owner=None,
+            lease_expires_at=None,
+            last_finished_at=now_utc(),
+            last_status=status,
+            last_error=error,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return res.rowcount == 1
+
+
+def due_jobs(now: Optional[datetime] = None) -> List[str]:
+    """Names of the enabled, registered jobs whose next run has come."""
+    now = now or now_utc()
+    names = db.session.execute(
+        sa.select(ScheduledJob.name)
+        .where(ScheduledJob.enabled.is_(True), ScheduledJob.next_run_at <= now)
+        .order_by(ScheduledJob.next_run_at)
+    ).scalars()
+    return [name for name in names if name in JOBS]
+
+
+def trigger(name: str, at: Optional[datetime] = None) -> None:
+    """Make job *name* due at *at* (default: now), e.g. for a deferred run."""
+    if name not in load_jobs():
+        raise KeyError(name)
+    sync_jobs()
+    db.session.execute(
+        sa.update(ScheduledJob)
+        .where(ScheduledJob.name == name)
+        .values(next_run_at=at or now_utc())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+# --- runs --------------------------------------------------------------------
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (bool, int, float, str, list, dict)):
+        return value
+    return repr(value)
+
+
+def _error_text(exc: BaseException) -> str:
+    return f"{exc.__class__.__name__}: {exc}"[:500]
+
+
+def _start_run(name: str, worker: str, trigger: str) -> ScheduledJobRun:
+    run = ScheduledJobRun(
+        job_name=name,
+        worker=worker,
+        trigger=trigger,
+        status=STATUS_RUNNING,
+        started_at=now_utc(),
+    )
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+
+def _finish_run(
+    run: ScheduledJobRun, worker: str, status: str, result=None, error=None
+) -> ScheduledJobRun:
+    finished = now_utc()
+    started = run.started_at
+    if started.tzinfo is None:
+        started = started.replace(tzinfo=timezone.utc)
+    run.status = status
+    run.finished_at = finished
+    run.duration_ms = int((finished - started).total_seconds() * 1000)
+    run.result = _jsonable(result)
+    run.error = error
+    db.session.commit()
+    if not release(run.job_name, worker, status, error):
+        current_app.logger.warning(
+            "Job %s finished after its lease expired (worker %s)", run.job_name, worker
+        )
+    log = current_app.logger.info if status == STATUS_OK else current_app.logger.error
+    log("Job %s %s in %d ms: %s", run.job_name, status, run.duration_ms, error or "")
+    return run
+
+
+def _run_inline(name: str, worker: str, trigger: str) -> ScheduledJobRun:
+    run = _start_run(name, worker, trigger)
+    try:
+        result = JOBS[name].fn()
+    except Exception as exc:  # noqa: BLE001
+        db.session.rollback()
+        current_app.logger.exception("Job %s failed", name)
+        return _finish_run(run, worker, STATUS_FAILED, error=_error_text(exc))
+    return _finish_run(run, worker, STATUS_OK, result)
+
+
+def run_job_now(name: str, worker: Optional[str] = None) -> Optional[ScheduledJobRun]:
+    """Run job *name* in this process, due or not.
+
+    Returns the run, or ``None`` if another worker holds the job's lease.
+    """
+    if name not in load_jobs():
+        raise KeyError(name)
+    sync_jobs()
+    worker = worker or _worker_id()
+    if not acquire(name, worker, due=False):
+        return None
+    return _run_inline(name, worker, TRIGGER_MANUAL)
+
+
+def _child(name: str, testing: bool, conn) -> None:
+    """Process entry point of one run: result or error goes to *conn*."""
+    from app import create_app
+
+    app = create_app({"TESTING": True} if testing else None)
+    with app.app_context():
+        try:
+            load_jobs()
+            result = (STATUS_OK, _jsonable(JOBS[name].fn()))
+        except Exception as exc:  # noqa: BLE001
+            app.logger.exception("Job %s failed", name)
+            result = (STATUS_FAILED, _error_text(exc))
+    conn.send(result)
+    conn.close()
+
+
+@dataclass
+class _Running:
+    run: ScheduledJobRun
+    process: multiprocessing.Process
+    conn: object
+    deadline: float
+
+
+def _spawn(name: str, worker: str, trigger: str) -> _Running:
+    run = _start_run(name, worker, trigger)
+    parent, child = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_child,
+        args=(name, bool(current_app.config.get("TESTING")), child),
+        name=f"job-{name}",
+    )
+    process.start()
+    child.close()
+    return _Running(run, process, parent, time.monotonic() + JOBS[name].timeout)
+
+
+def _reap(running: Dict[str, _Running], worker: str) -> List[ScheduledJobRun]:
+    """Record finished and time out overdue runs; returns the recorded ones."""
+    done = []
+    for name, entry in list(running.items()):
+        if entry.conn.poll():
+            try:
+                status, payload = entry.conn.recv()
+            except EOFError:
+                status, payload = STATUS_FAILED, "job process exited"
+            entry.process.join()
+        elif not entry.process.is_alive():
+            entry.process.join()
+            status = STATUS_FAILED
+            payload = f"job process exited with code {entry.process.exitcode}"
+        elif time.monotonic() > entry.deadline:
+            entry.process.terminate()
+            entry.process.join(5)
+            if entry.process.is_alive():
+                entry.process.kill()
+                entry.process.join()
+            status = STATUS_TIMEOUT
+            payload = f"timed out after {JOBS[name].timeout} s"
+        else:
+            continue
+        entry.conn.close()
+        del running[name]
+        if status == STATUS_OK:
+            done.append(_finish_run(entry.run, worker, status, payload))
+        else:
+            done.append(_finish_run(entry.run, worker, status, error=payload))
+    return done
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_scheduler(
+    *,
+    processes: Optional[int] = None,
+    once: bool = False,
+    poll_interval: float = 5.0,
+) -> int:
+    """Run due jobs until stopped; returns how many runs finished.
+
+    With *once* the scheduler starts the jobs that are due now, waits for
+    them and returns.  ``processes=0`` runs jobs inline.
+    """
+    if processes is None:
+        processes = current_app.config.get("SCHEDULER_PROCESSES")
+        processes = DEFAULT_PROCESSES if processes is None else processes
+    worker = _worker_id()
+    sync_jobs()
+    finished = 0
+    running: Dict[str, _Running] = {}
+    try:
+        while True:
+            finished += len(_reap(running, worker))
+            for name in due_jobs():
+                if processes and len(running) >= processes:
+                    break
+                if name in running or not acquire(name, worker):
+                    continue
+                if processes == 0:
+                    _run_inline(name, worker, TRIGGER_SCHEDULE)
+                    finished += 1
+                else:
+                    running[name] = _spawn(name, worker, TRIGGER_SCHEDULE)
+            if once and not running:
+                return finished
+            time.sleep(min(poll_interval, 1.0) if running else poll_interval)
+    finally:
+        for _name, entry in running.items():
+            entry.process.terminate()
+            entry.process.join()
+            _finish_run(entry.run, worker, STATUS_FAILED, error="scheduler stopped")
+
+
+def prune_history(days: Optional[int] = None) -> int:
+    """Delete runs older than *days* (``SCHEDULER_HISTORY_DAYS``)."""
+    days = days or current_app.config.get("SCHEDULER_HISTORY_DAYS")
+    cutoff = now_utc() - timedelta(days=days or DEFAULT_HISTORY_DAYS)
+    res = db.session.execute(
+        sa.delete(ScheduledJobRun).where(
+            ScheduledJobRun.started_at < cutoff,
+            ScheduledJobRun.status != STATUS_RUNNING,
+        )
+    )
+    db.session.commit()
+    return res.rowcount
+
+
+@job("scheduler_history", schedule="30 3 * * *", group="maintenance")
+def _prune_history_job() -> int:
+    """Delete old scheduled-job runs."""
+    return prune_history()
+
+
+def metrics() -> Dict[str, dict]:
+    """Per job: schedule, state and run counts/durations in the history."""
+    stats = {
+        row.name: {
+            "schedule": row.schedule,
+            "enabled": row.enabled,
+            "lock_group": row.lock_group,
+            "next_run_at": row.next_run_at.isoformat() if row.next_run_at else None,
+            "running_on": row.lease_owner,
+            "last_status": row.last_status,
+            "last_error": row.last_error,
+            "runs": 0,
+            STATUS_OK: 0,
+            STATUS_FAILED: 0,
+            STATUS_TIMEOUT: 0,
+            "avg_ms": None,
+            "max_ms": None,
+        }
+        for row in ScheduledJob.query.order_by(ScheduledJob.name)
+    }
+    rows = db.session.execute(
+        sa.select(
+            ScheduledJobRun.job_name,
+            ScheduledJobRun.status,
+            sa.func.count(),
+            sa.func.avg(ScheduledJobRun.duration_ms),
+            sa.func.max(ScheduledJobRun.duration_ms),
+        ).group_by(ScheduledJobRun.job_name, ScheduledJobRun.status)
+    )
+    for name, status, count, avg_ms, max_ms in rows:
+        entry = stats.get(name)
+        if entry is None or status == STATUS_RUNNING:
+            continue
+        entry[status] = count
+        entry["runs"] += count
+        if status == STATUS_OK:
+            entry["avg_ms"] = round(avg_ms) if avg_ms is not None else None
+        entry["max_ms"] = max(entry["max_ms"] or 0, max_ms or 0)
+    return stats
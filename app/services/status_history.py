@@ -0,0 +1,159 @@
+"""Status history (``status_transition``) queries and backfill."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy import func, select
+
+from app import db
+from app.audit import status_change
+from app.investigations.models import (
+    InvestigationChangeLog,
+    InvestigationStatusTransition,
+)
+from app.models import ChangeLog, StatusTransition
+from app.utils.time_utils import now_utc
+
+SUBJECT_MODELS = {
+    "case": (StatusTransition, ChangeLog, ChangeLog.case_id),
+    "investigation": (
+        InvestigationStatusTransition,
+        InvestigationChangeLog,
+        InvestigationChangeLog.investigation_id,
+    ),
+}
+
+
+def _models(subject_type: str):
+    try:
+        return SUBJECT_MODELS[subject_type]
+    except KeyError:
+        raise ValueError(f"unknown subject_type: {subject_type!r}") from None
+
+
+def dwell_time_stats(
+    subject_type: str = "case",
+    *,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    statuses: Optional[Iterable[str]] = None,
+    include_open: bool = False,
+    now: Optional[datetime] = None,
+) -> List[dict]:
+    """Aggregate time spent in each status, in seconds.
+
+    A stint starts at a transition into a status and ends at the subject's
+    next transition.  Stints still open are skipped unless *include_open* is
+    set, in which case they are measured up to *now*.  *since*/*until* bound
+    the stint start.
+    """
+    model = _models(subject_type)[0]
+
+    left_at = func.lead(model.at).over(
+        partition_by=model.subject_id, order_by=(model.at, model.id)
+    )
+    inner = select(
+        model.to_status.label("status"),
+        model.at.label("entered_at"),
+        left_at.label("left_at"),
+    )
+    # LEAD only looks forward, so a lower bound does not change stint ends.
+    if since is not None:
+        inner = inner.where(model.at >= since)
+    stints = inner.subquery()
+
+    end = stints.c.left_at
+    if include_open:
+        end = func.coalesce(end, sa.literal(now or now_utc(), sa.DateTime()))
+    seconds = (func.julianday(end) - func.julianday(stints.c.entered_at)) * 86400.0
+
+    stmt = (
+        select(
+            stints.c.status,
+            func.count().label("stints"),
+            func.avg(seconds).label("avg_seconds"),
+            func.min(seconds).label("min_seconds"),
+            func.max(seconds).label("max_seconds"),
+            func.sum(seconds).label("total_seconds"),
+        )
+        .where(end.isnot(None))
+        .group_by(stints.c.status)
+        .order_by(stints.c.status)
+    )
+    if until is not None:
+        stmt = stmt.where(stints.c.entered_at < until)
+    if statuses is not None:
+        stmt = stmt.where(stints.c.status.in_(list(statuses)))
+
+    return [
+        {
+            "status": row.status,
+            "stints": row.stints,
+            "avg_seconds": row.avg_seconds,
+            "min_seconds": row.min_seconds,
+            "max_seconds": row.max_seconds,
+            "total_seconds": row.total_seconds,
+        }
+        for row in db.session.execute(
+            stmt, bind_arguments={"mapper": sa.inspect(model)}
+        )
+    ]
+
+
+def backfill_from_changelog(subject_type: str, batch_size: int = 1000) -> int:
+    """Rebuild ``status_transition`` for *subject_type* from its change log.
+
+    Existing transitions are replaced, so the backfill can be rerun.  Returns
+    the number of rows written; the caller commits.
+    """
+    model, log_model, subject_col = _models(subject_type)
+    session = db.session
+    bind_args = {"mapper": sa.inspect(model)}
+    session.execute(sa.delete(model.__table__), bind_arguments=bind_args)
+
+    query = (
+        select(
+            log_model.id,
+            subject_col.label("subject_id"),
+            log_model.old_value,
+            log_model.new_value,
+            log_model.timestamp,
+            log_model.edited_by,
+        )
+        .where(log_model.field_name == "status")
+        .order_by(log_model.id)
+    )
+    written = 0
+    last_id = 0
+    while True:
+        rows = session.execute(
+            query.where(log_model.id > last_id).limit(batch_size),
+            bind_arguments={"mapper": sa.inspect(log_model)},
+        ).all()
+        if not rows:
+            break
+        payload = []
+        for row in rows:
+            transition = status_change([("status", row.old_value, row.new_value)])
+            if transition is None or row.timestamp is None:
+                continue
+            payload.append(
+                {
+                    "subject_type": subject_type,
+                    "subject_id": row.subject_id,
+                    "from_status": transition[0],
+                    "to_status": transition[1],
+                    "at": row.timestamp,
+                    "actor": row.edited_by,
+                }
+            )
+        if payload:
+            session.execute(
+                sa.insert(model.__table__), payload, bind_arguments=bind_args
+            )
+            written += len(payload)
+        last_id = rows[-1].id
+    return written
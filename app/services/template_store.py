@@ -0,0 +1,252 @@
+"""Shared, versioned store of the DO-NOT-EDIT template sets."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+
+CASE_SET = "boncolas"
+INVESTIGATION_SET = "vizsgalat"
+SANITIZED_SETS = {INVESTIGATION_SET}
+
+VERSION_LENGTH = 16
+
+
+@dataclass(frozen=True)
+class TemplateSet:
+    name: str
+    version: str
+    path: Path
+    files: Dict[str, Tuple[int, int]]  # relpath -> (size, mtime_ns) in the store
+    dirs: Tuple[str, ...]
+
+
+def store_root() -> Path:
+    configured = current_app.config.get("TEMPLATE_STORE_ROOT")
+    root = (
+        Path(configured)
+        if configured
+        else Path(current_app.instance_path) / "template_store"
+    )
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def source_root(name: str) -> Path:
+    """Return the editable source directory of template set *name*."""
+    if name == INVESTIGATION_SET:
+        override = current_app.config.get("INVESTIGATION_TEMPLATE_DIR")
+        if override:
+            return Path(override)
+    return Path(current_app.instance_path) / "docs" / name
+
+
+def _walk(src: Path) -> Tuple[List[Tuple[str, os.stat_result]], List[str]]:
+    files, dirs = [], []
+    for current, dirnames, filenames in os.walk(src):
+        dirnames.sort()
+        rel_dir = Path(current).relative_to(src)
+        for d in dirnames:
+            dirs.append((rel_dir / d).as_posix())
+        for f in sorted(filenames):
+            path = Path(current) / f
+            files.append(((rel_dir / f).as_posix(), path.stat()))
+    return files, dirs
+
+
+def _signature(name: str, src: Path, files, dirs) -> str:
+    digest = hashlib.sha256(f"{name}\0{src.resolve()}".encode())
+    for rel, st in files:
+        digest.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    for rel in dirs:
+        digest.update(f"{rel}/\n".encode())
+    return digest.hexdigest()[:VERSION_LENGTH]
+
+
+def _content_version(name: str, src: Path, files, dirs) -> str:
+    digest = hashlib.sha256(name.encode())
+    for rel, _ in files:
+        file_digest = hashlib.sha256()
+        with open(src / rel, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                file_digest.update(chunk)
+        digest.update(f"{rel}\0{file_digest.hexdigest()}\n".encode())
+    for rel in dirs:
+        digest.update(f"{rel}/\n".encode())
+    return digest.hexdigest()[:VERSION_LENGTH]
+
+
+def _manifest_path(name: str, version: str) -> Path:
+    return store_root() / name / f"{version}.json"
+
+
+def _load(name: str, version: str) -> Optional[TemplateSet]:
+    manifest = _manifest_path(name, version)
+    path = manifest.with_suffix("")
+    if not manifest.exists() or not path.is_dir():
+        return None
+    data = json.loads(manifest.read_text(encoding="utf-8"))
+    return TemplateSet(
+        name=name,
+        version=version,
+        path=path,
+        files={rel: tuple(stat) for rel, stat in data["files"].items()},
+        dirs=tuple(data["dirs"]),
+    )
+
+
+def _sanitized_copy(src: Path, dest: Path) -> None:
+    from app.investigations.routes import _sanitize_docx_placeholders
+
+    try:
+        sanitized = _sanitize_docx_placeholders(src)
+    except Exception:  # noqa: BLE001 - keep the original, render sanitizes anyway
+        shutil.copy2(src, dest)
+        return
+    shutil.move(str(sanitized), str(dest))
+
+
+def _build(name: str, src: Path, version: str, files, dirs) -> TemplateSet:
+    """Publish *src* as ``<store>/<name>/<version>``; safe against races."""
+    set_root = store_root() / name
+    set_root.mkdir(parents=True, exist_ok=True)
+    build = Path(tempfile.mkdtemp(prefix=f".{version}.", dir=set_root))
+    try:
+        for rel in dirs:
+            (build / rel).mkdir(parents=True, exist_ok=True)
+        for rel, _ in files:
+            dest = build / rel
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            if name in SANITIZED_SETS and rel.lower().endswith(".docx"):
+                _sanitized_copy(src / rel, dest)
+            else:
+                shutil.copy2(src / rel, dest)
+        stats = {}
+        for rel, _ in files:
+            st = (build / rel).stat()
+            stats[rel] = [st.st_size, st.st_mtime_ns]
+
+        final = set_root / version
+        stale = None
+        if final.exists():
+            stale = set_root / f".{version}.stale-{uuid.uuid4().hex[:8]}"
+            os.replace(final, stale)
+        try:
+            os.replace(build, final)
+        except OSError:
+            if not final.is_dir():  # lost a race on platforms without dir replace
+                raise
+        manifest = {"set": name, "version": version, "files": stats, "dirs": dirs}
+        tmp_manifest = set_root / f".{version}.{uuid.uuid4().hex[:8]}.json"
+        tmp_manifest.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp_manifest, _manifest_path(name, version))
+        if stale is not None:
+            shutil.rmtree(stale, ignore_errors=True)
+    finally:
+        if build.exists():
+            shutil.rmtree(build, ignore_errors=True)
+    current_app.logger.info("Published template set %s version %s", name, version)
+    return _load(name, version)
+
+
+def _intact(tset: TemplateSet) -> bool:
+    for rel, (size, mtime_ns) in tset.files.items():
+        try:
+            st = (tset.path / rel).stat()
+        except OSError:
+            return False
+        if st.st_size != size or st.st_mtime_ns != mtime_ns:
+            return False
+    return True
+
+
+def current(name: str) -> Optional[TemplateSet]:
+    """Return the published version of set *name*, publishing it if needed.
+
+    ``None`` when the source directory is missing.
+    """
+    src = source_root(name)
+    if not src.is_dir():
+        return None
+    files, dirs = _walk(src)
+    ref = store_root() / name / f"{_signature(name, src, files, dirs)}.ref"
+    version = ref.read_text().strip() if ref.exists() else None
+    tset = _load(name, version) if version else None
+    if tset is None:
+        version = version or _content_version(name, src, files, dirs)
+        tset = _load(name, version) or _build(name, src, version, files, dirs)
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        ref.write_text(version)
+    return tset
+
+
+def _link(src: Path, dest: Path) -> None:
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+def materialize(tset: TemplateSet, target: Path) -> int:
+    """Link *tset* into *target*; existing entries are left untouched.
+
+    Returns the number of files linked.
+    """
+    if not _intact(tset):
+        current_app.logger.warning(
+            "Template set %s version %s was modified; republishing",
+            tset.name,
+            tset.version,
+        )
+        src = source_root(tset.name)
+        files, dirs = _walk(src)
+        tset = _build(tset.name, src, tset.version, files, dirs)
+    target.mkdir(parents=True, exist_ok=True)
+    for rel in tset.dirs:
+        (target / rel).mkdir(parents=True, exist_ok=True)
+    linked = 0
+    for rel in tset.files:
+        dest = target / rel
+        if dest.exists():
+            continue
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        _link(tset.path / rel, dest)
+        linked += 1
+    return linked
+
+
+def versions(name: str) -> List[str]:
+    set_root = store_root() / name
+    return sorted(p.stem for p in set_root.glob("*.json") if not p.stem.startswith("."))
+
+
+def prune(name: str, keep: Iterable[str]) -> int:
+    """Remove published versions of *name* not in *keep*; returns the count.
+
+    Case folders keep their linked files; only the shared copy goes.
+    """
+    keep = set(keep)
+    current_set = current(name)
+    if current_set is not None:
+        keep.add(current_set.version)
+    set_root = store_root() / name
+    removed = 0
+    for version in versions(name):
+        if version in keep:
+            continue
+        shutil.rmtree(set_root / version, ignore_errors=True)
+        _manifest_path(name, version).unlink(missing_ok=True)
+        removed += 1
+    for ref in set_root.glob("*.ref"):
+        if ref.read_text().strip() not in keep:
+            ref.unlink(missing_ok=True)
+    return removed
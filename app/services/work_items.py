@@ -0,0 +1,390 @@
+"""Per-user work-item inbox backing the "Ügyeim" pages."""
+
+from __future__ import annotations
+
+from datetime import timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, event, or_, select
+from sqlalchemy.inspection import inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.investigations.models import Investigation
+from app.models import Case, UploadedFile, User, WorkItem
+from app.services.describer_sync import (
+    build_user_index,
+    case_describer_ids,
+    investigation_describer_ids,
+    normalize_identifier,
+)
+
+# describer_sync (imported above) registers its flush listeners before ours,
+# so the materialized describer is final by the time the inbox rows sync.
+
+SUBJECT_CASE = "case"
+SUBJECT_INVESTIGATION = "investigation"
+
+ROLE_EXPERT = "szakértő"
+ROLE_DESCRIBER = "leíró"
+ROLE_TOXI = "toxi"
+ROLE_ASSIGNED = "kirendelt"
+
+# Toxicology is a role-wide pool; its rows carry the tox state as status.
+TOXI_PENDING = "függőben"
+TOXI_DONE = "elvégezve"
+VEGZES_CATEGORY = "végzés"
+
+PER_PAGE = 25
+
+CASE_WATCHED_FIELDS = (
+    "expert_1",
+    "expert_2",
+    "effective_describer_id",
+    "status",
+    "deadline",
+    "tox_completed",
+)
+INVESTIGATION_WATCHED_FIELDS = (
+    "expert1_id",
+    "expert2_id",
+    "effective_describer_id",
+    "assignment_type",
+    "assigned_expert_id",
+    "status",
+    "deadline",
+)
+
+_PENDING_KEY = "work_item_pending"
+
+Key = Tuple[str, int, Optional[int], str]
+
+
+# ---------------------------------------------------------------------------
+# Desired state
+# ---------------------------------------------------------------------------
+
+
+def _case_rows(case: Case, user_index: Dict[str, User], has_vegzes: bool):
+    rows = {}
+    for ident in (case.expert_1, case.expert_2):
+        expert = user_index.get(normalize_identifier(ident))
+        if expert is not None:
+            rows[(expert.id, ROLE_EXPERT)] = case.status
+    for describer_id in case_describer_ids(case, user_index):
+        rows[(describer_id, ROLE_DESCRIBER)] = case.status
+    if has_vegzes:
+        rows[(None, ROLE_TOXI)] = TOXI_DONE if case.tox_completed else TOXI_PENDING
+    return {
+        (SUBJECT_CASE, case.id, uid, role): (status, case.deadline)
+        for (uid, role), status in rows.items()
+    }
+
+
+def _investigation_rows(inv: Investigation, users_by_id: Dict[int, User]):
+    rows = {}
+    for expert_id in (inv.expert1_id, inv.expert2_id):
+        if expert_id:
+            rows[(expert_id, ROLE_EXPERT)] = inv.status
+    for describer_id in investigation_describer_ids(inv, users_by_id):
+        rows[(describer_id, ROLE_DESCRIBER)] = inv.status
+    if inv.assignment_type == "SZAKÉRTŐI" and inv.assigned_expert_id:
+        rows[(inv.assigned_expert_id, ROLE_ASSIGNED)] = inv.status
+    return {
+        (SUBJECT_INVESTIGATION, inv.id, uid, role): (status, inv.deadline)
+        for (uid, role), status in rows.items()
+    }
+
+
+def _cases_with_vegzes(session, case_ids: Iterable[int]) -> set[int]:
+    case_ids = list(case_ids)
+    if not case_ids:
+        return set()
+    return {
+        cid
+        for (cid,) in session.query(UploadedFile.case_id)
+        .filter(
+            UploadedFile.case_id.in_(case_ids),
+            UploadedFile.category == VEGZES_CATEGORY,
+        )
+        .distinct()
+    }
+
+
+def _desired_rows(session, cases, investigations) -> Dict[Key, tuple]:
+    desired: Dict[Key, tuple] = {}
+    if not cases and not investigations:
+        return desired
+    users = session.query(User).all()
+    if cases:
+        user_index = build_user_index(users)
+        vegzes = _cases_with_vegzes(session, [c.id for c in cases])
+        for case in cases:
+            desired.update(_case_rows(case, user_index, case.id in vegzes))
+    users_by_id = {u.id: u for u in users}
+    for inv in investigations:
+        desired.update(_investigation_rows(inv, users_by_id))
+    return desired
+
+
+def _naive_utc(value):
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Sync
+# ---------------------------------------------------------------------------
+
+
+def sync_subjects(
+    session,
+    case_ids: Iterable[int] = (),
+    investigation_ids: Iterable[int] = (),
+) -> dict:
+    """Bring the work items of the given subjects in line with their state.
+
+    Subjects that no longer exist lose their rows.  Returns counts of
+    ``inserted``/``updated``/``deleted`` rows.
+    """
+    case_ids = sorted({cid for cid in case_ids if cid})
+    investigation_ids = sorted({iid for iid in investigation_ids if iid})
+    counts = {"inserted": 0, "updated": 0, "deleted": 0}
+    if not case_ids and not investigation_ids:
+        return counts
+
+    table = WorkItem.__table__
+    with session.no_autoflush:
+        cases = (
+            session.query(Case).filter(Case.id.in_(case_ids)).all() if case_ids else []
+        )
+        investigations = (
+            session.query(Investigation)
+            .filter(Investigation.id.in_(investigation_ids))
+            .all()
+            if investigation_ids
+            else []
+        )
+        desired = _desired_rows(session, cases, investigations)
+
+        subject_filters = []
+        if case_ids:
+            subject_filters.append(
+                and_(
+                    table.c.subject_type == SUBJECT_CASE,
+                    table.c.subject_id.in_(case_ids),
+                )
+            )
+        if investigation_ids:
+            subject_filters.append(
+                and_(
+                    table.c.subject_type == SUBJECT_INVESTIGATION,
+                    table.c.subject_id.in_(investigation_ids),
+                )
+            )
+        existing = {}
+        stale_ids = []
+        for row in session.execute(
+            select(table).where(or_(*subject_filters))
+        ).mappings():
+            key = (row["subject_type"], row["subject_id"], row["user_id"], row["role"])
+            if key in existing or key not in desired:
+                stale_ids.append(row["id"])
+            else:
+                existing[key] = row
+
+    inserts, updates = [], []
+    for key, (status, deadline) in desired.items():
+        row = existing.get(key)
+        if row is None:
+            subject_type, subject_id, user_id, role = key
+            inserts.append(
+                {
+                    "subject_type": subject_type,
+                    "subject_id": subject_id,
+                    "user_id": user_id,
+                    "role": role,
+                    "status": status,
+                    "deadline": deadline,
+                }
+            )
+        elif row["status"] != status or _naive_utc(row["deadline"]) != _naive_utc(
+            deadline
+        ):
+            updates.append(
+                {"b_id": row["id"], "b_status": status, "b_deadline": deadline}
+            )
+
+    if stale_ids:
+        session.execute(table.delete().where(table.c.id.in_(stale_ids)))
+    if inserts:
+        session.execute(table.insert(), inserts)
+    if updates:
+        session.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(status=bindparam("b_status"), deadline=bindparam("b_deadline")),
+            updates,
+        )
+    counts.update(inserted=len(inserts), updated=len(updates), deleted=len(stale_ids))
+    return counts
+
+
+def mark_subjects(session, subject_type: str, ids: Iterable[int]) -> None:
+    """Schedule work-item sync for subjects changed outside the ORM."""
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    pending.setdefault(subject_type, set()).update(i for i in ids if i)
+
+
+def _watched_changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_before_flush(session, flush_context, instances):  # noqa: ARG001
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    objects = pending.setdefault("objects", [])
+    for obj in session.new:
+        if isinstance(obj, (Case, Investigation)):
+            objects.append(obj)
+        elif isinstance(obj, UploadedFile):
+            objects.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Case) and _watched_changed(obj, CASE_WATCHED_FIELDS):
+            objects.append(obj)
+        elif isinstance(obj, Investigation) and _watched_changed(
+            obj, INVESTIGATION_WATCHED_FIELDS
+        ):
+            objects.append(obj)
+        elif isinstance(obj, UploadedFile) and _watched_changed(
+            obj, ("category", "case_id")
+        ):
+            objects.append(obj)
+            pending.setdefault(SUBJECT_CASE, set()).update(
+                inspect(obj).attrs.case_id.history.deleted or ()
+            )
+    for obj in session.deleted:
+        if isinstance(obj, Case):
+            pending.setdefault(SUBJECT_CASE, set()).add(obj.id)
+        elif isinstance(obj, Investigation):
+            pending.setdefault(SUBJECT_INVESTIGATION, set()).add(obj.id)
+        elif isinstance(obj, UploadedFile):
+            pending.setdefault(SUBJECT_CASE, set()).add(obj.case_id)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _sync_after_flush(session, flush_context):  # noqa: ARG001
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    case_ids = set(pending.get(SUBJECT_CASE, ()))
+    investigation_ids = set(pending.get(SUBJECT_INVESTIGATION, ()))
+    for obj in pending.get("objects", ()):
+        if isinstance(obj, Case):
+            case_ids.add(obj.id)
+        elif isinstance(obj, Investigation):
+            investigation_ids.add(obj.id)
+        else:
+            case_ids.add(obj.case_id)
+    sync_subjects(session, case_ids, investigation_ids)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_on_rollback(session, previous_transaction):  # noqa: ARG001
+    # A failed flush never reaches after_flush_postexec.
+    session.info.pop(_PENDING_KEY, None)
+
+
+def rebuild_all(session=None, batch_size: int = 500) -> dict:
+    """Recreate every work item from the current cases and investigations.
+
+    The caller is responsible for committing.
+    """
+    session = session or db.session
+    table = WorkItem.__table__
+    session.execute(table.delete())
+    total = 0
+    for model in (Case, Investigation):
+        last_id = 0
+        while True:
+            ids = [
+                row_id
+                for (row_id,) in session.query(model.id)
+                .filter(model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+            ]
+            if not ids:
+                break
+            if model is Case:
+                counts = sync_subjects(session, case_ids=ids)
+            else:
+                counts = sync_subjects(session, investigation_ids=ids)
+            total += counts["inserted"]
+            last_id = ids[-1]
+    return {"work_items": total}
+
+
+# ---------------------------------------------------------------------------
+# Read side
+# ---------------------------------------------------------------------------
+
+
+def inbox_page(
+    user_id: Optional[int],
+    role: str,
+    subject_type: str,
+    *,
+    statuses: Optional[Iterable[str]] = None,
+    exclude_statuses: Optional[Iterable[str]] = None,
+    page: int = 1,
+    per_page: int = PER_PAGE,
+):
+    """Return a page of work items and the subjects they point to.
+
+    The result is ``(pagination, subjects)`` where *subjects* are the loaded
+    :class:`Case`/:class:`Investigation` objects in inbox order (deadline
+    first, newest subject breaks ties).  Only the rows on the page are
+    loaded, so the cost does not grow with the total case volume.
+    """
+    owner = (
+        WorkItem.user_id.is_(None) if user_id is None else WorkItem.user_id == user_id
+    )
+    stmt = select(WorkItem).where(
+        owner, WorkItem.role == role, WorkItem.subject_type == subject_type
+    )
+    if statuses is not None:
+        stmt = stmt.where(WorkItem.status.in_(list(statuses)))
+    if exclude_statuses:
+        stmt = stmt.where(WorkItem.status.notin_(list(exclude_statuses)))
+    stmt = stmt.order_by(
+        WorkItem.deadline.is_(None),
+        WorkItem.deadline.asc(),
+        WorkItem.subject_id.desc(),
+    )
+    pagination = db.paginate(stmt, page=page, per_page=per_page, error_out=False)
+    return pagination, load_subjects(pagination.items)
+
+
+def load_subjects(items: Iterable[WorkItem]) -> List:
+    """Load the subjects of *items* (one IN query per bind), keeping order."""
+    items = list(items)
+    wanted = {SUBJECT_CASE: set(), SUBJECT_INVESTIGATION: set()}
+    for item in items:
+        wanted[item.subject_type].add(item.subject_id)
+    loaded = {}
+    for subject_type, model in (
+        (SUBJECT_CASE, Case),
+        (SUBJECT_INVESTIGATION, Investigation),
+    ):
+        if wanted[subject_type]:
+            for obj in model.query.filter(model.id.in_(wanted[subject_type])):
+                loaded[(subject_type, obj.id)] = obj
+    subjects = []
+    for item in items:
+        obj = loaded.get((item.subject_type, item.subject_id))
+        if obj is not None and obj not in subjects:
+            subjects.append(obj)
+    return subjects
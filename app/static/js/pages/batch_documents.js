@@ -0,0 +1,30 @@
+import { $ } from '../lib/dom.js';
+
+(function init() {
+  const box = $('#batch-documents');
+  if (!box || box.dataset.pending === '0') return;
+
+  const POLL_MS = 2000;
+  const statusUrl = box.dataset.statusUrl;
+
+  async function poll() {
+    try {
+      const resp = await fetch(statusUrl, {
+        headers: { Accept: 'application/json' },
+        credentials: 'same-origin',
+      });
+      if (resp.ok) {
+        const { counts } = await resp.json();
+        if (counts.queued + counts.running === 0) {
+          window.location.reload();
+          return;
+        }
+      }
+    } catch (err) {
+      // transient network error: keep polling
+    }
+    window.setTimeout(poll, POLL_MS);
+  }
+
+  window.setTimeout(poll, POLL_MS);
+})();
@@ -0,0 +1,40 @@
+import { $ } from '../lib/dom.js';
+
+(function init() {
+  const box = $('#document-job');
+  if (!box) return;
+
+  const POLL_MS = 1000;
+  const statusUrl = box.dataset.statusUrl;
+
+  function follow(state) {
+    if (state.status === 'done' && state.redirect) {
+      window.location.assign(state.redirect);
+      return true;
+    }
+    if (state.status === 'failed') {
+      window.location.reload();
+      return true;
+    }
+    return false;
+  }
+
+  const initial = box.dataset.status;
+  if (initial === 'failed') return; // already showing the error
+  if (follow({ status: initial, redirect: box.dataset.redirect })) return;
+
+  async function poll() {
+    try {
+      const resp = await fetch(statusUrl, {
+        headers: { Accept: 'application/json' },
+        credentials: 'same-origin',
+      });
+      if (resp.ok && follow(await resp.json())) return;
+    } catch (err) {
+      // transient network error: keep polling
+    }
+    window.setTimeout(poll, POLL_MS);
+  }
+
+  window.setTimeout(poll, POLL_MS);
+})();
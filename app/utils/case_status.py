@@ -1,3 +1,4 @@
+# Closing status of cases and investigations alike.
 CASE_STATUS_FINAL = "lezárt"
 
 
@@ -0,0 +1,136 @@
+"""Read-only routing for report pages, exports and report jobs."""
+
+from __future__ import annotations
+
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import sqlalchemy as sa
+from flask import current_app, make_response
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+log = logging.getLogger(__name__)
+
+SOURCE_PRIMARY = "primary"
+SOURCE_READONLY = "readonly"
+SOURCE_REPLICA = "replica"
+DEFAULT_MAX_STALENESS = 30.0
+
+# primary engine -> read-only engine, for the running view/job
+_routes: ContextVar[Optional[Dict[Engine, Engine]]] = ContextVar(
+    "reporting_routes", default=None
+)
+
+
+class RoutingSession(Session):
+    """``db.session`` class: sends SELECTs to the active reporting engines."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        routes = _routes.get()
+        if (
+            routes
+            and bind is None
+            and not self._flushing
+            and getattr(clause, "is_select", False)
+        ):
+            return routes.get(engine, engine)
+        return engine
+
+
+def _readonly_engine(path: Path) -> Engine:
+    """A cached ``mode=ro`` engine for the SQLite file at *path*."""
+    engines = current_app.extensions.setdefault("reporting_engines", {})
+    url = f"sqlite:///file:{path.as_posix()}?mode=ro&uri=true"
+    if url not in engines:
+        # No pool: a replica file replaced by a resync is picked up at once.
+        engines[url] = sa.create_engine(url, poolclass=NullPool)
+    return engines[url]
+
+
+def _primary_engines() -> Dict[str, Engine]:
+    from app import db
+    from app.utils.sqlite import is_file_engine
+
+    return {
+        bind or "main": engine
+        for bind, engine in db.engines.items()
+        if is_file_engine(engine)
+    }
+
+
+def choose_routes() -> Tuple[Dict[Engine, Engine], str]:
+    """The routes for ``REPORTING_SOURCE`` and a label of the source used."""
+    source = current_app.config.get("REPORTING_SOURCE") or SOURCE_PRIMARY
+    primaries = _primary_engines()
+    if source == SOURCE_READONLY:
+        routes = {
+            engine: _readonly_engine(Path(engine.url.database))
+            for engine in primaries.values()
+        }
+        return routes, SOURCE_READONLY
+    if source != SOURCE_REPLICA:
+        return {}, SOURCE_PRIMARY
+
+    from app.services import replication
+
+    root = current_app.config.get("REPLICATION_STANDBY_DIR")
+    budget = current_app.config.get("REPORTING_MAX_STALENESS_SECONDS")
+    budget = DEFAULT_MAX_STALENESS if budget is None else budget
+    if not root:
+        return {}, f"{SOURCE_PRIMARY}; no replica"
+    routes, worst = {}, 0.0
+    for name, engine in primaries.items():
+        lag = replication.replica_lag(root, name, engine.url.database)
+        if lag is None or lag > budget:
+            state = "unavailable" if lag is None else f"{lag:.1f} s behind"
+            log.info("reporting: replica %s %s, reading the primary", name, state)
+            return {}, f"{SOURCE_PRIMARY}; replica {name} {state}"
+        worst = max(worst, lag)
+        routes[engine] = _readonly_engine(Path(root) / name / f"{name}.db")
+    return routes, f"{SOURCE_REPLICA}; lag={worst:.1f}"
+
+
+@contextmanager
+def reporting(routes: Optional[Dict[Engine, Engine]] = None) -> Iterator[str]:
+    """Run the block's SELECTs on the reporting engines; yields the source."""
+    source = SOURCE_PRIMARY
+    if routes is None:
+        routes, source = choose_routes()
+    token = _routes.set(routes or None)
+    try:
+        yield source
+    finally:
+        _routes.reset(token)
+
+
+def reporting_view(view):
+    """Decorator for read-mostly views: read through :func:`reporting`."""
+
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        from app import db
+
+        routes, source = choose_routes()
+        try:
+            with reporting(routes):
+                response = make_response(view(*args, **kwargs))
+        except OperationalError as exc:
+            if not routes:
+                raise
+            log.warning("reporting: %s failed (%s), reading the primary", source, exc)
+            db.session.rollback()
+            source = f"{SOURCE_PRIMARY}; {source.split(';')[0]} failed"
+            with reporting({}):
+                response = make_response(view(*args, **kwargs))
+        response.headers["X-Read-Source"] = source
+        return response
+
+    return wrapped
@@ -0,0 +1,54 @@
+"""Connection settings for the SQLite files behind the binds."""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+
+def is_file_engine(engine: Engine) -> bool:
+    path = engine.url.database
+    return (
+        engine.dialect.name == "sqlite"
+        and bool(path)
+        and path != ":memory:"
+        and not path.startswith("file:")
+    )
+
+
+def wal_enabled(config) -> bool:
+    """``SQLITE_WAL`` if set, otherwise on only with replication configured."""
+    value = config.get("SQLITE_WAL")
+    if value is None or value == "":
+        return bool(config.get("REPLICATION_STANDBY_DIR"))
+    return str(value).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def configure_engines(app, engines) -> None:
+    """Put the file databases in WAL mode (see :func:`wal_enabled`).
+
+    With replication configured (``REPLICATION_STANDBY_DIR``) the app's
+    connections do not checkpoint on their own: the WAL shipper checkpoints
+    once it has shipped every frame (see ``app.services.replication``), and
+    the ``wal_guard`` job does when the shipper is overdue.
+    """
+    if not wal_enabled(app.config):
+        return
+    replicated = bool(app.config.get("REPLICATION_STANDBY_DIR"))
+
+    def _on_connect(dbapi_connection, _record):
+        try:
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+            if replicated:
+                dbapi_connection.execute("PRAGMA wal_autocheckpoint=0")
+        except sqlite3.OperationalError as exc:  # e.g. locked by a restore
+            log.warning("could not switch to WAL mode: %s", exc)
+
+    for engine in engines:
+        if is_file_engine(engine):
+            event.listen(engine, "connect", _on_connect)
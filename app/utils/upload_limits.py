@@ -0,0 +1,119 @@
+"""Per-route request body limits, enforced while the body streams in."""
+
+from __future__ import annotations
+
+from typing import Mapping, Optional
+
+from flask import Request, current_app
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from werkzeug.wrappers import Request as BaseRequest
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import get_content_length
+
+ENVIRON_KEY = "app.upload_limit"
+BODY_METHODS = frozenset({"POST", "PUT", "PATCH"})
+DEFAULT_LIMIT = 16 * 1024 * 1024
+
+
+def route_limit(config: Mapping, endpoint: Optional[str]) -> Optional[int]:
+    """Body limit for *endpoint* in bytes.
+
+    A route mapped to ``None`` is unlimited; unmapped routes use
+    ``MAX_CONTENT_LENGTH``, or 16 MB when that is unset.
+    """
+    limits = config.get("UPLOAD_ROUTE_LIMITS") or {}
+    if endpoint in limits:
+        return limits[endpoint]
+    return config.get("MAX_CONTENT_LENGTH") or DEFAULT_LIMIT
+
+
+class _CountingInput:
+    """``wsgi.input`` wrapper raising 413 once *limit* bytes are exceeded."""
+
+    def __init__(self, stream, limit: int):
+        self._stream = stream
+        self._limit = limit
+        self.received = 0
+
+    def _count(self, data: bytes) -> bytes:
+        self.received += len(data)
+        if self.received > self._limit:
+            raise RequestEntityTooLarge()
+        return data
+
+    def _cap(self, size: Optional[int]) -> int:
+        # Never buffer more than one byte past the limit for unbounded reads.
+        remaining = self._limit - self.received + 1
+        if size is None or size < 0:
+            return remaining
+        return min(size, remaining)
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        return self._count(self._stream.read(self._cap(size)))
+
+    def readline(self, size: Optional[int] = -1) -> bytes:
+        return self._count(self._stream.readline(self._cap(size)))
+
+    def __iter__(self):
+        while line := self.readline():
+            yield line
+
+    def close(self) -> None:
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            close()
+
+
+class UploadLimitMiddleware:
+    """WSGI middleware applying :func:`route_limit` before the app runs."""
+
+    def __init__(self, wsgi_app, flask_app):
+        self.wsgi_app = wsgi_app
+        self.flask_app = flask_app
+
+    def _endpoint(self, environ) -> Optional[str]:
+        adapter = self.flask_app.create_url_adapter(BaseRequest(environ))
+        try:
+            endpoint, _ = adapter.match()
+        except HTTPException:
+            return None
+        return endpoint
+
+    def __call__(self, environ, start_response):
+        if environ.get("REQUEST_METHOD") in BODY_METHODS:
+            limit = route_limit(self.flask_app.config, self._endpoint(environ))
+            environ[ENVIRON_KEY] = limit
+            if limit is not None:
+                length = get_content_length(environ)
+                if length is not None and length > limit:
+                    response = Response(
+                        "File too large", 413, headers={"Connection": "close"}
+                    )
+                    return response(environ, start_response)
+                environ["wsgi.input"] = _CountingInput(environ["wsgi.input"], limit)
+        return self.wsgi_app(environ, start_response)
+
+
+class UploadRequest(Request):
+    """Request honouring per-route limits and spooling files to the blob store."""
+
+    @property
+    def max_content_length(self) -> Optional[int]:  # type: ignore[override]
+        if ENVIRON_KEY in self.environ:
+            return self.environ[ENVIRON_KEY]
+        return super().max_content_length
+
+    def _get_file_stream(
+        self,
+        total_content_length,
+        content_type,
+        filename=None,
+        content_length=None,
+    ):
+        if not filename or not current_app:
+            return super()._get_file_stream(
+                total_content_length, content_type, filename, content_length
+            )
+        from app.services.blob_store import BlobSpool  # avoid import cycle
+
+        return BlobSpool()
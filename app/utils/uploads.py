@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 import mimetypes
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
+from urllib.parse import quote
 
 from flask import abort, current_app, request, send_file
-from werkzeug import exceptions
+from werkzeug import exceptions, utils
 from werkzeug.utils import secure_filename
 
+from app.services import blob_store, cold_storage
+
 try:  # optional python-magic
     import magic  # type: ignore
 except Exception:  # pragma: no cover - import failure
@@ -42,7 +46,8 @@ def resolve_safe(root: Path, *parts: str) -> Path:
     return p
 
 
-def guess_mimetype(path: Path) -> str:
+def guess_mimetype(path: Path, name: Optional[str] = None) -> str:
+    """Sniff *path*'s type, else guess it from *name* (default: the path)."""
     mime: Optional[str] = None
     if magic:  # pragma: no cover - optional
         try:
@@ -50,12 +55,27 @@ def guess_mimetype(path: Path) -> str:
         except Exception:
             mime = None
     if not mime:
-        mime, _ = mimetypes.guess_type(str(path))
+        mime, _ = mimetypes.guess_type(name or str(path))
     return mime or "application/octet-stream"
 
 
-def save_upload(file_storage, root: Path, domain: str, *subdirs: str) -> Path:
-    limit = current_app.config.get("MAX_CONTENT_LENGTH")
+@dataclass(frozen=True)
+class StoredUpload:
+    path: Path
+    sha256: str
+    size: int
+
+
+def store_upload(file_storage, root: Path, domain: str, *subdirs: str) -> StoredUpload:
+    """Validate and store an upload in the blob store, linked into the folder.
+
+    Multipart file parts are already spooled inside the blob store (see
+    ``app.utils.upload_limits``), so storing them is a rename.
+
+    A different file already using the name is kept; the upload then gets a
+    ``name_N.ext`` name (see ``blob_store.link_into``).
+    """
+    limit = request.max_content_length
     if request.content_length and limit and request.content_length > int(limit):
         abort(413)
     filename = secure_filename(file_storage.filename or "")
@@ -70,12 +90,123 @@ def save_upload(file_storage, root: Path, domain: str, *subdirs: str) -> Path:
     ):
         raise exceptions.BadRequest("forbidden file type")
     target_dir = resolve_safe(root, *subdirs)
-    target_dir.mkdir(parents=True, exist_ok=True)
-    dest = resolve_safe(target_dir, filename)
-    file_storage.save(str(dest))
-    return dest
+    resolve_safe(target_dir, filename)
+    blob = blob_store.store_stream(file_storage.stream)
+    dest = blob_store.link_into(blob, target_dir, filename)
+    return StoredUpload(dest, blob.sha256, blob.size)
 
 
-def send_safe(root: Path, *parts: str, as_attachment: bool = True):
+def save_upload(file_storage, root: Path, domain: str, *subdirs: str) -> Path:
+    return store_upload(file_storage, root, domain, *subdirs).path
+
+
+OFFLOAD_MODES = {"x-accel", "x-sendfile"}
+
+
+def _accel_uri(path: Path) -> Optional[str]:
+    """Map *path* to the proxy's internal location, or ``None`` if outside it."""
+    root = current_app.config.get("DOWNLOAD_ACCEL_ROOT") or (
+        Path(current_app.config["UPLOAD_CASES_ROOT"]).parent
+    )
+    try:
+        rel = path.relative_to(Path(root).resolve())
+    except ValueError:
+        return None
+    prefix = current_app.config.get("DOWNLOAD_ACCEL_PREFIX", "/_protected/")
+    return prefix.rstrip("/") + "/" + quote(rel.as_posix())
+
+
+def _offloaded(
+    path: Path, mode: str, as_attachment: bool, etag: Optional[str], name: str
+):
+    """Headers-only response for a front proxy to stream *path*.
+
+    The proxy handles Range itself; we still answer If-None-Match with 304 so
+    revalidation never touches the file.
+    """
+    uri = None
+    if mode == "x-accel":
+        uri = _accel_uri(path)
+        if uri is None:
+            return None
+    if not path.is_file():
+        raise FileNotFoundError(str(path))
+    rv = utils.send_file(
+        str(path),
+        request.environ,
+        mimetype=guess_mimetype(path, name),
+        as_attachment=as_attachment,
+        download_name=name,
+        use_x_sendfile=True,
+        conditional=False,
+        etag=etag or True,
+    )
+    rv = rv.make_conditional(request.environ)
+    rv.headers.pop("Content-Length", None)
+    if rv.status_code == 304:
+        rv.headers.pop("X-Sendfile", None)
+    elif uri is not None:
+        rv.headers.pop("X-Sendfile", None)
+        rv.headers["X-Accel-Redirect"] = uri
+    return rv
+
+
+def _streamed(cold: cold_storage.ColdFile, name: str, as_attachment: bool, etag: str):
+    """Stream a cold member straight out of its zip."""
+    rv = utils.send_file(
+        cold_storage.open_member(cold),
+        request.environ,
+        mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream",
+        as_attachment=as_attachment,
+        download_name=name,
+        conditional=False,
+        etag=etag,
+        last_modified=cold.mtime,
+    )
+    rv.content_length = cold.size
+    return rv.make_conditional(request.environ)
+
+
+def send_safe(
+    root: Path, *parts: str, as_attachment: bool = True, etag: Optional[str] = None
+):
+    """Send a file under *root*; *etag* (the content hash) makes it strong.
+
+    With ``DOWNLOAD_OFFLOAD`` set to ``x-accel`` (nginx) or ``x-sendfile``
+    (Apache/lighttpd) the front proxy streams the bytes after the caller's
+    permission check.  Otherwise the file is served directly with Range and
+    conditional-GET support.  Responses keep the global no-store policy
+    unless ``DOWNLOAD_CACHE_CONTROL`` is set; the ETag answers If-None-Match
+    either way.
+
+    A file packed into cold storage (app.services.cold_storage) is sent from
+    its blob, template or extracted copy the same way, or streamed out of
+    its zip without Range support when too large for the cache.
+    """
     path = resolve_safe(root, *parts)
-    return send_file(path, as_attachment=as_attachment, mimetype=guess_mimetype(path))
+    name = path.name
+    cold = None if path.exists() else cold_storage.find(root, path)
+    if cold is not None:
+        etag = etag or cold.sha256
+        path = cold_storage.local_copy(cold)
+    mode = (current_app.config.get("DOWNLOAD_OFFLOAD") or "").lower()
+    rv = None
+    if path is None:
+        rv = _streamed(cold, name, as_attachment, etag)
+    elif mode in OFFLOAD_MODES:
+        rv = _offloaded(path, mode, as_attachment, etag, name)
+    if rv is None:
+        rv = send_file(
+            path,
+            as_attachment=as_attachment,
+            download_name=name,
+            mimetype=guess_mimetype(path, name),
+            etag=etag or True,
+        )
+        # Werkzeug only says so when answering a Range request.
+        rv.headers.setdefault("Accept-Ranges", "bytes")
+    cache_control = current_app.config.get("DOWNLOAD_CACHE_CONTROL")
+    if cache_control:
+        rv.headers["Cache-Control"] = cache_control
+        rv.keep_cache_control = True
+    return rv
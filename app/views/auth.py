@@ -4,7 +4,7 @@ import csv
 import hashlib
 import io
 import json
-import shutil
+from contextlib import nullcontext
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
@@ -31,21 +31,48 @@ from wtforms.validators import DataRequired
 
 from app import db
 from app.audit import log_action
-from app.email_utils import send_email
+from app.email_utils import queue_email
 from app.forms import AdminUserForm, CaseIdentifierForm
 from app.investigations.models import Investigation, InvestigationChangeLog
 from app.investigations.utils import user_display_name
-from app.models import AuditLog, Case, ChangeLog, TaskMessage, UploadedFile, User
+from app.models import (
+    AuditLog,
+    Case,
+    CaseHistorySnapshot,
+    ChangeLog,
+    TaskMessage,
+    UploadedFile,
+    User,
+    WorkItem,
+)
 from app.paths import case_root, ensure_case_folder, file_safe_case_number
-from app.routes import handle_file_upload
+from app.routes import (
+    document_job_response,
+    flash_document_done,
+    force_render_requested,
+    handle_file_upload,
+    start_chunked_upload,
+)
+from app.services import change_feed, document_jobs, template_store
+from app.services.archive import archive_reads, archive_view
 from app.services.case_logic import resolve_effective_describer
 from app.services.core_user_read import get_user_safe
+from app.services.history import reconstruct
+from app.services.status_history import dwell_time_stats
+from app.services.work_items import (
+    ROLE_ASSIGNED,
+    ROLE_EXPERT,
+    SUBJECT_CASE,
+    SUBJECT_INVESTIGATION,
+    inbox_page,
+)
 from app.utils.case_number import generate_case_number_for_year
 from app.utils.dates import attach_case_dates, safe_fmt
 from app.utils.idempotency import claim_idempotency, make_default_key
 from app.utils.permissions import capabilities_for
 from app.utils.query_helpers import apply_case_filters, build_cases_and_users_map
 from app.utils.rbac import require_roles as roles_required
+from app.utils.reporting import reporting_view
 from app.utils.time_utils import (
     BUDAPEST_TZ,
     fmt_budapest,
@@ -57,8 +84,8 @@ from app.utils.uploads import (
     get_upload_categories,
     is_valid_category,
     resolve_safe,
-    save_upload,
     send_safe,
+    store_upload,
 )
 from app.utils.user_display import user_display_name as resolve_user_display
 
@@ -73,11 +100,11 @@ def _case_upload_root() -> str:
 
 
 def init_case_upload_dirs(case):
-    """Create per-case upload folders and populate the DO-NOT-EDIT template set."""
-    case_dir = Path(ensure_case_folder(case.case_number))
+    """Create per-case upload folders and link the shared DO-NOT-EDIT template set.
 
-    # Populate DO-NOT-EDIT from instance/docs/boncolas
-    src_root = Path(current_app.instance_path) / "docs" / "boncolas"
+    Records the template version on *case*; the caller commits.
+    """
+    case_dir = Path(ensure_case_folder(case.case_number))
     dst_root = case_dir / "DO-NOT-EDIT"
     dst_root.mkdir(parents=True, exist_ok=True)
 
@@ -86,23 +113,26 @@ def init_case_upload_dirs(case):
         if not keep.exists():
             keep.touch()
 
-    if not src_root.exists():
-        current_app.logger.warning("Case template dir missing: %s", src_root)
+    # Published from instance/docs/boncolas
+    tset = template_store.current(template_store.CASE_SET)
+    if tset is None:
+        current_app.logger.warning(
+            "Case template dir missing: %s",
+            template_store.source_root(template_store.CASE_SET),
+        )
         return
 
-    current_app.logger.info("Populating DO-NOT-EDIT: %s -> %s", src_root, dst_root)
-    for child in src_root.iterdir():
-        target = dst_root / child.name
-        if child.is_dir():
-            shutil.copytree(child, target, dirs_exist_ok=True)
-        else:
-            if not target.exists():
-                shutil.copy2(child, target)
+    current_app.logger.info(
+        "Linking DO-NOT-EDIT templates %s -> %s", tset.version, dst_root
+    )
+    template_store.materialize(tset, dst_root)
+    case.template_version = tset.version
 
 
 @auth_bp.route("/cases/<int:case_id>/changelog.csv")
 @login_required
 @roles_required("admin")
+@reporting_view
 def export_changelog_csv(case_id):
     case = db.session.get(Case, case_id) or abort(404)
     entries = (
@@ -257,24 +287,32 @@ def dashboard():
     template_ctx["query_params"] = request.args.to_dict(flat=True)
 
     if current_user.role in {"szak", "szakértő"}:
-        assigned_investigations = (
-            Investigation.query.filter(
-                Investigation.assignment_type == "SZAKÉRTŐI",
-                Investigation.assigned_expert_id == current_user.id,
-            )
-            .order_by(Investigation.registration_time.desc())
-            .all()
+        _, assigned_investigations = inbox_page(
+            current_user.id,
+            ROLE_ASSIGNED,
+            SUBJECT_INVESTIGATION,
+            page=request.args.get("inv_page", 1, type=int),
         )
         for inv in assigned_investigations:
             attach_case_dates(inv)
         template_ctx["assigned_investigations"] = assigned_investigations
 
     if current_user.role == "szakértő":
+        # Messages only for first-expert cases still in the inbox (work_item).
         task_messages = (
             db.session.query(TaskMessage)
+            .join(
+                WorkItem,
+                and_(
+                    WorkItem.subject_type == SUBJECT_CASE,
+                    WorkItem.subject_id == TaskMessage.case_id,
+                    WorkItem.user_id == current_user.id,
+                    WorkItem.role == ROLE_EXPERT,
+                ),
+            )
             .join(Case)
             .filter(
-                TaskMessage.recipient == current_user.username,
+                TaskMessage.user_id == current_user.id,
                 TaskMessage.seen.is_(False),
                 Case.expert_1 == (current_user.screen_name or current_user.username),
                 Case.started_by_expert.is_(False),
@@ -333,6 +371,7 @@ def dashboard():
 @auth_bp.route("/dashboard/penzugy")
 @login_required
 @roles_required("pénzügy", "admin")
+@reporting_view
 def dashboard_penzugy():
     cases, users_map, ordering_meta = build_cases_and_users_map(request.args)
 
@@ -369,27 +408,30 @@ def list_cases():
     query = Case.query
     query = apply_case_filters(query, request.args)
 
-    cases, users_map, ordering_meta = build_cases_and_users_map(request.args, query)
-
-    query_params = request.args.to_dict()
-
-    return render_template(
-        "list_cases.html",
-        cases=cases,
-        users_map=users_map,
-        sort_by=ordering_meta["sort_by"],
-        sort_order=ordering_meta["sort_order"],
-        query_params=query_params,
-        status_filter=status_filter,
-        case_type_filter=case_type_filter,
-        search_query=search_query,
-        caps=capabilities_for(current_user),
-    )
+    # Searches also cover the archived years (app.services.archive).
+    with archive_reads() if search_query else nullcontext():
+        cases, users_map, ordering_meta = build_cases_and_users_map(request.args, query)
+
+        query_params = request.args.to_dict()
+
+        return render_template(
+            "list_cases.html",
+            cases=cases,
+            users_map=users_map,
+            sort_by=ordering_meta["sort_by"],
+            sort_order=ordering_meta["sort_order"],
+            query_params=query_params,
+            status_filter=status_filter,
+            case_type_filter=case_type_filter,
+            search_query=search_query,
+            caps=capabilities_for(current_user),
+        )
 
 
 @auth_bp.route("/cases/<int:case_id>")
 @login_required
 @roles_required("admin", "iroda", "szakértő", "leíró", "szignáló", "toxi", "pénzügy")
+@archive_view
 def case_detail(case_id):
     case = db.session.get(Case, case_id) or abort(404)
 
@@ -407,6 +449,7 @@ def case_detail(case_id):
 @auth_bp.route("/cases/<int:case_id>/view")
 @login_required
 @roles_required("admin", "iroda", "szakértő", "leíró", "szignáló", "toxi", "pénzügy")
+@archive_view
 def view_case(case_id):
     """Read-only view for case details."""
     case = db.session.get(Case, case_id) or abort(404)
@@ -426,14 +469,15 @@ def view_case(case_id):
 @login_required
 @roles_required("admin", "iroda", "szakértő", "leíró", "szignáló", "toxi", "pénzügy")
 def closed_cases():
-    closed = (
-        Case.query.filter(Case.status == CASE_STATUS_FINAL)
-        .order_by(Case.deadline.desc())
-        .all()
-    )
-    for case in closed:
-        attach_case_dates(case)
-    return render_template("closed_cases.html", cases=closed)
+    with archive_reads():
+        closed = (
+            Case.query.filter(Case.status == CASE_STATUS_FINAL)
+            .order_by(Case.deadline.desc())
+            .all()
+        )
+        for case in closed:
+            attach_case_dates(case)
+        return render_template("closed_cases.html", cases=closed)
 
 
 @auth_bp.route("/cases/new", methods=["GET", "POST"])
@@ -570,6 +614,7 @@ def create_case():
         try:
             db.session.commit()
             init_case_upload_dirs(new_case)
+            db.session.commit()
         except Exception as e:  # noqa: BLE001
             db.session.rollback()
             current_app.logger.error(f"Database error: {e}")
@@ -844,19 +889,22 @@ def upload_file(case_id):
     saved = []
     for f in files:
         try:
-            dest = save_upload(f, root, "cases", subdir)
+            stored = store_upload(f, root, "cases", subdir)
         except exceptions.BadRequest:
             raise
         except Exception as e:  # noqa: BLE001
             current_app.logger.error(f"File save failed: {e}")
             flash("A fájl mentése nem sikerült.", "danger")
             continue
+        dest = stored.path
         upload_rec = UploadedFile(
             case_id=case.id,
             filename=dest.name,
             uploader=resolve_user_display(current_user),
             upload_time=now_utc(),
             category=category,
+            sha256=stored.sha256,
+            size_bytes=stored.size,
         )
         db.session.add(upload_rec)
         saved.append(dest.name)
@@ -887,16 +935,40 @@ def upload_file(case_id):
     return redirect(url_for("auth.case_detail", case_id=case_id))
 
 
+@auth_bp.route("/cases/<int:case_id>/uploads/chunked", methods=["POST"])
+@login_required
+@roles_required("admin", "iroda", "szakértő", "leíró", "szignáló", "toxi")
+def start_case_chunked_upload(case_id):
+    """Open a resumable upload; chunks go to the shared ``/uploads/chunked`` API."""
+    case = db.session.get(Case, case_id) or abort(404)
+    if not capabilities_for(current_user).get("can_upload_case"):
+        return jsonify({"error": "Nincs jogosultság"}), 403
+    if is_final_status(case.status):
+        return jsonify({"error": "Case is finalized. Uploads are disabled."}), 409
+    return start_chunked_upload(SUBJECT_CASE, case.id)
+
+
 @auth_bp.route("/cases/<int:case_id>/files/<path:filename>")
 @login_required
 @roles_required("admin", "iroda", "szakértő", "leíró", "szignáló", "toxi")
+@archive_view
 def download_file(case_id, filename):
     case = db.session.get(Case, case_id) or abort(404)
     subdir = file_safe_case_number(case.case_number)
     root = Path(current_app.config["UPLOAD_CASES_ROOT"]) / subdir
+    record = (
+        UploadedFile.query.filter_by(case_id=case.id, filename=filename)
+        .order_by(UploadedFile.id.desc())
+        .first()
+    )
 
     try:
-        resp = send_safe(root, filename, as_attachment=True)
+        resp = send_safe(
+            root,
+            filename,
+            as_attachment=True,
+            etag=record.sha256 if record else None,
+        )
     except exceptions.BadRequest:
         current_app.logger.warning(
             "Path traversal attempt for case %s: %s", case_id, filename
@@ -1077,6 +1149,12 @@ def assign_pathologist(case_id):
             )
             db.session.add(msg)
 
+        recipient = assigned_user.username if assigned_user else expert_1
+        queue_email(
+            subject=f"Assigned to case {case.case_number}",
+            recipients=[recipient],
+            body=f"You have been assigned as szakértő for case {case.case_number}.",
+        )
         try:
             db.session.commit()
         except Exception as e:  # noqa: BLE001
@@ -1090,12 +1168,6 @@ def assign_pathologist(case_id):
             + (f", {expert_2}" if expert_2 else "")
             + f" for case {case.case_number}",
         )
-        recipient = assigned_user.username if assigned_user else expert_1
-        send_email(
-            subject=f"Assigned to case {case.case_number}",
-            recipients=[recipient],
-            body=f"You have been assigned as szakértő for case {case.case_number}.",
-        )
         flash("Szakértők sikeresen hozzárendelve.", "success")
         return redirect(url_for("auth.szignal_cases"))
 
@@ -1360,6 +1432,7 @@ def _collect_admin_changelog(filters: AdminChangelogFilters, *, limit: Optional[
 @auth_bp.route("/admin/changelog")
 @login_required
 @roles_required("admin")
+@reporting_view
 def admin_changelog():
     filters = _parse_admin_changelog_filters(request.args)
     limit = filters.offset + filters.per_page
@@ -1398,6 +1471,7 @@ def admin_changelog():
 @auth_bp.route("/admin/changelog.csv")
 @login_required
 @roles_required("admin")
+@reporting_view
 def admin_changelog_csv():
     filters = _parse_admin_changelog_filters(request.args)
     entries, _ = _collect_admin_changelog(filters, limit=None)
@@ -1442,6 +1516,7 @@ def admin_changelog_csv():
 @auth_bp.route("/admin/changelog.jsonl")
 @login_required
 @roles_required("admin")
+@reporting_view
 def admin_changelog_jsonl():
     filters = _parse_admin_changelog_filters(request.args)
     entries, _ = _collect_admin_changelog(filters, limit=None)
@@ -1473,6 +1548,131 @@ def admin_changelog_jsonl():
     )
 
 
+def _int_arg(name: str, default: int) -> int:
+    raw = (request.args.get(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        abort(400)
+
+
+@auth_bp.route("/admin/changes/<stream>.jsonl")
+@login_required
+@roles_required("admin")
+def admin_change_feed(stream):
+    """Change-data-capture events after ``?after=<seq>`` as JSONL.
+
+    ``limit`` caps the batch (``change_feed.MAX_LIMIT``); ``wait`` long-polls
+    up to that many seconds (at most ``change_feed.HTTP_MAX_WAIT``) when
+    nothing is pending.  ``X-Change-Cursor`` is
+    the ``after`` value for the next call.
+    """
+    if stream not in change_feed.STREAMS:
+        abort(404)
+    after = _int_arg("after", 0)
+    limit = change_feed.clamp_limit(_int_arg("limit", change_feed.DEFAULT_LIMIT))
+    try:
+        wait = float(request.args.get("wait") or 0)
+    except ValueError:
+        abort(400)
+    if after < 0 or wait < 0:
+        abort(400)
+
+    wait = min(wait, change_feed.HTTP_MAX_WAIT)
+    events = change_feed.wait_for(stream, after, limit, wait)
+    cursor = events[-1]["seq"] if events else after
+    body = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events)
+    return Response(
+        body,
+        mimetype="application/jsonl; charset=utf-8",
+        headers={
+            "X-Change-Cursor": str(cursor),
+            "X-Change-More": "1" if len(events) >= limit else "0",
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@auth_bp.route("/admin/status-dwell.json")
+@login_required
+@roles_required("admin")
+def admin_status_dwell():
+    """Per-status dwell-time aggregates (seconds) for cases and investigations."""
+    filters = _parse_admin_changelog_filters(request.args)
+    include_open = request.args.get("include_open") in {"1", "true", "yes"}
+    subject_types = (
+        [filters.subject_type] if filters.subject_type else ["case", "investigation"]
+    )
+    payload = {
+        subject_type: dwell_time_stats(
+            subject_type,
+            since=filters.start_utc,
+            until=filters.end_utc,
+            include_open=include_open,
+        )
+        for subject_type in subject_types
+    }
+    return jsonify(payload)
+
+
+def _parse_history_at(raw: Optional[str]) -> Optional[datetime]:
+    """Parse a Budapest-local ``YYYY-MM-DD[THH:MM[:SS]]`` into UTC."""
+    raw = (raw or "").strip()
+    if not raw:
+        return now_utc()
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(raw, fmt)
+        except ValueError:
+            continue
+        if fmt == "%Y-%m-%d":
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+        return parsed.replace(tzinfo=BUDAPEST_TZ).astimezone(timezone.utc)
+    return None
+
+
+def _history_or_400(subject_type: str, subject_id: int):
+    if subject_type not in {"case", "investigation"}:
+        abort(404)
+    at = _parse_history_at(request.args.get("at"))
+    if at is None:
+        abort(400)
+    return reconstruct(subject_type, subject_id, at)
+
+
+@auth_bp.route("/admin/history/<subject_type>/<int:subject_id>.json")
+@login_required
+@roles_required("admin")
+def admin_history_json(subject_type, subject_id):
+    result = _history_or_400(subject_type, subject_id)
+    return jsonify(
+        {
+            "subject_type": result.subject_type,
+            "subject_id": result.subject_id,
+            "as_of": result.as_of.isoformat(),
+            "exists": result.exists,
+            "state": result.state,
+            "checkpoint_id": result.checkpoint_id,
+            "replayed": result.replayed,
+        }
+    )
+
+
+@auth_bp.route("/admin/history/<subject_type>/<int:subject_id>")
+@login_required
+@roles_required("admin")
+def admin_history(subject_type, subject_id):
+    result = _history_or_400(subject_type, subject_id)
+    return render_template(
+        "admin/history.html",
+        result=result,
+        at_value=to_budapest(result.as_of).strftime("%Y-%m-%dT%H:%M"),
+        as_of_display=fmt_budapest(result.as_of, "%Y-%m-%d %H:%M:%S"),
+    )
+
+
 @auth_bp.route("/admin/users")
 @login_required
 @roles_required("admin")
@@ -1657,6 +1857,7 @@ def delete_case(case_id):
         return resp
 
     ChangeLog.query.filter_by(case_id=case.id).delete()
+    CaseHistorySnapshot.query.filter_by(subject_id=case.id).delete()
 
     log_action("Case deleted", f"{case.case_number}")
     db.session.delete(case)
@@ -1730,13 +1931,6 @@ def generate_tox_doc(case_id):
         resp := ensure_unlocked_or_redirect(case, "auth.case_detail", case_id=case.id)
     ) is not None:
         return resp
-    key = make_default_key(request)
-    if not claim_idempotency(
-        key, route=request.endpoint, user_id=current_user.id, case_id=case.id
-    ):
-        flash("Művelet már feldolgozva.")
-        return redirect(url_for("auth.case_detail", case_id=case.id))
-
     root = Path(current_app.config["UPLOAD_CASES_ROOT"])
     template_path = resolve_safe(
         root, "autofill-word-do-not-edit", "Toxikológiai-kirendelő.docx"
@@ -1821,46 +2015,74 @@ def generate_tox_doc(case_id):
         "osszesen_ara": int(total),
     }
 
-    try:
-        try:
-            from docxtpl import DocxTemplate
-
-            tpl = DocxTemplate(str(template_path))
-            tpl.render(context)
-            tpl.save(str(output_path))
-        except ModuleNotFoundError:
-            from docx import Document
-
-            doc = Document(str(template_path))
-            replacements = {
+    detail_url = url_for("auth.case_detail", case_id=case.id)
+    job, created = document_jobs.submit(
+        document_jobs.KIND_TOX_DOC,
+        subject_type=SUBJECT_CASE,
+        subject_id=case.id,
+        case_id=case.id,
+        key=make_default_key(request),
+        force=force_render_requested(),
+        payload={
+            "renderer": "plain_docx",
+            "template": str(template_path),
+            "output": str(output_path),
+            "context": context,
+            "replacements": {
                 "{{case.case_number}}": context["case"]["case_number"],
                 "{{case.anyja_neve}}": context["case"]["anyja_neve"],
-            }
-            for p in doc.paragraphs:
-                for k, v in replacements.items():
-                    if k in p.text:
-                        p.text = p.text.replace(k, str(v))
-            doc.save(str(output_path))
-
-        case.tox_doc_generated = True
-        case.tox_doc_generated_at = now_utc()
-        case.tox_doc_generated_by = resolve_user_display(current_user)
-
-        db.session.add(
-            UploadedFile(
-                case_id=case.id,
-                filename=output_path.name,
-                uploader=resolve_user_display(current_user),
-                upload_time=now_utc(),
-                category="Toxikológiai kirendelő",
-            )
-        )
-        db.session.commit()
-        flash("✅ Toxikológiai kirendelő dokumentum generálva.", "success")
-        log_action("Toxikológiai kirendelő generálva", f"{case.case_number}")
-    except Exception as e:  # noqa: BLE001
-        db.session.rollback()
-        current_app.logger.error(f"DOCX generation error: {e}")
+            },
+            "next": {"endpoint": "auth.case_detail", "values": {"case_id": case.id}},
+        },
+    )
+    if not created or job.status in document_jobs.PENDING:
+        return document_job_response(job, created, detail_url)
+    if job.status == document_jobs.STATUS_FAILED:
         flash("❌ Hiba történt a dokumentum generálása közben.", "danger")
-
-    return redirect(url_for("auth.case_detail", case_id=case_id))
+    else:
+        flash_document_done(job, "✅ Toxikológiai kirendelő dokumentum generálva.")
+    return redirect(detail_url)
+
+
+@document_jobs.finisher(document_jobs.KIND_TOX_DOC)
+def _tox_doc_generated(job):
+    case = db.session.get(Case, job.subject_id)
+    if case is None:
+        return {}
+    user = db.session.get(User, job.user_id) if job.user_id else None
+    generated_by = resolve_user_display(user) if user is not None else ""
+    case.tox_doc_generated = True
+    case.tox_doc_generated_at = now_utc()
+    case.tox_doc_generated_by = generated_by
+    upload = UploadedFile(
+        case_id=case.id,
+        filename=Path(job.payload["output"]).name,
+        uploader=generated_by,
+        upload_time=now_utc(),
+        category="Toxikológiai kirendelő",
+        render_fingerprint=job.payload.get("fingerprint"),
+    )
+    db.session.add(upload)
+    db.session.flush()
+    if user is not None:
+        log_action("Toxikológiai kirendelő generálva", case.case_number, user=user)
+    return {}
+
+
+@document_jobs.reuser(document_jobs.KIND_TOX_DOC)
+def _reuse_tox_doc(job):
+    output = Path(job.payload["output"])
+    if not output.is_file():
+        return None
+    upload = (
+        UploadedFile.query.filter_by(
+            case_id=job.subject_id,
+            filename=output.name,
+            category="Toxikológiai kirendelő",
+        )
+        .order_by(UploadedFile.upload_time.desc())
+        .first()
+    )
+    if upload is None or upload.render_fingerprint != job.payload["fingerprint"]:
+        return None
+    return {}
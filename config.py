@@ -43,6 +43,156 @@ class Config:
 
     TRACK_USER_ACTIVITY = True
 
+    # Downloads: "x-accel" (nginx) or "x-sendfile" hands streaming to the proxy.
+    DOWNLOAD_OFFLOAD = os.environ.get("DOWNLOAD_OFFLOAD", "")
+    # nginx internal location mapped to DOWNLOAD_ACCEL_ROOT (default: the
+    # directory holding the upload roots).
+    DOWNLOAD_ACCEL_PREFIX = os.environ.get("DOWNLOAD_ACCEL_PREFIX", "/_protected/")
+    DOWNLOAD_ACCEL_ROOT = os.environ.get("DOWNLOAD_ACCEL_ROOT")
+    # Opt-in Cache-Control for file downloads (e.g. "private, no-cache" to
+    # let browsers keep and revalidate them); unset keeps the global no-store.
+    DOWNLOAD_CACHE_CONTROL = os.environ.get("DOWNLOAD_CACHE_CONTROL") or None
+
+    # Resumable uploads: fixed chunk size (capped by MAX_CONTENT_LENGTH) and
+    # the largest file a chunked upload may announce.
+    CHUNKED_UPLOAD_CHUNK_SIZE = int(
+        os.environ.get("CHUNKED_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024))
+    )
+    CHUNKED_UPLOAD_MAX_SIZE = int(
+        os.environ.get("CHUNKED_UPLOAD_MAX_SIZE", str(2 * 1024 * 1024 * 1024))
+    )
+
+    # Shared, versioned DO-NOT-EDIT template sets (default: instance/template_store).
+    TEMPLATE_STORE_ROOT = os.environ.get("TEMPLATE_STORE_ROOT")
+
+    # Sanitized DOCX templates (app.services.docx_cache): on-disk copies
+    # (default: instance/cache/docx) and the in-memory budget in bytes.
+    DOCX_CACHE_ROOT = os.environ.get("DOCX_CACHE_ROOT")
+    DOCX_CACHE_MAX_BYTES = int(
+        os.environ.get("DOCX_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+    )
+
+    # Queued document generation (app.services.document_jobs); the worker is
+    # ``python run_tasks.py documents``.  Eager mode renders inside the request.
+    DOCUMENT_JOBS_EAGER = os.environ.get("DOCUMENT_JOBS_EAGER", "0") == "1"
+    DOCUMENT_JOB_PROCESSES = int(os.environ.get("DOCUMENT_JOB_PROCESSES", "0")) or None
+    DOCUMENT_JOB_TIMEOUT = int(os.environ.get("DOCUMENT_JOB_TIMEOUT", "600"))
+    DOCUMENT_JOB_MAX_ATTEMPTS = int(os.environ.get("DOCUMENT_JOB_MAX_ATTEMPTS", "3"))
+    # Upper bound of one batch (app.investigations.batch).
+    DOCUMENT_BATCH_MAX_INVESTIGATIONS = int(
+        os.environ.get("DOCUMENT_BATCH_MAX_INVESTIGATIONS", "500")
+    )
+
+    # Email outbox (app.services.email_outbox); the sender is
+    # ``python run_tasks.py emails``.  Rate limit: emails per recipient and window.
+    EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", "50"))
+    EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", "5"))
+    EMAIL_RETRY_BASE_SECONDS = int(os.environ.get("EMAIL_RETRY_BASE_SECONDS", "60"))
+    EMAIL_RETRY_MAX_SECONDS = int(os.environ.get("EMAIL_RETRY_MAX_SECONDS", "21600"))
+    EMAIL_RATE_LIMIT = int(os.environ.get("EMAIL_RATE_LIMIT", "30"))
+    EMAIL_RATE_WINDOW_SECONDS = int(os.environ.get("EMAIL_RATE_WINDOW_SECONDS", "3600"))
+    EMAIL_SEND_TIMEOUT = int(os.environ.get("EMAIL_SEND_TIMEOUT", "300"))
+
+    # Daily deadline digests: cases/investigations due within this many days.
+    DEADLINE_DIGEST_DAYS = int(os.environ.get("DEADLINE_DIGEST_DAYS", "14"))
+
+    # Job scheduler (app.services.scheduler; ``python run_scheduler.py``):
+    # concurrent job processes, per-job schedule overrides ({"name": "cron"}),
+    # switched-off jobs and how long run history is kept.
+    SCHEDULER_PROCESSES = int(os.environ.get("SCHEDULER_PROCESSES", "2"))
+    SCHEDULER_SCHEDULES = {}
+    SCHEDULER_DISABLED_JOBS = [
+        name.strip()
+        for name in os.environ.get("SCHEDULER_DISABLED_JOBS", "").split(",")
+        if name.strip()
+    ]
+    SCHEDULER_HISTORY_DAYS = int(os.environ.get("SCHEDULER_HISTORY_DAYS", "30"))
+
+    # Nightly SQLite maintenance (app.services.db_maintenance): switch the
+    # databases to incremental auto_vacuum (one full VACUUM each), pages
+    # released per run (0 = all free pages) and the age of leaked temp files.
+    DB_MAINTENANCE_CONVERT = os.environ.get("DB_MAINTENANCE_CONVERT", "0") == "1"
+    DB_MAINTENANCE_VACUUM_PAGES = int(
+        os.environ.get("DB_MAINTENANCE_VACUUM_PAGES", "0")
+    )
+    DB_MAINTENANCE_TEMP_MAX_AGE_HOURS = float(
+        os.environ.get("DB_MAINTENANCE_TEMP_MAX_AGE_HOURS", "6")
+    )
+
+    # Online backups (app.services.backups; default root: instance/backups):
+    # backups kept, database pages copied per step and the pause between
+    # steps, and how often writes may restart a copy before it is done in
+    # one step.
+    BACKUP_ROOT = os.environ.get("BACKUP_ROOT")
+    BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", "7"))
+    BACKUP_PAGES_PER_STEP = int(os.environ.get("BACKUP_PAGES_PER_STEP", "1024"))
+    BACKUP_STEP_SLEEP_MS = int(os.environ.get("BACKUP_STEP_SLEEP_MS", "5"))
+    BACKUP_MAX_RESTARTS = int(os.environ.get("BACKUP_MAX_RESTARTS", "20"))
+
+    # SQLite files in WAL mode (app.utils.sqlite): "1" on, "0" off, unset =
+    # only while WAL shipping is configured.  WAL needs shared memory, so
+    # keep it off for instance dirs on network mounts.
+    SQLITE_WAL = os.environ.get("SQLITE_WAL")
+
+    # WAL shipping to a warm standby (app.services.replication;
+    # ``python run_tasks.py replicate``): standby directory (local disk or a
+    # mounted share; unset = off), poll interval and the WAL size in frames
+    # at which the shipper checkpoints.  The ``wal_guard`` job checkpoints
+    # anyway once the shipper has not reported for
+    # REPLICATION_SHIPPER_STALE_SECONDS or the WAL exceeds
+    # REPLICATION_MAX_WAL_MB, so a stopped shipper cannot grow it unbounded.
+    REPLICATION_STANDBY_DIR = os.environ.get("REPLICATION_STANDBY_DIR")
+    REPLICATION_POLL_SECONDS = float(os.environ.get("REPLICATION_POLL_SECONDS", "1"))
+    REPLICATION_CHECKPOINT_FRAMES = int(
+        os.environ.get("REPLICATION_CHECKPOINT_FRAMES", "1000")
+    )
+    REPLICATION_SHIPPER_STALE_SECONDS = float(
+        os.environ.get("REPLICATION_SHIPPER_STALE_SECONDS", "300")
+    )
+    REPLICATION_MAX_WAL_MB = int(os.environ.get("REPLICATION_MAX_WAL_MB", "1024"))
+
+    # Read-only routing of report pages and exports (app.utils.reporting):
+    # "readonly" (live files opened mode=ro), "replica" (the warm standby
+    # while at most REPORTING_MAX_STALENESS_SECONDS behind, else the
+    # primary) or "primary" (no routing).
+    REPORTING_SOURCE = os.environ.get("REPORTING_SOURCE", "readonly")
+    REPORTING_MAX_STALENESS_SECONDS = float(
+        os.environ.get("REPORTING_MAX_STALENESS_SECONDS", "30")
+    )
+
+    # Archiving of closed cases/investigations (app.services.archive; weekly
+    # ``archive`` job): per-year archive files (default: instance/archive),
+    # months a closed subject stays hot and subjects moved per transaction.
+    ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR")
+    ARCHIVE_AFTER_MONTHS = int(os.environ.get("ARCHIVE_AFTER_MONTHS", "24"))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "200"))
+
+    # Cold storage of closed subjects' upload folders (app.services.cold_storage;
+    # weekly ``cold_storage`` job): months closed before a folder is zipped,
+    # and the LRU cache of extracted members (default: instance/cold_cache).
+    COLD_STORAGE_AFTER_MONTHS = int(os.environ.get("COLD_STORAGE_AFTER_MONTHS", "12"))
+    COLD_STORAGE_CACHE_DIR = os.environ.get("COLD_STORAGE_CACHE_DIR")
+    COLD_STORAGE_CACHE_MAX_MB = int(os.environ.get("COLD_STORAGE_CACHE_MAX_MB", "512"))
+
+    # Upload tree reconciliation (app.services.reconcile): scan threads, the
+    # incremental manifest (default: instance/reconcile_manifest.json) and
+    # where repairs move files aside (default: instance/reconcile_quarantine).
+    RECONCILE_WORKERS = int(os.environ.get("RECONCILE_WORKERS", "8"))
+    RECONCILE_MANIFEST = os.environ.get("RECONCILE_MANIFEST")
+    RECONCILE_QUARANTINE = os.environ.get("RECONCILE_QUARANTINE")
+
+    # Request body caps per endpoint (bytes), enforced while streaming by
+    # app.utils.upload_limits; other endpoints use MAX_CONTENT_LENGTH.
+    UPLOAD_ROUTE_LIMITS = {
+        "auth.login": 64 * 1024,
+        "auth.start_case_chunked_upload": 64 * 1024,
+        "investigations.start_investigation_chunked_upload": 64 * 1024,
+        "main.chunked_upload_finalize": 0,
+    }
+
+    # Change-log rows between compressed history snapshots (time travel).
+    HISTORY_SNAPSHOT_EVERY = int(os.environ.get("HISTORY_SNAPSHOT_EVERY", "50"))
+
     NO_STORE_HEADERS_ENABLED = True
     BFCACHE_RELOAD_ENABLED = True
     STRICT_PRG_ENABLED = True
@@ -56,6 +206,7 @@ class TestingConfig(Config):
     TRACK_USER_ACTIVITY = False
     # 👇 ensure SQLAlchemy doesn’t expire objects after commit in tests
     SQLALCHEMY_SESSION_OPTIONS = {"expire_on_commit": False}
+    DOCUMENT_JOBS_EAGER = True
 
     @staticmethod
     def init_app(app):
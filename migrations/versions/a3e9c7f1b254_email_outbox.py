@@ -0,0 +1,95 @@
+"""Add email_outbox table for queued outgoing email
+
+Revision ID: a3e9c7f1b254
+Revises: f4b8d2c6a913
+Create Date: 2026-10-19 23:30:00.000000
+
+Emails are sent by ``python run_tasks.py emails``.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "a3e9c7f1b254"
+down_revision = "f4b8d2c6a913"
+branch_labels = None
+depends_on = None
+
+TABLE = "email_outbox"
+INDEXES = {
+    "ix_email_outbox_status_next": ["status", "next_attempt_at"],
+    "ix_email_outbox_recipient_sent": ["recipient", "sent_at"],
+}
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _table_exists(name: str) -> bool:
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    if _table_exists(TABLE):
+        return
+    op.create_table(
+        TABLE,
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("recipient", sa.String(length=255), nullable=False),
+        sa.Column("sender", sa.String(length=255), nullable=True),
+        sa.Column("subject", sa.String(length=255), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("worker", sa.String(length=64), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    for name, columns in INDEXES.items():
+        op.create_index(name, TABLE, columns)
+
+
+def downgrade_main():
+    if _table_exists(TABLE):
+        for name in INDEXES:
+            op.drop_index(name, table_name=TABLE)
+        op.drop_table(TABLE)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
@@ -0,0 +1,91 @@
+"""Add chunked_upload table for resumable uploads
+
+Revision ID: a6e2d8c4f915
+Revises: f3d9a2b7c614
+Create Date: 2026-10-19 17:00:00.000000
+
+Abandoned sessions are removed by
+``python scripts/blob_store_maintenance.py --purge-partial-hours N``.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "a6e2d8c4f915"
+down_revision = "f3d9a2b7c614"
+branch_labels = None
+depends_on = None
+
+TABLE = "chunked_upload"
+INDEX_NAME = "ix_chunked_upload_updated_at"
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _table_exists(name: str) -> bool:
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    if _table_exists(TABLE):
+        return
+    op.create_table(
+        TABLE,
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("subject_type", sa.String(length=16), nullable=False),
+        sa.Column("subject_id", sa.Integer(), nullable=False),
+        sa.Column("filename", sa.String(length=256), nullable=False),
+        sa.Column("category", sa.String(length=64), nullable=False),
+        sa.Column("total_size", sa.BigInteger(), nullable=False),
+        sa.Column("chunk_size", sa.Integer(), nullable=False),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("received_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(INDEX_NAME, TABLE, ["updated_at"])
+
+
+def downgrade_main():
+    if _table_exists(TABLE):
+        op.drop_index(INDEX_NAME, table_name=TABLE)
+        op.drop_table(TABLE)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
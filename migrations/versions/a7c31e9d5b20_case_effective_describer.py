@@ -0,0 +1,87 @@
+"""Materialize effective describer on case
+
+Revision ID: a7c31e9d5b20
+Revises: fd3bcf1ab5c4
+Create Date: 2026-10-19 09:00:00.000000
+
+Backfill after upgrading with ``python scripts/recompute_effective_describers.py``.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "a7c31e9d5b20"
+down_revision = "fd3bcf1ab5c4"
+branch_labels = None
+depends_on = None
+
+COLUMN = "effective_describer_id"
+INDEX_NAME = "ix_case_effective_describer_id"
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _table_exists(name: str) -> bool:
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    if not _table_exists("case"):
+        return
+    insp = sa.inspect(op.get_bind())
+    columns = {col["name"] for col in insp.get_columns("case")}
+    indexes = {idx["name"] for idx in insp.get_indexes("case")}
+    with op.batch_alter_table("case", schema=None) as batch_op:
+        if COLUMN not in columns:
+            batch_op.add_column(sa.Column(COLUMN, sa.Integer(), nullable=True))
+        if INDEX_NAME not in indexes:
+            batch_op.create_index(INDEX_NAME, [COLUMN])
+
+
+def downgrade_main():
+    if not _table_exists("case"):
+        return
+    insp = sa.inspect(op.get_bind())
+    columns = {col["name"] for col in insp.get_columns("case")}
+    indexes = {idx["name"] for idx in insp.get_indexes("case")}
+    with op.batch_alter_table("case", schema=None) as batch_op:
+        if INDEX_NAME in indexes:
+            batch_op.drop_index(INDEX_NAME)
+        if COLUMN in columns:
+            batch_op.drop_column(COLUMN)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
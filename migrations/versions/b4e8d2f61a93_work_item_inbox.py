@@ -0,0 +1,90 @@
+"""Add work_item inbox table
+
+Revision ID: b4e8d2f61a93
+Revises: a7c31e9d5b20
+Create Date: 2026-10-19 10:00:00.000000
+
+Populate after upgrading with ``python scripts/rebuild_work_items.py``.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "b4e8d2f61a93"
+down_revision = "a7c31e9d5b20"
+branch_labels = None
+depends_on = None
+
+TABLE = "work_item"
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _table_exists(name: str) -> bool:
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    if _table_exists(TABLE):
+        return
+    op.create_table(
+        TABLE,
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("subject_type", sa.String(length=16), nullable=False),
+        sa.Column("subject_id", sa.Integer(), nullable=False),
+        sa.Column("role", sa.String(length=32), nullable=False),
+        sa.Column("status", sa.String(length=64), nullable=True),
+        sa.Column("deadline", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_work_item_user_status_deadline",
+        TABLE,
+        ["user_id", "status", "deadline"],
+    )
+    op.create_index("ix_work_item_subject", TABLE, ["subject_type", "subject_id"])
+
+
+def downgrade_main():
+    if not _table_exists(TABLE):
+        return
+    op.drop_index("ix_work_item_subject", table_name=TABLE)
+    op.drop_index("ix_work_item_user_status_deadline", table_name=TABLE)
+    op.drop_table(TABLE)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
@@ -0,0 +1,79 @@
+"""Add deadline_digest table recording the daily deadline digests
+
+Revision ID: b7d4f2a9c163
+Revises: a3e9c7f1b254
+Create Date: 2026-10-19 23:45:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "b7d4f2a9c163"
+down_revision = "a3e9c7f1b254"
+branch_labels = None
+depends_on = None
+
+TABLE = "deadline_digest"
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _table_exists(name: str) -> bool:
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    if _table_exists(TABLE):
+        return
+    op.create_table(
+        TABLE,
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("digest_date", sa.Date(), nullable=False),
+        sa.Column("upcoming", sa.Integer(), nullable=False),
+        sa.Column("overdue", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "digest_date", name="uq_deadline_digest_day"),
+    )
+
+
+def downgrade_main():
+    if _table_exists(TABLE):
+        op.drop_table(TABLE)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
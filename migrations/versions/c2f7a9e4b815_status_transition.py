@@ -0,0 +1,96 @@
+"""Add status_transition history for cases
+
+Revision ID: c2f7a9e4b815
+Revises: b4e8d2f61a93
+Create Date: 2026-10-19 11:00:00.000000
+
+Backfill after upgrading with ``python scripts/backfill_status_transitions.py``.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "c2f7a9e4b815"
+down_revision = "b4e8d2f61a93"
+branch_labels = None
+depends_on = None
+
+TABLE = "status_transition"
+INDEXES = {
+    "ix_status_transition_subject_at": ["subject_id", "at"],
+    "ix_status_transition_to_status_at": ["to_status", "at"],
+    "ix_status_transition_at": ["at"],
+}
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _table_exists(name: str) -> bool:
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    if _table_exists(TABLE):
+        return
+    op.create_table(
+        TABLE,
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column(
+            "subject_type",
+            sa.String(length=16),
+            nullable=False,
+            server_default="case",
+        ),
+        sa.Column("subject_id", sa.Integer(), nullable=False),
+        sa.Column("from_status", sa.String(length=64), nullable=True),
+        sa.Column("to_status", sa.String(length=64), nullable=True),
+        sa.Column("at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("actor", sa.String(length=64), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    for name, columns in INDEXES.items():
+        op.create_index(name, TABLE, columns)
+
+
+def downgrade_main():
+    if not _table_exists(TABLE):
+        return
+    for name in INDEXES:
+        op.drop_index(name, table_name=TABLE)
+    op.drop_table(TABLE)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
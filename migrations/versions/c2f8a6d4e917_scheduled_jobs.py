@@ -0,0 +1,105 @@
+"""Add scheduled_job / scheduled_job_run tables for the job scheduler
+
+Revision ID: c2f8a6d4e917
+Revises: b7d4f2a9c163
+Create Date: 2026-10-19 23:55:00.000000
+
+Rows are created by ``python run_scheduler.py`` for the registered jobs.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "c2f8a6d4e917"
+down_revision = "b7d4f2a9c163"
+branch_labels = None
+depends_on = None
+
+JOB_TABLE = "scheduled_job"
+RUN_TABLE = "scheduled_job_run"
+RUN_INDEX = "ix_scheduled_job_run_job_started"
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _table_exists(name: str) -> bool:
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    if not _table_exists(JOB_TABLE):
+        op.create_table(
+            JOB_TABLE,
+            sa.Column("name", sa.String(length=64), nullable=False),
+            sa.Column("schedule", sa.String(length=64), nullable=False),
+            sa.Column("enabled", sa.Boolean(), nullable=False),
+            sa.Column("lock_group", sa.String(length=64), nullable=True),
+            sa.Column("next_run_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("lease_owner", sa.String(length=64), nullable=True),
+            sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("last_started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("last_finished_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("last_status", sa.String(length=16), nullable=True),
+            sa.Column("last_error", sa.Text(), nullable=True),
+            sa.PrimaryKeyConstraint("name"),
+        )
+    if not _table_exists(RUN_TABLE):
+        op.create_table(
+            RUN_TABLE,
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("job_name", sa.String(length=64), nullable=False),
+            sa.Column("worker", sa.String(length=64), nullable=False),
+            sa.Column("trigger", sa.String(length=16), nullable=False),
+            sa.Column("status", sa.String(length=16), nullable=False),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("duration_ms", sa.Integer(), nullable=True),
+            sa.Column("error", sa.Text(), nullable=True),
+            sa.Column("result", sa.JSON(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(RUN_INDEX, RUN_TABLE, ["job_name", "started_at"])
+
+
+def downgrade_main():
+    if _table_exists(RUN_TABLE):
+        op.drop_index(RUN_INDEX, table_name=RUN_TABLE)
+        op.drop_table(RUN_TABLE)
+    if _table_exists(JOB_TABLE):
+        op.drop_table(JOB_TABLE)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
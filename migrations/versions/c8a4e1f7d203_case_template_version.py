@@ -0,0 +1,79 @@
+"""Add template_version to case
+
+Revision ID: c8a4e1f7d203
+Revises: a6e2d8c4f915
+Create Date: 2026-10-19 18:00:00.000000
+
+Records which shared DO-NOT-EDIT template set version was linked into the
+case folder (``app.services.template_store``).  Older cases keep NULL: their
+folders hold full copies.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "c8a4e1f7d203"
+down_revision = "a6e2d8c4f915"
+branch_labels = None
+depends_on = None
+
+TABLE = "case"
+COLUMN = "template_version"
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _columns() -> set:
+    insp = sa.inspect(op.get_bind())
+    if TABLE not in insp.get_table_names():
+        return set()
+    return {col["name"] for col in insp.get_columns(TABLE)}
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    columns = _columns()
+    if columns and COLUMN not in columns:
+        with op.batch_alter_table(TABLE, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(COLUMN, sa.String(length=16)))
+
+
+def downgrade_main():
+    if COLUMN in _columns():
+        with op.batch_alter_table(TABLE, schema=None) as batch_op:
+            batch_op.drop_column(COLUMN)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
@@ -0,0 +1,85 @@
+"""Add case_history_snapshot checkpoints
+
+Revision ID: d5a1c8e3f047
+Revises: c2f7a9e4b815
+Create Date: 2026-10-19 12:00:00.000000
+
+Build checkpoints for existing history with
+``python scripts/build_history_checkpoints.py``.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "d5a1c8e3f047"
+down_revision = "c2f7a9e4b815"
+branch_labels = None
+depends_on = None
+
+TABLE = "case_history_snapshot"
+INDEX_NAME = "ix_case_history_snapshot_subject_taken"
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _table_exists(name: str) -> bool:
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    if _table_exists(TABLE):
+        return
+    op.create_table(
+        TABLE,
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("subject_id", sa.Integer(), nullable=False),
+        sa.Column("changelog_id", sa.Integer(), nullable=False),
+        sa.Column("change_count", sa.Integer(), nullable=False),
+        sa.Column("taken_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("state", sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(INDEX_NAME, TABLE, ["subject_id", "taken_at"])
+
+
+def downgrade_main():
+    if not _table_exists(TABLE):
+        return
+    op.drop_index(INDEX_NAME, table_name=TABLE)
+    op.drop_table(TABLE)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
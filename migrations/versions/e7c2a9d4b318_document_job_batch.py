@@ -0,0 +1,76 @@
+"""Add document_job.batch_id for batch document generation
+
+Revision ID: e7c2a9d4b318
+Revises: d1b5f3a8e742
+Create Date: 2026-10-19 22:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "e7c2a9d4b318"
+down_revision = "d1b5f3a8e742"
+branch_labels = None
+depends_on = None
+
+TABLE = "document_job"
+COLUMN = "batch_id"
+INDEX_NAME = "ix_document_job_batch_id"
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _columns(table: str):
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    if COLUMN in _columns(TABLE):
+        return
+    with op.batch_alter_table(TABLE) as batch_op:
+        batch_op.add_column(sa.Column(COLUMN, sa.String(length=32), nullable=True))
+        batch_op.create_index(INDEX_NAME, [COLUMN])
+
+
+def downgrade_main():
+    if COLUMN not in _columns(TABLE):
+        return
+    with op.batch_alter_table(TABLE) as batch_op:
+        batch_op.drop_index(INDEX_NAME)
+        batch_op.drop_column(COLUMN)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
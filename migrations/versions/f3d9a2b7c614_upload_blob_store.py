@@ -0,0 +1,102 @@
+"""Add upload_blob store and uploaded_file hash/size
+
+Revision ID: f3d9a2b7c614
+Revises: e8b3f1c6a920
+Create Date: 2026-10-19 15:00:00.000000
+
+Existing uploads keep NULL hashes until
+``python scripts/blob_store_maintenance.py --backfill`` adopts them.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "f3d9a2b7c614"
+down_revision = "e8b3f1c6a920"
+branch_labels = None
+depends_on = None
+
+TABLE = "upload_blob"
+INDEX_NAME = "ix_uploaded_file_sha256"
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _table_exists(name: str) -> bool:
+    return name in sa.inspect(op.get_bind()).get_table_names()
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    if not _table_exists(TABLE):
+        op.create_table(
+            TABLE,
+            sa.Column("sha256", sa.String(length=64), nullable=False),
+            sa.Column("size_bytes", sa.Integer(), nullable=False),
+            sa.Column("refcount", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint("sha256"),
+        )
+    if not _table_exists("uploaded_file"):
+        return
+    insp = sa.inspect(op.get_bind())
+    columns = {col["name"] for col in insp.get_columns("uploaded_file")}
+    indexes = {idx["name"] for idx in insp.get_indexes("uploaded_file")}
+    with op.batch_alter_table("uploaded_file", schema=None) as batch_op:
+        if "sha256" not in columns:
+            batch_op.add_column(sa.Column("sha256", sa.String(length=64)))
+        if "size_bytes" not in columns:
+            batch_op.add_column(sa.Column("size_bytes", sa.Integer()))
+        if INDEX_NAME not in indexes:
+            batch_op.create_index(INDEX_NAME, ["sha256"])
+
+
+def downgrade_main():
+    if _table_exists("uploaded_file"):
+        insp = sa.inspect(op.get_bind())
+        columns = {col["name"] for col in insp.get_columns("uploaded_file")}
+        indexes = {idx["name"] for idx in insp.get_indexes("uploaded_file")}
+        with op.batch_alter_table("uploaded_file", schema=None) as batch_op:
+            if INDEX_NAME in indexes:
+                batch_op.drop_index(INDEX_NAME)
+            if "size_bytes" in columns:
+                batch_op.drop_column("size_bytes")
+            if "sha256" in columns:
+                batch_op.drop_column("sha256")
+    if _table_exists(TABLE):
+        op.drop_table(TABLE)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
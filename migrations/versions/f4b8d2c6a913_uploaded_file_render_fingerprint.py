@@ -0,0 +1,78 @@
+"""Add render_fingerprint to uploaded_file
+
+Revision ID: f4b8d2c6a913
+Revises: e7c2a9d4b318
+Create Date: 2026-10-19 23:00:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "f4b8d2c6a913"
+down_revision = "e7c2a9d4b318"
+branch_labels = None
+depends_on = None
+
+TABLE = "uploaded_file"
+COLUMN = "render_fingerprint"
+
+
+def _current_bind():
+    tag = context.get_tag_argument()
+    if tag:
+        return tag
+    try:
+        x = context.get_x_argument(as_dictionary=True)
+        return x.get("bind") or x.get("bind_key")
+    except Exception:
+        return None
+
+
+def _columns(table: str):
+    insp = sa.inspect(op.get_bind())
+    if table not in insp.get_table_names():
+        return None
+    return {c["name"] for c in insp.get_columns(table)}
+
+
+def upgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        upgrade_main()
+    elif b == "examination":
+        upgrade_examination()
+
+
+def downgrade():
+    b = _current_bind()
+    if b in ("default", "main", None):
+        downgrade_main()
+    elif b == "examination":
+        downgrade_examination()
+
+
+def upgrade_main():
+    columns = _columns(TABLE)
+    if columns is None or COLUMN in columns:
+        return
+    with op.batch_alter_table(TABLE) as batch_op:
+        batch_op.add_column(sa.Column(COLUMN, sa.String(length=64), nullable=True))
+
+
+def downgrade_main():
+    columns = _columns(TABLE)
+    if not columns or COLUMN not in columns:
+        return
+    with op.batch_alter_table(TABLE) as batch_op:
+        batch_op.drop_column(COLUMN)
+
+
+def upgrade_examination():
+    # No-op for examination bind in this revision
+    pass
+
+
+def downgrade_examination():
+    # No-op for examination bind in this revision
+    pass
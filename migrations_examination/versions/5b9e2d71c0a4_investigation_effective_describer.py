@@ -0,0 +1,70 @@
+"""Materialize effective describer on investigation
+
+Revision ID: 5b9e2d71c0a4
+Revises: 48c6473d06a3
+Create Date: 2026-10-19 09:05:00.000000
+
+Backfill after upgrading with ``python scripts/recompute_effective_describers.py``.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "5b9e2d71c0a4"
+down_revision = "48c6473d06a3"
+branch_labels = None
+depends_on = None
+
+COLUMN = "effective_describer_id"
+INDEX_NAME = "ix_investigation_effective_describer_id"
+
+
+def _is_examination_bind() -> bool:
+    tag = context.get_tag_argument()
+    if tag and tag != "examination":
+        return False
+    try:
+        x_args = context.get_x_argument(as_dictionary=True)
+    except Exception:  # pragma: no cover - optional in offline runs
+        x_args = {}
+    bind = x_args.get("bind") or x_args.get("bind_key")
+    if bind and bind != "examination":
+        return False
+    if not tag and not bind:
+        return False
+    return True
+
+
+def upgrade() -> None:
+    if not _is_examination_bind():
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if "investigation" not in inspector.get_table_names():
+        return
+
+    columns = {col["name"] for col in inspector.get_columns("investigation")}
+    indexes = {idx["name"] for idx in inspector.get_indexes("investigation")}
+    with op.batch_alter_table("investigation", schema=None) as batch_op:
+        if COLUMN not in columns:
+            batch_op.add_column(sa.Column(COLUMN, sa.Integer(), nullable=True))
+        if INDEX_NAME not in indexes:
+            batch_op.create_index(INDEX_NAME, [COLUMN])
+
+
+def downgrade() -> None:
+    if not _is_examination_bind():
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if "investigation" not in inspector.get_table_names():
+        return
+
+    columns = {col["name"] for col in inspector.get_columns("investigation")}
+    indexes = {idx["name"] for idx in inspector.get_indexes("investigation")}
+    with op.batch_alter_table("investigation", schema=None) as batch_op:
+        if INDEX_NAME in indexes:
+            batch_op.drop_index(INDEX_NAME)
+        if COLUMN in columns:
+            batch_op.drop_column(COLUMN)
@@ -0,0 +1,81 @@
+"""Add status_transition history for investigations
+
+Revision ID: 6d1f3b8a2c57
+Revises: 5b9e2d71c0a4
+Create Date: 2026-10-19 11:05:00.000000
+
+Backfill after upgrading with ``python scripts/backfill_status_transitions.py``.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "6d1f3b8a2c57"
+down_revision = "5b9e2d71c0a4"
+branch_labels = None
+depends_on = None
+
+TABLE = "status_transition"
+INDEXES = {
+    "ix_inv_status_transition_subject_at": ["subject_id", "at"],
+    "ix_inv_status_transition_to_status_at": ["to_status", "at"],
+    "ix_inv_status_transition_at": ["at"],
+}
+
+
+def _is_examination_bind() -> bool:
+    tag = context.get_tag_argument()
+    if tag and tag != "examination":
+        return False
+    try:
+        x_args = context.get_x_argument(as_dictionary=True)
+    except Exception:  # pragma: no cover - optional in offline runs
+        x_args = {}
+    bind = x_args.get("bind") or x_args.get("bind_key")
+    if bind and bind != "examination":
+        return False
+    if not tag and not bind:
+        return False
+    return True
+
+
+def upgrade() -> None:
+    if not _is_examination_bind():
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if TABLE in inspector.get_table_names():
+        return
+
+    op.create_table(
+        TABLE,
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column(
+            "subject_type",
+            sa.String(length=16),
+            nullable=False,
+            server_default="investigation",
+        ),
+        sa.Column("subject_id", sa.Integer(), nullable=False),
+        sa.Column("from_status", sa.String(length=64), nullable=True),
+        sa.Column("to_status", sa.String(length=64), nullable=True),
+        sa.Column("at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("actor", sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    for name, columns in INDEXES.items():
+        op.create_index(name, TABLE, columns)
+
+
+def downgrade() -> None:
+    if not _is_examination_bind():
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if TABLE not in inspector.get_table_names():
+        return
+
+    for name in INDEXES:
+        op.drop_index(name, table_name=TABLE)
+    op.drop_table(TABLE)
@@ -0,0 +1,66 @@
+"""Add change_outbox change-data-capture feed for investigations
+
+Revision ID: 8f2c6d4e1a35
+Revises: 7e4a9c2d1b68
+Create Date: 2026-10-19 14:05:00.000000
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "8f2c6d4e1a35"
+down_revision = "7e4a9c2d1b68"
+branch_labels = None
+depends_on = None
+
+TABLE = "change_outbox"
+
+
+def _is_examination_bind() -> bool:
+    tag = context.get_tag_argument()
+    if tag and tag != "examination":
+        return False
+    try:
+        x_args = context.get_x_argument(as_dictionary=True)
+    except Exception:  # pragma: no cover - optional in offline runs
+        x_args = {}
+    bind = x_args.get("bind") or x_args.get("bind_key")
+    if bind and bind != "examination":
+        return False
+    if not tag and not bind:
+        return False
+    return True
+
+
+def upgrade() -> None:
+    if not _is_examination_bind():
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if TABLE in inspector.get_table_names():
+        return
+
+    op.create_table(
+        TABLE,
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("subject_type", sa.String(length=16), nullable=False),
+        sa.Column("subject_id", sa.Integer(), nullable=False),
+        sa.Column("op", sa.String(length=8), nullable=False),
+        sa.Column("at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("actor", sa.Integer(), nullable=True),
+        sa.Column("changes", sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sqlite_autoincrement=True,
+    )
+
+
+def downgrade() -> None:
+    if not _is_examination_bind():
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if TABLE not in inspector.get_table_names():
+        return
+
+    op.drop_table(TABLE)
@@ -0,0 +1,75 @@
+"""Add sha256/size_bytes to investigation_attachment
+
+Revision ID: 9a4e7c1f2b80
+Revises: 8f2c6d4e1a35
+Create Date: 2026-10-19 15:05:00.000000
+
+Existing attachments keep NULL hashes until
+``python scripts/blob_store_maintenance.py --backfill`` adopts them.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "9a4e7c1f2b80"
+down_revision = "8f2c6d4e1a35"
+branch_labels = None
+depends_on = None
+
+TABLE = "investigation_attachment"
+INDEX_NAME = "ix_investigation_attachment_sha256"
+
+
+def _is_examination_bind() -> bool:
+    tag = context.get_tag_argument()
+    if tag and tag != "examination":
+        return False
+    try:
+        x_args = context.get_x_argument(as_dictionary=True)
+    except Exception:  # pragma: no cover - optional in offline runs
+        x_args = {}
+    bind = x_args.get("bind") or x_args.get("bind_key")
+    if bind and bind != "examination":
+        return False
+    if not tag and not bind:
+        return False
+    return True
+
+
+def upgrade() -> None:
+    if not _is_examination_bind():
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if TABLE not in inspector.get_table_names():
+        return
+
+    columns = {col["name"] for col in inspector.get_columns(TABLE)}
+    indexes = {idx["name"] for idx in inspector.get_indexes(TABLE)}
+    with op.batch_alter_table(TABLE, schema=None) as batch_op:
+        if "sha256" not in columns:
+            batch_op.add_column(sa.Column("sha256", sa.String(length=64)))
+        if "size_bytes" not in columns:
+            batch_op.add_column(sa.Column("size_bytes", sa.Integer()))
+        if INDEX_NAME not in indexes:
+            batch_op.create_index(INDEX_NAME, ["sha256"])
+
+
+def downgrade() -> None:
+    if not _is_examination_bind():
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if TABLE not in inspector.get_table_names():
+        return
+
+    columns = {col["name"] for col in inspector.get_columns(TABLE)}
+    indexes = {idx["name"] for idx in inspector.get_indexes(TABLE)}
+    with op.batch_alter_table(TABLE, schema=None) as batch_op:
+        if INDEX_NAME in indexes:
+            batch_op.drop_index(INDEX_NAME)
+        if "size_bytes" in columns:
+            batch_op.drop_column("size_bytes")
+        if "sha256" in columns:
+            batch_op.drop_column("sha256")
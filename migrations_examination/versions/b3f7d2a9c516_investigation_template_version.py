@@ -0,0 +1,66 @@
+"""Add template_version to investigation
+
+Revision ID: b3f7d2a9c516
+Revises: 9a4e7c1f2b80
+Create Date: 2026-10-19 18:00:00.000000
+
+Records which shared DO-NOT-EDIT template set version was linked into the
+investigation folder (``app.services.template_store``).  Older
+investigations keep NULL: their folders hold full copies.
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision = "b3f7d2a9c516"
+down_revision = "9a4e7c1f2b80"
+branch_labels = None
+depends_on = None
+
+TABLE = "investigation"
+COLUMN = "template_version"
+
+
+def _is_examination_bind() -> bool:
+    tag = context.get_tag_argument()
+    if tag and tag != "examination":
+        return False
+    try:
+        x_args = context.get_x_argument(as_dictionary=True)
+    except Exception:  # pragma: no cover - optional in offline runs
+        x_args = {}
+    bind = x_args.get("bind") or x_args.get("bind_key")
+    if bind and bind != "examination":
+        return False
+    if not tag and not bind:
+        return False
+    return True
+
+
+def upgrade() -> None:
+    if not _is_examination_bind():
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if TABLE not in inspector.get_table_names():
+        return
+
+    columns = {col["name"] for col in inspector.get_columns(TABLE)}
+    if COLUMN not in columns:
+        with op.batch_alter_table(TABLE, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(COLUMN, sa.String(length=16)))
+
+
+def downgrade() -> None:
+    if not _is_examination_bind():
+        return
+
+    inspector = sa.inspect(op.get_bind())
+    if TABLE not in inspector.get_table_names():
+        return
+
+    columns = {col["name"] for col in inspector.get_columns(TABLE)}
+    if COLUMN in columns:
+        with op.batch_alter_table(TABLE, schema=None) as batch_op:
+            batch_op.drop_column(COLUMN)
@@ -1,3 +1,4 @@
+import argparse
 import logging
 import sys
 
@@ -5,17 +6,45 @@ from app import create_app  # noqa: F401
 from app.utils.context import get_app, run_with_app, setup_logging  # noqa: F401
 
 
-def _init_and_run() -> int:
+def _init_and_run(args) -> int:
+    from app.services import scheduler
     from app.tasks.smoke import ping_db
 
     logging.getLogger(__name__).info("smoke: %r", ping_db())
+    # Leases keep several schedulers (or cron-started --once runs) from
+    # running a job twice.
+    finished = scheduler.run_scheduler(
+        processes=args.processes, once=args.once, poll_interval=args.poll
+    )
+    logging.getLogger(__name__).info("scheduler: %d job run(s) finished", finished)
     return 0
 
 
-def main() -> int:
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scheduled job runner.")
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Run the jobs due now and exit (for cron).",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Concurrent job processes (default: SCHEDULER_PROCESSES; "
+        "0 runs jobs in the scheduler process without timeouts).",
+    )
+    parser.add_argument(
+        "--poll", type=float, default=5.0, help="Seconds between schedule checks."
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
     try:
+        args = _parse_args(argv or [])
         setup_logging()
-        return run_with_app(_init_and_run)
+        return run_with_app(_init_and_run, args)
     except Exception:
         logging.exception("run_scheduler.py: fatal")
         if __name__ == "__main__":
@@ -24,4 +53,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(main(sys.argv[1:]))
@@ -1,3 +1,4 @@
+import argparse
 import logging
 import sys
 
@@ -12,9 +13,142 @@ def _init_and_run() -> int:
     return 0
 
 
-def main() -> int:
+def _run_documents(args) -> int:
+    from app.services import document_jobs
+
+    finished = document_jobs.run_worker(
+        processes=args.processes, once=args.once, poll_interval=args.poll
+    )
+    logging.getLogger(__name__).info("documents: %d job(s) finished", finished)
+    return 0
+
+
+def _run_emails(args) -> int:
+    from app.services import email_outbox
+
+    if args.requeue_dead:
+        requeued = email_outbox.requeue_dead()
+        logging.getLogger(__name__).info("emails: %d dead email(s) requeued", requeued)
+    sent = email_outbox.run_worker(once=args.once, poll_interval=args.poll)
+    logging.getLogger(__name__).info(
+        "emails: %d sent, outbox %r", sent, email_outbox.stats()
+    )
+    return 0
+
+
+def _run_digests(args) -> int:
+    from app.services import deadline_digest
+
+    result = deadline_digest.run(send=not args.queue_only)
+    logging.getLogger(__name__).info(
+        "digests: %d queued, %d email(s) sent", result["queued"], result["sent"]
+    )
+    return 0
+
+
+def _run_job(args) -> int:
+    from app.services import scheduler
+
+    run = scheduler.run_job_now(args.name)
+    if run is None:
+        logging.getLogger(__name__).warning("job %s: already running", args.name)
+        return 1
+    logging.getLogger(__name__).info(
+        "job %s: %s in %d ms", args.name, run.status, run.duration_ms
+    )
+    return 0 if run.status == scheduler.STATUS_OK else 1
+
+
+def _run_replication(args) -> int:
+    from app.services import replication
+
+    totals = replication.run(
+        once=args.once,
+        poll_interval=args.poll,
+        ship=not args.replay_only,
+        replay=not args.ship_only,
+    )
+    logging.getLogger(__name__).info("replication: %r", totals)
+    return 0
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Background task runner.")
+    sub = parser.add_subparsers(dest="task")
+    docs = sub.add_parser("documents", help="Render queued documents.")
+    docs.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Render processes (default: DOCUMENT_JOB_PROCESSES or CPU count; "
+        "0 renders in the worker process).",
+    )
+    docs.add_argument(
+        "--once", action="store_true", help="Exit when the queue is empty."
+    )
+    docs.add_argument(
+        "--poll", type=float, default=1.0, help="Seconds between queue polls."
+    )
+    emails = sub.add_parser("emails", help="Send queued emails.")
+    emails.add_argument(
+        "--once", action="store_true", help="Exit when no email is due."
+    )
+    emails.add_argument(
+        "--poll", type=float, default=5.0, help="Seconds between outbox polls."
+    )
+    emails.add_argument(
+        "--requeue-dead",
+        action="store_true",
+        help="Retry dead (undeliverable) emails first.",
+    )
+    digests = sub.add_parser("digests", help="Queue today's deadline digests.")
+    digests.add_argument(
+        "--queue-only",
+        action="store_true",
+        help="Leave sending to run_tasks.py emails.",
+    )
+    job = sub.add_parser("job", help="Run a scheduled job now.")
+    job.add_argument("name", help="Job name (see /jobs/scheduler).")
+    replicate = sub.add_parser(
+        "replicate", help="Ship WAL frames to REPLICATION_STANDBY_DIR."
+    )
+    replicate.add_argument(
+        "--once", action="store_true", help="One round of shipping and replay."
+    )
+    replicate.add_argument(
+        "--poll",
+        type=float,
+        default=None,
+        help="Seconds between rounds (default: REPLICATION_POLL_SECONDS).",
+    )
+    side = replicate.add_mutually_exclusive_group()
+    side.add_argument(
+        "--ship-only",
+        action="store_true",
+        help="Only ship (the standby host replays).",
+    )
+    side.add_argument(
+        "--replay-only",
+        action="store_true",
+        help="Only replay shipped segments (on the standby host).",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
     try:
+        args = _parse_args(argv or [])
         setup_logging()
+        if args.task == "documents":
+            return run_with_app(_run_documents, args)
+        if args.task == "emails":
+            return run_with_app(_run_emails, args)
+        if args.task == "digests":
+            return run_with_app(_run_digests, args)
+        if args.task == "job":
+            return run_with_app(_run_job, args)
+        if args.task == "replicate":
+            return run_with_app(_run_replication, args)
         return run_with_app(_init_and_run)
     except Exception:
         logging.exception("run_tasks.py: fatal")
@@ -24,4 +158,4 @@ def main() -> int:
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(main(sys.argv[1:]))
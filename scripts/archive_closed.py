@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""Move long-closed cases and investigations to the per-year archives.
+
+Closed subjects untouched for ``--months`` (default ARCHIVE_AFTER_MONTHS)
+move, with their change logs, uploads metadata and notes, into
+``<ARCHIVE_DIR>/<bind>-<year>.db``.  The same runs weekly as the
+``archive`` job of ``run_scheduler.py``.  The freed pages are returned by
+the nightly SQLite maintenance (incremental vacuum).
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--months", type=int, default=None, help="Closed for at least this long."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only count what would move."
+    )
+    parser.add_argument(
+        "--status", action="store_true", help="Show hot and archived row counts."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.services import archive
+
+    app = create_app()
+    with app.app_context():
+        if args.status:
+            print(json.dumps(archive.status(), indent=2))
+            return 0
+        report = archive.run(months=args.months, dry_run=args.dry_run)
+        verb = "would move" if args.dry_run else "moved"
+        print(f"cutoff : {report['cutoff']}")
+        for name, years in report["binds"].items():
+            moved = ", ".join(f"{year}: {n}" for year, n in years.items()) or "-"
+            print(f"{name:<12}: {verb} {moved}")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+import argparse
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild status_transition tables from the change logs."
+    )
+    parser.add_argument(
+        "--subject",
+        choices=("case", "investigation", "all"),
+        default="all",
+        help="Which history to rebuild.",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=1000, help="Change-log rows per batch."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app, db
+    from app.services.status_history import backfill_from_changelog
+
+    subjects = ("case", "investigation") if args.subject == "all" else (args.subject,)
+    app = create_app()
+    with app.app_context():
+        print("=== Status transition backfill ===")
+        for subject in subjects:
+            written = backfill_from_changelog(subject, batch_size=args.batch_size)
+            print(f"{subject:<13}: {written} transition(s)")
+        db.session.commit()
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
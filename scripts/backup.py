@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""Online backups of the databases and upload trees.
+
+  backup.py create            take a backup (and prune old ones)
+  backup.py list              list complete backups
+  backup.py verify NAME       check checksums and quick_check (--deep: re-hash)
+  backup.py restore NAME --yes  verify, then overwrite the live data
+
+Restore with the application stopped.  The same backup runs nightly as the
+``backup`` job of ``run_scheduler.py``.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.splitlines()[2:]),
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    create = sub.add_parser("create", help="Take a backup.")
+    create.add_argument(
+        "--no-prune", action="store_true", help="Keep all older backups."
+    )
+    sub.add_parser("list", help="List complete backups.")
+    verify = sub.add_parser("verify", help="Check a backup.")
+    verify.add_argument("name")
+    verify.add_argument(
+        "--deep", action="store_true", help="Re-hash every upload copy."
+    )
+    restore = sub.add_parser("restore", help="Restore a backup.")
+    restore.add_argument("name")
+    restore.add_argument(
+        "--yes", action="store_true", help="Really overwrite the live data."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.services import backups
+
+    app = create_app()
+    with app.app_context():
+        if args.command == "create":
+            manifest = backups.create_backup()
+            stats = manifest["stats"]
+            print(f"backup  : {manifest['name']} (consistent={manifest['consistent']})")
+            for bind, info in manifest["databases"].items():
+                print(
+                    f"  {bind:<12}: {info['size'] / 1024 / 1024:.1f} MiB, "
+                    f"{info['restarts']} restart(s)"
+                )
+            print(
+                f"uploads : {stats['copied']} copied "
+                f"({stats['copied_bytes'] / 1024 / 1024:.1f} MiB), "
+                f"{stats['linked']} linked, {stats['seconds']:.1f} s"
+            )
+            if not args.no_prune:
+                for name in backups.prune():
+                    print(f"pruned  : {name}")
+            return 0
+        if args.command == "list":
+            for name in backups.list_backups():
+                manifest = backups.load_manifest(name)
+                files = sum(len(files) for files in manifest["uploads"].values())
+                print(f"{name}  consistent={manifest['consistent']}  files={files}")
+            return 0
+        if args.command == "verify":
+            problems = backups.verify(args.name, deep=args.deep)
+            for problem in problems:
+                print(f"  {problem}")
+            print(f"verify  : {args.name} {'damaged' if problems else 'ok'}")
+            return 1 if problems else 0
+        if not args.yes:
+            print("restore overwrites the live databases and uploads; add --yes")
+            return 2
+        restored = backups.restore(args.name)
+        print(
+            f"restore : {args.name}: {', '.join(restored['databases'])}, "
+            f"{restored['files']} file(s)"
+        )
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
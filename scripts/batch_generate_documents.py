@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""Generate one leíró letter for many investigations in one run.
+
+Selects the investigations by the given filters, queues one render per
+investigation (see ``app.investigations.batch``) and, unless ``--queue-only``
+is given, renders them right away with ``--processes`` render processes.
+Each output is registered as a "generated" attachment of its investigation;
+``--zip`` additionally bundles the finished documents.
+
+Example::
+
+    python scripts/batch_generate_documents.py hatarido_hosszabbitas_kerelem \\
+        --status szignálva --as-user leiro1 --processes 4 \\
+        --field titulus_szerv=Osztályvezető --field cimzett_szerv=ORFK \\
+        --field actor="N. N." --field reasons=túlterheltsége \\
+        --field desired_date=2026-12-31 --field titulus=dr. --zip out.zip
+"""
+
+import argparse
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def _field(value):
+    name, sep, text = value.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError("expected NAME=VALUE")
+    return name, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("letter", help="Letter key, see app.investigations.batch.")
+    parser.add_argument(
+        "--as-user",
+        required=True,
+        help="Username the documents are generated for (attachment uploader).",
+    )
+    parser.add_argument(
+        "--field",
+        type=_field,
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Letter field; repeat for every field of the letter.",
+    )
+    parser.add_argument("--ids", type=int, nargs="*", default=[])
+    parser.add_argument("--status", default="")
+    parser.add_argument("--case-type", default="")
+    parser.add_argument("--expert-id", type=int, default=None)
+    parser.add_argument(
+        "--deadline-before",
+        type=date.fromisoformat,
+        default=None,
+        metavar="YYYY-MM-DD",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Render processes (default: DOCUMENT_JOB_PROCESSES or CPU count).",
+    )
+    parser.add_argument(
+        "--queue-only",
+        action="store_true",
+        help="Only queue the jobs; run_tasks.py documents renders them.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Render even documents whose template and data are unchanged.",
+    )
+    parser.add_argument("--zip", type=Path, help="Write the documents to this ZIP.")
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.investigations import batch
+    from app.models import User
+    from app.services import document_jobs
+
+    app = create_app()
+    with app.app_context():
+        if args.letter not in batch.LETTERS:
+            print(
+                f"Unknown letter; choose from: {', '.join(batch.LETTERS)}",
+                file=sys.stderr,
+            )
+            return 2
+        user = User.query.filter_by(username=args.as_user).first()
+        if user is None:
+            print(f"Unknown user: {args.as_user}", file=sys.stderr)
+            return 2
+        letter = batch.LETTERS[args.letter]
+        fields = dict(args.field)
+        errors = batch.validate_fields(letter, fields)
+        if errors:
+            print("Missing or invalid fields: " + ", ".join(errors), file=sys.stderr)
+            return 2
+        selection = batch.Selection(
+            ids=args.ids,
+            case_type=args.case_type,
+            status=args.status,
+            expert_id=args.expert_id,
+            deadline_before=args.deadline_before,
+        )
+        try:
+            invs = batch.select_investigations(selection)
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            return 2
+        if not invs:
+            print("No investigation matches the filters.")
+            return 0
+
+        start = time.perf_counter()
+        batch_id, skipped = batch.submit_batch(
+            args.letter, invs, fields, user_id=user.id, force=args.force
+        )
+        for inv, reason in skipped:
+            print(f"skipped {inv.case_number}: {reason}")
+        print(f"batch {batch_id}: {len(invs) - len(skipped)} job(s) queued")
+        if args.queue_only:
+            return 0
+
+        document_jobs.run_worker(processes=args.processes, once=True, batch_id=batch_id)
+        counts = document_jobs.batch_counts(batch_id)
+        print(
+            f"done {counts['done']}, failed {counts['failed']} "
+            f"in {time.perf_counter() - start:.1f} s"
+        )
+        for job in batch.batch_jobs(batch_id):
+            if job.status == document_jobs.STATUS_FAILED:
+                print(f"failed investigation {job.subject_id}: {job.error}")
+        if args.zip:
+            with open(args.zip, "wb") as fh:
+                written = batch.write_zip(batch_id, fh)
+            print(f"wrote {written} document(s) to {args.zip}")
+        return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
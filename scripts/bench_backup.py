@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""Benchmark writer latency while a database snapshot is taken.
+
+Builds a scratch SQLite file of ``--mb`` megabytes in a temp directory and
+keeps a writer thread committing small transactions while the file is
+backed up, once as a single-step copy and once page-stepped the way
+``app.services.backups`` does it.  Prints the backup time and the writer's
+commit latencies (p50/p99/max) for each, in WAL and rollback-journal mode.
+"""
+
+import argparse
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def _build(path: Path, mb: int, journal: str) -> None:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute(f"PRAGMA journal_mode={journal}")
+    conn.execute("CREATE TABLE blob (id INTEGER PRIMARY KEY, data BLOB)")
+    conn.execute("CREATE TABLE hit (id INTEGER PRIMARY KEY, at REAL)")
+    row = b"x" * 4000
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO blob (data) VALUES (?)", ((row,) for _ in range(mb * 256))
+    )
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def _ms(latencies: list, q: float) -> float:
+    return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+
+
+def _writer(path: Path, stop: threading.Event, latencies: list) -> None:
+    conn = sqlite3.connect(path, isolation_level=None, timeout=60)
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn.execute("INSERT INTO hit (at) VALUES (?)", (start,))
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.005)
+    conn.close()
+
+
+def _run(path: Path, dest: Path, stepped: bool, app) -> tuple:
+    from app.services import backups
+
+    latencies: list = []
+    stop = threading.Event()
+    thread = threading.Thread(target=_writer, args=(path, stop, latencies))
+    thread.start()
+    time.sleep(0.2)
+    source = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    start = time.perf_counter()
+    with app.app_context():
+        if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            source.execute("BEGIN")
+            source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        if stepped:
+            info = backups._copy_db(source, dest)
+        else:
+            target = sqlite3.connect(dest)
+            source.backup(target)
+            target.close()
+            info = {"restarts": 0, "one_step": True}
+    elapsed = time.perf_counter() - start
+    if source.in_transaction:
+        source.execute("COMMIT")
+    source.close()
+    stop.set()
+    thread.join()
+    dest.unlink()
+    return elapsed, sorted(latencies), info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=200, help="Database size.")
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+
+    app = create_app({"TESTING": True})
+    with tempfile.TemporaryDirectory() as tmp:
+        for journal in ("wal", "delete"):
+            path = Path(tmp) / f"bench_{journal}.db"
+            _build(path, args.mb, journal)
+            for stepped in (False, True):
+                elapsed, lat, info = _run(path, Path(tmp) / "copy.db", stepped, app)
+                print(
+                    f"{journal:<6} {'stepped' if stepped else 'one step':<8}: "
+                    f"backup {elapsed:.2f} s, {len(lat)} commits, "
+                    f"p50 {_ms(lat, 0.5):.1f} ms, p99 {_ms(lat, 0.99):.1f} ms, "
+                    f"max {lat[-1] * 1000:.1f} ms, "
+                    f"restarts {info['restarts']}"
+                    f"{' -> one step' if stepped and info['one_step'] else ''}"
+                )
+            path.unlink()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""Benchmark batch document generation across many investigations.
+
+Creates scratch investigations in the *test* database and generates the
+"tájékoztatás az ügy szignálásáról" letter for all of them with
+``app.investigations.batch``, rendering with 1, 2 and 4 processes (or the
+counts given with ``--processes``).  Reports the time to build and queue the
+contexts (bulk selection + one user query) and the render throughput.
+"""
+
+import argparse
+import logging
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+FIELDS = {
+    "cimzett_szerv": "ORFK",
+    "titulus_szerv": "Osztályvezető",
+    "actor": "N. N.",
+    "titulus": "dr.",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--investigations", type=int, default=40, help="Investigations per run."
+    )
+    parser.add_argument(
+        "--paragraphs", type=int, default=500, help="Template size in paragraphs."
+    )
+    parser.add_argument("--processes", type=int, nargs="*", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from docx import Document
+
+    from app import create_app, db
+    from app.investigations import batch
+    from app.investigations.models import Investigation, InvestigationAttachment
+    from app.models import DocumentJob, User
+    from app.services import document_jobs
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_batch_"))
+    src = tmp / "templates"
+    src.mkdir()
+    app = create_app(
+        {
+            "TESTING": True,
+            "DOCUMENT_JOBS_EAGER": False,
+            "UPLOAD_INVESTIGATIONS_ROOT": str(tmp / "inv"),
+            "INVESTIGATION_UPLOAD_FOLDER": str(tmp / "inv"),
+            "INVESTIGATION_TEMPLATE_DIR": str(src),
+            "TEMPLATE_STORE_ROOT": str(tmp / "store"),
+            "DOCX_CACHE_ROOT": str(tmp / "cache"),
+        }
+    )
+    logging.getLogger("app").setLevel(logging.ERROR)
+    doc = Document()
+    for i in range(args.paragraphs):
+        doc.add_paragraph(f"{i}. sor: {{{{iktatasi_szam}}}} {{{{szak}}}}")
+    doc.save(str(src / "tajekoztatas_ugy_szignalasarol.docx"))
+
+    stamp = int(time.time())
+    with app.app_context():
+        db.create_all()
+        experts = []
+        for i in range(5):
+            user = User(
+                username=f"bench_batch_{stamp}_{i}",
+                screen_name=f"Bench szakértő {i}",
+                role="szakértő",
+            )
+            user.set_password("bench")
+            experts.append(user)
+        db.session.add_all(experts)
+        db.session.commit()
+        expert_ids = [u.id for u in experts]
+        inv_ids = []
+        for run, _ in enumerate(args.processes):
+            invs = [
+                Investigation(
+                    case_number=f"B:{stamp % 10000:04d}{run}{i:03d}/2026",
+                    subject_name="Bench",
+                    mother_name="Bench",
+                    birth_place="Bench",
+                    birth_date=date(2000, 1, 1),
+                    taj_number="000000000",
+                    residence="Bench",
+                    citizenship="HU",
+                    institution_name="Bench",
+                    status="szignálva",
+                    expert1_id=expert_ids[i % len(expert_ids)],
+                )
+                for i in range(args.investigations)
+            ]
+            db.session.add_all(invs)
+            db.session.commit()
+            inv_ids.append([inv.id for inv in invs])
+
+    print(
+        f"{args.investigations} investigations, "
+        f"template {args.paragraphs} paragraphs"
+    )
+    print(f"{'processes':>9} {'queue s':>8} {'render s':>9} {'docs/s':>7}")
+    try:
+        with app.app_context():
+            for processes, ids in zip(args.processes, inv_ids, strict=True):
+                start = time.perf_counter()
+                invs = batch.select_investigations(batch.Selection(ids=ids))
+                batch_id, _ = batch.submit_batch(
+                    "tajekoztatas_ugy_szignalasarol",
+                    invs,
+                    FIELDS,
+                    user_id=expert_ids[0],
+                )
+                queued = time.perf_counter() - start
+                start = time.perf_counter()
+                done = document_jobs.run_worker(
+                    processes=processes, once=True, batch_id=batch_id
+                )
+                rendered = time.perf_counter() - start
+                print(
+                    f"{processes:>9} {queued:>8.2f} {rendered:>9.2f} "
+                    f"{done / rendered:>7.1f}"
+                )
+    finally:
+        with app.app_context():
+            all_ids = [i for ids in inv_ids for i in ids]
+            DocumentJob.query.filter(DocumentJob.subject_id.in_(all_ids)).filter(
+                DocumentJob.subject_type == "investigation"
+            ).delete()
+            InvestigationAttachment.query.filter(
+                InvestigationAttachment.investigation_id.in_(all_ids)
+            ).delete()
+            Investigation.query.filter(Investigation.id.in_(all_ids)).delete()
+            User.query.filter(User.id.in_(expert_ids)).delete()
+            db.session.commit()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""Benchmark cold storage: disk reclaimed and cold download latency.
+
+Builds ``--folders`` scratch case folders in a temporary upload root with a
+typical mix (text-based PDFs, scans, generated DOCX, notes), packs them with
+:func:`app.services.cold_storage.pack` and prints the bytes before and after.
+Then times ``send_safe`` for every file (p50/p99, whole body read) from the
+plain folder (warm), from the zip with an empty extract cache (cold), from
+the cache (hit) and streamed out of the zip (cache too small).
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+WORDS = "boncolás jegyzőkönyv vizsgálat határidő szakértő végzés ügy".split()
+
+
+def _text(rng: random.Random, size: int) -> bytes:
+    out, total = [], 0
+    while total < size:
+        line = " ".join(rng.choice(WORDS) for _ in range(12)) + f" {rng.random()}\n"
+        out.append(line)
+        total += len(line)
+    return "".join(out).encode()[:size]
+
+
+def _folder(path: Path, rng: random.Random) -> None:
+    path.mkdir(parents=True)
+    for n in range(4):
+        (path / f"jegyzokonyv_{n}.pdf").write_bytes(
+            b"%PDF-1.4\n" + _text(rng, 300 * 1024)
+        )
+    for n in range(3):
+        (path / f"scan_{n}.jpg").write_bytes(os.urandom(2 * 1024 * 1024))
+    (path / "DO-NOT-EDIT").mkdir()
+    for n in range(6):
+        (path / "DO-NOT-EDIT" / f"level_{n}.docx").write_bytes(os.urandom(40 * 1024))
+    (path / "jegyzetek.txt").write_bytes(_text(rng, 50 * 1024))
+
+
+def _du(root: Path) -> int:
+    return sum(p.stat().st_size for p in root.rglob("*") if p.is_file())
+
+
+def _time_downloads(app, root: Path, files) -> list:
+    from app.utils.uploads import send_safe
+
+    latencies = []
+    for folder, rel in files:
+        with app.test_request_context():
+            start = time.perf_counter()
+            rv = send_safe(root / folder, *rel.split("/"))
+            for _chunk in rv.response:
+                pass
+            rv.close()
+            latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def _ms(latencies: list, q: float) -> float:
+    return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--folders", type=int, default=20, help="Case folders.")
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.services import cold_storage
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_cold_"))
+    root = tmp / "uploads_cases"
+    app = create_app(
+        {
+            "TESTING": True,
+            "UPLOAD_CASES_ROOT": str(root),
+            "CASE_UPLOAD_FOLDER": str(root),
+            "UPLOAD_INVESTIGATIONS_ROOT": str(tmp / "uploads_investigations"),
+            "INVESTIGATION_UPLOAD_FOLDER": str(tmp / "uploads_investigations"),
+            "COLD_STORAGE_CACHE_DIR": str(tmp / "cold_cache"),
+        }
+    )
+    rng = random.Random(7)
+    try:
+        with app.app_context():
+            names = [f"B-{n:04d}-2020" for n in range(args.folders)]
+            for name in names:
+                _folder(root / name, rng)
+            files = [
+                (name, p.relative_to(root / name).as_posix())
+                for name in names
+                for p in sorted((root / name).rglob("*"))
+                if p.is_file()
+            ]
+            before = _du(root)
+            warm = _time_downloads(app, root, files)
+
+            start = time.perf_counter()
+            for name in names:
+                cold_storage.pack(root / name)
+            packing = time.perf_counter() - start
+            after = _du(root)
+            print(
+                f"{len(names)} folders, {len(files)} files: "
+                f"{before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB, "
+                f"reclaimed {(before - after) / 2**20:.1f} MiB "
+                f"({(before - after) / before:.0%}), packed in {packing:.2f} s"
+            )
+
+            cold = _time_downloads(app, root, files)
+            hit = _time_downloads(app, root, files)
+            app.config["COLD_STORAGE_CACHE_MAX_MB"] = 0
+            streamed = _time_downloads(app, root, files)
+            for label, lat in (
+                ("warm folder", warm),
+                ("cold, cache miss", cold),
+                ("cold, cache hit", hit),
+                ("cold, streamed", streamed),
+            ):
+                print(
+                    f"{label:<17}: p50 {_ms(lat, 0.5):6.2f} ms, "
+                    f"p99 {_ms(lat, 0.99):6.2f} ms, "
+                    f"mean {statistics.mean(lat) * 1000:6.2f} ms"
+                )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""Benchmark the daily deadline digest job.
+
+Creates ``--users`` scratch experts in the *test* database, each with
+``--items`` cases in their ``work_item`` inbox (half overdue, half due
+soon), then times queueing the digests (one work-item query, bulk outbox
+insert) and draining the outbox with sending suppressed (Flask-Mail's
+testing mode), i.e. the job's own cost without the SMTP server's.
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--items", type=int, default=6, help="Cases per user.")
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    import sqlalchemy as sa
+
+    from app import create_app, db
+    from app.models import Case, DeadlineDigest, EmailOutbox, User, WorkItem
+    from app.services import deadline_digest, email_outbox
+    from app.services.work_items import ROLE_EXPERT, SUBJECT_CASE
+    from app.utils.time_utils import now_utc
+
+    app = create_app({"TESTING": True, "EMAIL_RATE_LIMIT": 0})
+    logging.getLogger("app").setLevel(logging.ERROR)
+    prefix = f"bench_digest_{int(time.time())}_"
+    now = now_utc()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(
+            sa.insert(User),
+            [
+                {"username": f"{prefix}{i}", "password_hash": "-", "role": "szakértő"}
+                for i in range(args.users)
+            ],
+        )
+        users = db.session.execute(
+            sa.select(User.id).where(User.username.like(f"{prefix}%"))
+        ).scalars()
+        cases, items = [], []
+        for n, user_id in enumerate(users):
+            for j in range(args.items):
+                deadline = now + timedelta(days=(j % 10) - args.items // 2)
+                cases.append(
+                    {
+                        "case_number": f"{prefix}{n}/{j}",
+                        "status": "szignálva",
+                        "deadline": deadline,
+                    }
+                )
+                items.append((user_id, deadline))
+        db.session.execute(sa.insert(Case), cases)
+        case_ids = db.session.execute(
+            sa.select(Case.id).where(Case.case_number.like(f"{prefix}%"))
+        ).scalars()
+        db.session.execute(
+            sa.insert(WorkItem),
+            [
+                {
+                    "user_id": user_id,
+                    "subject_type": SUBJECT_CASE,
+                    "subject_id": case_id,
+                    "role": ROLE_EXPERT,
+                    "status": "szignálva",
+                    "deadline": deadline,
+                }
+                for case_id, (user_id, deadline) in zip(case_ids, items, strict=True)
+            ],
+        )
+        db.session.commit()
+
+        try:
+            start = time.perf_counter()
+            queued = deadline_digest.queue_digests(now)
+            queue_s = time.perf_counter() - start
+            start = time.perf_counter()
+            sent = email_outbox.run_worker(once=True)
+            send_s = time.perf_counter() - start
+            print(f"{args.users} users x {args.items} cases")
+            print(f"queue: {queued} digests in {queue_s:.2f} s")
+            print(f"send (suppressed): {sent} emails in {send_s:.2f} s")
+        finally:
+            user_ids = sa.select(User.id).where(User.username.like(f"{prefix}%"))
+            db.session.execute(
+                sa.delete(WorkItem).where(WorkItem.user_id.in_(user_ids))
+            )
+            # Other users of the test database got a digest too.
+            db.session.execute(
+                sa.delete(DeadlineDigest).where(DeadlineDigest.created_at == now)
+            )
+            db.session.execute(
+                sa.delete(EmailOutbox).where(EmailOutbox.created_at >= now)
+            )
+            db.session.execute(
+                sa.delete(Case).where(Case.case_number.like(f"{prefix}%"))
+            )
+            db.session.execute(sa.delete(User).where(User.username.like(f"{prefix}%")))
+            db.session.commit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""Benchmark document routes under a burst: rendering in the request vs. queued.
+
+Runs the app on a local threaded WSGI server against the *test* database
+with a scratch user and case, then fires a burst of concurrent
+``generate_tox_doc`` POSTs (distinct forms, so none is deduplicated) against
+a large template.  "eager" renders inside the request as before; "queued"
+only stores a job, which ``document_jobs.run_worker`` then drains with the
+given number of render processes.
+"""
+
+import argparse
+import http.client
+import logging
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def _login(port, username, password):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request(
+        "POST",
+        "/login",
+        body=urlencode({"username": username, "password": password}),
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    resp = conn.getresponse()
+    resp.read()
+    cookie = resp.getheader("Set-Cookie", "").split(";", 1)[0]
+    conn.close()
+    return cookie
+
+
+def _post(port, path, cookie, n, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    body = urlencode({"alkohol_minta_count": str(n), "alkohol_minta_ara": "100"})
+    start = time.perf_counter()
+    conn.request(
+        "POST",
+        path,
+        body=body,
+        headers={
+            "Cookie": cookie,
+            "Content-Type": "application/x-www-form-urlencoded",
+        },
+    )
+    resp = conn.getresponse()
+    resp.read()
+    results.append((resp.status, (time.perf_counter() - start) * 1000))
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=16, help="Concurrent POSTs.")
+    parser.add_argument(
+        "--paragraphs", type=int, default=3000, help="Template size in paragraphs."
+    )
+    parser.add_argument(
+        "--processes", type=int, default=4, help="Render processes for draining."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from docx import Document
+    from werkzeug.serving import make_server
+
+    from app import create_app, db
+    from app.models import (
+        AuditLog,
+        Case,
+        ChangeLog,
+        DocumentJob,
+        IdempotencyToken,
+        UploadedFile,
+        User,
+    )
+    from app.services import document_jobs
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_jobs_"))
+    cases_root = tmp / "uploads_cases"
+    app = create_app(
+        {
+            "TESTING": True,
+            "WTF_CSRF_ENABLED": False,
+            "UPLOAD_CASES_ROOT": str(cases_root),
+            "CASE_UPLOAD_FOLDER": str(cases_root),
+            "UPLOAD_INVESTIGATIONS_ROOT": str(tmp / "uploads_investigations"),
+            "INVESTIGATION_UPLOAD_FOLDER": str(tmp / "uploads_investigations"),
+            "TRACK_USER_ACTIVITY": False,
+        }
+    )
+    template_dir = cases_root / "autofill-word-do-not-edit"
+    template_dir.mkdir(parents=True)
+    doc = Document()
+    for i in range(args.paragraphs):
+        doc.add_paragraph(f"{i}. sor: {{{{case.case_number}}}} {{{{osszesen_ara}}}}")
+    doc.save(str(template_dir / "Toxikológiai-kirendelő.docx"))
+
+    stamp = int(time.time())
+    username = f"bench_jobs_{stamp}"
+    with app.app_context():
+        db.create_all()
+        user = User(username=username, screen_name=username, role="admin")
+        user.set_password("bench")
+        case = Case(case_number=f"BENCH-JOB-{stamp}")
+        db.session.add_all([user, case])
+        db.session.commit()
+        case_id, user_id = case.id, user.id
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    logging.getLogger("app").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    path = f"/cases/{case_id}/generate_tox_doc"
+    try:
+        cookie = _login(port, username, "bench")
+        print(f"burst of {args.burst}, template {args.paragraphs} paragraphs")
+        print(f"{'mode':<7} {'status':>7} {'median ms':>10} {'max ms':>8}")
+        offset = 0
+        for mode in ("eager", "queued"):
+            app.config["DOCUMENT_JOBS_EAGER"] = mode == "eager"
+            results = []
+            threads = [
+                threading.Thread(
+                    target=_post, args=(port, path, cookie, offset + i, results)
+                )
+                for i in range(args.burst)
+            ]
+            offset += args.burst
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            times = [ms for _, ms in results]
+            statuses = ",".join(sorted({str(s) for s, _ in results}))
+            print(
+                f"{mode:<7} {statuses:>7} {statistics.median(times):>10.1f} "
+                f"{max(times):>8.1f}"
+            )
+        with app.app_context():
+            start = time.perf_counter()
+            done = document_jobs.run_worker(processes=args.processes, once=True)
+            print(
+                f"worker drained {done} job(s) with {args.processes} process(es) "
+                f"in {time.perf_counter() - start:.2f} s"
+            )
+    finally:
+        server.shutdown()
+        with app.app_context():
+            DocumentJob.query.filter_by(
+                subject_id=case_id, subject_type="case"
+            ).delete()
+            IdempotencyToken.query.filter_by(case_id=case_id).delete()
+            UploadedFile.query.filter_by(case_id=case_id).delete()
+            ChangeLog.query.filter_by(case_id=case_id).delete()
+            AuditLog.query.filter_by(user_id=user_id).delete()
+            db.session.delete(db.session.get(Case, case_id))
+            db.session.delete(db.session.get(User, user_id))
+            db.session.commit()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
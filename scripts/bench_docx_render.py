@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Benchmark DOCX rendering with a cold vs. warm sanitized-template cache.
+
+"cold" clears the memory and disk cache before every render, which is what
+every render cost before ``app.services.docx_cache`` existed; "disk" only
+clears memory (a fresh worker process); "warm" is a repeat render in the same
+process.  Templates default to ``instance/docs/vizsgalat/*.docx``.
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+CONTEXT = {
+    "ugyszam": "V:0001/2026",
+    "titulus": "dr.",
+    "vizsg_date": "2026.01.01",
+}
+
+
+def _measure(render, templates, out_dir, rounds, before=None):
+    samples = []
+    for i in range(rounds):
+        for template in templates:
+            if before is not None:
+                before()
+            start = time.perf_counter()
+            render(template, out_dir / f"{i}_{template.name}", CONTEXT)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "templates", nargs="*", type=Path, help="DOCX templates to render."
+    )
+    parser.add_argument("--rounds", type=int, default=20, help="Renders per mode.")
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.investigations.routes import _render_docx_template
+    from app.services import docx_cache
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_docx_"))
+    app = create_app(
+        {
+            "TESTING": True,
+            "DOCX_CACHE_ROOT": str(tmp / "cache"),
+        }
+    )
+    with app.app_context():
+        templates = args.templates or sorted(
+            (Path(app.instance_path) / "docs" / "vizsgalat").glob("*.docx")
+        )
+        if not templates:
+            print("No templates found.", file=sys.stderr)
+            return 1
+        out_dir = tmp / "out"
+        out_dir.mkdir()
+
+        modes = [
+            ("cold", lambda: docx_cache.clear(disk=True)),
+            ("disk", docx_cache.clear),
+            ("warm", None),
+        ]
+        print(f"{len(templates)} template(s), {args.rounds} round(s)")
+        print(f"{'mode':<6} {'median ms':>10} {'p95 ms':>8}")
+        for name, before in modes:
+            if name == "warm":
+                _measure(_render_docx_template, templates, out_dir, 1)
+            samples = sorted(
+                _measure(_render_docx_template, templates, out_dir, args.rounds, before)
+            )
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            print(f"{name:<6} {statistics.median(samples):>10.2f} {p95:>8.2f}")
+        print("cache:", docx_cache.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
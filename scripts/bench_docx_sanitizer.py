@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""Benchmark DOCX placeholder sanitizing: legacy vs. single-pass tokenizer.
+
+The corpus is every template in ``app/docs/vizsgalat`` and
+``instance/docs/vizsgalat`` plus two generated documents: one with
+thousands of placeholders split across runs by Word, and one of about
+``--image-mb`` MB with stored (uncompressed) PNG images, like the
+letterhead templates.  "legacy" is the sanitizer before the single-pass
+tokenizer (whole-part decode + regex, every entry deflated again, the result
+reopened with python-docx); its output is checked against the new one.
+"""
+
+import argparse
+import io
+import os
+import re
+import statistics
+import struct
+import sys
+import tempfile
+import time
+import unicodedata
+import zipfile
+import zlib
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_LEGACY_PATTERN = re.compile(r"(\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\})", flags=re.DOTALL)
+_LEGACY_VAR = re.compile(r"\{\{\s*(.*?)\s*\}\}", flags=re.DOTALL)
+
+
+def _legacy_normalize(xml_bytes):
+    if b"{{" not in xml_bytes or b"}}" not in xml_bytes:
+        return xml_bytes, False
+    changed = False
+    text = xml_bytes.decode("utf-8", errors="ignore")
+
+    def repl(match):
+        nonlocal changed
+        token = match.group(0)
+        vm = _LEGACY_VAR.fullmatch(token)
+        if not vm:
+            return token
+        inner = re.sub(r"<[^>]+>", "", vm.group(1), flags=re.DOTALL)
+        inner = re.sub(r"\s+", " ", inner).strip()
+        nfkd = unicodedata.normalize("NFKD", inner)
+        folded = "".join(ch for ch in nfkd if not unicodedata.combining(ch))
+        sanitized = "{{" + re.sub(r"[^\w]", "", folded) + "}}"
+        changed = changed or sanitized != token
+        return sanitized
+
+    return _LEGACY_PATTERN.sub(repl, text).encode("utf-8"), changed
+
+
+def _legacy_sanitize(docx_path):
+    from docx import Document
+
+    out_buf = io.BytesIO()
+    with (
+        zipfile.ZipFile(str(docx_path), "r") as zin,
+        zipfile.ZipFile(out_buf, "w", compression=zipfile.ZIP_DEFLATED) as zout,
+    ):
+        for name in zin.namelist():
+            data = zin.read(name)
+            if name.startswith(("word/document.xml", "word/header", "word/footer")):
+                data, _ = _legacy_normalize(data)
+            zout.writestr(name, data)
+    fd, name = tempfile.mkstemp(prefix="sanitized", suffix=".docx")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(out_buf.getvalue())
+    Document(name)
+    return Path(name)
+
+
+def _png(width, height):
+    """A random-pixel RGB PNG (incompressible, like a scanned letterhead)."""
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    row = width * 3
+    raw = b"".join(b"\x00" + os.urandom(row) for _ in range(height))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", ihdr)
+        + chunk(b"IDAT", zlib.compress(raw, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _split_placeholders(doc, count):
+    names = ["{{", "vizsg", "_dá", "tum", "}}"]
+    for i in range(count):
+        para = doc.add_paragraph(f"{i}. bekezdés: ")
+        for piece in names:
+            para.add_run(piece)
+        para.add_run(" és {{ iktatási_szám }} ")
+
+
+def _restore_stored_media(path):
+    """python-docx deflates everything; Word stores media uncompressed."""
+    fd, name = tempfile.mkstemp(suffix=".docx", dir=path.parent)
+    os.close(fd)
+    with zipfile.ZipFile(path) as zin, zipfile.ZipFile(name, "w") as zout:
+        for info in zin.infolist():
+            media = info.filename.startswith("word/media/")
+            zout.writestr(
+                info,
+                zin.read(info),
+                compress_type=zipfile.ZIP_STORED if media else zipfile.ZIP_DEFLATED,
+            )
+    os.replace(name, path)
+
+
+def build_corpus(out_dir, placeholders, image_mb):
+    from docx import Document
+    from docx.shared import Cm
+
+    corpus = []
+    for folder in (ROOT / "app/docs/vizsgalat", ROOT / "instance/docs/vizsgalat"):
+        corpus.extend(sorted(folder.glob("*.docx")))
+
+    split = out_dir / "split_placeholders.docx"
+    doc = Document()
+    _split_placeholders(doc, placeholders)
+    doc.save(str(split))
+    corpus.append(split)
+
+    images = out_dir / "images.docx"
+    doc = Document()
+    _split_placeholders(doc, 200)
+    per_image = 1024 * 1024 * 3
+    for _ in range(max(1, int(image_mb * 1024 * 1024 / per_image))):
+        doc.add_picture(io.BytesIO(_png(1024, 1024)), width=Cm(15))
+    doc.save(str(images))
+    _restore_stored_media(images)
+    corpus.append(images)
+    return corpus
+
+
+def _time(fn, path, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        out = fn(path)
+        samples.append(time.perf_counter() - start)
+        out.unlink()
+    return statistics.median(samples)
+
+
+def _parts(path):
+    with zipfile.ZipFile(path) as z:
+        return {n: z.read(n) for n in z.namelist()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--placeholders",
+        type=int,
+        default=5000,
+        help="Split placeholders in the generated text document.",
+    )
+    parser.add_argument(
+        "--image-mb", type=float, default=20, help="Size of the image document."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.investigations.routes import _sanitize_docx_placeholders
+
+    app = create_app({"TESTING": True})
+    app.logger.disabled = True
+    with tempfile.TemporaryDirectory(prefix="bench_sanitizer_") as tmp:
+        corpus = build_corpus(Path(tmp), args.placeholders, args.image_mb)
+        print(
+            f"{'template':<40} {'MB':>6} {'legacy ms':>10} {'new ms':>8} "
+            f"{'MB/s':>7} {'speedup':>8}"
+        )
+        totals = [0.0, 0.0, 0.0]
+        with app.app_context():
+            for path in corpus:
+                size = path.stat().st_size / (1024 * 1024)
+                legacy = _time(_legacy_sanitize, path, args.rounds)
+                new = _time(_sanitize_docx_placeholders, path, args.rounds)
+                totals = [totals[0] + size, totals[1] + legacy, totals[2] + new]
+                print(
+                    f"{path.name[:40]:<40} {size:>6.2f} {legacy * 1000:>10.1f} "
+                    f"{new * 1000:>8.1f} {size / new:>7.1f} {legacy / new:>7.1f}x"
+                )
+                old_out = _legacy_sanitize(path)
+                new_out = _sanitize_docx_placeholders(path)
+                try:
+                    if _parts(old_out) != _parts(new_out):
+                        print(f"  output differs from legacy: {path.name}")
+                finally:
+                    old_out.unlink()
+                    new_out.unlink()
+        size, legacy, new = totals
+        print(
+            f"{'total':<40} {size:>6.2f} {legacy * 1000:>10.1f} "
+            f"{new * 1000:>8.1f} {size / new:>7.1f} {legacy / new:>7.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+"""Benchmark concurrent large downloads: direct serving vs. proxy offload.
+
+Runs the app on a local threaded WSGI server against the *test* database
+(instance/test.db) with a scratch user, case and file in a temporary upload
+root, then downloads the file from several clients at once.  "worker s" is
+the time a server thread spent inside the app per download, i.e. how long a
+worker is tied up.  In offload modes no proxy is running, so clients only get
+the headers a proxy would act on.
+"""
+
+import argparse
+import hashlib
+import http.client
+import logging
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+class _Occupancy:
+    """WSGI middleware recording how long each request occupies a worker."""
+
+    def __init__(self, app):
+        self.app = app
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        body = self.app(environ, start_response)
+        try:
+            yield from body
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+            with self._lock:
+                self.samples.append(time.perf_counter() - start)
+
+
+def _login(port, username, password):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request(
+        "POST",
+        "/login",
+        body=urlencode({"username": username, "password": password}),
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    resp = conn.getresponse()
+    resp.read()
+    cookie = resp.getheader("Set-Cookie", "").split(";", 1)[0]
+    conn.close()
+    return cookie
+
+
+def _download(port, url, cookie, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    start = time.perf_counter()
+    conn.request("GET", url, headers={"Cookie": cookie})
+    resp = conn.getresponse()
+    received = 0
+    while chunk := resp.read(1024 * 1024):
+        received += len(chunk)
+    results.append((resp.status, received, time.perf_counter() - start))
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64, help="File size.")
+    parser.add_argument(
+        "--concurrency", default="1,4,16", help="Comma-separated client counts."
+    )
+    parser.add_argument(
+        "--modes", default="direct,x-accel,x-sendfile", help="Modes to compare."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from werkzeug.serving import make_server
+
+    from app import create_app, db
+    from app.models import AuditLog, Case, ChangeLog, UploadedFile, User
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_dl_"))
+    cases_root = tmp / "uploads_cases"
+    app = create_app(
+        {
+            "TESTING": True,
+            "WTF_CSRF_ENABLED": False,
+            "UPLOAD_CASES_ROOT": str(cases_root),
+            "CASE_UPLOAD_FOLDER": str(cases_root),
+            "UPLOAD_INVESTIGATIONS_ROOT": str(tmp / "uploads_investigations"),
+            "INVESTIGATION_UPLOAD_FOLDER": str(tmp / "uploads_investigations"),
+            "MAX_CONTENT_LENGTH": None,
+            "TRACK_USER_ACTIVITY": False,
+        }
+    )
+    stamp = int(time.time())
+    username = f"bench_dl_{stamp}"
+    with app.app_context():
+        db.create_all()
+        user = User(username=username, screen_name=username, role="admin")
+        user.set_password("bench")
+        case = Case(case_number=f"BENCH-DL-{stamp}")
+        db.session.add_all([user, case])
+        db.session.commit()
+        folder = cases_root / case.case_number
+        folder.mkdir(parents=True)
+        data = b"%PDF-1.4\n" + b"\0" * (args.size_mb * 1024 * 1024)
+        (folder / "scan.pdf").write_bytes(data)
+        db.session.add(
+            UploadedFile(
+                case_id=case.id,
+                filename="scan.pdf",
+                uploader="bench",
+                category="egyéb",
+                sha256=hashlib.sha256(data).hexdigest(),
+                size_bytes=len(data),
+            )
+        )
+        db.session.commit()
+        url = f"/cases/{case.id}/files/scan.pdf"
+        case_id, user_id = case.id, user.id
+        del data
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    wrapped = _Occupancy(app.wsgi_app)
+    app.wsgi_app = wrapped
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        cookie = _login(port, username, "bench")
+        print(
+            f"{'mode':>10} {'clients':>7} {'wall s':>8} "
+            f"{'worker s':>9} {'worker s max':>12} {'MB recv':>8}"
+        )
+        for mode in args.modes.split(","):
+            app.config["DOWNLOAD_OFFLOAD"] = "" if mode == "direct" else mode
+            for clients in (int(c) for c in args.concurrency.split(",")):
+                wrapped.samples.clear()
+                results = []
+                threads = [
+                    threading.Thread(
+                        target=_download, args=(port, url, cookie, results)
+                    )
+                    for _ in range(clients)
+                ]
+                start = time.perf_counter()
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                wall = time.perf_counter() - start
+                downloads = wrapped.samples[-clients:]
+                assert all(status == 200 for status, _, _ in results), results
+                received = sum(size for _, size, _ in results) / 1024 / 1024
+                print(
+                    f"{mode:>10} {clients:>7} {wall:>8.3f} "
+                    f"{statistics.mean(downloads):>9.4f} "
+                    f"{max(downloads):>12.4f} {received:>8.0f}"
+                )
+    finally:
+        server.shutdown()
+        with app.app_context():
+            UploadedFile.query.filter_by(case_id=case_id).delete()
+            ChangeLog.query.filter_by(case_id=case_id).delete()
+            AuditLog.query.filter_by(user_id=user_id).delete()
+            db.session.delete(db.session.get(Case, case_id))
+            db.session.delete(db.session.get(User, user_id))
+            db.session.commit()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
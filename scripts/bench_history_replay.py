@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""Benchmark time-travel reconstruction with and without history snapshots.
+
+Runs against the *test* database (instance/test.db): creates one scratch case
+per size, writes synthetic ChangeLog rows, reconstructs at the midpoint and at
+the end, and removes everything it created.
+"""
+
+import argparse
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def _timed(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="100,1000,5000",
+        help="Comma-separated edit counts per scratch case.",
+    )
+    parser.add_argument("--every", type=int, default=50, help="Snapshot interval.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions.")
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app, db
+    from app.models import Case, CaseHistorySnapshot, ChangeLog
+    from app.services.history import build_checkpoints, reconstruct
+    from app.utils.time_utils import now_utc
+
+    app = create_app({"TESTING": True})
+    with app.app_context():
+        db.create_all()
+        print(f"{'edits':>7} {'at':>5} {'mode':>9} {'replayed':>9} {'best ms':>9}")
+        for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+            case = Case(case_number=f"BENCH-{size}-{int(time.time())}")
+            db.session.add(case)
+            db.session.commit()
+            start = now_utc()
+            db.session.execute(
+                ChangeLog.__table__.insert(),
+                [
+                    {
+                        "case_id": case.id,
+                        "field_name": f"field_{i % 20}",
+                        "old_value": str(i - 1),
+                        "new_value": str(i),
+                        "edited_by": "bench",
+                        "timestamp": start + timedelta(seconds=i + 1),
+                    }
+                    for i in range(size)
+                ],
+            )
+            db.session.commit()
+            points = {
+                "mid": start + timedelta(seconds=size // 2),
+                "end": start + timedelta(seconds=size + 1),
+            }
+            try:
+                for mode in ("replay", "snapshot"):
+                    if mode == "replay":
+                        # Drop the checkpoint the insert listener may have made.
+                        CaseHistorySnapshot.query.filter_by(subject_id=case.id).delete()
+                        db.session.commit()
+                    else:
+                        build_checkpoints("case", case.id, every=args.every)
+                        db.session.commit()
+                    for label, at in points.items():
+                        result, best = _timed(
+                            lambda at=at, case=case: reconstruct("case", case.id, at),
+                            args.repeat,
+                        )
+                        print(
+                            f"{size:>7} {label:>5} {mode:>9} "
+                            f"{result.replayed:>9} {best * 1000:>9.2f}"
+                        )
+            finally:
+                CaseHistorySnapshot.query.filter_by(subject_id=case.id).delete()
+                ChangeLog.query.filter_by(case_id=case.id).delete()
+                db.session.delete(case)
+                db.session.commit()
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
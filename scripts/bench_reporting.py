@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Benchmark interactive write latency while a large export runs.
+
+Builds a scratch database with ``--rows`` change-log rows in a temp
+directory.  A writer process commits small transactions (like interactive
+edits) while this process streams all rows into a CSV, the way the admin
+change-log export does, reading either the primary file or a replica copy
+(``REPORTING_SOURCE=replica``).  Prints the export time, the writer's commit
+latencies (p50/p99/max) and how large the WAL grew, in WAL and
+rollback-journal mode.
+"""
+
+import argparse
+import csv
+import io
+import multiprocessing
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def _build(path: Path, rows: int, journal: str) -> None:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute(f"PRAGMA journal_mode={journal}")
+    conn.execute(
+        "CREATE TABLE changelog (id INTEGER PRIMARY KEY, case_id INTEGER, "
+        "field_name TEXT, old_value TEXT, new_value TEXT, edited_by TEXT, "
+        "timestamp TEXT)"
+    )
+    conn.execute("CREATE TABLE edit (id INTEGER PRIMARY KEY, at REAL, v TEXT)")
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO changelog (case_id, field_name, old_value, new_value, "
+        "edited_by, timestamp) VALUES (?, 'status', ?, ?, 'admin', "
+        "'2026-10-19 10:00:00')",
+        ((i // 20, "x" * 60, "y" * 60) for i in range(rows)),
+    )
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def _writer(path: str, stop, results) -> None:
+    conn = sqlite3.connect(path, isolation_level=None, timeout=60)
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn.execute("INSERT INTO edit (at, v) VALUES (?, ?)", (start, "z" * 500))
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.005)
+    conn.close()
+    results.put(latencies)
+
+
+def _export(path: Path) -> int:
+    conn = sqlite3.connect(f"file:{path.as_posix()}?mode=ro", uri=True)
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=";")
+    count = 0
+    for row in conn.execute("SELECT * FROM changelog ORDER BY timestamp, id"):
+        writer.writerow(row)
+        count += 1
+    conn.close()
+    return count
+
+
+def _ms(latencies: list, q: float) -> float:
+    return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+
+
+def _run(path: Path, read_from: Path) -> tuple:
+    ctx = multiprocessing.get_context("spawn")
+    stop, results = ctx.Event(), ctx.Queue()
+    writer = ctx.Process(target=_writer, args=(str(path), stop, results))
+    writer.start()
+    time.sleep(0.5)
+    start = time.perf_counter()
+    _export(read_from)
+    elapsed = time.perf_counter() - start
+    # Before the writer's last close checkpoints and removes it
+    wal = Path(f"{path}-wal")
+    wal_mb = wal.stat().st_size / 1024 / 1024 if wal.exists() else 0.0
+    stop.set()
+    latencies = sorted(results.get())
+    writer.join()
+    return elapsed, latencies, wal_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000, help="Export rows.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for journal in ("wal", "delete"):
+            path = Path(tmp) / f"bench_{journal}.db"
+            _build(path, args.rows, journal)
+            replica = Path(tmp) / "replica.db"
+            source = sqlite3.connect(path)
+            target = sqlite3.connect(replica)
+            source.backup(target)
+            source.close()
+            target.close()
+            for label, read_from in (("primary", path), ("replica", replica)):
+                elapsed, lat, wal_mb = _run(path, read_from)
+                print(
+                    f"{journal:<6} export from {label:<7}: {elapsed:.2f} s, "
+                    f"{len(lat)} commits, p50 {_ms(lat, 0.5):.1f} ms, "
+                    f"p99 {_ms(lat, 0.99):.1f} ms, max {lat[-1] * 1000:.1f} ms, "
+                    f"WAL {wal_mb:.1f} MiB"
+                )
+            replica.unlink()
+            path.unlink()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""Benchmark rejecting concurrent oversized (bogus) uploads.
+
+Runs the app on a local threaded WSGI server against the *test* database
+(instance/test.db) with a scratch user and case, then has several clients
+push large multipart bodies at once, either with a declared Content-Length or
+chunked.  "baseline" is stock Flask request handling (no route limits, files
+spooled by Werkzeug); "streaming" uses ``app.utils.upload_limits``.  "MB read"
+is how much of the bodies the app consumed before answering.
+"""
+
+import argparse
+import logging
+import select
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlencode
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+BLOCK = 256 * 1024
+
+
+class _ReadCounter:
+    """WSGI middleware totalling the request body bytes the app reads."""
+
+    def __init__(self, app):
+        self.app = app
+        self.read = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        stream = environ["wsgi.input"]
+        counter = self
+
+        class _Input:
+            def read(self, *args):
+                data = stream.read(*args)
+                with counter._lock:
+                    counter.read += len(data)
+                return data
+
+            def readline(self, *args):
+                data = stream.readline(*args)
+                with counter._lock:
+                    counter.read += len(data)
+                return data
+
+        environ["wsgi.input"] = _Input()
+        return self.app(environ, start_response)
+
+
+def _login(port, username, password):
+    import http.client
+
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request(
+        "POST",
+        "/login",
+        body=urlencode({"username": username, "password": password}),
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    resp = conn.getresponse()
+    resp.read()
+    cookie = resp.getheader("Set-Cookie", "").split(";", 1)[0]
+    conn.close()
+    return cookie
+
+
+def _bogus_upload(port, path, cookie, size, chunked, results):
+    """Send *size* bytes of junk until the server answers; record the status."""
+    part = (
+        b'--x\r\nContent-Disposition: form-data; name="file"; '
+        b'filename="bogus.pdf"\r\nContent-Type: application/pdf\r\n\r\n'
+    )
+    head = [
+        f"POST {path} HTTP/1.1",
+        "Host: 127.0.0.1",
+        f"Cookie: {cookie}",
+        "Content-Type: multipart/form-data; boundary=x",
+        "Transfer-Encoding: chunked" if chunked else f"Content-Length: {size}",
+    ]
+    sock = socket.create_connection(("127.0.0.1", port))
+    start = time.perf_counter()
+    sock.sendall(("\r\n".join(head) + "\r\n\r\n").encode())
+    sock.setblocking(False)
+    block = b"\0" * BLOCK
+    remaining = size
+    pending = b""
+    status = None
+    try:
+        while status is None:
+            if not pending and remaining > 0:
+                data = part if remaining == size else block[: min(BLOCK, remaining)]
+                data = data[:remaining]
+                remaining -= len(data)
+                pending = b"%x\r\n%s\r\n" % (len(data), data) if chunked else data
+                if chunked and remaining == 0:
+                    pending += b"0\r\n\r\n"
+            writers = [sock] if pending else []
+            readable, writable, _ = select.select([sock], writers, [], 60)
+            if readable:
+                line = sock.recv(64)
+                status = int(line.split()[1]) if line else 0
+            elif writable:
+                try:
+                    pending = pending[sock.send(pending) :]
+                except OSError:
+                    pending, remaining = b"", 0
+            elif not writers:
+                status = 0
+    except (OSError, ValueError, IndexError):
+        status = 0
+    finally:
+        sock.close()
+    results.append((status, time.perf_counter() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=100, help="Body size.")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients.")
+    parser.add_argument(
+        "--modes", default="baseline,streaming", help="Modes to compare."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from flask import Request
+    from werkzeug.serving import make_server
+
+    from app import create_app, db
+    from app.models import AuditLog, Case, ChangeLog, User
+    from app.utils.upload_limits import UploadRequest
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_ul_"))
+    app = create_app(
+        {
+            "TESTING": True,
+            "WTF_CSRF_ENABLED": False,
+            "UPLOAD_CASES_ROOT": str(tmp / "uploads_cases"),
+            "CASE_UPLOAD_FOLDER": str(tmp / "uploads_cases"),
+            "UPLOAD_INVESTIGATIONS_ROOT": str(tmp / "uploads_investigations"),
+            "INVESTIGATION_UPLOAD_FOLDER": str(tmp / "uploads_investigations"),
+            "MAX_CONTENT_LENGTH": 16 * 1024 * 1024,
+            "TRACK_USER_ACTIVITY": False,
+        }
+    )
+    stamp = int(time.time())
+    username = f"bench_ul_{stamp}"
+    with app.app_context():
+        db.create_all()
+        user = User(username=username, screen_name=username, role="admin")
+        user.set_password("bench")
+        case = Case(case_number=f"BENCH-UL-{stamp}")
+        db.session.add_all([user, case])
+        db.session.commit()
+        case_id, user_id = case.id, user.id
+
+    limited = app.wsgi_app
+    stacks = {
+        "baseline": (Request, limited.wsgi_app),
+        "streaming": (UploadRequest, limited),
+    }
+    counter = _ReadCounter(None)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app.wsgi_app = counter
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    targets = {"upload": f"/cases/{case_id}/upload", "login": "/login"}
+    size = args.size_mb * 1024 * 1024
+    try:
+        app.request_class, counter.app = stacks["streaming"]
+        cookie = _login(port, username, "bench")
+        print(
+            f"{'mode':>9} {'target':>6} {'body':>8} {'status':>6} "
+            f"{'mean s':>7} {'max s':>7} {'MB read':>8}"
+        )
+        for mode in args.modes.split(","):
+            app.request_class, counter.app = stacks[mode]
+            for target, path in targets.items():
+                for chunked in (False, True):
+                    counter.read = 0
+                    results = []
+                    threads = [
+                        threading.Thread(
+                            target=_bogus_upload,
+                            args=(port, path, cookie, size, chunked, results),
+                        )
+                        for _ in range(args.clients)
+                    ]
+                    for t in threads:
+                        t.start()
+                    for t in threads:
+                        t.join()
+                    times = [elapsed for _, elapsed in results]
+                    statuses = ",".join(sorted({str(s) for s, _ in results}))
+                    print(
+                        f"{mode:>9} {target:>6} "
+                        f"{'chunked' if chunked else 'declared':>8} {statuses:>6} "
+                        f"{statistics.mean(times):>7.3f} {max(times):>7.3f} "
+                        f"{counter.read / 1024 / 1024:>8.1f}"
+                    )
+    finally:
+        server.shutdown()
+        with app.app_context():
+            ChangeLog.query.filter_by(case_id=case_id).delete()
+            AuditLog.query.filter_by(user_id=user_id).delete()
+            db.session.delete(db.session.get(Case, case_id))
+            db.session.delete(db.session.get(User, user_id))
+            db.session.commit()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
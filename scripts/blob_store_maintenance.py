@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+import argparse
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Maintain the content-addressed upload store."
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Hash legacy uploads, move them under the store and record hashes.",
+    )
+    parser.add_argument(
+        "--recount", action="store_true", help="Rebuild blob reference counts."
+    )
+    parser.add_argument(
+        "--verify", action="store_true", help="Re-hash every blob and report damage."
+    )
+    parser.add_argument("--gc", action="store_true", help="Delete unreferenced blobs.")
+    parser.add_argument(
+        "--grace-hours",
+        type=float,
+        default=1.0,
+        help="Only collect blobs unreferenced for at least this long.",
+    )
+    parser.add_argument(
+        "--purge-partial-hours",
+        type=float,
+        metavar="HOURS",
+        help="Drop resumable uploads idle for at least this long.",
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app, db
+    from app.models import UploadBlob
+    from app.services import blob_store, chunked_uploads
+
+    app = create_app()
+    with app.app_context():
+        print("=== Blob store maintenance ===")
+        if args.backfill:
+            stats = blob_store.backfill()
+            print(f"backfill: {stats['adopted']} adopted, {stats['missing']} missing")
+        if args.recount:
+            print(f"recount : {blob_store.recount()} referenced blob(s)")
+        damaged = []
+        if args.verify:
+            hashes = [h for (h,) in db.session.query(UploadBlob.sha256)]
+            damaged = [h for h in hashes if not blob_store.verify(h)]
+            print(f"verify  : {len(hashes)} blob(s), {len(damaged)} damaged")
+            for sha256 in damaged:
+                print(f"  damaged: {sha256}")
+        if args.gc:
+            removed = blob_store.collect_garbage(timedelta(hours=args.grace_hours))
+            print(f"gc      : {removed} blob(s) removed")
+        if args.purge_partial_hours is not None:
+            purged = chunked_uploads.collect_stale(
+                timedelta(hours=args.purge_partial_hours)
+            )
+            print(f"partial : {purged} stale upload(s) removed")
+        db.session.commit()
+        return 1 if damaged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
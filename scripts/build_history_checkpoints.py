@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+import argparse
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build compressed history snapshots for existing change logs."
+    )
+    parser.add_argument(
+        "--subject",
+        choices=("case", "investigation", "all"),
+        default="all",
+        help="Which history to checkpoint.",
+    )
+    parser.add_argument(
+        "--every",
+        type=int,
+        default=None,
+        help="Change-log rows between snapshots (default: HISTORY_SNAPSHOT_EVERY).",
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app, db
+    from app.services.history import build_all_checkpoints
+
+    subjects = ("case", "investigation") if args.subject == "all" else (args.subject,)
+    app = create_app()
+    with app.app_context():
+        print("=== History checkpoints ===")
+        for subject in subjects:
+            counts = build_all_checkpoints(subject, every=args.every)
+            db.session.commit()
+            print(
+                f"{subject:<13}: {counts['snapshots']} snapshot(s) "
+                f"for {counts['subjects']} subject(s)"
+            )
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
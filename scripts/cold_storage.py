@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""Zip the upload folders of long-closed cases and investigations.
+
+Folders of subjects closed and untouched for ``--months`` (default
+COLD_STORAGE_AFTER_MONTHS) are packed into ``<folder>.zip`` beside them; the
+downloads keep working from the zip.  The same runs weekly as the
+``cold_storage`` job of ``run_scheduler.py``.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def _mib(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--months", type=int, default=None, help="Closed for at least this long."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only count what would be packed."
+    )
+    parser.add_argument(
+        "--status", action="store_true", help="Show packed folders and the cache."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.services import cold_storage
+
+    app = create_app()
+    with app.app_context():
+        if args.status:
+            print(json.dumps(cold_storage.status(), indent=2))
+            return 0
+        report = cold_storage.run(months=args.months, dry_run=args.dry_run)
+        print(f"cutoff   : {report['cutoff']}")
+        print(f"folders  : {report['folders']} ({report['files']} files)")
+        print(f"size     : {_mib(report['bytes'])}")
+        if not args.dry_run:
+            print(f"freed    : {_mib(report['freed'])}")
+            print(f"zips     : +{_mib(report['zip_bytes'])}")
+            print(f"reclaimed: {_mib(report['reclaimed'])}")
+        for name in report.get("failed", []):
+            print(f"FAILED   : {name}")
+        return 1 if report.get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+import argparse
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Publish the shared DO-NOT-EDIT template sets."
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="Remove published versions no case or investigation references.",
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app, db
+    from app.investigations.models import Investigation
+    from app.models import Case
+    from app.services import archive, template_store
+
+    app = create_app()
+    with app.app_context():
+        print("=== Template store ===")
+        for name, model in (
+            (template_store.CASE_SET, Case),
+            (template_store.INVESTIGATION_SET, Investigation),
+        ):
+            tset = template_store.current(name)
+            if tset is None:
+                src = template_store.source_root(name)
+                print(f"{name:10}: source missing ({src})")
+                continue
+            print(f"{name:10}: version {tset.version}, {len(tset.files)} file(s)")
+            if args.prune:
+                # Archived subjects' cold folders still point at their version
+                with archive.archive_reads():
+                    used = {
+                        v
+                        for (v,) in db.session.query(model.template_version).distinct()
+                        if v
+                    }
+                removed = template_store.prune(name, used)
+                print(f"{'':10}  pruned {removed} unreferenced version(s)")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
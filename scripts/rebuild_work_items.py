@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+import argparse
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the work_item inbox table from cases and investigations."
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=500, help="Subjects synced per batch."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app, db
+    from app.services.work_items import rebuild_all
+
+    app = create_app()
+    with app.app_context():
+        counts = rebuild_all(db.session, batch_size=args.batch_size)
+        db.session.commit()
+        print("=== Work item rebuild ===")
+        print(f"Work items : {counts['work_items']}")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+import argparse
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Recompute the materialized effective_describer_id on cases and "
+            "investigations (backfill after migrating)."
+        )
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=500, help="Rows loaded per batch."
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report changes without committing."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app, db
+    from app.services.describer_sync import recompute_all
+
+    app = create_app()
+    with app.app_context():
+        counts = recompute_all(db.session, batch_size=args.batch_size)
+        if args.dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+
+        print("=== Effective describer recompute ===")
+        print(f"Cases updated          : {counts['cases']}")
+        print(f"Investigations updated : {counts['investigations']}")
+        if args.dry_run:
+            print("[DRY-RUN] No changes committed.")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Reconcile both upload trees with the attachment records.
+
+Reports records without a file, files overwritten in place, files no record
+names and folders of deleted cases/investigations (see
+app.services.reconcile) as JSON.  Reruns only list directories changed
+since the last run unless ``--full``.  Exits 1 if anything other than
+untracked files was found.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--hash", action="store_true", help="Compare SHA-256, not only sizes."
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="Ignore the manifest; list everything."
+    )
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help="Relink missing/changed files from blobs; quarantine orphans.",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Scan threads.")
+    parser.add_argument(
+        "--output", default="-", help="Report file (default: standard output)."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.services import reconcile
+
+    app = create_app()
+    with app.app_context():
+        report = reconcile.run(
+            hash_files=args.hash,
+            full=args.full,
+            repair=args.repair,
+            workers=args.workers,
+        )
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output == "-":
+        print(text)
+    else:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+        counts = ", ".join(f"{k}: {n}" for k, n in report["counts"].items())
+        print(f"{report['folders']} folders, {counts or 'no findings'}")
+    problems = sum(n for kind, n in report["counts"].items() if kind != "untracked")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Warm standby of the databases (WAL shipping).
+
+  replication.py status               shipped/replayed segments and lag
+  replication.py promote              replay what arrived, make the copies
+                                      primaries (left in the standby dir)
+  replication.py promote --install --yes
+                                      ... and copy them over this
+                                      instance's database files
+
+Shipping runs as ``python run_tasks.py replicate``; stop it (and the app,
+for --install) before promoting.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.splitlines()[2:]),
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Show replication lag.")
+    promote = sub.add_parser("promote", help="Turn the standby into a primary.")
+    promote.add_argument(
+        "--install",
+        action="store_true",
+        help="Copy the promoted databases over this instance's files.",
+    )
+    promote.add_argument(
+        "--yes", action="store_true", help="Really overwrite with --install."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.services import replication
+
+    app = create_app()
+    with app.app_context():
+        if args.command == "status":
+            print(json.dumps(replication.metrics(), indent=2))
+            return 0
+        if args.install and not args.yes:
+            print("promote --install overwrites the database files; add --yes")
+            return 2
+        primaries = replication.primaries()
+        report = replication.promote(
+            replication.standby_root(),
+            list(primaries),
+            targets=primaries if args.install else None,
+        )
+        for name, info in report.items():
+            print(
+                f"{name:<12}: generation {info['generation']}, "
+                f"segment {info['segment']} ({info['applied']} just replayed)"
+                f" -> {info.get('installed', info['path'])}"
+            )
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""SQLite maintenance of forensic_cases.db and examination.db.
+
+Checkpoints the WAL, runs ANALYZE / PRAGMA optimize, releases free pages
+with an incremental vacuum and purges leaked temp files, printing page
+counts, free lists and index statistics before and after.  The same runs
+nightly as the ``db_maintenance`` job of ``run_scheduler.py``; run this
+during low traffic, since vacuuming locks the database.
+"""
+
+import argparse
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def _print_stats(label, stats):
+    print(
+        f"  {label:<7}: {stats['page_count']} pages x {stats['page_size']} B, "
+        f"{stats['freelist_count']} free ({stats['free_bytes'] / 1024:.0f} KiB), "
+        f"auto_vacuum={stats['auto_vacuum']}, journal={stats['journal_mode']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--convert",
+        action="store_true",
+        help="Switch databases to incremental auto_vacuum (one full VACUUM).",
+    )
+    parser.add_argument(
+        "--vacuum-pages",
+        type=int,
+        default=None,
+        help="Free pages to release per database (default: all).",
+    )
+    parser.add_argument(
+        "--temp-max-age-hours",
+        type=float,
+        default=None,
+        help="Purge leaked temp files older than this (default: config).",
+    )
+    parser.add_argument(
+        "--indexes", action="store_true", help="List index sizes and statistics."
+    )
+    parser.add_argument(
+        "--report-only", action="store_true", help="Only print the statistics."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.services import db_maintenance
+
+    app = create_app()
+    with app.app_context():
+        print("=== SQLite maintenance ===")
+        if args.report_only:
+            for name, engine in db_maintenance.engines().items():
+                print(f"{name}:")
+                stats = db_maintenance.stats(engine, indexes=args.indexes)
+                _print_stats("now", stats)
+                for index in stats.get("indexes", []):
+                    print(
+                        f"    {index['table']}.{index['index']}: "
+                        f"{index['pages']} pages, stat={index['stat']}"
+                    )
+            return 0
+        report = db_maintenance.run(
+            convert=args.convert or None,
+            vacuum_pages=args.vacuum_pages,
+            temp_max_age=(
+                timedelta(hours=args.temp_max_age_hours)
+                if args.temp_max_age_hours is not None
+                else None
+            ),
+            indexes=args.indexes,
+        )
+        temp = report.pop("temp_files")
+        failed = False
+        for name, entry in report.items():
+            print(f"{name}: {', '.join(entry.get('steps', [])) or '-'}")
+            if "error" in entry:
+                failed = True
+                print(f"  error  : {entry['error']}")
+            _print_stats("before", entry["before"])
+            _print_stats("after", entry["after"])
+            before = {i["index"]: i for i in entry["before"].get("indexes", [])}
+            for index in entry["after"].get("indexes", []):
+                old = before.get(index["index"], {})
+                print(
+                    f"    {index['table']}.{index['index']}: "
+                    f"{old.get('pages')} -> {index['pages']} pages, "
+                    f"stat={index['stat']}"
+                )
+        print(f"temp   : {temp['files']} file(s), {temp['bytes'] / 1024:.0f} KiB")
+        return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path when running as a script
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+
+def _read_cursor(path):
+    try:
+        return int(Path(path).read_text(encoding="utf-8").strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_cursor(path, seq):
+    # Write-then-rename so a crash never leaves a truncated cursor behind.
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(f"{seq}\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print change-feed events after a sequence number as JSONL."
+    )
+    parser.add_argument("--stream", choices=("case", "investigation"), required=True)
+    parser.add_argument(
+        "--after", type=int, default=None, help="Start after this sequence number."
+    )
+    parser.add_argument(
+        "--cursor-file",
+        help="Durable cursor: read the start position and store it after each batch.",
+    )
+    parser.add_argument("--limit", type=int, default=500, help="Events per batch.")
+    parser.add_argument(
+        "--follow", action="store_true", help="Keep waiting for new events."
+    )
+    parser.add_argument(
+        "--wait", type=float, default=25.0, help="Long-poll timeout per batch (s)."
+    )
+    args = parser.parse_args()
+
+    # Lazy import app to avoid heavy startup before args parse
+    from app import create_app
+    from app.services.change_feed import fetch, wait_for
+
+    after = args.after
+    if after is None:
+        after = _read_cursor(args.cursor_file) if args.cursor_file else 0
+
+    app = create_app()
+    with app.app_context():
+        try:
+            while True:
+                if args.follow:
+                    events = wait_for(args.stream, after, args.limit, args.wait)
+                else:
+                    events = fetch(args.stream, after, args.limit)
+                for event in events:
+                    sys.stdout.write(json.dumps(event, ensure_ascii=False) + "\n")
+                sys.stdout.flush()
+                if events:
+                    after = events[-1]["seq"]
+                    if args.cursor_file:
+                        _write_cursor(args.cursor_file, after)
+                elif not args.follow:
+                    break
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,7 +9,8 @@ sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Verify examination uploads vs DB attachments (read-only)."
+        description="Verify examination uploads vs DB attachments (read-only).",
+        epilog="scripts/reconcile_uploads.py checks every case and investigation.",
     )
     parser.add_argument(
         "--case", required=True, help="Investigation case number, e.g. 'V:0002/2025'"
@@ -20,9 +21,10 @@ def main():
     from app import create_app, db
     from app.investigations.models import Investigation
     from app.paths import investigation_expected_folder
+    from app.services import archive, cold_storage
 
     app = create_app()
-    with app.app_context():
+    with app.app_context(), archive.archive_reads():
         inv = db.session.query(Investigation).filter_by(case_number=args.case).first()
         if not inv:
             print(f"[ERROR] Investigation not found for case_number={args.case}")
@@ -43,7 +45,8 @@ def main():
         present = []
         for a in atts:
             fpath = Path(folder) / a.filename
-            (present if fpath.exists() else missing).append(a.filename)
+            found = fpath.exists() or cold_storage.find(Path(folder), fpath)
+            (present if found else missing).append(a.filename)
 
         print("=== Examination Upload Verification ===")
         print(f"Case number : {inv.case_number}")
@@ -162,9 +162,18 @@ def _force_tmp_upload_roots(tmp_path_factory):
     os.environ["UPLOAD_CASES_ROOT"] = str(tmp_cases)
     os.environ["UPLOAD_INVESTIGATIONS_ROOT"] = str(tmp_investigations)
 
+    # Published templates and the DOCX cache live beside the uploads, not
+    # in instance/.
+    orig_template_store = TestingConfig.TEMPLATE_STORE_ROOT
+    orig_docx_cache = TestingConfig.DOCX_CACHE_ROOT
+    TestingConfig.TEMPLATE_STORE_ROOT = str(tmp_base / "template_store")
+    TestingConfig.DOCX_CACHE_ROOT = str(tmp_base / "docx_cache")
+
     try:
         yield
     finally:
+        TestingConfig.TEMPLATE_STORE_ROOT = orig_template_store
+        TestingConfig.DOCX_CACHE_ROOT = orig_docx_cache
         if orig_case_root is not None:
             _paths.case_root = orig_case_root
         if orig_investigation_root is not None:
@@ -0,0 +1,124 @@
+import sqlite3
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+
+from app import db
+from app.investigations.models import Investigation, InvestigationChangeLog
+from app.models import Case, ChangeLog, UploadBlob, UploadedFile
+from app.services import archive, blob_store
+from tests.helpers import create_investigation, create_user, login
+
+NOW = datetime(2026, 10, 19, 8, 0, tzinfo=timezone.utc)
+OLD = datetime(2017, 3, 1, 9, 0, tzinfo=timezone.utc)
+
+
+def _case(number, status, when):
+    case = Case(case_number=number, status=status)
+    db.session.add(case)
+    db.session.commit()
+    db.session.execute(
+        sa.update(Case.__table__)
+        .where(Case.__table__.c.id == case.id)
+        .values(registration_time=when, updated_at=when)
+    )
+    db.session.commit()
+    return case.id
+
+
+def _rows(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_closed_cases_move_to_the_year_archive_and_stay_readable(app, client, tmp_path):
+    app.config["ARCHIVE_DIR"] = str(tmp_path / "archive")
+    create_user("admin", "secret", "admin")
+    old_id = _case("B:0001/2017", "lezárt", OLD)
+    db.session.add(
+        UploadedFile(
+            case_id=old_id,
+            filename="jkv.pdf",
+            uploader="admin",
+            category="egyéb",
+            sha256="ab" * 32,
+        )
+    )
+    db.session.add(UploadBlob(sha256="ab" * 32, size_bytes=3, refcount=1))
+    db.session.commit()
+    recent_id = _case("B:0002/2026", "lezárt", NOW)
+    open_id = _case("B:0003/2026", "új", NOW)
+    db.session.add(
+        UploadedFile(
+            case_id=open_id, filename="x.pdf", uploader="admin", category="egyéb"
+        )
+    )
+    db.session.commit()
+
+    report = archive.run(NOW, months=24)
+    assert report["binds"]["main"] == {"2017": 1}
+    assert sorted(db.session.execute(sa.select(Case.id)).scalars()) == [
+        recent_id,
+        open_id,
+    ]
+    assert not ChangeLog.query.filter_by(case_id=old_id).count()
+    assert not UploadedFile.query.filter_by(case_id=old_id).count()
+    path = tmp_path / "archive" / "main-2017.db"
+    assert _rows(path, 'SELECT id, case_number FROM "case"') == [
+        (old_id, "B:0001/2017")
+    ]
+    assert _rows(path, "SELECT filename FROM uploaded_file") == [("jkv.pdf",)]
+    assert _rows(path, "SELECT count(*) FROM change_log")[0][0] > 0
+
+    assert archive.run(NOW, months=24)["binds"]["main"] == {}
+    assert blob_store.recount() == 1  # archived uploads keep their blobs
+    assert db.session.get(UploadBlob, "ab" * 32).refcount == 1
+
+    with client:
+        login(client, "admin", "secret")
+        detail = client.get(f"/cases/{old_id}")
+        assert detail.status_code == 200 and "B:0001/2017" in detail.text
+        found = client.get("/cases?search=0001/2017")
+        assert "B:0001/2017" in found.text
+        assert "B:0001/2017" not in client.get("/cases").text
+        assert "B:0001/2017" in client.get("/cases/closed").text
+        assert client.get("/cases/999999").status_code == 404
+
+
+def test_newest_and_recent_investigations_stay_hot(app, client, tmp_path):
+    app.config["ARCHIVE_DIR"] = str(tmp_path / "archive")
+    create_user("admin", "secret", "admin")
+    first = create_investigation(case_number="V:0001/2018", status="lezárt")
+    inv_id = first.id
+    db.session.execute(
+        sa.update(Investigation)
+        .where(Investigation.id == inv_id)
+        .values(registration_time=OLD.replace(year=2018))
+    )
+    db.session.execute(
+        sa.update(InvestigationChangeLog)
+        .where(InvestigationChangeLog.investigation_id == inv_id)
+        .values(timestamp=OLD)
+    )
+    db.session.commit()
+
+    # It owns the newest investigation and change-log ids: archiving it
+    # would let the next row reuse an archived id.
+    assert archive.run(NOW, months=24)["binds"]["examination"] == {}
+
+    create_investigation(case_number="V:0002/2026")
+    assert archive.run(NOW, months=24)["binds"]["examination"] == {"2018": 1}
+    assert db.session.get(Investigation, inv_id) is None
+    with archive.archive_reads() as attached:
+        assert attached
+        assert db.session.get(Investigation, inv_id).case_number == "V:0001/2018"
+
+    with client:
+        login(client, "admin", "secret")
+        listing = client.get("/investigations/?search=V:0001")
+        assert "V:0001/2018" in listing.text
+        resp = client.get(f"/investigations/{inv_id}/view")
+        assert resp.status_code == 200 and "V:0001/2018" in resp.text
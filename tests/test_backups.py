@@ -0,0 +1,97 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.models import Case
+from app.services import backups
+
+T0 = datetime(2026, 10, 19, 1, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def roots(app, tmp_path):
+    app.config.update(
+        CASE_UPLOAD_FOLDER=str(tmp_path / "cases"),
+        UPLOAD_CASES_ROOT=str(tmp_path / "cases"),
+        INVESTIGATION_UPLOAD_FOLDER=str(tmp_path / "investigations"),
+        BLOB_STORE_ROOT=str(tmp_path / "blobs"),
+        BACKUP_ROOT=str(tmp_path / "backups"),
+        BACKUP_PAGES_PER_STEP=16,
+        BACKUP_STEP_SLEEP_MS=0,
+    )
+    return backups.upload_trees()
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def _case_numbers(snapshot):
+    conn = sqlite3.connect(snapshot)
+    try:
+        return [row[0] for row in conn.execute('SELECT case_number FROM "case"')]
+    finally:
+        conn.close()
+
+
+def test_backups_link_unchanged_files_and_verify(roots):
+    db.session.add(Case(case_number="B:0001/2026"))
+    db.session.commit()
+    scan = _write(roots["cases"] / "B-0001-2026" / "scan.pdf", b"scan" * 1000)
+    (roots["blobs"] / "ab" / "cd").mkdir(parents=True)
+    os.link(scan, roots["blobs"] / "ab" / "cd" / "abcd")  # blob store entry
+    report = _write(roots["investigations"] / "V-1" / "report.docx", b"v1")
+
+    first = backups.create_backup(T0)
+    assert set(first["databases"]) == {"main", "examination"}
+    assert first["stats"]["copied"] == 2 and first["stats"]["linked"] == 1
+    base1 = backups.backup_root() / first["name"]
+    assert _case_numbers(base1 / "main.db") == ["B:0001/2026"]
+
+    report.write_bytes(b"v2 changed")
+    second = backups.create_backup(T0 + timedelta(hours=1))
+    assert second["stats"]["copied"] == 1 and second["stats"]["linked"] == 2
+    base2 = backups.backup_root() / second["name"]
+    copy1 = base1 / "uploads" / "cases" / "B-0001-2026" / "scan.pdf"
+    copy2 = base2 / "uploads" / "cases" / "B-0001-2026" / "scan.pdf"
+    assert copy1.stat().st_ino == copy2.stat().st_ino
+    assert backups.list_backups() == [first["name"], second["name"]]
+
+    assert backups.prune(keep=1) == [first["name"]]
+    assert backups.verify(second["name"], deep=True) == []
+
+    (base2 / "uploads" / "investigations" / "V-1" / "report.docx").write_bytes(
+        b"v2 CHANGED"
+    )
+    assert backups.verify(second["name"]) == []
+    assert backups.verify(second["name"], deep=True) == [
+        "investigations/V-1/report.docx: checksum mismatch"
+    ]
+    with pytest.raises(backups.BackupError):
+        backups.restore(second["name"])
+
+
+def test_restore_brings_back_databases_and_uploads(roots):
+    db.session.add(Case(case_number="B:0002/2026"))
+    db.session.commit()
+    scan = _write(roots["cases"] / "B-0002-2026" / "scan.pdf", b"scan")
+    name = backups.create_backup(T0)["name"]
+
+    Case.query.delete()
+    db.session.commit()
+    scan.unlink()
+    _write(roots["cases"] / "stray.txt", b"after the backup")
+
+    restored = backups.restore(name)
+    assert sorted(restored["databases"]) == ["examination", "main"]
+    assert restored["files"] == 1
+    assert [c.case_number for c in Case.query.all()] == ["B:0002/2026"]
+    cases = backups.upload_trees()["cases"]
+    assert (cases / "B-0002-2026" / "scan.pdf").read_bytes() == b"scan"
+    assert not (cases / "stray.txt").exists()
+    assert list(cases.parent.glob("cases.pre-restore-*"))
@@ -0,0 +1,121 @@
+import io
+from zipfile import ZipFile
+
+import pytest
+import sqlalchemy as sa
+from docx import Document
+
+from app import db
+from app.investigations import batch
+from app.investigations.models import InvestigationAttachment
+from app.models import DocumentJob
+from app.services import document_jobs
+from tests.helpers import create_investigation, create_user, login_follow
+
+FIELDS = {
+    "letter": "tajekoztatas_ugy_szignalasarol",
+    "cimzett_szerv": "ORFK",
+    "titulus_szerv": "Osztályvezető",
+    "actor": "N. N.",
+    "titulus": "dr.",
+}
+
+
+@pytest.fixture
+def cases(app, client, tmp_path):
+    app.config["UPLOAD_INVESTIGATIONS_ROOT"] = str(tmp_path / "inv")
+    app.config["INVESTIGATION_UPLOAD_FOLDER"] = str(tmp_path / "inv")
+    app.config["TEMPLATE_STORE_ROOT"] = str(tmp_path / "store")
+    app.config["INVESTIGATION_TEMPLATE_DIR"] = str(tmp_path / "src")
+    (tmp_path / "src").mkdir()
+    doc = Document()
+    doc.add_paragraph("Szakértő: {{szak}}, vezető: {{vezeto}}")
+    doc.save(str(tmp_path / "src" / "tajekoztatas_ugy_szignalasarol.docx"))
+
+    leiro = create_user("batch_leiro", "secret", "leíró")
+    experts = [
+        create_user(f"batch_expert{i}", "secret", "szakértő", default_leiro_id=leiro.id)
+        for i in range(2)
+    ]
+    invs = [
+        create_investigation(
+            case_number=f"V:{i:04d}/2026",
+            status="szignálva",
+            expert1_id=experts[i % 2].id,
+        )
+        for i in range(3)
+    ]
+    create_investigation(case_number="V:0099/2026", status="lezárt")
+    login_follow(client, leiro.username, "secret")
+    return invs, leiro
+
+
+def test_batch_renders_attachments_for_the_selection(client, cases):
+    invs, leiro = cases
+    resp = client.post(
+        "/investigations/batch_documents", data={**FIELDS, "status": "szignálva"}
+    )
+
+    job = DocumentJob.query.first()
+    assert resp.status_code == 302
+    assert resp.headers["Location"].endswith(f"/batch_documents/{job.batch_id}")
+    atts = InvestigationAttachment.query.order_by("investigation_id").all()
+    assert [a.investigation_id for a in atts] == [inv.id for inv in invs]
+    assert {a.uploaded_by for a in atts} == {leiro.id}
+    assert atts[0].filename == "V-0000-2026_tajekoztatas_ugy_szignalasarol.docx"
+
+    state = client.get(f"/investigations/batch_documents/{job.batch_id}?format=json")
+    assert state.json["counts"]["done"] == 3
+
+    archive = client.get(f"/investigations/batch_documents/{job.batch_id}/download")
+    with ZipFile(io.BytesIO(archive.data)) as zf:
+        assert sorted(zf.namelist()) == sorted(a.filename for a in atts)
+
+
+def test_contexts_resolve_users_from_one_query(app, cases):
+    invs, _ = cases
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.engine
+    sa.event.listen(engine, "before_cursor_execute", record)
+    try:
+        users = batch.prefetch_users(invs)
+        contexts = [batch.LETTERS[FIELDS["letter"]].context(i, FIELDS) for i in invs]
+    finally:
+        sa.event.remove(engine, "before_cursor_execute", record)
+
+    assert len(users) == 2
+    assert len([s for s in statements if "FROM user" in s]) == 1
+    assert all(ctx["szak"].startswith("batch_expert") for ctx in contexts)
+
+
+def test_queued_batch_is_drained_by_its_own_worker(app, client, cases):
+    invs, _ = cases
+    app.config["DOCUMENT_JOBS_EAGER"] = False
+    ids = f"{invs[0].id}, {invs[2].id}"
+    client.post("/investigations/batch_documents", data={**FIELDS, "ids": ids})
+    batch_id = DocumentJob.query.first().batch_id
+    status_url = f"/investigations/batch_documents/{batch_id}"
+
+    assert client.get(f"{status_url}?format=json").json["counts"]["queued"] == 2
+    assert "Folyamatban" in client.get(status_url).get_data(as_text=True)
+    assert document_jobs.run_worker(processes=0, once=True, batch_id="x") == 0
+    assert document_jobs.run_worker(processes=0, once=True, batch_id=batch_id) == 2
+    assert "Letöltés ZIP-ben" in client.get(status_url).get_data(as_text=True)
+
+
+def test_invalid_fields_and_foreign_batches_are_rejected(client, cases):
+    resp = client.post(
+        "/investigations/batch_documents", data={**FIELDS, "titulus": " "}
+    )
+    assert resp.status_code == 400
+    assert DocumentJob.query.count() == 0
+
+    client.post("/investigations/batch_documents", data=FIELDS)
+    batch_id = DocumentJob.query.first().batch_id
+    create_user("masik", "secret", "leíró")
+    login_follow(client, "masik", "secret")
+    assert client.get(f"/investigations/batch_documents/{batch_id}").status_code == 404
@@ -0,0 +1,198 @@
+import hashlib
+import io
+import os
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.investigations.models import InvestigationAttachment
+from app.models import Case, ChangeLog, UploadBlob, UploadedFile, User
+from app.paths import ensure_investigation_folder, file_safe_case_number
+from app.services import blob_store
+from tests.helpers import create_investigation, create_user, login
+
+PDF = b"%PDF-1.4 vegzes"
+SHA = hashlib.sha256(PDF).hexdigest()
+
+
+def _case(number):
+    case = Case(case_number=number)
+    db.session.add(case)
+    db.session.commit()
+    return case
+
+
+def _upload(client, case_id, payload, name="vegzes.pdf"):
+    return client.post(
+        f"/cases/{case_id}/upload",
+        data={"category": "végzés", "file": (io.BytesIO(payload), name)},
+        content_type="multipart/form-data",
+    )
+
+
+def _case_dir(app, case):
+    root = Path(app.config["UPLOAD_CASES_ROOT"])
+    return root / file_safe_case_number(case.case_number)
+
+
+def test_identical_uploads_share_one_blob(client, app):
+    create_user()
+    first, second = _case("B-1"), _case("B-2")
+
+    with client:
+        login(client, "admin", "secret")
+        assert _upload(client, first.id, PDF).status_code == 302
+        assert _upload(client, second.id, PDF).status_code == 302
+
+    records = UploadedFile.query.order_by(UploadedFile.id).all()
+    assert [(r.sha256, r.size_bytes) for r in records] == [(SHA, len(PDF))] * 2
+    blob = db.session.get(UploadBlob, SHA)
+    assert blob.refcount == 2
+
+    blob_file = blob_store.blob_path(SHA)
+    for case in (first, second):
+        folder_file = _case_dir(app, case) / "vegzes.pdf"
+        assert folder_file.read_bytes() == PDF
+        assert os.path.samefile(folder_file, blob_file)
+    assert blob_store.verify(SHA)
+
+
+def test_name_clash_keeps_both_files(client, app):
+    create_user()
+    case = _case("B-3")
+
+    with client:
+        login(client, "admin", "secret")
+        _upload(client, case.id, PDF)
+        _upload(client, case.id, b"%PDF-1.4 other")
+
+    folder = _case_dir(app, case)
+    assert (folder / "vegzes.pdf").read_bytes() == PDF
+    assert (folder / "vegzes_2.pdf").read_bytes() == b"%PDF-1.4 other"
+    names = {r.filename for r in UploadedFile.query.filter_by(case_id=case.id)}
+    assert names == {"vegzes.pdf", "vegzes_2.pdf"}
+
+
+def test_download_serves_strong_etag(client, app):
+    create_user()
+    case = _case("B-4")
+
+    with client:
+        login(client, "admin", "secret")
+        _upload(client, case.id, PDF)
+        resp = client.get(f"/cases/{case.id}/files/vegzes.pdf")
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] == f'"{SHA}"'
+        resp = client.get(
+            f"/cases/{case.id}/files/vegzes.pdf",
+            headers={"If-None-Match": f'"{SHA}"'},
+        )
+        assert resp.status_code == 304
+
+
+def test_investigation_upload_records_hash(client, app):
+    create_user()
+    inv = create_investigation()
+
+    with client:
+        login(client, "admin", "secret")
+        resp = client.post(
+            f"/investigations/{inv.id}/upload",
+            data={"category": "végzés", "file": (io.BytesIO(PDF), "doc.pdf")},
+            content_type="multipart/form-data",
+        )
+        assert resp.status_code in (302, 303)
+        att = InvestigationAttachment.query.filter_by(investigation_id=inv.id).one()
+        assert (att.sha256, att.size_bytes) == (SHA, len(PDF))
+        assert db.session.get(UploadBlob, SHA).refcount == 1
+
+        resp = client.get(f"/investigations/{inv.id}/download/{att.id}")
+        assert resp.headers["ETag"] == f'"{SHA}"'
+
+
+def test_delete_releases_reference_and_gc_keeps_folder_copy(client, app):
+    create_user()
+    case = _case("B-5")
+    with client:
+        login(client, "admin", "secret")
+        _upload(client, case.id, PDF)
+    folder_file = _case_dir(app, case) / "vegzes.pdf"
+
+    ChangeLog.query.filter_by(case_id=case.id).delete()
+    db.session.delete(case)
+    db.session.commit()
+    db.session.expire_all()
+    assert db.session.get(UploadBlob, SHA).refcount == 0
+
+    assert blob_store.collect_garbage(grace=timedelta(hours=1)) == 0  # in grace
+    db.session.execute(
+        UploadBlob.__table__.update().values(
+            created_at=UploadBlob.created_at - timedelta(days=1)
+        )
+    )
+    assert blob_store.collect_garbage(grace=timedelta(hours=1)) == 1
+    db.session.commit()
+    assert not blob_store.blob_path(SHA).exists()
+    assert folder_file.read_bytes() == PDF
+
+
+def test_backfill_adopts_and_dedupes_legacy_files(app):
+    case = _case("B-6")
+    inv = create_investigation()
+    case_file = _case_dir(app, case) / "old.pdf"
+    case_file.parent.mkdir(parents=True, exist_ok=True)
+    case_file.write_bytes(PDF)
+    inv_file = ensure_investigation_folder(inv.case_number) / "old.pdf"
+    inv_file.write_bytes(PDF)
+    db.session.add(
+        UploadedFile(
+            case_id=case.id, filename="old.pdf", uploader="x", category="egyéb"
+        )
+    )
+    db.session.add(
+        InvestigationAttachment(
+            investigation_id=inv.id,
+            filename="old.pdf",
+            category="egyéb",
+            uploaded_by=1,
+        )
+    )
+    db.session.commit()
+
+    stats = blob_store.backfill()
+    db.session.commit()
+
+    assert stats == {"adopted": 2, "missing": 0}
+    db.session.expire_all()
+    assert UploadedFile.query.one().sha256 == SHA
+    assert InvestigationAttachment.query.one().sha256 == SHA
+    assert db.session.get(UploadBlob, SHA).refcount == 2
+    assert os.path.samefile(case_file, inv_file)
+
+
+def test_failed_flush_does_not_leak_refcount_deltas(app):
+    create_user()
+    case = _case("B-7")
+    blob_store.store_stream(io.BytesIO(PDF))
+    db.session.commit()
+
+    db.session.add(
+        UploadedFile(
+            case_id=case.id,
+            filename="a.pdf",
+            uploader="x",
+            category="egyéb",
+            sha256=SHA,
+            size_bytes=len(PDF),
+        )
+    )
+    db.session.add(User(username="admin", password_hash="x", role="admin"))
+    with pytest.raises(IntegrityError):
+        db.session.flush()
+    db.session.rollback()
+
+    _case("B-8")
+    assert db.session.get(UploadBlob, SHA).refcount == 0
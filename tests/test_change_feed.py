@@ -0,0 +1,106 @@
+from app import db
+from app.models import Case, ChangeLog, ChangeOutbox
+from app.services import change_feed
+from tests.helpers import create_investigation, create_user, login
+
+
+def _changes(event):
+    return {c["field"]: (c["old"], c["new"]) for c in event["changes"]}
+
+
+def test_case_changes_are_written_to_outbox(app):
+    case = Case(case_number="CDC-1", status="beérkezett")
+    db.session.add(case)
+    db.session.commit()
+    case.status = "szignálva"
+    db.session.commit()
+    ChangeLog.query.filter_by(case_id=case.id).delete()  # as delete_case does
+    db.session.delete(case)
+    db.session.commit()
+
+    events = change_feed.fetch("case")
+    assert [e["op"] for e in events] == ["insert", "update", "delete"]
+    assert [e["seq"] for e in events] == sorted(e["seq"] for e in events)
+    assert all(e["subject"] == {"type": "case", "id": case.id} for e in events)
+    assert _changes(events[0])["status"] == (None, "beérkezett")
+    assert _changes(events[1]) == {"status": ("beérkezett", "szignálva")}
+    assert events[2]["changes"] == []
+
+
+def test_outbox_rolls_back_with_the_change(app):
+    case = Case(case_number="CDC-2")
+    db.session.add(case)
+    db.session.flush()
+    db.session.rollback()
+    assert ChangeOutbox.query.count() == 0
+    assert change_feed.head("case") == 0
+
+
+def test_fetch_resumes_after_cursor_with_limit(app):
+    for i in range(5):
+        db.session.add(Case(case_number=f"CDC-L{i}"))
+        db.session.commit()
+
+    first = change_feed.fetch("case", 0, limit=2)
+    assert len(first) == 2
+    rest = change_feed.fetch("case", first[-1]["seq"], limit=10)
+    assert len(rest) == 3
+    assert change_feed.fetch("case", rest[-1]["seq"]) == []
+    assert change_feed.head("case") == rest[-1]["seq"]
+
+
+def test_wait_for_times_out_without_events(app):
+    sleeps = []
+    assert change_feed.wait_for("case", 0, timeout=1.0, sleep=sleeps.append) == []
+    assert sleeps
+
+
+def test_investigation_stream(app):
+    inv = create_investigation()
+    inv.status = "szignálva"
+    db.session.commit()
+
+    events = change_feed.fetch("investigation")
+    assert [e["op"] for e in events] == ["insert", "update"]
+    assert events[1]["subject"] == {"type": "investigation", "id": inv.id}
+    assert change_feed.fetch("case") == []
+
+
+def test_admin_change_feed_endpoint(client):
+    create_user()  # admin
+    for i in range(3):
+        db.session.add(Case(case_number=f"CDC-E{i}"))
+        db.session.commit()
+
+    with client:
+        login(client, "admin", "secret")
+        resp = client.get("/admin/changes/case.jsonl?limit=2")
+        assert resp.status_code == 200
+        lines = resp.get_data(as_text=True).splitlines()
+        assert len(lines) == 2
+        assert resp.headers["X-Change-More"] == "1"
+        cursor = resp.headers["X-Change-Cursor"]
+
+        resp = client.get(f"/admin/changes/case.jsonl?after={cursor}")
+        assert len(resp.get_data(as_text=True).splitlines()) == 1
+        assert resp.headers["X-Change-More"] == "0"
+
+        assert client.get("/admin/changes/bogus.jsonl").status_code == 404
+        assert client.get("/admin/changes/case.jsonl?after=x").status_code == 400
+
+
+def test_admin_change_feed_caps_long_poll(client, monkeypatch):
+    create_user()  # admin
+    waits = []
+    monkeypatch.setattr(
+        change_feed,
+        "wait_for",
+        lambda stream, after, limit, timeout: waits.append(timeout) or [],
+    )
+
+    with client:
+        login(client, "admin", "secret")
+        resp = client.get("/admin/changes/case.jsonl?wait=30")
+        assert resp.status_code == 200
+        assert resp.headers["X-Change-Cursor"] == "0"
+    assert waits == [change_feed.HTTP_MAX_WAIT]
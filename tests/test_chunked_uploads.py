@@ -0,0 +1,172 @@
+import hashlib
+import os
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from app import db
+from app.investigations.models import InvestigationAttachment
+from app.models import Case, ChunkedUpload, UploadBlob, UploadedFile
+from app.paths import ensure_investigation_folder, file_safe_case_number
+from app.services import blob_store, chunked_uploads
+from tests.helpers import create_investigation, create_user, login
+
+CHUNK = 1024
+PAYLOAD = b"%PDF-1.4 " + os.urandom(CHUNK * 2 + 100)
+SHA = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+@pytest.fixture
+def case(client, app):
+    app.config["CHUNKED_UPLOAD_CHUNK_SIZE"] = CHUNK
+    create_user()
+    case = Case(case_number="CH-1")
+    db.session.add(case)
+    db.session.commit()
+    login(client, "admin", "secret")
+    return case
+
+
+def _start(client, url, **overrides):
+    body = {
+        "filename": "scan.pdf",
+        "category": "egyéb",
+        "size": len(PAYLOAD),
+        "sha256": SHA,
+    }
+    body.update(overrides)
+    return client.post(url, json=body)
+
+
+def _put(client, upload_id, offset, data):
+    return client.put(
+        f"/uploads/chunked/{upload_id}?offset={offset}",
+        data=data,
+        content_type="application/octet-stream",
+    )
+
+
+def _send_all(client, upload_id, start=0):
+    for offset in range(start, len(PAYLOAD), CHUNK):
+        resp = _put(client, upload_id, offset, PAYLOAD[offset : offset + CHUNK])
+        assert resp.status_code == 200, resp.get_json()
+
+
+def test_chunked_upload_resumes_and_finalizes_into_case(client, app, case):
+    resp = _start(client, f"/cases/{case.id}/uploads/chunked")
+    assert resp.status_code == 201
+    state = resp.get_json()
+    assert state["chunk_size"] == CHUNK
+    assert state["offset"] == 0
+    upload_id = state["id"]
+
+    assert _put(client, upload_id, 0, PAYLOAD[:CHUNK]).status_code == 200
+    # A retried or skipped chunk is refused with the confirmed offset.
+    resp = _put(client, upload_id, 0, PAYLOAD[:CHUNK])
+    assert resp.status_code == 409
+    assert resp.get_json()["offset"] == CHUNK
+    resp = _put(client, upload_id, 2 * CHUNK, PAYLOAD[2 * CHUNK :])
+    assert resp.status_code == 409
+    # Wrong-sized chunks are refused without moving the offset.
+    assert _put(client, upload_id, CHUNK, b"short").status_code == 400
+    assert client.get(f"/uploads/chunked/{upload_id}").get_json()["offset"] == CHUNK
+
+    _send_all(client, upload_id, start=CHUNK)
+    resp = client.post(f"/uploads/chunked/{upload_id}/finalize")
+    assert resp.status_code == 200
+    assert resp.get_json()["sha256"] == SHA
+
+    record = UploadedFile.query.filter_by(case_id=case.id).one()
+    assert (record.filename, record.sha256, record.size_bytes) == (
+        "scan.pdf",
+        SHA,
+        len(PAYLOAD),
+    )
+    assert db.session.get(UploadBlob, SHA).refcount == 1
+    folder = Path(app.config["UPLOAD_CASES_ROOT"]) / file_safe_case_number("CH-1")
+    assert (folder / "scan.pdf").read_bytes() == PAYLOAD
+    assert os.path.samefile(folder / "scan.pdf", blob_store.blob_path(SHA))
+    assert "scan.pdf" in db.session.get(Case, case.id).uploaded_files
+
+    resp = client.post(f"/uploads/chunked/{upload_id}/finalize")
+    assert resp.status_code == 409
+
+
+def test_checksum_mismatch_restarts_upload(client, case):
+    state = _start(client, f"/cases/{case.id}/uploads/chunked", sha256="0" * 64)
+    upload_id = state.get_json()["id"]
+    _send_all(client, upload_id)
+
+    resp = client.post(f"/uploads/chunked/{upload_id}/finalize")
+    assert resp.status_code == 422
+    assert client.get(f"/uploads/chunked/{upload_id}").get_json()["offset"] == 0
+    assert UploadedFile.query.filter_by(case_id=case.id).count() == 0
+    assert db.session.get(UploadBlob, "0" * 64) is None
+
+
+def test_init_validates_and_checks_permissions(client, app, case):
+    url = f"/cases/{case.id}/uploads/chunked"
+    assert _start(client, url, filename="evil.exe").status_code == 400
+    assert _start(client, url, sha256="nope").status_code == 400
+    assert _start(client, url, category="").status_code == 400
+    app.config["CHUNKED_UPLOAD_MAX_SIZE"] = 10
+    assert _start(client, url).status_code == 413
+    app.config["CHUNKED_UPLOAD_MAX_SIZE"] = None
+
+    upload_id = _start(client, url).get_json()["id"]
+    client.get("/logout")
+    create_user("other", "secret", "admin")
+    login(client, "other", "secret")
+    assert client.get(f"/uploads/chunked/{upload_id}").status_code == 404
+    assert _put(client, upload_id, 0, PAYLOAD[:CHUNK]).status_code == 404
+
+
+def test_chunked_upload_into_investigation(client, case):
+    inv = create_investigation()
+    resp = _start(client, f"/investigations/{inv.id}/uploads/chunked")
+    assert resp.status_code == 201
+    upload_id = resp.get_json()["id"]
+    _send_all(client, upload_id)
+
+    resp = client.post(f"/uploads/chunked/{upload_id}/finalize")
+    assert resp.status_code == 200
+    att = InvestigationAttachment.query.filter_by(investigation_id=inv.id).one()
+    assert att.sha256 == SHA
+    folder = Path(ensure_investigation_folder(inv.case_number))
+    assert (folder / att.filename).read_bytes() == PAYLOAD
+
+
+def test_finalize_rechecks_status_and_permission(client, case):
+    inv = create_investigation()
+    case_id = _start(client, f"/cases/{case.id}/uploads/chunked").get_json()["id"]
+    inv_id = _start(client, f"/investigations/{inv.id}/uploads/chunked").get_json()[
+        "id"
+    ]
+    _send_all(client, case_id)
+    _send_all(client, inv_id)
+
+    case.status = "lezárt"
+    db.session.commit()
+    assert client.post(f"/uploads/chunked/{case_id}/finalize").status_code == 409
+
+    create_user("admin", "secret", "leíró")  # not assigned to the investigation
+    assert client.post(f"/uploads/chunked/{inv_id}/finalize").status_code == 403
+    assert not InvestigationAttachment.query.filter_by(investigation_id=inv.id).all()
+    assert not UploadedFile.query.filter_by(case_id=case.id).all()
+
+
+def test_collect_stale_drops_idle_uploads(client, case):
+    upload_id = _start(client, f"/cases/{case.id}/uploads/chunked").get_json()["id"]
+    _put(client, upload_id, 0, PAYLOAD[:CHUNK])
+    upload = db.session.get(ChunkedUpload, upload_id)
+    partial = chunked_uploads.partial_path(upload)
+    assert partial.stat().st_size == CHUNK
+
+    assert chunked_uploads.collect_stale(timedelta(hours=1)) == 0
+    upload.updated_at = upload.updated_at - timedelta(days=2)
+    db.session.commit()
+    assert chunked_uploads.collect_stale(timedelta(hours=1)) == 1
+    db.session.commit()
+    assert db.session.get(ChunkedUpload, upload_id) is None
+    assert not partial.exists()
@@ -0,0 +1,105 @@
+import hashlib
+import io
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import sqlalchemy as sa
+
+from app import db
+from app.investigations.models import Investigation, InvestigationChangeLog
+from app.models import Case
+from app.paths import file_safe_case_number
+from app.services import cold_storage
+from app.utils.case_status import CASE_STATUS_FINAL
+from tests.helpers import create_investigation, create_user, login
+
+NOW = datetime(2026, 10, 19, 8, 0, tzinfo=timezone.utc)
+OLD = datetime(2024, 3, 1, 9, 0, tzinfo=timezone.utc)
+SCAN = b"%PDF-1.4 " + b"x" * 4096
+NOTES = ("Jegyzőkönyv a boncolásról.\n" * 2000).encode()
+BIG = bytes(range(256)) * 2048  # 512 KiB, over a quarter of a 1 MiB cache
+
+
+def test_closed_case_folder_is_zipped_and_still_downloadable(app, client, tmp_path):
+    app.config["COLD_STORAGE_CACHE_DIR"] = str(tmp_path / "cache")
+    app.config["COLD_STORAGE_CACHE_MAX_MB"] = 1
+    create_user()
+    case = Case(case_number="B:0007/2024")
+    db.session.add(case)
+    db.session.commit()
+    login(client, "admin", "secret")
+    resp = client.post(
+        f"/cases/{case.id}/upload",
+        data={"category": "egyéb", "file": (io.BytesIO(SCAN), "scan.pdf")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 302
+    folder = Path(app.config["UPLOAD_CASES_ROOT"]) / file_safe_case_number(
+        case.case_number
+    )
+    (folder / "notes.txt").write_bytes(NOTES)
+    (folder / "big.bin").write_bytes(BIG)
+    db.session.execute(
+        sa.update(Case.__table__)
+        .where(Case.__table__.c.id == case.id)
+        .values(status="lezárt", updated_at=OLD)
+    )
+    db.session.commit()
+
+    report = cold_storage.run(NOW, months=12)
+    assert report["folders"] == 1 and report["files"] == 3
+    assert report["freed"] == len(NOTES) + len(BIG)  # the scan stays a blob
+    assert 0 < report["reclaimed"] < report["freed"]
+    assert not folder.exists()
+    index = cold_storage.read_index(cold_storage.zip_path(folder))
+    assert {rel: entry["kind"] for rel, entry in index.items()} == {
+        "scan.pdf": "blob",
+        "notes.txt": "zip",
+        "big.bin": "zip",
+    }
+    assert cold_storage.run(NOW, months=12)["folders"] == 0
+
+    base = f"/cases/{case.id}/files"
+    resp = client.get(f"{base}/scan.pdf")
+    assert resp.data == SCAN
+    assert resp.headers["ETag"] == f'"{hashlib.sha256(SCAN).hexdigest()}"'
+    assert "scan.pdf" in resp.headers["Content-Disposition"]
+
+    sha = hashlib.sha256(NOTES).hexdigest()
+    cached = tmp_path / "cache" / sha[:2] / sha
+    resp = client.get(f"{base}/notes.txt")
+    assert resp.data == NOTES and cached.is_file()
+    assert resp.headers["Accept-Ranges"] == "bytes"
+    resp = client.get(f"{base}/notes.txt", headers={"Range": "bytes=0-9"})
+    assert resp.status_code == 206 and resp.data == NOTES[:10]
+
+    resp = client.get(f"{base}/big.bin")
+    assert resp.data == BIG and resp.content_length == len(BIG)
+    assert not (tmp_path / "cache" / hashlib.sha256(BIG).hexdigest()[:2]).exists()
+    etag = resp.headers["ETag"]
+    resp = client.get(f"{base}/big.bin", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert client.get(f"{base}/missing.pdf").status_code == 404
+
+    # A file written after packing is merged in by the next run
+    folder.mkdir()
+    (folder / "late.txt").write_bytes(b"late")
+    assert cold_storage.run(NOW, months=12)["folders"] == 1
+    assert not folder.exists()
+    with zipfile.ZipFile(cold_storage.zip_path(folder)) as zf:
+        assert zf.read("late.txt") == b"late" and zf.read("notes.txt") == NOTES
+    assert client.get(f"{base}/big.bin").data == BIG
+
+
+def test_only_investigations_in_the_final_status_are_due(app):
+    statuses = {"V:0001/2024": "beérkezett", "V:0002/2024": "szignálva"}
+    statuses["V:0003/2024"] = CASE_STATUS_FINAL
+    for number, status in statuses.items():
+        create_investigation(case_number=number, status=status)
+    db.session.execute(sa.update(Investigation).values(registration_time=OLD))
+    db.session.execute(sa.update(InvestigationChangeLog).values(timestamp=OLD))
+    db.session.commit()
+
+    due = [folder.name for folder, _ in cold_storage.due(NOW)]
+    assert due == [file_safe_case_number("V:0003/2024")]
@@ -0,0 +1,74 @@
+import os
+import time
+from datetime import timedelta
+
+import sqlalchemy as sa
+
+from app import db
+from app.models import EmailOutbox
+from app.services import db_maintenance, email_outbox
+
+
+def _churn():
+    """Fill and empty the outbox so the main database has free pages."""
+    email_outbox.enqueue_many(
+        [(f"u{i}@example.com", "s", "x" * 2000) for i in range(300)]
+    )
+    db.session.commit()
+    db.session.execute(sa.delete(EmailOutbox))
+    db.session.commit()
+
+
+def test_first_run_analyzes_and_converts_to_incremental_vacuum(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+        conn.exec_driver_sql("CREATE INDEX ix_t_v ON t (v)")
+        conn.exec_driver_sql(
+            "INSERT INTO t (v) SELECT printf('%.2000c', 'x') FROM "
+            "(WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n "
+            "WHERE i < 300) SELECT i FROM n)"
+        )
+        conn.exec_driver_sql("DELETE FROM t WHERE id > 10")
+
+    assert db_maintenance.maintain(engine) == ["analyze", "optimize"]
+    assert db_maintenance.stats(engine)["auto_vacuum"] == "none"
+    assert db_maintenance.maintain(engine, convert=True) == ["optimize", "vacuum"]
+    stats = db_maintenance.stats(engine)
+    assert (stats["auto_vacuum"], stats["freelist_count"]) == ("incremental", 0)
+    assert stats["analyzed"]
+    assert [i["index"] for i in stats["indexes"]] == ["ix_t_v"]
+    assert stats["indexes"][0]["pages"] and stats["indexes"][0]["stat"]
+    engine.dispose()
+
+
+def test_run_releases_free_pages_of_the_binds(app):
+    db_maintenance.run(convert=True)
+    _churn()
+
+    report = db_maintenance.run(indexes=True)
+    main = report["main"]
+    assert main["steps"][-1] == "incremental_vacuum"
+    assert main["before"]["freelist_count"] > 100
+    assert main["after"]["freelist_count"] == 0
+    assert main["after"]["page_count"] < main["before"]["page_count"]
+    assert {i["table"] for i in main["after"]["indexes"]} >= {"email_outbox"}
+    assert "examination" in report and "temp_files" in report
+
+
+def test_purge_removes_only_old_leaked_temp_files(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(db_maintenance.tempfile, "gettempdir", lambda: str(tmp_path))
+    old = tmp_path / "sanitizedabc.docx"
+    fresh = tmp_path / "sanitizeddef.docx"
+    other = tmp_path / "report.docx"
+    for path in (old, fresh, other):
+        path.write_bytes(b"x" * 10)
+    stale = time.time() - 7 * 3600
+    os.utime(old, (stale, stale))
+    os.utime(other, (stale, stale))
+
+    assert db_maintenance.purge_temp_files(timedelta(hours=6)) == {
+        "files": 1,
+        "bytes": 10,
+    }
+    assert not old.exists() and fresh.exists() and other.exists()
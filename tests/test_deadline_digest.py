@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from app import db
+from app.models import Case, DeadlineDigest, EmailOutbox
+from app.services import deadline_digest, email_outbox
+from app.utils.time_utils import now_utc
+from tests.helpers import create_investigation, create_user
+
+
+def _case(number, days, expert, status="szignálva"):
+    case = Case(
+        case_number=number,
+        expert_1=expert,
+        status=status,
+        deadline=now_utc() + timedelta(days=days),
+    )
+    db.session.add(case)
+    db.session.commit()
+    return case
+
+
+def test_one_digest_per_user_and_day(app):
+    leiro = create_user("digest_leiro", "pw", "leíró", screen_name="Leíró L.")
+    expert = create_user(
+        "digest_exp",
+        "pw",
+        "szakértő",
+        screen_name="Szakértő S.",
+        default_leiro_id=leiro.id,
+    )
+    _case("B:0001/2026", 3, expert.screen_name)
+    _case("B:0002/2026", -2, expert.screen_name)
+    _case("B:0003/2026", 30, expert.screen_name)
+    _case("B:0004/2026", 1, expert.screen_name, status="lezárt")
+    create_investigation(
+        case_number="V:0007/2026",
+        expert1_id=expert.id,
+        deadline=now_utc() + timedelta(days=5),
+    )
+
+    now = now_utc()
+    assert deadline_digest.run(now) == {"queued": 2, "sent": 2}
+
+    mails = {row.recipient: row for row in EmailOutbox.query.all()}
+    assert set(mails) == {"digest_exp", "digest_leiro"}
+    assert all(row.status == email_outbox.STATUS_SENT for row in mails.values())
+    body = mails["digest_exp"].body
+    assert "Kedves Szakértő S.!" in body
+    assert "B:0002/2026 (ügy)" in body.split("napon belül")[0]
+    assert "B:0001/2026" in body and "V:0007/2026 (vizsgálat)" in body
+    assert "B:0003/2026" not in body and "B:0004/2026" not in body
+    assert "1 lejárt, 2 közelgő" in mails["digest_exp"].subject
+    record = DeadlineDigest.query.filter_by(user_id=expert.id).one()
+    assert (record.overdue, record.upcoming) == (1, 2)
+
+    assert deadline_digest.run(now)["queued"] == 0
+    assert deadline_digest.queue_digests(now + timedelta(days=1)) == 2
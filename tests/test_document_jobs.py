@@ -0,0 +1,198 @@
+import os
+import time
+from datetime import timedelta
+
+import pytest
+from docx import Document
+
+from app import db
+from app.investigations.models import InvestigationAttachment
+from app.models import DocumentJob
+from app.paths import ensure_investigation_folder
+from app.services import document_jobs
+from app.utils.time_utils import now_utc
+from tests.helpers import (
+    create_investigation_with_default_leiro,
+    create_user,
+    login_follow,
+)
+
+FORM = {
+    "cimzett_szerv": "ORFK",
+    "titulus_szerv": "Osztályvezető",
+    "actor": "N. N.",
+    "titulus": "dr.",
+    "sum": "250 000 Ft",
+}
+
+
+@pytest.fixture
+def queued(app, client, tmp_path):
+    app.config["DOCUMENT_JOBS_EAGER"] = False
+    app.config["UPLOAD_INVESTIGATIONS_ROOT"] = str(tmp_path / "inv")
+    app.config["INVESTIGATION_UPLOAD_FOLDER"] = str(tmp_path / "inv")
+    inv, leiro, _ = create_investigation_with_default_leiro()
+    template_dir = ensure_investigation_folder(inv.case_number) / "DO-NOT-EDIT"
+    template_dir.mkdir(parents=True, exist_ok=True)
+    doc = Document()
+    doc.add_paragraph("Titulus: {{titulus}}")
+    doc.save(str(template_dir / "tajekoztatas_arajanlat.docx"))
+    login_follow(client, leiro.username, "secret")
+    return inv, leiro, f"/investigations/{inv.id}/leiro/tajekoztatas_arajanlat"
+
+
+def test_route_enqueues_and_worker_renders(client, queued):
+    inv, leiro, url = queued
+    resp = client.post(url, data=FORM)
+
+    job = DocumentJob.query.one()
+    assert resp.status_code == 302
+    assert resp.headers["Location"].endswith(f"/jobs/{job.id}")
+    assert job.status == document_jobs.STATUS_QUEUED
+    assert not InvestigationAttachment.query.filter_by(investigation_id=inv.id).all()
+    assert client.get(f"/jobs/{job.id}?format=json").json["status"] == "queued"
+    assert "folyamatban" in client.get(f"/jobs/{job.id}").get_data(as_text=True)
+
+    assert document_jobs.run_worker(processes=0, once=True) == 1
+
+    state = client.get(f"/jobs/{job.id}?format=json").json
+    att = InvestigationAttachment.query.filter_by(investigation_id=inv.id).one()
+    assert state["status"] == "done"
+    assert state["redirect"].endswith(f"generated_id={att.id}")
+    assert att.uploaded_by == leiro.id
+    assert att.category == "generated"
+
+
+def test_repeated_submit_returns_the_same_job(client, queued):
+    _, _, url = queued
+    first = client.post(url, data=FORM)
+    second = client.post(url, data=FORM)
+
+    assert DocumentJob.query.count() == 1
+    assert second.headers["Location"] == first.headers["Location"]
+
+    document_jobs.run_worker(processes=0, once=True)
+    third = client.post(url, data=FORM)
+    assert DocumentJob.query.count() == 1
+    assert "generated_id=" in third.headers["Location"]
+
+
+def test_json_clients_get_202_with_status_url(client, queued):
+    _, _, url = queued
+    resp = client.post(url, data=FORM, headers={"Accept": "application/json"})
+
+    assert resp.status_code == 202
+    assert resp.json["status"] == "queued"
+    assert resp.headers["Location"].endswith(f"/jobs/{resp.json['id']}")
+
+
+def test_failed_render_is_reported_and_can_be_resubmitted(client, queued, monkeypatch):
+    _, _, url = queued
+
+    def broken(payload):
+        raise RuntimeError("template is broken")
+
+    monkeypatch.setitem(document_jobs.RENDERERS, "docx", broken)
+    client.post(url, data=FORM)
+    document_jobs.run_worker(processes=0, once=True)
+
+    job = DocumentJob.query.one()
+    assert job.status == document_jobs.STATUS_FAILED
+    state = client.get(f"/jobs/{job.id}?format=json").json
+    assert "template is broken" in state["error"]
+
+    client.post(url, data=FORM)
+    assert DocumentJob.query.count() == 2
+
+
+def test_stale_running_jobs_are_requeued(app, client, queued):
+    _, _, url = queued
+    client.post(url, data=FORM)
+    job = DocumentJob.query.one()
+    document_jobs.claim(1, "crashed-worker")
+    timeout = app.config["DOCUMENT_JOB_TIMEOUT"]
+    job.started_at = now_utc() - timedelta(seconds=timeout + 1)
+    db.session.commit()
+
+    assert document_jobs.requeue_stale() == 1
+    assert job.status == document_jobs.STATUS_QUEUED
+    assert document_jobs.run_worker(processes=0, once=True) == 1
+    assert job.status == document_jobs.STATUS_DONE
+    assert job.attempts == 2
+
+
+def test_render_outliving_the_timeout_is_not_finished_twice(
+    app, client, queued, monkeypatch
+):
+    inv, _, url = queued
+    client.post(url, data=FORM)
+    job = DocumentJob.query.one()
+    timeout = app.config["DOCUMENT_JOB_TIMEOUT"]
+    render = document_jobs.render
+
+    def slow_render(payload):
+        render(payload)
+        job.started_at = now_utc() - timedelta(seconds=timeout + 1)
+        db.session.commit()
+        # The rendering worker's own pass leaves the job alone ...
+        assert document_jobs.requeue_stale(job.worker) == 0
+        # ... another worker's pass re-queues it and claims it.
+        assert document_jobs.requeue_stale("other-worker") == 1
+        assert document_jobs.claim(1, "other-worker") == [job]
+
+    monkeypatch.setattr(document_jobs, "render", slow_render)
+    document_jobs.run_worker(processes=0, once=True)
+
+    assert job.status == document_jobs.STATUS_RUNNING
+    assert job.worker == "other-worker"
+    assert not InvestigationAttachment.query.filter_by(investigation_id=inv.id).all()
+
+
+def _hang(payload):
+    time.sleep(60)
+
+
+def test_hung_pool_render_times_out_and_is_retried(app, client, queued, monkeypatch):
+    _, _, url = queued
+    client.post(url, data=FORM)
+    job = DocumentJob.query.one()
+    job.payload = {**job.payload, "renderer": "hang"}
+    db.session.commit()
+    monkeypatch.setitem(document_jobs.RENDERERS, "hang", _hang)
+    app.config.update(DOCUMENT_JOB_TIMEOUT=1, DOCUMENT_JOB_MAX_ATTEMPTS=2)
+
+    started = time.monotonic()
+    document_jobs.run_worker(processes=1, once=True, poll_interval=0.1)
+
+    db.session.refresh(job)
+    assert time.monotonic() - started < 30
+    assert job.status == document_jobs.STATUS_FAILED
+    assert job.attempts == 2
+    assert "timed out" in job.error
+
+
+def test_other_users_cannot_see_a_job(client, queued):
+    _, _, url = queued
+    client.post(url, data=FORM)
+    job = DocumentJob.query.one()
+    create_user("masik", "secret", "leíró")
+    login_follow(client, "masik", "secret")
+    assert client.get(f"/jobs/{job.id}").status_code == 404
+
+
+def test_plain_render_replaces_a_hardlinked_output(tmp_path):
+    template = tmp_path / "template.docx"
+    doc = Document()
+    doc.add_paragraph("Titulus: {{ titulus }}")
+    doc.save(str(template))
+    blob = tmp_path / "blob"
+    blob.write_bytes(b"stored upload")
+    output = tmp_path / "out.docx"
+    os.link(blob, output)
+
+    document_jobs.render_plain_docx(
+        {"template": str(template), "output": str(output), "context": FORM}
+    )
+
+    assert blob.read_bytes() == b"stored upload"
+    assert "dr." in Document(str(output)).paragraphs[0].text
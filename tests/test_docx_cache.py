@@ -0,0 +1,95 @@
+import os
+
+import pytest
+from docx import Document
+
+from app.investigations import routes as inv_routes
+from app.services import docx_cache
+
+
+@pytest.fixture
+def template(app, tmp_path, monkeypatch):
+    app.config["DOCX_CACHE_ROOT"] = str(tmp_path / "cache")
+    docx_cache.clear()
+    path = tmp_path / "ertesites.docx"
+    doc = Document()
+    doc.add_paragraph("Ügyszám: {{ ugyszam }}")
+    doc.save(str(path))
+
+    calls = []
+    original = inv_routes._sanitize_docx_placeholders
+
+    def counting(p):
+        calls.append(p)
+        return original(p)
+
+    monkeypatch.setattr(inv_routes, "_sanitize_docx_placeholders", counting)
+    yield path, calls
+    docx_cache.clear()
+
+
+def _render(path, out, value="V-1"):
+    inv_routes._render_docx_template(path, out, {"ugyszam": value})
+    return Document(str(out)).paragraphs[0].text
+
+
+def test_repeat_renders_sanitize_once(template, tmp_path):
+    path, calls = template
+    assert _render(path, tmp_path / "a.docx", "V-1") == "Ügyszám: V-1"
+    assert _render(path, tmp_path / "b.docx", "V-2") == "Ügyszám: V-2"
+
+    assert len(calls) == 1
+    stats = docx_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["entries"] == 1
+
+
+def test_changed_template_is_resanitized(template, tmp_path):
+    path, calls = template
+    _render(path, tmp_path / "a.docx")
+
+    doc = Document(str(path))
+    doc.paragraphs[0].text = "Szám: {{ ugyszam }}"
+    doc.save(str(path))
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    assert _render(path, tmp_path / "b.docx", "V-3") == "Szám: V-3"
+    assert len(calls) == 2
+
+
+def test_disk_cache_survives_memory_clear(template, tmp_path):
+    path, calls = template
+    _render(path, tmp_path / "a.docx")
+    docx_cache.clear()
+
+    assert _render(path, tmp_path / "b.docx", "V-4") == "Ügyszám: V-4"
+    assert len(calls) == 1
+    assert docx_cache.stats()["disk_hits"] == 1
+
+
+def test_memory_budget_evicts_oldest(app, template, tmp_path):
+    path, _ = template
+    other = tmp_path / "other.docx"
+    doc = Document()
+    doc.add_paragraph("Másik: {{ ugyszam }}")
+    doc.save(str(other))
+    app.config["DOCX_CACHE_MAX_BYTES"] = path.stat().st_size + 1
+
+    _render(path, tmp_path / "a.docx")
+    _render(other, tmp_path / "b.docx")
+
+    stats = docx_cache.stats()
+    assert stats["entries"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_digest_memo_is_bounded(template, tmp_path, monkeypatch):
+    monkeypatch.setattr(docx_cache, "MAX_DIGESTS", 2)
+    for n in range(4):
+        path = tmp_path / f"t{n}.docx"
+        path.write_bytes(b"template %d" % n)
+        docx_cache.digest(path)
+
+    assert len(docx_cache._digests) == 2
@@ -76,3 +76,40 @@ def test_sanitize_docx_placeholders_returns_tempfile_with_normalized_content():
         assert "{{jkvvezeto}}" in data
     sanitized_path.unlink()
     docx_path.unlink()
+
+
+def test_normalize_xml_placeholders_repairs_split_delimiters():
+    xml = (
+        b"<w:p><w:r><w:t>{</w:t></w:r><w:r><w:t>{vizsg</w:t></w:r>"
+        b"<w:r><w:t>_d\xc3\xa1tum}</w:t></w:r>\n<w:r><w:t>}</w:t></w:r></w:p>"
+        b"<w:p><w:r><w:t>{% if x %}{{ nyitott</w:t></w:r></w:p>"
+    )
+    output, changed = _normalize_xml_placeholders(xml)
+    assert changed is True
+    assert b"<w:t>{{vizsg_datum}}</w:t>" in output
+    assert b"{% if x %}{{ nyitott" in output
+
+
+def test_normalize_xml_placeholders_bounds_block_and_comment_tokens():
+    filler = b"x" * 5000
+    xml = (
+        b"<w:t>{% " + filler + b" {{a b}} " + filler + b" %} {# " + filler + b"#}</w:t>"
+    )
+    output, changed = _normalize_xml_placeholders(xml)
+    assert changed is True
+    assert b"{{ab}}" in output
+
+
+def test_sanitize_docx_placeholders_keeps_compression_and_unchanged_bytes():
+    docx_path = _make_fake_docx(BROKEN_XML)
+    with zipfile.ZipFile(docx_path, "a") as z:
+        z.writestr("word/media/image1.png", b"\x89PNG" * 64, zipfile.ZIP_STORED)
+    sanitized_path = _sanitize_docx_placeholders(docx_path)
+    with zipfile.ZipFile(sanitized_path, "r") as z:
+        assert z.getinfo("word/media/image1.png").compress_type == zipfile.ZIP_STORED
+        assert z.getinfo("word/document.xml").compress_type == zipfile.ZIP_DEFLATED
+
+    again = _sanitize_docx_placeholders(sanitized_path)
+    assert again.read_bytes() == sanitized_path.read_bytes()
+    for path in (again, sanitized_path, docx_path):
+        path.unlink()
@@ -0,0 +1,122 @@
+import hashlib
+import io
+from pathlib import Path
+
+import pytest
+
+from app import db
+from app.models import Case
+from app.paths import file_safe_case_number
+from tests.helpers import create_investigation, create_user, login
+
+PAYLOAD = b"%PDF-1.4 " + b"x" * 4096
+SHA = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+@pytest.fixture
+def uploaded(client, app):
+    create_user()
+    case = Case(case_number="DL-1")
+    db.session.add(case)
+    db.session.commit()
+    login(client, "admin", "secret")
+    resp = client.post(
+        f"/cases/{case.id}/upload",
+        data={"category": "egyéb", "file": (io.BytesIO(PAYLOAD), "scan.pdf")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 302
+    return case
+
+
+def _url(case):
+    return f"/cases/{case.id}/files/scan.pdf"
+
+
+def test_direct_download_supports_range_and_revalidation(client, uploaded):
+    resp = client.get(_url(uploaded))
+    assert resp.status_code == 200
+    assert resp.data == PAYLOAD
+    assert resp.headers["ETag"] == f'"{SHA}"'
+    assert resp.headers["Accept-Ranges"] == "bytes"
+    assert resp.headers["Cache-Control"].startswith("no-store")
+
+    resp = client.get(_url(uploaded), headers={"Range": "bytes=0-7"})
+    assert resp.status_code == 206
+    assert resp.data == PAYLOAD[:8]
+    assert resp.headers["Content-Range"] == f"bytes 0-7/{len(PAYLOAD)}"
+
+    resp = client.get(
+        _url(uploaded), headers={"Range": "bytes=0-7", "If-Range": '"stale"'}
+    )
+    assert resp.status_code == 200
+    assert resp.data == PAYLOAD
+
+    resp = client.get(_url(uploaded), headers={"If-None-Match": f'"{SHA}"'})
+    assert resp.status_code == 304
+
+
+def test_download_cache_control_is_opt_in(client, app, uploaded):
+    app.config["DOWNLOAD_CACHE_CONTROL"] = "private, no-cache"
+    resp = client.get(_url(uploaded))
+    assert resp.headers["Cache-Control"] == "private, no-cache"
+    assert "Pragma" not in resp.headers
+
+
+def test_x_accel_redirect_offloads_after_permission_check(client, app, uploaded):
+    app.config["DOWNLOAD_OFFLOAD"] = "x-accel"
+    resp = client.get(_url(uploaded))
+    assert resp.status_code == 200
+    assert resp.data == b""
+    cases_dir = Path(app.config["UPLOAD_CASES_ROOT"]).name
+    safe = file_safe_case_number(uploaded.case_number)
+    assert resp.headers["X-Accel-Redirect"] == (
+        f"/_protected/{cases_dir}/{safe}/scan.pdf"
+    )
+    assert "X-Sendfile" not in resp.headers
+    assert resp.headers["ETag"] == f'"{SHA}"'
+    assert "attachment" in resp.headers["Content-Disposition"]
+
+    resp = client.get(_url(uploaded), headers={"If-None-Match": f'"{SHA}"'})
+    assert resp.status_code == 304
+    assert "X-Accel-Redirect" not in resp.headers
+
+    client.get("/logout")
+    create_user("penz", "secret", "pénzügy")
+    login(client, "penz", "secret")
+    resp = client.get(_url(uploaded))
+    assert resp.status_code in (302, 403)
+    assert "X-Accel-Redirect" not in resp.headers
+
+
+def test_x_accel_falls_back_outside_mapped_root(client, app, tmp_path, uploaded):
+    app.config["DOWNLOAD_OFFLOAD"] = "x-accel"
+    app.config["DOWNLOAD_ACCEL_ROOT"] = str(tmp_path / "elsewhere")
+    resp = client.get(_url(uploaded))
+    assert "X-Accel-Redirect" not in resp.headers
+    assert resp.data == PAYLOAD
+
+
+def test_x_sendfile_mode(client, app, uploaded):
+    app.config["DOWNLOAD_OFFLOAD"] = "x-sendfile"
+    resp = client.get(_url(uploaded))
+    assert resp.status_code == 200
+    assert Path(resp.headers["X-Sendfile"]).read_bytes() == PAYLOAD
+
+
+def test_investigation_download_offload(client, app):
+    create_user()
+    inv = create_investigation()
+    login(client, "admin", "secret")
+    client.post(
+        f"/investigations/{inv.id}/upload",
+        data={"category": "végzés", "file": (io.BytesIO(PAYLOAD), "doc.pdf")},
+        content_type="multipart/form-data",
+    )
+    from app.investigations.models import InvestigationAttachment
+
+    att = InvestigationAttachment.query.filter_by(investigation_id=inv.id).one()
+    app.config["DOWNLOAD_OFFLOAD"] = "x-accel"
+    resp = client.get(f"/investigations/{inv.id}/download/{att.id}")
+    assert resp.status_code == 200
+    assert resp.headers["X-Accel-Redirect"].endswith(f"/{att.filename}")
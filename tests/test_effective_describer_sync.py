@@ -0,0 +1,122 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Case, ChangeLog, User
+from app.services.describer_sync import recompute_all
+from app.services.work_items import ROLE_DESCRIBER, SUBJECT_CASE, inbox_page
+from tests.helpers import create_investigation, create_user
+
+
+def make_case(case_number: str, **kwargs) -> Case:
+    case = Case(case_number=case_number, **kwargs)
+    db.session.add(case)
+    db.session.commit()
+    return case
+
+
+def test_case_explicit_describer_matches_case_insensitively(app):
+    leiro = create_user("leiro1", "pw", role="leíró", screen_name="Leiro One")
+    case = make_case("S-001", describer="  leiro one ")
+    assert case.effective_describer_id == leiro.id
+
+    case.describer = "Nobody"
+    db.session.commit()
+    assert case.effective_describer_id is None
+
+
+def test_case_falls_back_to_first_expert_with_default_leiro(app):
+    leiro = create_user("leiro1", "pw", role="leíró")
+    create_user("szak1", "pw", role="szakértő", screen_name="Szak One")
+    create_user(
+        "szak2",
+        "pw",
+        role="szakértő",
+        screen_name="Szak Two",
+        default_leiro_id=leiro.id,
+    )
+    case = make_case("S-002", expert_1="Szak One", expert_2="szak two")
+    assert case.effective_describer_id == leiro.id
+
+
+def test_user_changes_resync_dependent_rows(app):
+    leiro_a = create_user("leiroA", "pw", role="leíró")
+    leiro_b = create_user("leiroB", "pw", role="leíró")
+    expert = create_user(
+        "szak1",
+        "pw",
+        role="szakértő",
+        screen_name="Szak One",
+        default_leiro_id=leiro_a.id,
+    )
+    case = make_case("S-003", expert_1="Szak One")
+    inv = create_investigation(expert1_id=expert.id)
+    assert case.effective_describer_id == leiro_a.id
+    assert inv.effective_describer_id == leiro_a.id
+    stamp = case.updated_at.replace(tzinfo=None)
+
+    expert.default_leiro_id = leiro_b.id
+    db.session.commit()
+
+    db.session.expire_all()
+    assert db.session.get(Case, case.id).effective_describer_id == leiro_b.id
+    assert db.session.get(type(inv), inv.id).effective_describer_id == leiro_b.id
+    assert db.session.get(Case, case.id).updated_at.replace(tzinfo=None) == stamp
+
+
+def test_renamed_user_gains_explicit_cases(app):
+    leiro = create_user("leiro1", "pw", role="leíró", screen_name="Old Name")
+    case = make_case("S-004", describer="New Name")
+    assert case.effective_describer_id is None
+
+    leiro.screen_name = "New Name"
+    db.session.commit()
+
+    db.session.expire_all()
+    assert db.session.get(Case, case.id).effective_describer_id == leiro.id
+
+
+def test_materialized_column_is_not_audited(app):
+    leiro = create_user("leiro1", "pw", role="leíró")
+    case = make_case("S-005", describer="leiro1")
+    fields = {row.field_name for row in ChangeLog.query.filter_by(case_id=case.id)}
+    assert case.effective_describer_id == leiro.id
+    assert "effective_describer_id" not in fields
+
+
+def test_recompute_all_repairs_stale_rows(app):
+    leiro = create_user("leiro1", "pw", role="leíró")
+    case = make_case("S-006", describer="leiro1")
+    table = Case.__table__
+    db.session.execute(
+        table.update().where(table.c.id == case.id).values(effective_describer_id=None)
+    )
+    db.session.commit()
+
+    assert recompute_all(db.session) == {"cases": 1, "investigations": 0}
+    db.session.commit()
+    db.session.expire_all()
+    assert db.session.get(Case, case.id).effective_describer_id == leiro.id
+
+
+def test_failed_flush_drops_pending_user_resync(app):
+    create_user("szak1", "pw", role="szakértő")
+    db.session.add(User(username="szak1", password_hash="x", role="szakértő"))
+    with pytest.raises(IntegrityError):
+        db.session.flush()
+    db.session.rollback()
+
+    assert "describer_sync_users" not in db.session.info
+
+
+def test_leiro_inbox_lists_cases_of_either_experts_default_leiro(app):
+    leiro_a = create_user("leiroA", "pw", role="leíró")
+    leiro_b = create_user("leiroB", "pw", role="leíró")
+    create_user("szak1", "pw", role="szakértő", default_leiro_id=leiro_a.id)
+    create_user("szak2", "pw", role="szakértő", default_leiro_id=leiro_b.id)
+    case = make_case("S-010", expert_1="szak1", expert_2="szak2")
+
+    assert case.effective_describer_id == leiro_a.id
+    for leiro in (leiro_a, leiro_b):
+        _, cases = inbox_page(leiro.id, ROLE_DESCRIBER, SUBJECT_CASE)
+        assert [c.id for c in cases] == [case.id]
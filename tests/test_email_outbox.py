@@ -0,0 +1,141 @@
+import socketserver
+import threading
+from datetime import timedelta
+
+import pytest
+
+from app import db, mail
+from app.models import Case, EmailOutbox
+from app.services import email_outbox
+from app.utils.time_utils import now_local, now_utc, to_budapest
+from tests.helpers import create_user, login
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib.sendmail."""
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.wfile.write(b"220 localhost stand-in\r\n")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            verb = line.split(" ", 1)[0].upper()
+            if verb == "RCPT":
+                rcpt = line.split(":", 1)[1].strip("<> ")
+                reply = server.replies.get(rcpt, "250 ok")
+                if reply.startswith("250"):
+                    recipients.append(rcpt)
+                self.wfile.write(reply.encode() + b"\r\n")
+            elif verb == "DATA":
+                self.wfile.write(b"354 go ahead\r\n")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                server.delivered.extend(recipients)
+                recipients = []
+                self.wfile.write(b"250 queued\r\n")
+            elif verb == "QUIT":
+                self.wfile.write(b"221 bye\r\n")
+                return
+            else:  # EHLO, HELO, MAIL, RSET, NOOP
+                recipients = [] if verb == "RSET" else recipients
+                self.wfile.write(b"250 ok\r\n")
+
+
+@pytest.fixture
+def smtp(app):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPHandler)
+    server.daemon_threads = True
+    server.connections, server.delivered, server.replies = 0, [], {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config.update(
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=server.server_address[1],
+        MAIL_USE_TLS=False,
+        MAIL_USE_SSL=False,
+        MAIL_USERNAME=None,
+        MAIL_SUPPRESS_SEND=False,
+        EMAIL_RETRY_BASE_SECONDS=60,
+        EMAIL_MAX_ATTEMPTS=2,
+    )
+    mail.init_app(app)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _due_again():
+    EmailOutbox.query.update({"next_attempt_at": now_utc() - timedelta(seconds=1)})
+    db.session.commit()
+
+
+def test_assignment_queues_email_and_sender_reuses_one_connection(client, smtp):
+    create_user("szig", "pw", "szignáló")
+    create_user("exp", "pw", "szakértő")
+    case = Case(case_number="C200", registration_time=now_local())
+    db.session.add(case)
+    db.session.commit()
+    login(client, "szig", "pw")
+
+    resp = client.post(
+        f"/szignal_cases/{case.id}/assign",
+        data={"action": "assign", "expert_1": "exp", "expert_2": ""},
+    )
+
+    assert resp.status_code == 302
+    assert smtp.connections == 0
+    row = EmailOutbox.query.one()
+    assert (row.recipient, row.status) == ("exp", email_outbox.STATUS_QUEUED)
+
+    email_outbox.enqueue("Teszt", ["a@example.com", "b@example.com"], "x")
+    db.session.commit()
+    assert email_outbox.drain() == {"sent": 3, "retry": 0, "dead": 0, "postponed": 0}
+    assert smtp.connections == 1
+    assert sorted(smtp.delivered) == ["a@example.com", "b@example.com", "exp"]
+    assert email_outbox.stats()[email_outbox.STATUS_SENT] == 3
+
+
+def test_failures_back_off_and_end_in_dead_letter(smtp):
+    smtp.replies["busy@example.com"] = "451 try later"
+    smtp.replies["gone@example.com"] = "550 no such user"
+    email_outbox.enqueue("Teszt", ["busy@example.com", "gone@example.com"], "x")
+    db.session.commit()
+
+    assert email_outbox.drain()["retry"] == 1
+    busy = EmailOutbox.query.filter_by(recipient="busy@example.com").one()
+    gone = EmailOutbox.query.filter_by(recipient="gone@example.com").one()
+    assert gone.status == email_outbox.STATUS_DEAD
+    assert busy.status == email_outbox.STATUS_QUEUED
+    assert to_budapest(busy.next_attempt_at) > now_utc() + timedelta(seconds=50)
+    assert email_outbox.drain() == {"sent": 0, "retry": 0, "dead": 0, "postponed": 0}
+
+    _due_again()
+    assert email_outbox.drain()["dead"] == 1
+    assert email_outbox.stats()[email_outbox.STATUS_DEAD] == 2
+
+    del smtp.replies["busy@example.com"]
+    assert email_outbox.requeue_dead([busy.id]) == 1
+    assert email_outbox.drain()["sent"] == 1
+    assert smtp.delivered == ["busy@example.com"]
+
+
+def test_rate_limit_postpones_and_unreachable_server_retries(app, smtp):
+    app.config["EMAIL_RATE_LIMIT"] = 2
+    email_outbox.enqueue("1", ["exp@example.com"], "x")
+    email_outbox.enqueue("2", ["exp@example.com"], "x")
+    email_outbox.enqueue("3", ["exp@example.com"], "x")
+    db.session.commit()
+
+    assert email_outbox.drain() == {"sent": 2, "retry": 0, "dead": 0, "postponed": 1}
+    assert email_outbox.run_worker(once=True) == 0
+
+    app.config["EMAIL_RATE_LIMIT"] = 10
+    app.config["MAIL_PORT"] = 1
+    mail.init_app(app)
+    _due_again()
+    assert email_outbox.drain()["retry"] == 1
+    row = EmailOutbox.query.filter_by(status=email_outbox.STATUS_QUEUED).one()
+    assert row.attempts == 1 and row.last_error
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Case, CaseHistorySnapshot, ChangeLog
+from app.services.history import (
+    build_all_checkpoints,
+    compress_state,
+    decompress_state,
+    reconstruct,
+)
+from tests.helpers import create_investigation, create_user, login
+
+
+def _wall_clock():
+    # Change-log timestamps use the real clock; ``now_utc`` is frozen in tests.
+    return datetime.now(timezone.utc)
+
+
+def _edit_case(case, n):
+    for i in range(n):
+        case.deceased_name = f"Név {i}"
+        db.session.commit()
+
+
+def test_state_round_trips_through_compression():
+    state = {"status": "szignálva", "notes": None}
+    assert decompress_state(compress_state(state)) == state
+
+
+def test_reconstruct_returns_state_as_of_timestamp(app):
+    case = Case(case_number="TT-1", status="beérkezett", deceased_name="Első")
+    db.session.add(case)
+    db.session.commit()
+    before_edit = _wall_clock()
+    # Keep timestamps strictly ordered relative to the cut-off.
+    ChangeLog.query.filter_by(case_id=case.id).update(
+        {"timestamp": before_edit - timedelta(seconds=1)}
+    )
+    db.session.commit()
+
+    case.status = "szignálva"
+    case.deceased_name = "Második"
+    db.session.commit()
+
+    past = reconstruct("case", case.id, before_edit)
+    assert past.state["status"] == "beérkezett"
+    assert past.state["deceased_name"] == "Első"
+
+    present = reconstruct("case", case.id, _wall_clock() + timedelta(seconds=1))
+    assert present.state["status"] == "szignálva"
+    assert present.state["deceased_name"] == "Második"
+
+    assert not reconstruct("case", case.id, before_edit - timedelta(days=1)).exists
+
+
+def test_listener_checkpoints_every_n_changes(app):
+    app.config["HISTORY_SNAPSHOT_EVERY"] = 5
+    case = Case(case_number="TT-2")
+    db.session.add(case)
+    db.session.commit()
+    CaseHistorySnapshot.query.delete()
+    db.session.commit()
+
+    _edit_case(case, 12)
+
+    snapshots = CaseHistorySnapshot.query.filter_by(subject_id=case.id).all()
+    assert snapshots
+    result = reconstruct("case", case.id, _wall_clock() + timedelta(seconds=1))
+    assert result.checkpoint_id is not None
+    assert result.replayed < 5
+    assert result.state["deceased_name"] == "Név 11"
+
+
+def test_build_all_checkpoints_backfills_existing_history(app):
+    app.config["HISTORY_SNAPSHOT_EVERY"] = 10_000
+    case = Case(case_number="TT-3")
+    db.session.add(case)
+    db.session.commit()
+    _edit_case(case, 6)
+    assert CaseHistorySnapshot.query.filter_by(subject_id=case.id).count() == 0
+
+    counts = build_all_checkpoints("case", every=3)
+    db.session.commit()
+    assert counts["snapshots"] >= 2
+
+    result = reconstruct("case", case.id, _wall_clock() + timedelta(seconds=1))
+    assert result.replayed < 3
+    assert result.state["deceased_name"] == "Név 5"
+
+
+def test_failed_flush_drops_pending_checkpoints(app):
+    db.session.add(Case(case_number="H-900"))
+    db.session.commit()
+
+    db.session.add(Case(case_number="H-900"))
+    with pytest.raises(IntegrityError):
+        db.session.flush()
+    db.session.rollback()
+
+    assert "history_checkpoint_pending" not in db.session.info
+
+
+def test_investigation_history_and_admin_views(client, app):
+    create_user()  # admin
+    inv = create_investigation(status="beérkezett")
+    inv.status = "szignálva"
+    db.session.commit()
+
+    with client:
+        login(client, "admin", "secret")
+        resp = client.get(f"/admin/history/investigation/{inv.id}.json")
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert data["state"]["status"] == "szignálva"
+
+        page = client.get(f"/admin/history/investigation/{inv.id}")
+        assert page.status_code == 200
+        assert "szignálva" in page.get_data(as_text=True)
+
+        assert client.get(f"/admin/history/bogus/{inv.id}").status_code == 404
+        bad = client.get("/admin/history/case/1.json?at=not-a-date")
+        assert bad.status_code == 400
@@ -53,7 +53,6 @@ def test_assign_pathologist_idempotent_same_assignment(client, app, monkeypatch)
         case = _create_case()
         version = case.updated_at.isoformat()
         cid = case.id
-    monkeypatch.setattr("app.views.auth.send_email", lambda *a, **k: None)
     login(client, "szig", "pw")
     form = {
         "action": "assign",
@@ -0,0 +1,108 @@
+import io
+
+import pytest
+
+from app import db
+from app.models import Case, UploadedFile
+from app.services import cold_storage, reconcile
+from tests.helpers import create_user, login
+
+SCAN = b"%PDF-1.4 " + b"s" * 2048
+NOTES = b"%PDF-1.4 " + b"n" * 1024
+FOLDERS = {"B-0001-2026", "B-0099-2020"}
+
+
+def _findings(report):
+    return {
+        (f["kind"], f["folder"], f["file"])
+        for f in report["findings"]
+        if f["folder"] in FOLDERS
+    }
+
+
+@pytest.fixture
+def cases_root(app, client, tmp_path):
+    root = tmp_path / "cases"
+    app.config.update(
+        UPLOAD_CASES_ROOT=str(root),
+        CASE_UPLOAD_FOLDER=str(root),
+        UPLOAD_INVESTIGATIONS_ROOT=str(tmp_path / "inv"),
+        INVESTIGATION_UPLOAD_FOLDER=str(tmp_path / "inv"),
+        BLOB_STORE_ROOT=str(tmp_path / "blobs"),
+        RECONCILE_MANIFEST=str(tmp_path / "manifest.json"),
+        RECONCILE_QUARANTINE=str(tmp_path / "quarantine"),
+    )
+    create_user()
+    case = Case(case_number="B:0001/2026")
+    db.session.add(case)
+    db.session.commit()
+    login(client, "admin", "secret")
+    for name, data in (("scan.pdf", SCAN), ("notes.pdf", NOTES)):
+        resp = client.post(
+            f"/cases/{case.id}/upload",
+            data={"category": "egyéb", "file": (io.BytesIO(data), name)},
+            content_type="multipart/form-data",
+        )
+        assert resp.status_code == 302
+    return root
+
+
+def test_reconcile_reports_and_repairs_upload_drift(cases_root):
+    folder = cases_root / "B-0001-2026"
+    (folder / "notes.pdf").unlink()
+    scan = folder / "scan.pdf"
+    scan.unlink()  # break the blob link, then overwrite with the same size
+    scan.write_bytes(SCAN.replace(b"s", b"x"))
+    (folder / "stray.txt").write_text("?")
+    (cases_root / "B-0099-2020").mkdir()  # left behind by a deleted case
+
+    report = reconcile.run()
+    assert _findings(report) == {
+        ("missing", "B-0001-2026", "notes.pdf"),
+        ("untracked", "B-0001-2026", "stray.txt"),
+        ("orphan", "B-0099-2020", None),
+    }
+
+    report = reconcile.run(hash_files=True)
+    assert ("changed", "B-0001-2026", "scan.pdf") in _findings(report)
+    assert report["listed"] == 0 and report["reused"] == 2
+    assert report["hashed"] == 1
+
+    report = reconcile.run(hash_files=True, repair=True)
+    assert {r["action"] for r in report["repairs"]} == {"relinked", "quarantined"}
+    assert (folder / "notes.pdf").read_bytes() == NOTES
+    assert scan.read_bytes() == SCAN
+    assert not (cases_root / "B-0099-2020").exists()
+    kept = [r["kept"] for r in report["repairs"] if "kept" in r]
+    assert len(kept) == 1 and b"x" in open(kept[0], "rb").read()
+
+    report = reconcile.run(hash_files=True)
+    assert _findings(report) == {("untracked", "B-0001-2026", "stray.txt")}
+    assert report["listed"] >= 1  # the repaired folder changed
+
+
+def test_overwritten_blob_is_reported_unrepairable(cases_root):
+    scan = cases_root / "B-0001-2026" / "scan.pdf"
+    scan.write_bytes(SCAN.replace(b"s", b"x"))  # through the blob's hard link
+
+    report = reconcile.run(hash_files=True, repair=True)
+    assert ("changed", "B-0001-2026", "scan.pdf") in _findings(report)
+    assert [r["action"] for r in report["repairs"]] == ["unrepairable"]
+    assert b"x" in scan.read_bytes()  # left in place, nothing to relink from
+
+
+def test_changed_cold_copy_is_relinked_without_a_folder_file(cases_root):
+    folder = cases_root / "B-0001-2026"
+    cold_storage.pack(folder)
+    assert not (folder / "notes.pdf").exists()
+    notes = UploadedFile.query.filter_by(filename="notes.pdf").one()
+    scan = UploadedFile.query.filter_by(filename="scan.pdf").one()
+    notes.sha256, notes.size_bytes = scan.sha256, scan.size_bytes  # zip has NOTES
+    db.session.commit()
+
+    report = reconcile.run(hash_files=True, repair=True)
+    assert _findings(report) == {("changed", "B-0001-2026", "notes.pdf")}
+    assert report["repairs"] == [
+        {"action": "relinked", "path": str(folder / "notes.pdf")}
+    ]
+    assert (folder / "notes.pdf").read_bytes() == SCAN
@@ -0,0 +1,128 @@
+import os
+
+import pytest
+from docx import Document
+
+from app import db
+from app.investigations.models import InvestigationAttachment
+from app.models import Case, DocumentJob, UploadedFile
+from app.paths import case_root, ensure_investigation_folder
+from app.services import document_jobs
+from tests.helpers import (
+    create_investigation_with_default_leiro,
+    create_user,
+    login_follow,
+)
+
+FORM = {
+    "cimzett_szerv": "ORFK",
+    "titulus_szerv": "Osztályvezető",
+    "actor": "N. N.",
+    "titulus": "dr.",
+    "sum": "250 000 Ft",
+}
+
+
+@pytest.fixture
+def renders(app, monkeypatch):
+    # Identical forms are otherwise answered by the idempotency guard.
+    app.config["IDEMPOTENCY_TTL_SECONDS"] = 0
+    calls = []
+    for name, fn in list(document_jobs.RENDERERS.items()):
+
+        def counted(payload, fn=fn):
+            calls.append(payload["output"])
+            fn(payload)
+
+        monkeypatch.setitem(document_jobs.RENDERERS, name, counted)
+    return calls
+
+
+@pytest.fixture
+def letter(app, client, tmp_path, renders):
+    app.config["UPLOAD_INVESTIGATIONS_ROOT"] = str(tmp_path / "inv")
+    app.config["INVESTIGATION_UPLOAD_FOLDER"] = str(tmp_path / "inv")
+    inv, leiro, _ = create_investigation_with_default_leiro()
+    template = (
+        ensure_investigation_folder(inv.case_number)
+        / "DO-NOT-EDIT"
+        / "tajekoztatas_arajanlat.docx"
+    )
+    doc = Document()
+    doc.add_paragraph("Titulus: {{titulus}}")
+    doc.save(str(template))
+    login_follow(client, leiro.username, "secret")
+    return inv, template, f"/investigations/{inv.id}/leiro/tajekoztatas_arajanlat"
+
+
+def test_unchanged_letter_is_not_rendered_again(client, letter, renders):
+    inv, _, url = letter
+    client.post(url, data=FORM)
+    att = InvestigationAttachment.query.filter_by(investigation_id=inv.id).one()
+    uploaded_at = att.uploaded_at
+    assert att.render_fingerprint
+
+    resp = client.post(url, data=FORM, follow_redirects=True)
+
+    assert len(renders) == 1
+    assert "nem változott" in resp.get_data(as_text=True)
+    job = DocumentJob.query.order_by(DocumentJob.created_at.desc()).first()
+    assert job.status == document_jobs.STATUS_DONE
+    assert job.result == {"generated_id": att.id, "reused": True}
+    assert att.uploaded_at == uploaded_at
+
+
+def test_changed_data_template_or_force_renders(client, letter, renders):
+    _, template, url = letter
+    client.post(url, data=FORM)
+    client.post(url, data={**FORM, "titulus": "prof."})
+    assert len(renders) == 2
+
+    doc = Document()
+    doc.add_paragraph("Tisztelt {{titulus}}!")
+    doc.save(str(template))
+    client.post(url, data={**FORM, "titulus": "prof."})
+    assert len(renders) == 3
+
+    client.post(url, data={**FORM, "titulus": "prof.", "force": "1"})
+    assert len(renders) == 4
+
+
+def test_missing_output_is_rendered_again(client, letter, renders):
+    _, _, url = letter
+    client.post(url, data=FORM)
+    for path in set(renders):
+        os.remove(path)
+    client.post(url, data=FORM)
+    assert len(renders) == 2
+
+
+def test_tox_doc_reuse_and_stats(app, client, tmp_path, renders):
+    app.config["UPLOAD_CASES_ROOT"] = str(tmp_path / "cases")
+    app.config["CASE_UPLOAD_FOLDER"] = str(tmp_path / "cases")
+    create_user("tox", "pw", "toxi")
+    create_user("admin1", "pw", "admin")
+    case = Case(case_number="B:0003/2026", anyja_neve="Anyja")
+    db.session.add(case)
+    db.session.commit()
+    template_dir = case_root() / "autofill-word-do-not-edit"
+    template_dir.mkdir(parents=True, exist_ok=True)
+    doc = Document()
+    doc.add_paragraph("{{case.case_number}}")
+    doc.save(str(template_dir / "Toxikológiai-kirendelő.docx"))
+    form = {"alkohol_minta_count": "1", "alkohol_minta_ara": "100"}
+
+    login_follow(client, "tox", "pw")
+    for _ in range(3):
+        client.post(f"/cases/{case.id}/generate_tox_doc", data=form)
+
+    assert len(renders) == 1
+    assert UploadedFile.query.filter_by(case_id=case.id).count() == 1
+
+    login_follow(client, "admin1", "pw")
+    stats = client.get("/jobs/stats").json
+    assert stats[document_jobs.KIND_TOX_DOC] == {
+        "rendered": 1,
+        "reused": 2,
+        "hit_rate": 0.667,
+    }
@@ -0,0 +1,231 @@
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.services import replication
+from app.utils.sqlite import wal_enabled
+
+WRITER = """
+import sqlite3, sys, time
+conn = sqlite3.connect(sys.argv[1], isolation_level=None, timeout=30)
+conn.execute("PRAGMA wal_autocheckpoint=0")
+batch = 0
+while True:
+    batch += 1
+    conn.execute("BEGIN IMMEDIATE")
+    for i in range(10):
+        conn.execute("INSERT INTO t (batch, v) VALUES (?, ?)", (batch, "x" * 300))
+    conn.execute("COMMIT")
+    time.sleep(0.002)
+"""
+
+
+@pytest.fixture
+def primary(tmp_path):
+    path = tmp_path / "primary.db"
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, batch INTEGER, v TEXT)")
+    yield path, conn
+    conn.close()
+
+
+def _rows(path, **kw):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, **kw)
+    try:
+        return conn.execute("SELECT id, batch FROM t ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_standby_follows_commits_across_wal_restarts(primary, tmp_path):
+    path, conn = primary
+    root = tmp_path / "standby"
+    shipper = replication.Shipper("main", path, root, checkpoint_frames=20)
+    replayer = replication.Replayer("main", root)
+    shipper.sync()
+    replayer.apply()
+    reader = sqlite3.connect(f"file:{replayer.db_path}?mode=ro", uri=True)
+
+    salts = set()
+    for batch in range(5):
+        conn.execute("BEGIN")
+        for _ in range(60):
+            conn.execute("INSERT INTO t (batch, v) VALUES (?, ?)", (batch, "x" * 2000))
+        conn.execute("COMMIT")
+        assert shipper.sync() > 0
+        assert shipper.needs_checkpoint() and shipper.checkpoint()
+        salts.add(tuple(shipper.state["salts"]))
+        lag = replication.status(root, {"main": path})["main"]
+        assert lag["pending_segments"] == 1 and lag["unshipped_frames"] == 0
+        assert replayer.apply() == 1
+        # An open read-only connection sees each replayed transaction.
+        assert reader.execute("SELECT count(*) FROM t").fetchone()[0] == 60 * (
+            batch + 1
+        )
+    assert len(salts) == 5  # the WAL started over after every checkpoint
+    reader.close()
+
+    # A restarted shipper picks up where it stopped, no new snapshot.
+    conn.execute("INSERT INTO t (batch, v) VALUES (8, 'y')")
+    assert shipper.sync() > 0
+    shipper.close()
+    conn.execute("INSERT INTO t (batch, v) VALUES (9, 'y')")
+    restarted = replication.Shipper("main", path, root)
+    assert restarted.sync() > 0 and restarted.state["generation"] == 1
+    replayer.apply()
+    assert _rows(replayer.db_path) == _rows(path)
+    assert replication.status(root, {"main": path})["main"]["lag_seconds"] == 0.0
+    restarted.close()
+
+
+def test_resync_when_wal_was_checkpointed_behind_the_shippers_back(primary, tmp_path):
+    path, conn = primary
+    root = tmp_path / "standby"
+    shipper = replication.Shipper("main", path, root)
+    shipper.sync()
+    shipper.close()
+    conn.execute("INSERT INTO t (batch, v) VALUES (1, 'lost from the WAL')")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    restarted = replication.Shipper("main", path, root)
+    restarted.sync()
+    assert restarted.state["generation"] == 2
+    replication.Replayer("main", root).apply()
+    assert _rows(root / "main" / "main.db") == [(1, 1)]
+    restarted.close()
+
+
+def test_failover_after_primary_is_killed_mid_write(primary, tmp_path):
+    path, conn = primary
+    conn.close()
+    root = tmp_path / "standby"
+    shipper = replication.Shipper("main", path, root, checkpoint_frames=200)
+    replayer = replication.Replayer("main", root)
+    shipper.sync()
+    writer = subprocess.Popen([sys.executable, "-c", WRITER, str(path)])
+    try:
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            shipper.sync()
+            if shipper.needs_checkpoint():
+                shipper.checkpoint()
+            replayer.apply()
+            if len(_rows(replayer.db_path)) > 2000:
+                break
+            time.sleep(0.05)
+    finally:
+        os.kill(writer.pid, signal.SIGKILL)
+        writer.wait()
+
+    # Whatever reached the primary's WAL before the kill is shipped.
+    shipper.sync()
+    shipper.close()
+    report = replication.promote(root, ["main"], targets={"main": path})
+    assert report["main"]["installed"] == str(path)
+    assert list(tmp_path.glob("primary.db.failed-*"))
+
+    failed = next(tmp_path.glob("primary.db.failed-*"))
+    for wal in tmp_path.glob("primary.db-wal.failed-*"):
+        wal.rename(f"{failed}-wal")
+    committed = _rows(failed)  # what the old primary had committed
+    promoted = _rows(path)
+    assert len(promoted) > 2000 and promoted == committed
+    assert all(count == 10 for count in _batch_sizes(promoted))
+    check = sqlite3.connect(path)
+    assert check.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+    assert check.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    check.close()
+    with pytest.raises(replication.ReplicationError):
+        replication.Shipper("main", failed, root).sync()
+
+
+def _batch_sizes(rows):
+    sizes = {}
+    for _id, batch in rows:
+        sizes[batch] = sizes.get(batch, 0) + 1
+    return sizes.values()
+
+
+def test_wal_follows_replication_unless_configured():
+    assert not wal_enabled({})
+    assert wal_enabled({"REPLICATION_STANDBY_DIR": "/standby"})
+    assert wal_enabled({"SQLITE_WAL": "1"})
+    assert not wal_enabled({"SQLITE_WAL": "0", "REPLICATION_STANDBY_DIR": "/s"})
+
+
+def test_app_binds_use_wal_and_replicate(tmp_path):
+    from app import create_app, db
+
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'main.db'}",
+            "SQLALCHEMY_BINDS": {
+                "examination": f"sqlite:///{tmp_path / 'examination.db'}"
+            },
+            "REPLICATION_STANDBY_DIR": str(tmp_path / "standby"),
+        }
+    )
+    with app.app_context():
+        with db.engines[None].connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        totals = replication.run(once=True)
+        assert totals["frames"] == 0
+        lag = replication.metrics()
+        assert set(lag) == {"main", "examination"}
+        assert all(info["generation"] == 1 for info in lag.values())
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    assert (tmp_path / "standby" / "main" / "main.db").exists()
+
+
+def test_wal_guard_checkpoints_when_the_shipper_is_overdue(tmp_path):
+    from app import create_app, db
+    from app.services import db_maintenance
+
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'main.db'}",
+            "SQLALCHEMY_BINDS": {
+                "examination": f"sqlite:///{tmp_path / 'examination.db'}"
+            },
+            "REPLICATION_STANDBY_DIR": str(tmp_path / "standby"),
+        }
+    )
+    main = tmp_path / "main.db"
+
+    def write():
+        with db.engines[None].begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE IF NOT EXISTS t (v TEXT)")
+            conn.exec_driver_sql("INSERT INTO t VALUES (?)", ("x" * 5000,))
+
+    with app.app_context():
+        write()
+        # No shipper has ever reported: the app checkpoints on its own.
+        assert db_maintenance.guard_wal()["main"]["checkpointed"]
+        assert replication.wal_bytes(main) == 0
+
+        replication.run(once=True)
+        write()
+        assert "checkpointed" not in db_maintenance.guard_wal()["main"]
+        assert replication.metrics()["main"]["wal_bytes"] > 0
+
+        ship_path = tmp_path / "standby" / "main" / replication.SHIP_STATE
+        ship = json.loads(ship_path.read_text())
+        ship["updated_at"] -= 3600
+        ship_path.write_text(json.dumps(ship))
+        assert db_maintenance.guard_wal()["main"]["checkpointed"]
+        assert replication.metrics()["main"]["wal_bytes"] == 0
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
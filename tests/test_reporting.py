@@ -0,0 +1,86 @@
+import sqlalchemy as sa
+
+from app import db
+from app.models import Case
+from app.services import replication
+from app.utils import reporting
+from tests.helpers import create_user, login
+
+
+def _admin(app):
+    with app.app_context():
+        return create_user("admin", "secret", "admin").username
+
+
+def _case_numbers():
+    return sorted(db.session.execute(sa.select(Case.case_number)).scalars())
+
+
+def test_reads_are_routed_and_writes_stay_on_the_primary(app):
+    app.config["REPORTING_SOURCE"] = "readonly"
+    with reporting.reporting() as source:
+        assert source == "readonly"
+        bind = db.session.get_bind(mapper=Case, clause=sa.select(Case))
+        assert "mode=ro" in str(bind.url)
+        db.session.add(Case(case_number="R:0001/2026"))
+        db.session.commit()  # the flush goes to the primary
+        assert _case_numbers() == ["R:0001/2026"]
+    assert db.session.get_bind(mapper=Case, clause=sa.select(Case)) is db.engine
+
+
+def test_replica_within_budget_else_primary(app, client, tmp_path):
+    username = _admin(app)
+    app.config.update(
+        REPORTING_SOURCE="replica",
+        REPLICATION_STANDBY_DIR=str(tmp_path / "standby"),
+        REPORTING_MAX_STALENESS_SECONDS=30,
+    )
+    with client:
+        login(client, username, "secret")
+        resp = client.get("/admin/changelog.csv")
+        source = resp.headers["X-Read-Source"]
+        assert source.startswith("primary; replica") and "unavailable" in source
+
+        db.session.add(Case(case_number="R:0002/2026"))
+        db.session.commit()
+        replication.run(once=True)
+        with reporting.reporting() as source:
+            assert source == "replica; lag=0.0"
+            assert _case_numbers() == ["R:0002/2026"]
+
+        # Committed but not shipped yet: stale, within the budget.
+        db.session.add(Case(case_number="R:0003/2026"))
+        db.session.commit()
+        with reporting.reporting() as source:
+            assert source.startswith("replica")
+            assert _case_numbers() == ["R:0002/2026"]
+        assert (
+            client.get("/dashboard/penzugy")
+            .headers["X-Read-Source"]
+            .startswith("replica")
+        )
+
+        app.config["REPORTING_MAX_STALENESS_SECONDS"] = -1
+        with reporting.reporting() as source:
+            assert source.startswith("primary; replica") and "behind" in source
+            assert _case_numbers() == ["R:0002/2026", "R:0003/2026"]
+
+
+def test_view_falls_back_to_the_primary_when_the_replica_fails(
+    app, client, tmp_path, monkeypatch
+):
+    username = _admin(app)
+    missing = sa.create_engine(
+        f"sqlite:///file:{(tmp_path / 'gone.db').as_posix()}?mode=ro&uri=true"
+    )
+    monkeypatch.setattr(
+        reporting,
+        "choose_routes",
+        lambda: ({db.engine: missing}, "replica; lag=0.0"),
+    )
+    with client:
+        login(client, username, "secret")
+        resp = client.get("/admin/changelog.csv")
+    assert resp.status_code == 200
+    assert resp.headers["X-Read-Source"] == "primary; replica failed"
+    missing.dispose()
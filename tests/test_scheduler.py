@@ -0,0 +1,116 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.models import ScheduledJob, ScheduledJobRun
+from app.services import scheduler
+from app.utils.time_utils import BUDAPEST_TZ, to_budapest
+
+
+def _budapest(*args):
+    return datetime(*args, tzinfo=BUDAPEST_TZ)
+
+
+@pytest.fixture
+def jobs(app, monkeypatch):
+    calls = []
+
+    def register(name, fn, schedule="@every 1h", timeout=60, group=None):
+        monkeypatch.setitem(
+            scheduler.JOBS,
+            name,
+            scheduler.JobSpec(name, fn, schedule, timeout, group),
+        )
+
+    def ok():
+        calls.append("ok")
+        return {"done": len(calls)}
+
+    def boom():
+        raise RuntimeError("boom")
+
+    def slow():
+        time.sleep(30)
+
+    register("t_ok", ok, group="maint")
+    register("t_boom", boom)
+    register("t_other", ok, group="maint")
+    register("t_slow", slow, timeout=1)
+    scheduler.sync_jobs()
+    return calls
+
+
+def test_next_fire_cron_and_intervals():
+    after = _budapest(2026, 10, 17, 8, 0)  # Saturday
+    nf = scheduler.next_fire
+    assert to_budapest(nf("0 7 * * *", after)) == _budapest(2026, 10, 18, 7, 0)
+    assert to_budapest(nf("*/15 * * * *", after)) == _budapest(2026, 10, 17, 8, 15)
+    assert to_budapest(nf("30 9 * * 1-5", after)) == _budapest(2026, 10, 19, 9, 30)
+    assert to_budapest(nf("0 0 1 1 *", after)) == _budapest(2027, 1, 1, 0, 0)
+    # Daylight saving ends on 2026-10-25: midnight stays local midnight.
+    assert to_budapest(nf("@daily", _budapest(2026, 10, 25, 1, 0))) == _budapest(
+        2026, 10, 26, 0, 0
+    )
+    assert nf("@every 5m", after) == after + timedelta(minutes=5)
+    with pytest.raises(ValueError):
+        nf("61 * * * *", after)
+    with pytest.raises(ValueError):
+        nf("@every soon", after)
+
+
+def test_leases_are_exclusive_per_job_and_lock_group(jobs):
+    scheduler.trigger("t_ok")
+    scheduler.trigger("t_other")
+
+    assert scheduler.acquire("t_ok", "host:1")
+    assert not scheduler.acquire("t_ok", "host:2", due=False)
+    # Same lock group: waits for t_ok's lease even though it is due.
+    assert not scheduler.acquire("t_other", "host:2")
+    assert "t_other" in scheduler.due_jobs()
+
+    assert not scheduler.release("t_ok", "host:2", scheduler.STATUS_OK)
+    assert scheduler.release("t_ok", "host:1", scheduler.STATUS_OK)
+    assert scheduler.acquire("t_other", "host:2")
+    # t_ok's next run moved into the future when its lease was taken.
+    assert "t_ok" not in scheduler.due_jobs()
+
+    # An expired lease (crashed scheduler) can be taken over.
+    ScheduledJob.query.filter_by(name="t_other").update(
+        {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}
+    )
+    db.session.commit()
+    assert scheduler.acquire("t_other", "host:3", due=False)
+
+
+def test_inline_runs_record_history_and_metrics(jobs):
+    scheduler.trigger("t_ok")
+    scheduler.trigger("t_boom")
+
+    assert scheduler.run_scheduler(processes=0, once=True) == 2
+    assert scheduler.run_scheduler(processes=0, once=True) == 0
+    runs = {run.job_name: run for run in ScheduledJobRun.query.all()}
+    assert runs["t_ok"].status == scheduler.STATUS_OK
+    assert runs["t_ok"].result == {"done": 1}
+    assert runs["t_boom"].status == scheduler.STATUS_FAILED
+    assert "boom" in runs["t_boom"].error
+    assert db.session.get(ScheduledJob, "t_boom").lease_owner is None
+
+    assert scheduler.run_job_now("t_ok").trigger == scheduler.TRIGGER_MANUAL
+    stats = scheduler.metrics()
+    assert stats["t_ok"]["runs"] == 2 and stats["t_ok"][scheduler.STATUS_OK] == 2
+    assert stats["t_boom"]["last_status"] == scheduler.STATUS_FAILED
+    assert "email_outbox" in stats and stats["email_outbox"]["runs"] == 0
+
+
+def test_process_runs_are_killed_at_their_timeout(jobs):
+    scheduler.trigger("t_slow")
+
+    start = time.monotonic()
+    assert scheduler.run_scheduler(processes=1, once=True, poll_interval=0.1) == 1
+    assert time.monotonic() - start < 15
+    run = ScheduledJobRun.query.filter_by(job_name="t_slow").one()
+    assert run.status == scheduler.STATUS_TIMEOUT
+    job = db.session.get(ScheduledJob, "t_slow")
+    assert (job.last_status, job.lease_owner) == (scheduler.STATUS_TIMEOUT, None)
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+
+from app import db
+from app.investigations.models import InvestigationStatusTransition
+from app.models import Case, ChangeLog, StatusTransition
+from app.services.status_history import backfill_from_changelog, dwell_time_stats
+from tests.helpers import create_investigation, create_user, login
+
+
+def _transitions(model, subject_id):
+    return [
+        (t.from_status, t.to_status)
+        for t in model.query.filter_by(subject_id=subject_id).order_by(model.id)
+    ]
+
+
+def test_case_listeners_record_transitions(app):
+    case = Case(case_number="ST-1", status="beérkezett")
+    db.session.add(case)
+    db.session.commit()
+    case.status = "szignálva"
+    db.session.commit()
+    case.deceased_name = "Nem státusz"
+    db.session.commit()
+
+    assert _transitions(StatusTransition, case.id) == [
+        (None, "beérkezett"),
+        ("beérkezett", "szignálva"),
+    ]
+
+
+def test_investigation_listeners_record_transitions(app):
+    inv = create_investigation(status="beérkezett")
+    inv.status = "szignálva"
+    db.session.commit()
+
+    assert _transitions(InvestigationStatusTransition, inv.id) == [
+        (None, "beérkezett"),
+        ("beérkezett", "szignálva"),
+    ]
+
+
+def _add(subject_id, to_status, at, from_status=None):
+    db.session.add(
+        StatusTransition(
+            subject_id=subject_id, from_status=from_status, to_status=to_status, at=at
+        )
+    )
+
+
+def test_dwell_time_stats_in_sql(app):
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    _add(1, "beérkezett", t0)
+    _add(1, "szignálva", t0 + timedelta(hours=2))
+    _add(1, "lezárt", t0 + timedelta(hours=8))
+    _add(2, "beérkezett", t0)
+    _add(2, "szignálva", t0 + timedelta(hours=4))
+    db.session.commit()
+
+    stats = {row["status"]: row for row in dwell_time_stats("case")}
+    assert stats["beérkezett"]["stints"] == 2
+    assert round(stats["beérkezett"]["avg_seconds"]) == 3 * 3600
+    assert round(stats["szignálva"]["max_seconds"]) == 6 * 3600
+    assert "lezárt" not in stats
+
+    now = t0 + timedelta(hours=10)
+    open_stats = {
+        row["status"]: row
+        for row in dwell_time_stats("case", include_open=True, now=now)
+    }
+    assert open_stats["szignálva"]["stints"] == 2
+    assert round(open_stats["lezárt"]["total_seconds"]) == 2 * 3600
+
+    later = dwell_time_stats("case", since=t0 + timedelta(hours=1))
+    assert [row["status"] for row in later] == ["szignálva"]
+
+
+def test_backfill_from_changelog(app):
+    case = Case(case_number="ST-2", status="beérkezett")
+    db.session.add(case)
+    db.session.commit()
+    db.session.add(
+        ChangeLog(
+            case_id=case.id,
+            field_name="status",
+            old_value="beérkezett",
+            new_value="szignálva",
+            edited_by="legacy",
+        )
+    )
+    db.session.commit()
+
+    assert backfill_from_changelog("case") == 2
+    db.session.commit()
+    assert _transitions(StatusTransition, case.id) == [
+        (None, "beérkezett"),
+        ("beérkezett", "szignálva"),
+    ]
+
+
+def test_admin_status_dwell_endpoint(client):
+    create_user()  # admin
+    with client:
+        login(client, "admin", "secret")
+        resp = client.get("/admin/status-dwell.json?subject_type=case")
+    assert resp.status_code == 200
+    assert resp.get_json() == {"case": []}
@@ -0,0 +1,110 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from app import db
+from app.investigations import routes as inv_routes
+from app.investigations.utils import init_investigation_upload_dirs
+from app.models import Case
+from app.paths import ensure_case_folder, ensure_investigation_folder
+from app.services import template_store
+from app.views.auth import init_case_upload_dirs
+from tests.helpers import create_investigation
+
+
+@pytest.fixture
+def store(app, tmp_path):
+    app.config["TEMPLATE_STORE_ROOT"] = str(tmp_path / "store")
+    src = Path(app.instance_path) / "docs" / "boncolas"
+    if src.exists():
+        shutil.rmtree(src)
+    (src / "forms").mkdir(parents=True)
+    (src / "README.txt").write_text("v1")
+    (src / "forms" / "blank.txt").write_text("blank")
+    return src
+
+
+def _case(number):
+    case = Case(case_number=number)
+    db.session.add(case)
+    db.session.commit()
+    init_case_upload_dirs(case)
+    db.session.commit()
+    return case, ensure_case_folder(number) / "DO-NOT-EDIT"
+
+
+def test_cases_link_one_shared_version(store):
+    first, first_dir = _case("TS-1")
+    second, second_dir = _case("TS-2")
+
+    assert first.template_version
+    assert first.template_version == second.template_version
+    assert (first_dir / "forms" / "blank.txt").read_text() == "blank"
+    assert os.path.samefile(first_dir / "README.txt", second_dir / "README.txt")
+    tset = template_store.current(template_store.CASE_SET)
+    assert os.path.samefile(first_dir / "README.txt", tset.path / "README.txt")
+
+
+def test_source_change_publishes_new_version(store):
+    old, old_dir = _case("TS-3")
+    (store / "README.txt").write_text("v2")
+    new, new_dir = _case("TS-4")
+
+    assert new.template_version != old.template_version
+    assert (old_dir / "README.txt").read_text() == "v1"
+    assert (new_dir / "README.txt").read_text() == "v2"
+    assert set(template_store.versions(template_store.CASE_SET)) == {
+        old.template_version,
+        new.template_version,
+    }
+
+    assert template_store.prune(template_store.CASE_SET, keep=()) == 1
+    assert template_store.versions(template_store.CASE_SET) == [new.template_version]
+    assert (old_dir / "README.txt").read_text() == "v1"
+
+
+def test_edit_through_a_link_is_repaired(store):
+    _, first_dir = _case("TS-5")
+    (first_dir / "README.txt").write_text("edited in place")
+
+    _, second_dir = _case("TS-6")
+    assert (second_dir / "README.txt").read_text() == "v1"
+    assert (first_dir / "README.txt").read_text() == "edited in place"
+
+
+def test_investigation_templates_are_sanitized_once(app, tmp_path, monkeypatch):
+    from docx import Document
+
+    app.config["TEMPLATE_STORE_ROOT"] = str(tmp_path / "store")
+    src = tmp_path / "vizsgalat"
+    src.mkdir()
+    doc = Document()
+    doc.add_paragraph("Ügyszám: {{ ugyszam }}")
+    doc.save(str(src / "ertesites.docx"))
+    app.config["INVESTIGATION_TEMPLATE_DIR"] = str(src)
+
+    calls = []
+    original = inv_routes._sanitize_docx_placeholders
+
+    def counting(path):
+        calls.append(path)
+        return original(path)
+
+    monkeypatch.setattr(inv_routes, "_sanitize_docx_placeholders", counting)
+
+    invs = [create_investigation(), create_investigation()]
+    for inv in invs:
+        init_investigation_upload_dirs(inv)
+    db.session.commit()
+
+    assert len(calls) == 1
+    assert invs[0].template_version == invs[1].template_version
+    first, second = (
+        ensure_investigation_folder(inv.case_number) / "DO-NOT-EDIT" / "ertesites.docx"
+        for inv in invs
+    )
+    assert os.path.samefile(first, second)
+    # The shared copy is already sanitized (placeholder whitespace normalized).
+    assert Document(str(first)).paragraphs[0].text == "Ügyszám: {{ugyszam}}"
@@ -0,0 +1,130 @@
+import io
+from pathlib import Path
+
+import pytest
+from werkzeug.test import EnvironBuilder
+
+from app import db
+from app.models import Case, UploadedFile
+from app.services import blob_store
+from tests.helpers import create_user, login
+
+
+class _Untouchable(io.RawIOBase):
+    def read(self, size=-1):
+        raise AssertionError("body must not be read")
+
+
+class _Endless(io.RawIOBase):
+    """A never-ending multipart body, as sent by a chunked abusive client."""
+
+    def __init__(self):
+        self.sent = 0
+        self._head = (
+            b'--x\r\nContent-Disposition: form-data; name="file"; '
+            b'filename="big.pdf"\r\nContent-Type: application/pdf\r\n\r\n'
+        )
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        data = self._head or b"\0" * len(buf)
+        self._head = b""
+        n = min(len(buf), len(data))
+        buf[:n] = data[:n]
+        self.sent += n
+        return n
+
+
+def _call(app, environ):
+    status = []
+    body = b"".join(app.wsgi_app(environ, lambda s, h, e=None: status.append(s)))
+    return int(status[0].split()[0]), body
+
+
+@pytest.fixture
+def case(client):
+    create_user()
+    case = Case(case_number="LIM-1")
+    db.session.add(case)
+    db.session.commit()
+    login(client, "admin", "secret")
+    return case
+
+
+def test_declared_oversize_is_refused_without_reading(app, case):
+    app.config["UPLOAD_ROUTE_LIMITS"] = {"auth.upload_file": 1024}
+    environ = EnvironBuilder(
+        path=f"/cases/{case.id}/upload",
+        method="POST",
+        content_type="multipart/form-data; boundary=x",
+    ).get_environ()
+    environ["CONTENT_LENGTH"] = "4096"
+    environ["wsgi.input"] = _Untouchable()
+
+    status, body = _call(app, environ)
+    assert status == 413
+    assert body == b"File too large"
+
+
+def test_streamed_oversize_aborts_at_the_limit(app, client, case):
+    app.config["UPLOAD_ROUTE_LIMITS"] = {"auth.upload_file": 64 * 1024}
+    environ = EnvironBuilder(
+        path=f"/cases/{case.id}/upload",
+        method="POST",
+        content_type="multipart/form-data; boundary=x",
+        headers={"Cookie": f"session={client.get_cookie('session').value}"},
+    ).get_environ()
+    del environ["CONTENT_LENGTH"]  # chunked transfer encoding
+    environ["wsgi.input_terminated"] = True
+    environ["wsgi.input"] = body = _Endless()
+
+    status, _ = _call(app, environ)
+    assert status == 413
+    assert body.sent <= 64 * 1024 + 1
+    assert UploadedFile.query.filter_by(case_id=case.id).count() == 0
+    assert list((blob_store.blob_root() / "tmp").glob("*.part")) == []
+
+
+def test_route_limit_overrides_global_cap(app, client, case):
+    app.config["MAX_CONTENT_LENGTH"] = 1024
+    app.config["UPLOAD_ROUTE_LIMITS"] = {"auth.upload_file": 64 * 1024}
+    payload = b"%PDF-1.4 " + b"x" * 8192
+    resp = client.post(
+        f"/cases/{case.id}/upload",
+        data={"category": "egyéb", "file": (io.BytesIO(payload), "scan.pdf")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 302
+    assert UploadedFile.query.filter_by(case_id=case.id).one().size_bytes == len(
+        payload
+    )
+
+    # Routes without an entry keep the global cap.
+    resp = client.post(f"/cases/{case.id}/add_note", data={"new_note": "x" * 4096})
+    assert resp.status_code == 413
+
+
+def test_multipart_files_are_spooled_into_the_blob_store(
+    app, client, case, monkeypatch
+):
+    published = []
+    original = blob_store.BlobSpool.publish
+
+    def spy(self):
+        published.append(Path(self.path).parent)
+        return original(self)
+
+    monkeypatch.setattr(blob_store.BlobSpool, "publish", spy)
+    payload = b"%PDF-1.4 spooled"
+    resp = client.post(
+        f"/cases/{case.id}/upload",
+        data={"category": "egyéb", "file": (io.BytesIO(payload), "spool.pdf")},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 302
+    assert published == [blob_store.blob_root() / "tmp"]
+    record = UploadedFile.query.filter_by(case_id=case.id).one()
+    assert blob_store.blob_path(record.sha256).read_bytes() == payload
+    assert list((blob_store.blob_root() / "tmp").glob("*.part")) == []
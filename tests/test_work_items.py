@@ -0,0 +1,154 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Case, UploadedFile, WorkItem
+from app.services.work_items import (
+    ROLE_ASSIGNED,
+    ROLE_DESCRIBER,
+    ROLE_EXPERT,
+    ROLE_TOXI,
+    SUBJECT_CASE,
+    SUBJECT_INVESTIGATION,
+    TOXI_DONE,
+    TOXI_PENDING,
+    inbox_page,
+    rebuild_all,
+)
+from tests.helpers import create_investigation, create_user, login
+
+
+def _items(subject_type, subject_id):
+    return {
+        (w.user_id, w.role, w.status)
+        for w in WorkItem.query.filter_by(
+            subject_type=subject_type, subject_id=subject_id
+        )
+    }
+
+
+def test_case_assignment_and_status_maintain_items(app):
+    leiro = create_user("leiro1", "pw", role="leíró")
+    expert = create_user(
+        "szak1",
+        "pw",
+        role="szakértő",
+        screen_name="Szak One",
+        default_leiro_id=leiro.id,
+    )
+    case = Case(case_number="W-001", status="beérkezett")
+    db.session.add(case)
+    db.session.commit()
+    assert _items(SUBJECT_CASE, case.id) == set()
+
+    case.expert_1 = "Szak One"
+    case.status = "szignálva"
+    db.session.commit()
+    assert _items(SUBJECT_CASE, case.id) == {
+        (expert.id, ROLE_EXPERT, "szignálva"),
+        (leiro.id, ROLE_DESCRIBER, "szignálva"),
+    }
+
+    case.expert_1 = None
+    db.session.commit()
+    assert _items(SUBJECT_CASE, case.id) == set()
+
+
+def test_vegzes_upload_puts_case_into_toxi_pool(app):
+    case = Case(case_number="W-002", status="szignálva")
+    db.session.add(case)
+    db.session.commit()
+    upload = UploadedFile(
+        case_id=case.id, filename="v.pdf", uploader="x", category="végzés"
+    )
+    db.session.add(upload)
+    db.session.commit()
+    assert _items(SUBJECT_CASE, case.id) == {(None, ROLE_TOXI, TOXI_PENDING)}
+
+    case.tox_completed = True
+    db.session.commit()
+    assert _items(SUBJECT_CASE, case.id) == {(None, ROLE_TOXI, TOXI_DONE)}
+
+    db.session.delete(upload)
+    db.session.commit()
+    assert _items(SUBJECT_CASE, case.id) == set()
+
+
+def test_investigation_items_and_delete(app):
+    expert = create_user("szak1", "pw", role="szakértő")
+    inv = create_investigation(
+        assignment_type="SZAKÉRTŐI", assigned_expert_id=expert.id
+    )
+    assert _items(SUBJECT_INVESTIGATION, inv.id) == {
+        (expert.id, ROLE_EXPERT, "beérkezett"),
+        (expert.id, ROLE_ASSIGNED, "beérkezett"),
+    }
+    db.session.delete(inv)
+    db.session.commit()
+    assert _items(SUBJECT_INVESTIGATION, inv.id) == set()
+
+
+def test_inbox_page_is_paginated_in_deadline_order(app):
+    from datetime import datetime, timezone
+
+    expert = create_user("szak1", "pw", role="szakértő")
+    for n in range(5):
+        db.session.add(
+            Case(
+                case_number=f"P-{n}",
+                expert_1="szak1",
+                status="szignálva",
+                deadline=datetime(2026, 1, 5 - n, tzinfo=timezone.utc),
+            )
+        )
+    db.session.commit()
+
+    with app.test_request_context():
+        pagination, cases = inbox_page(
+            expert.id, ROLE_EXPERT, SUBJECT_CASE, page=1, per_page=2
+        )
+    assert pagination.total == 5
+    assert [c.case_number for c in cases] == ["P-4", "P-3"]
+
+
+def test_rebuild_all_recreates_rows(app):
+    create_user("szak1", "pw", role="szakértő")
+    case = Case(case_number="W-003", expert_1="szak1", status="szignálva")
+    db.session.add(case)
+    db.session.commit()
+    WorkItem.query.delete()
+    db.session.commit()
+
+    assert rebuild_all(db.session) == {"work_items": 1}
+    db.session.commit()
+    assert len(_items(SUBJECT_CASE, case.id)) == 1
+
+
+def test_failed_flush_drops_pending_subjects(app):
+    create_user("szak1", "pw", role="szakértő")
+    db.session.add(Case(case_number="W-004", expert_1="szak1"))
+    db.session.commit()
+
+    db.session.add(Case(case_number="W-004", expert_1="szak1"))
+    with pytest.raises(IntegrityError):
+        db.session.flush()
+    db.session.rollback()
+
+    assert "work_item_pending" not in db.session.info
+
+
+def test_toxi_ugyeim_reads_pool(client, app):
+    create_user("toxi1", "pw", role="toxi")
+    case = Case(case_number="TOX-1", status="szignálva")
+    db.session.add(case)
+    db.session.commit()
+    db.session.add(
+        UploadedFile(case_id=case.id, filename="v.pdf", uploader="x", category="végzés")
+    )
+    db.session.commit()
+
+    with client:
+        login(client, "toxi1", "pw")
+        resp = client.get("/ugyeim/toxi")
+    assert resp.status_code == 200
+    assert b"TOX-1" in resp.data